@@ -2,65 +2,36 @@
 Agent 应用服务
 使用 LangChain Agent 框架，让 Agent 自主决定何时调用向量检索工具
 """
-from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Any, Optional, List, Tuple
+import asyncio
 import re
 
 from langchain.agents import AgentExecutor, create_react_agent
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 
+from config import settings
 from infrastructure.llm.llm_service import get_llm_service
-from domain.agent.vector_search_tool import get_vector_search_tool
+from infrastructure.cache.response_cache import get_response_cache
+from infrastructure.repository.sqlite_file_repository import get_file_repository
+from domain.agent.vector_search_tool import get_vector_search_tool, scoped_file_id
+from domain.sql.sql_generator import SQLGenerator, get_sql_generator
+from domain.sql.symbol_table import SchemaSymbolTable, get_symbol_table_registry
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("agent_service")
 
+# ReAct 输出中最终答案的标记（其后的 token 即为 SQL）
+FINAL_ANSWER_MARKER = "Final Answer:"
 
-class AgentService:
-    """
-    Agent 服务（基于 LangChain Agent 框架）
-    
-    核心设计：
-    1. 使用 ReAct Agent 模式
-    2. 向量检索作为 Tool 提供给 Agent
-    3. Agent 根据提示词自主决定工作流程
-    """
-    
-    def __init__(self):
-        """初始化 Agent"""
-        logger.info("Initializing LangChain Agent service...")
-        
-        # 获取 LLM 服务
-        self.llm_service = get_llm_service()
-        
-        # 准备工具列表（Agent 可用的技能）
-        self.tools = [
-            get_vector_search_tool()
-        ]
-        
-        # Agent Executor（延迟初始化，因为需要API Key）
-        self.agent_executor = None
-        
-        logger.info(f"Agent initialized with {len(self.tools)} tools: {[t.name for t in self.tools]}")
-    
-    def _get_or_create_agent(self, api_key: Optional[str] = None) -> AgentExecutor:
-        """
-        获取或创建 Agent Executor
-        
-        Args:
-            api_key: 用户提供的API Key
-            
-        Returns:
-            AgentExecutor: Agent 执行器
-        """
-        # 获取 LLM（使用用户提供的API Key）
-        llm = self.llm_service.get_chat_model(api_key=api_key)
-        
-        # 构建 ReAct Agent 提示词模板（LangChain 标准格式）
-        # 必须包含所有必需变量: tools, tool_names, input, agent_scratchpad
-        agent_prompt = PromptTemplate(
-            input_variables=["tools", "tool_names", "input", "agent_scratchpad"],
-            template="""你是一个专业的 RAG Text-to-SQL 智能助手。
+AGENT_EXPLANATION = "由 Agent 自主调用向量检索工具并生成"
+DIRECT_EXPLANATION = "根据完整表结构直接生成"
+
+# ReAct Agent 提示词模板（LangChain 标准格式）
+# 必须包含所有必需变量: tools, tool_names, input, agent_scratchpad
+AGENT_PROMPT_TEMPLATE = """你是一个专业的 RAG Text-to-SQL 智能助手。
 
 你的核心任务是：根据用户的自然语言问题生成准确的 SQL 查询语句。
 
@@ -88,6 +59,8 @@ Final Answer: 最终答案
 2. 基于工具返回的表结构信息生成SQL
 3. 只生成SELECT语句
 4. Final Answer只包含SQL语句本身
+5. 表结构格式为 表名(字段 类型 [PK 主键] [FK→被引用表.字段] ['注释'], ...) -- 表注释
+6. 检索结果中的"关联子图"已给出相关表的字段和外键连接条件，多表查询直接使用其中的连接条件，无需为关联表再次检索
 
 **示例：**
 
@@ -95,7 +68,7 @@ Question: 查询所有活跃用户
 Thought: 我需要先了解用户表的结构
 Action: vector_search
 Action Input: 用户表 活跃
-Observation: [{{"type": "表", "name": "users", "description": "用户表"}}, {{"type": "字段", "table": "users", "name": "status", "data_type": "VARCHAR"}}]
+Observation: [{{"type":"表","name":"users","schema":"users(id BIGINT PK, name VARCHAR(64), status VARCHAR(16) '状态') -- 用户"}},{{"type":"字段","table":"users","name":"status","data_type":"VARCHAR(16)","comment":"状态"}}]
 Thought: 我现在知道了表结构，可以生成SQL了
 Final Answer: SELECT * FROM users WHERE status = 'active';
 
@@ -103,23 +76,110 @@ Final Answer: SELECT * FROM users WHERE status = 'active';
 
 Question: {input}
 Thought: {agent_scratchpad}"""
+
+
+class AgentService:
+    """
+    Agent 服务（基于 LangChain Agent 框架）
+    
+    核心设计：
+    1. 使用 ReAct Agent 模式
+    2. 向量检索作为 Tool 提供给 Agent
+    3. Agent 根据提示词自主决定工作流程
+    4. 小 schema（表数不超过 DIRECT_MODE_MAX_TABLES）直接把完整表结构放入提示词，
+       由 SQLGenerator 一次 LLM 调用生成；直接生成失败或 schema 较大时使用 Agent
+    """
+    
+    def __init__(self):
+        """初始化 Agent"""
+        logger.info("Initializing LangChain Agent service...")
+        
+        # 获取 LLM 服务
+        self.llm_service = get_llm_service()
+        
+        # SQL 响应缓存（命中时跳过整个 ReAct 循环）
+        self.response_cache = get_response_cache()
+        
+        # 小 schema 的直接生成（单次 LLM 调用）
+        self.sql_generator = get_sql_generator()
+        
+        # 按文件缓存的 schema 符号表（验证直接生成的 SQL 的表和字段引用）
+        self.symbol_tables = get_symbol_table_registry()
+        
+        # 文件仓储（直接生成时加载完整表结构）
+        self.file_repository = get_file_repository()
+        
+        # 准备工具列表（Agent 可用的技能）
+        self.tools = [
+            get_vector_search_tool()
+        ]
+        
+        # ReAct Agent 提示词模板（只构建一次）
+        self.agent_prompt = PromptTemplate(
+            input_variables=["tools", "tool_names", "input", "agent_scratchpad"],
+            template=AGENT_PROMPT_TEMPLATE
         )
         
-        # 创建 Agent
+        # Agent Executor 缓存（按 LLM 客户端，延迟创建，因为需要API Key）
+        self._agent_executors: "OrderedDict[int, Tuple[BaseChatModel, AgentExecutor]]" = OrderedDict()
+        self._max_cached_agents = settings.llm_client_cache_size + 1  # 用户 Key 客户端 + 默认客户端
+        
+        logger.info(f"Agent initialized with {len(self.tools)} tools: {[t.name for t in self.tools]}")
+    
+    def _build_agent_executor(self, llm: BaseChatModel) -> AgentExecutor:
+        """
+        为指定 LLM 构建 Agent Executor（提示词模板在初始化时已构建）
+        
+        Args:
+            llm: Chat Model 实例
+        
+        Returns:
+            AgentExecutor: Agent 执行器
+        """
+        # 创建 Agent（渲染工具描述，仅在首次使用该 LLM 时执行）
         agent = create_react_agent(
             llm=llm,
             tools=self.tools,
-            prompt=agent_prompt
+            prompt=self.agent_prompt
         )
         
         # 创建 Agent Executor
-        agent_executor = AgentExecutor(
+        return AgentExecutor(
             agent=agent,
             tools=self.tools,
             verbose=True,  # 启用详细日志
             max_iterations=5,  # 最多5轮思考
-            handle_parsing_errors=True  # 处理解析错误
+            handle_parsing_errors=True,  # 处理解析错误
+            return_intermediate_steps=True  # 返回工具调用步骤（提取引用表、统计轮数）
         )
+    
+    def _get_or_create_agent(self, api_key: Optional[str] = None) -> AgentExecutor:
+        """
+        获取或创建 Agent Executor（按 LLM 客户端缓存，请求处理时只需绑定输入）
+        
+        Args:
+            api_key: 用户提供的API Key
+        
+        Returns:
+            AgentExecutor: Agent 执行器
+        """
+        # 获取 LLM（使用用户提供的API Key，客户端本身由 LLM 服务缓存）
+        llm = self.llm_service.get_chat_model(api_key=api_key)
+        
+        # 以 LLM 实例标识为键；缓存项同时持有 LLM 引用，保证 id 不会被复用
+        cache_key = id(llm)
+        cached = self._agent_executors.get(cache_key)
+        if cached is not None:
+            self._agent_executors.move_to_end(cache_key)
+            return cached[1]
+        
+        logger.info("Building Agent Executor for new LLM client")
+        agent_executor = self._build_agent_executor(llm)
+        self._agent_executors[cache_key] = (llm, agent_executor)
+        
+        # 超出容量时淘汰最久未使用的执行器
+        while len(self._agent_executors) > self._max_cached_agents:
+            self._agent_executors.popitem(last=False)
         
         return agent_executor
     
@@ -127,16 +187,20 @@ Thought: {agent_scratchpad}"""
         self,
         user_message: str,
         file_id: Optional[str] = None,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        schema_version: Optional[str] = None,
+        table_count: Optional[int] = None
     ) -> Dict[str, Any]:
         """
-        处理用户消息（使用 LangChain Agent 框架）
+        处理用户消息（小 schema 直接生成，否则使用 LangChain Agent 框架）
         
         Args:
             user_message: 用户消息
             file_id: 当前文件 ID（可选）
             api_key: 用户提供的API Key（可选）
-            
+            schema_version: 当前文件的 schema 指纹（可选，提供时启用响应缓存）
+            table_count: 当前文件的表数（可选，不超过阈值时加载完整表结构直接生成）
+        
         Returns:
             Dict: 响应数据（SQL、解释、引用表等）
         """
@@ -144,44 +208,286 @@ Thought: {agent_scratchpad}"""
         if api_key:
             logger.info("Using user-provided API Key")
         
+        # 查询响应缓存（语义匹配需要计算向量，放到线程中执行）
+        use_cache = bool(file_id and schema_version)
+        if use_cache:
+            cached = await asyncio.to_thread(
+                self.response_cache.get, file_id, schema_version, user_message
+            )
+            if cached is not None:
+                return cached
+        
         try:
-            # 获取 Agent Executor
-            agent_executor = self._get_or_create_agent(api_key=api_key)
+            response = None
+            if file_id and self.use_direct_mode(table_count):
+                tables = await asyncio.to_thread(self._load_tables, file_id)
+                if tables:
+                    response = await self._generate_direct(user_message, tables, file_id, api_key)
+            if response is None:
+                response = await self._run_agent(user_message, file_id, api_key)
+            sql = response["sql"]
             
-            # 执行 Agent（Agent 会自主决定是否调用工具）
-            logger.info("Invoking Agent...")
-            result = agent_executor.invoke({
-                "input": user_message
-            })
-            
-            # 提取结果
-            agent_output = result.get('output', '')
-            
-            logger.info(f"Agent output: {agent_output[:200]}...")
-            
-            # 清理 SQL
-            sql = self._clean_sql(agent_output)
-            
-            # 提取引用的表名（从 Agent 的中间步骤中提取）
-            referenced_tables = self._extract_tables_from_agent_steps(result)
+            if use_cache and sql:
+                await asyncio.to_thread(
+                    self.response_cache.put, file_id, schema_version, user_message, response
+                )
             
-            return {
-                "sql": sql,
-                "explanation": "由 Agent 自主调用向量检索工具并生成",
-                "references": referenced_tables
-            }
+            return response
         
         except Exception as e:
             logger.error(f"Agent processing failed: {e}", exc_info=True)
             raise
     
+    def use_direct_mode(self, table_count: Optional[int]) -> bool:
+        """
+        是否使用直接生成模式（表数不超过 DIRECT_MODE_MAX_TABLES，0 表示始终使用 Agent）
+        
+        Args:
+            table_count: 当前文件的表数（文件元数据中记录，无需加载表结构）
+        
+        Returns:
+            bool: True 表示直接生成
+        """
+        return bool(table_count) and table_count <= settings.direct_mode_max_tables
+    
+    def _load_tables(self, file_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        加载文件的完整表结构（解码 tables_json，应在线程中调用）
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            List[Dict]: 表结构列表，文件不存在或未解析时返回 None
+        """
+        file_data = self.file_repository.get(file_id)
+        return file_data.get("tables") if file_data else None
+    
+    async def _generate_direct(
+        self,
+        user_message: str,
+        tables: List[Dict[str, Any]],
+        file_id: Optional[str] = None,
+        api_key: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        直接生成：完整表结构放入提示词，一次 LLM 调用生成 SQL（不调用检索工具）
+        
+        Args:
+            user_message: 用户消息
+            tables: 当前文件的完整表结构
+            file_id: 当前文件 ID（可选，用于获取文件的符号表）
+            api_key: 用户提供的API Key（可选）
+        
+        Returns:
+            Dict: 响应数据（与 Agent 模式一致），
+                未能生成 SQL 或 SQL 引用了不存在的表/字段时返回 None（由 Agent 模式兜底）
+        """
+        logger.info(f"Direct generation with {len(tables)} tables")
+        
+        def generate() -> Dict[str, Any]:
+            # 符号表未缓存时会读取并解码表结构，与生成、验证一起放到线程中执行
+            symbols = self.symbol_tables.get(file_id) if file_id else None
+            return self.sql_generator.generate(
+                user_message,
+                SQLGenerator.build_table_context(tables),
+                symbols or SchemaSymbolTable.from_tables(tables),
+                api_key
+            )
+        
+        result = await asyncio.to_thread(generate)
+        
+        sql = self._clean_sql(result.get("sql", ""))
+        if not sql:
+            logger.warning("Direct generation produced no SQL, falling back to Agent")
+            return None
+        
+        reference_errors = result.get("validation", {}).get("references", {}).get("errors")
+        if reference_errors:
+            logger.warning(f"Direct generation referenced unknown schema objects {reference_errors}, falling back to Agent")
+            return None
+        
+        references = []
+        for reference in result.get("references", []):
+            fields = [column["name"] for column in reference.get("columns", [])]
+            references.append({"table": reference["table"], "fields": fields} if fields else {"table": reference["table"]})
+        
+        return {
+            "sql": sql,
+            "explanation": DIRECT_EXPLANATION,
+            "references": references
+        }
+    
+    async def _run_agent(
+        self,
+        user_message: str,
+        file_id: Optional[str] = None,
+        api_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Agent 模式：ReAct 循环中自主调用向量检索工具后生成 SQL
+        
+        Args:
+            user_message: 用户消息
+            file_id: 当前文件 ID（可选）
+            api_key: 用户提供的API Key（可选）
+        
+        Returns:
+            Dict: 响应数据（SQL、解释、引用表）
+        """
+        # 获取 Agent Executor
+        agent_executor = self._get_or_create_agent(api_key=api_key)
+        
+        # 异步执行 Agent（Agent 会自主决定是否调用工具，LLM/工具调用不阻塞事件循环）
+        # 向量检索限定在当前文件的表结构中
+        logger.info("Invoking Agent...")
+        with scoped_file_id(file_id):
+            result = await agent_executor.ainvoke({
+                "input": user_message
+            })
+        
+        # 提取结果
+        agent_output = result.get('output', '')
+        
+        logger.info(
+            f"Agent output after {len(result.get('intermediate_steps', []))} tool calls: {agent_output[:200]}..."
+        )
+        
+        return {
+            # 清理 SQL
+            "sql": self._clean_sql(agent_output),
+            "explanation": AGENT_EXPLANATION,
+            # 提取引用的表名（从 Agent 的中间步骤中提取）
+            "references": self._extract_tables_from_agent_steps(result)
+        }
+    
+    async def stream_message(
+        self,
+        user_message: str,
+        file_id: Optional[str] = None,
+        api_key: Optional[str] = None,
+        schema_version: Optional[str] = None,
+        table_count: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式处理用户消息：Agent 每一步和最终 SQL 的 token 产生时立即返回
+        
+        直接生成模式没有中间步骤，生成完成后一次返回 SQL
+        
+        Args:
+            user_message: 用户消息
+            file_id: 当前文件 ID（可选）
+            api_key: 用户提供的API Key（可选）
+            schema_version: 当前文件的 schema 指纹（可选，提供时启用响应缓存）
+            table_count: 当前文件的表数（可选，不超过阈值时加载完整表结构直接生成）
+        
+        Yields:
+            Dict: 事件，event 字段取值：
+                - step: Agent 步骤（tool_start 工具调用 / tool_end 检索到的表 / direct 直接生成使用的表）
+                - token: 最终 SQL 的 token 片段
+                - sql: 最终结果（SQL、解释、引用表，与 process_message 返回值一致）
+        """
+        logger.info(f"Agent streaming message: {user_message[:50]}...")
+        
+        use_cache = bool(file_id and schema_version)
+        if use_cache:
+            cached = await asyncio.to_thread(
+                self.response_cache.get, file_id, schema_version, user_message
+            )
+            if cached is not None:
+                yield {"event": "token", "text": cached["sql"]}
+                yield {"event": "sql", **cached}
+                return
+        
+        tables = None
+        if file_id and self.use_direct_mode(table_count):
+            tables = await asyncio.to_thread(self._load_tables, file_id)
+        if tables:
+            yield {"event": "step", "type": "direct", "tables": [table["name"] for table in tables]}
+            response = await self._generate_direct(user_message, tables, file_id, api_key)
+            if response is not None:
+                if use_cache:
+                    await asyncio.to_thread(
+                        self.response_cache.put, file_id, schema_version, user_message, response
+                    )
+                yield {"event": "token", "text": response["sql"]}
+                yield {"event": "sql", **response}
+                return
+        
+        agent_executor = self._get_or_create_agent(api_key=api_key)
+        
+        observations = []
+        agent_output = None
+        llm_text = ""        # 当前这轮 LLM 输出的累计文本
+        emitted = 0          # 当前这轮已作为 SQL token 返回的字符数（相对标记之后）
+        
+        with scoped_file_id(file_id):
+            async for event in agent_executor.astream_events({"input": user_message}, version="v2"):
+                kind = event["event"]
+                
+                if kind == "on_chat_model_start":
+                    llm_text, emitted = "", 0
+                
+                elif kind == "on_chat_model_stream":
+                    llm_text += event["data"]["chunk"].content or ""
+                    marker = llm_text.find(FINAL_ANSWER_MARKER)
+                    if marker >= 0:
+                        answer = llm_text[marker + len(FINAL_ANSWER_MARKER):].lstrip()
+                        if len(answer) > emitted:
+                            yield {"event": "token", "text": answer[emitted:]}
+                            emitted = len(answer)
+                
+                elif kind == "on_chain_stream" and event["name"] == "AgentExecutor":
+                    # Agent 决定调用工具（工具输入取自解析后的 AgentAction）
+                    for action in event["data"]["chunk"].get("actions", []):
+                        yield {
+                            "event": "step",
+                            "type": "tool_start",
+                            "tool": action.tool,
+                            "input": action.tool_input
+                        }
+                
+                elif kind == "on_tool_end":
+                    observation = event["data"].get("output")
+                    observation = getattr(observation, "content", observation)
+                    observations.append((None, observation))
+                    yield {
+                        "event": "step",
+                        "type": "tool_end",
+                        "tool": event["name"],
+                        "tables": self._extract_tables_from_agent_steps(
+                            {"intermediate_steps": [(None, observation)]}
+                        )
+                    }
+                
+                elif kind == "on_chain_end" and event["name"] == "AgentExecutor":
+                    agent_output = event["data"]["output"].get("output", "")
+        
+        agent_output = agent_output or ""
+        logger.info(f"Agent output: {agent_output[:200]}...")
+        
+        response = {
+            "sql": self._clean_sql(agent_output),
+            "explanation": AGENT_EXPLANATION,
+            "references": self._extract_tables_from_agent_steps(
+                {"intermediate_steps": observations, "output": agent_output}
+            )
+        }
+        
+        if use_cache and response["sql"]:
+            await asyncio.to_thread(
+                self.response_cache.put, file_id, schema_version, user_message, response
+            )
+        
+        yield {"event": "sql", **response}
+    
     def _extract_tables_from_agent_steps(self, agent_result: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         从 Agent 执行结果中提取引用的表名和字段信息
         
         Args:
             agent_result: Agent 执行结果
-            
+        
         Returns:
             List[Dict[str, Any]]: 表引用列表，格式为 [{"table": "table_name", "fields": ["field1", "field2"]}]
         """
@@ -253,7 +559,7 @@ Thought: {agent_scratchpad}"""
         
         Args:
             sql_response: 原始响应
-            
+        
         Returns:
             str: 清理后的 SQL 语句
         """
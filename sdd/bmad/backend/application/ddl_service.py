@@ -2,16 +2,26 @@
 DDL 应用服务
 编排 DDL 解析、向量化和状态管理流程
 """
-import time
-from typing import Dict, Any
 import asyncio
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from infrastructure.parser.ddl_parser import ddl_parser, TableInfo
+from domain.ddl.schema_graph import get_schema_graph_registry
+from domain.sql.symbol_table import SchemaSymbolTable, get_symbol_table_registry
+from infrastructure.parser.ddl_parser import ddl_parser, TableInfo, compute_schema_fingerprint
 from infrastructure.vector.vector_service import get_vector_service
+from infrastructure.repository.sqlite_file_repository import get_file_repository
+from infrastructure.cache.response_cache import get_response_cache
+from infrastructure.executor.ingestion_executor import get_ingestion_executor
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("ddl_service")
 
+# 启动恢复租约有效期（持有租约的 worker 异常退出后，其他 worker 可在过期后重新执行恢复）
+RECOVERY_LEASE_SECONDS = 600.0
+
 
 class DDLService:
     """DDL 应用服务"""
@@ -19,16 +29,100 @@ class DDLService:
     def __init__(self):
         """初始化服务"""
         self.vector_service = get_vector_service()
+        self.file_repository = get_file_repository()
+        self.ingestion_executor = get_ingestion_executor()
+        self.response_cache = get_response_cache()
+        self.schema_graphs = get_schema_graph_registry()
+        self.symbol_tables = get_symbol_table_registry()
     
-    async def process_ddl_file(self, file_id: str, content: str, file_store: Dict) -> Dict[str, Any]:
+    def reserve_slot(self) -> None:
         """
-        处理 DDL 文件：解析 + 向量化
+        为新上传的文件预占处理队列位置（背压）
+        
+        Raises:
+            IngestionQueueFullError: 处理队列已满
+        """
+        self.ingestion_executor.reserve()
+    
+    def release_slot(self) -> None:
+        """
+        归还 reserve_slot 预占的队列位置（文件未能进入处理队列时调用）
+        """
+        self.ingestion_executor.release()
+    
+    async def enqueue_ddl_file(self, file_id: str, content: Optional[str] = None) -> Dict[str, Any]:
+        """
+        在摄取执行器的并发上限内处理 DDL 文件（需先调用 reserve_slot）
         
         Args:
             file_id: 文件 ID
-            content: DDL 文件内容
-            file_store: 文件存储（引用）
+            content: DDL 文件内容（为空时从文件仓储流式读取）
+        
+        Returns:
+            Dict[str, Any]: 处理结果
+        """
+        return await self.ingestion_executor.run(
+            lambda: self.process_ddl_file(file_id, content),
+            reserved=True
+        )
+    
+    async def recover_files(self) -> int:
+        """
+        启动时恢复未完成的文件（启动时在后台调用）
+        
+        - pending/parsing：上次进程退出时尚未处理完，重新处理
+        - ready 但当前向量库中没有对应向量（如内存模式重启）：重新向量化，
+          schema 指纹未变化的持久化向量会被直接复用
+        
+        多 worker 部署时通过仓储租约保证只有一个 worker 执行恢复
+        
+        Returns:
+            int: 重新处理的文件数量
+        """
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        if not self.file_repository.try_acquire_lease(
+            "startup-recovery", owner, ttl_seconds=RECOVERY_LEASE_SECONDS
+        ):
+            logger.info("File recovery is running in another worker, skipped")
+            return 0
+        
+        try:
+            return await self._recover_files()
+        finally:
+            self.file_repository.release_lease("startup-recovery", owner)
+    
+    async def _recover_files(self) -> int:
+        """重新处理未完成或缺少向量的文件（recover_files 的实现）"""
+        if self.vector_service.is_persistent:
+            # 清理仓储中已删除文件的向量（以共享仓储为准，而不是单个进程的向量清单）
+            self.vector_service.drop_orphaned_vectors(
+                lambda: [file_data['file_id'] for file_data in self.file_repository.list_files()]
+            )
+        
+        recovered = 0
+        for file_data in self.file_repository.list_files(statuses=['pending', 'parsing', 'ready']):
+            file_id = file_data['file_id']
+            if file_data['status'] == 'ready' and self.vector_service.has_file_vectors(
+                file_id, file_data['schema_fingerprint']
+            ):
+                continue
             
+            logger.info(f"Recovering file after restart: {file_id} ({file_data['status']})")
+            await self.ingestion_executor.run(lambda: self.process_ddl_file(file_id))
+            recovered += 1
+        
+        if recovered:
+            logger.info(f"Recovered {recovered} files after restart")
+        return recovered
+    
+    async def process_ddl_file(self, file_id: str, content: Optional[str] = None) -> Dict[str, Any]:
+        """
+        处理 DDL 文件：解析 + 向量化
+        
+        Args:
+            file_id: 文件 ID
+            content: DDL 文件内容（为空时从文件仓储流式读取，解析时不需要完整文本常驻内存）
+        
         Returns:
             Dict[str, Any]: 处理结果
         """
@@ -36,13 +130,25 @@ class DDLService:
         start_time = time.time()
         
         try:
-            # 更新状态为"解析中"
-            file_store[file_id]['status'] = 'parsing'
+            # 更新状态为"解析中"（SQLite 写入，放到线程中执行）
+            await asyncio.to_thread(self.file_repository.update_status, file_id, 'parsing')
             logger.info(f"File status updated: {file_id} -> parsing")
             
-            # Step 1: 解析 DDL
+            # 文件重新处理时，旧的 SQL 响应缓存、表关系图和符号表失效
+            self.response_cache.invalidate_file(file_id)
+            self.schema_graphs.invalidate(file_id)
+            self.symbol_tables.invalidate(file_id)
+            
+            # Step 1: 解析 DDL（流式切分后在进程池中执行，不阻塞事件循环）
             logger.info("Step 1: Parsing DDL...")
-            tables = ddl_parser.parse(content)
+            chunks = [content] if content is not None else self.file_repository.iter_content(file_id)
+            if chunks is None:
+                raise ValueError("文件内容不存在")
+            if self.ingestion_executor.parse_workers > 0:
+                # 语句分批分发到解析进程池，多核并行
+                tables = await self.ingestion_executor.run_parse_parallel(ddl_parser.parse_parallel, chunks)
+            else:
+                tables = await self.ingestion_executor.run_parse(ddl_parser.parse_stream, chunks)
             
             if not tables:
                 raise ValueError("未能解析出任何表结构，请检查 DDL 格式")
@@ -52,21 +158,24 @@ class DDLService:
             
             logger.info(f"DDL parsed: {table_count} tables, {column_count} columns")
             
-            # Step 2: 向量化
+            # Step 2: 计算 schema 指纹并向量化（都在向量化线程池中执行，进度写入文件状态；
+            # schema 指纹未变化时复用已有向量）
             logger.info("Step 2: Vectorizing schema...")
-            embedding_count = self.vector_service.vectorize_tables(tables, file_id)
-            
-            logger.info(f"Vectorization completed: {embedding_count} embeddings")
+            schema_fingerprint, vector_stats = await self.ingestion_executor.run_embed(
+                self._fingerprint_and_vectorize,
+                tables,
+                file_id,
+                lambda embedded, total: self.file_repository.update_progress(file_id, embedded, total)
+            )
+            embedding_count = vector_stats["count"]
             
-            # Step 3: 保存结构信息
-            file_store[file_id]['tables'] = [table.to_dict() for table in tables]
-            file_store[file_id]['table_count'] = table_count
-            file_store[file_id]['column_count'] = column_count
-            file_store[file_id]['embedding_count'] = embedding_count
+            logger.info(
+                f"Vectorization completed: {embedding_count} embeddings, "
+                f"{vector_stats['embedded']} computed (cache hit ratio {vector_stats['cache_hit_ratio']:.2%})"
+            )
             
-            # Step 4: 更新状态为"就绪"
-            file_store[file_id]['status'] = 'ready'
-            file_store[file_id]['error_message'] = None
+            # Step 3: 保存结构信息、更新状态为"就绪"并构建符号表（整份表结构的序列化和 SQLite 写入，放到线程中执行）
+            await asyncio.to_thread(self._save_parse_result, file_id, tables, embedding_count, schema_fingerprint)
             
             elapsed = time.time() - start_time
             logger.info(
@@ -80,6 +189,8 @@ class DDLService:
                 "table_count": table_count,
                 "column_count": column_count,
                 "embedding_count": embedding_count,
+                "embeddings_computed": vector_stats["embedded"],
+                "embedding_cache_hit_ratio": vector_stats["cache_hit_ratio"],
                 "elapsed_time": round(elapsed, 2)
             }
         
@@ -94,8 +205,7 @@ class DDLService:
             )
             
             # 更新状态为"错误"
-            file_store[file_id]['status'] = 'error'
-            file_store[file_id]['error_message'] = error_message
+            await asyncio.to_thread(self.file_repository.update_status, file_id, 'error', error_message)
             
             return {
                 "success": False,
@@ -103,6 +213,57 @@ class DDLService:
                 "error": error_message,
                 "elapsed_time": round(elapsed, 2)
             }
+    
+    def _fingerprint_and_vectorize(
+        self,
+        tables: List[TableInfo],
+        file_id: str,
+        progress_callback: Callable[[int, int], None]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        计算 schema 指纹并向量化（整份表结构的 JSON 编码和 embedding 计算，应在向量化线程池中调用）
+        
+        Args:
+            tables: 表结构信息列表
+            file_id: 文件 ID
+            progress_callback: 进度回调 (已处理条目数, 条目总数)
+        
+        Returns:
+            Tuple[str, Dict[str, Any]]: schema 指纹和向量化统计
+        """
+        schema_fingerprint = compute_schema_fingerprint(tables)
+        vector_stats = self.vector_service.vectorize_tables_with_stats(
+            tables, file_id, schema_fingerprint, progress_callback
+        )
+        return schema_fingerprint, vector_stats
+    
+    def _save_parse_result(
+        self,
+        file_id: str,
+        tables: List[TableInfo],
+        embedding_count: int,
+        schema_fingerprint: str
+    ) -> None:
+        """
+        保存解析结果（一次原子写入，状态更新为"就绪"），并直接构建符号表（应在线程中调用）
+        
+        Args:
+            file_id: 文件 ID
+            tables: 表结构信息列表
+            embedding_count: 向量条目数
+            schema_fingerprint: schema 指纹
+        """
+        self.file_repository.save_parse_result(
+            file_id,
+            tables=tables,
+            embedding_count=embedding_count,
+            schema_fingerprint=schema_fingerprint
+        )
+        
+        # 解析结果直接构建符号表，SQL 引用验证时无需再读取和转换表结构
+        self.symbol_tables.put(file_id, SchemaSymbolTable({
+            table.name: {column.name: column.data_type for column in table.columns} for table in tables
+        }))
 
 
 # 全局单例
@@ -0,0 +1,209 @@
+"""
+Agent 轮数基准测试
+在带外键的电商示例库上，对比检索结果沿外键扩展（关联子图）前后，每个 SQL 问题平均需要的 Agent 轮数
+
+两种 Agent：
+1. oracle（默认，离线）：模拟 ReAct 循环，按问题中提到的实体依次检索，
+   直到检索结果（含关联子图）覆盖了 SQL 需要的全部表，再加一轮输出 Final Answer
+2. glm：真实的 ReAct Agent（需要 GLM_API_KEY），轮数取 intermediate_steps 的工具调用数 + 1
+
+离线模式使用按词哈希的 embedding，不需要下载模型；--embedding default 使用服务默认的模型。
+
+用法（在 backend 目录下）：
+    python benchmarks/agent_iterations_benchmark.py --depths 0 1 2 --agent oracle
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import List, Set
+
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# 离线模式不调用 LLM，未配置时使用占位 Key 通过配置校验
+os.environ.setdefault("GLM_API_KEY", "benchmark-placeholder")
+# 文件仓储写入临时目录，不影响本地数据
+os.environ["FILE_REPOSITORY_PATH"] = str(Path(tempfile.mkdtemp()) / "files.db")
+os.environ["VECTOR_STORE_PATH"] = ""
+
+FILE_ID = "agent-iterations-benchmark"
+
+DDL = """
+CREATE TABLE users (id BIGINT PRIMARY KEY, name VARCHAR(64) COMMENT '用户名', city VARCHAR(32) COMMENT '城市') COMMENT='用户';
+CREATE TABLE addresses (id BIGINT PRIMARY KEY, user_id BIGINT REFERENCES users(id), detail VARCHAR(255)) COMMENT='收货地址';
+CREATE TABLE categories (id BIGINT PRIMARY KEY, name VARCHAR(64) COMMENT '分类名') COMMENT='商品分类';
+CREATE TABLE shops (id BIGINT PRIMARY KEY, owner_id BIGINT REFERENCES users(id), name VARCHAR(64)) COMMENT='店铺';
+CREATE TABLE products (
+  id BIGINT PRIMARY KEY, shop_id BIGINT, category_id BIGINT, name VARCHAR(128), price DECIMAL(10,2),
+  CONSTRAINT fk_product_shop FOREIGN KEY (shop_id) REFERENCES shops (id),
+  CONSTRAINT fk_product_category FOREIGN KEY (category_id) REFERENCES categories (id)
+) COMMENT='商品';
+CREATE TABLE orders (
+  id BIGINT PRIMARY KEY, user_id BIGINT, address_id BIGINT, total DECIMAL(10,2) COMMENT '订单金额', created_at DATETIME,
+  CONSTRAINT fk_order_user FOREIGN KEY (user_id) REFERENCES users (id),
+  CONSTRAINT fk_order_address FOREIGN KEY (address_id) REFERENCES addresses (id)
+) COMMENT='订单';
+CREATE TABLE order_items (
+  id BIGINT PRIMARY KEY, order_id BIGINT, product_id BIGINT, quantity INT COMMENT '数量',
+  CONSTRAINT fk_item_order FOREIGN KEY (order_id) REFERENCES orders (id),
+  CONSTRAINT fk_item_product FOREIGN KEY (product_id) REFERENCES products (id)
+) COMMENT='订单明细';
+CREATE TABLE payments (id BIGINT PRIMARY KEY, order_id BIGINT REFERENCES orders(id), amount DECIMAL(10,2), method VARCHAR(16)) COMMENT='支付';
+CREATE TABLE reviews (id BIGINT PRIMARY KEY, product_id BIGINT REFERENCES products(id), user_id BIGINT REFERENCES users(id), rating INT COMMENT '评分') COMMENT='评价';
+CREATE TABLE audit_logs (id BIGINT PRIMARY KEY, action VARCHAR(32), created_at DATETIME) COMMENT='审计日志';
+CREATE TABLE settings (id BIGINT PRIMARY KEY, setting_key VARCHAR(64), setting_value VARCHAR(255)) COMMENT='系统设置';
+"""
+
+# (问题, Agent 依次检索的实体, SQL 需要的表)
+QUESTIONS = [
+    ("查询每个用户的订单总金额", ["orders 订单", "users 用户"], {"orders", "users"}),
+    ("统计每个城市用户的支付总额", ["payments 支付", "orders 订单", "users 城市"], {"payments", "orders", "users"}),
+    ("查询每个分类下商品的销量", ["order_items 订单明细 数量", "products 商品", "categories 分类"],
+     {"order_items", "products", "categories"}),
+    ("查询评分最高的商品所在店铺", ["reviews 评价 评分", "products 商品", "shops 店铺"], {"reviews", "products", "shops"}),
+    ("查询订单的收货地址", ["orders 订单", "addresses 收货地址"], {"orders", "addresses"}),
+    ("查询所有商品的名称和价格", ["products 商品 价格"], {"products"}),
+    ("查询店铺老板的用户名", ["shops 店铺", "users 用户名"], {"shops", "users"}),
+    ("统计每个用户购买的商品数量", ["order_items 数量", "orders 订单", "users 用户"], {"order_items", "orders", "users"}),
+]
+
+
+class HashEmbedding(EmbeddingFunction):
+    """按词哈希的离线 embedding（不需要下载模型）"""
+    
+    def __init__(self):
+        pass
+    
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors = []
+        for text in input:
+            vector = [0.0] * 256
+            for token in re.findall(r"[a-z_]+|[一-鿿]", text.lower()):
+                vector[int(hashlib.md5(token.encode("utf-8")).hexdigest(), 16) % 256] += 1.0
+            vectors.append(vector)
+        return vectors
+    
+    @staticmethod
+    def name() -> str:
+        return "hash-embedding"
+    
+    def get_config(self) -> dict:
+        return {}
+
+
+def prepare(embedding: str) -> None:
+    """解析示例库，写入文件仓储并向量化"""
+    from infrastructure.parser.ddl_parser import ddl_parser
+    from infrastructure.repository.sqlite_file_repository import get_file_repository
+    from infrastructure.vector.vector_service import get_vector_service
+    
+    tables = ddl_parser.parse(DDL)
+    vector_service = get_vector_service()
+    if embedding == "hash":
+        vector_service.embedding_function = HashEmbedding()
+        vector_service.collection = vector_service.client.get_or_create_collection(
+            name="ddl_schema_benchmark", embedding_function=vector_service.embedding_function
+        )
+    embedding_count = vector_service.vectorize_tables(tables, FILE_ID)
+    
+    repository = get_file_repository()
+    repository.create(FILE_ID, "benchmark.sql", DDL, len(DDL), datetime.now())
+    repository.save_parse_result(FILE_ID, tables=tables, embedding_count=embedding_count, schema_fingerprint="benchmark")
+
+
+def observed_tables(observation: str) -> Set[str]:
+    """检索结果中出现的表（命中的表/字段和关联子图中的表）"""
+    tables = set()
+    for item in json.loads(observation):
+        if item.get("type") == "表":
+            tables.add(item["name"])
+        elif item.get("type") == "字段":
+            tables.add(item["table"])
+        elif item.get("type") == "关联子图":
+            tables.update(table["name"] for table in item["tables"])
+    return tables
+
+
+def oracle_rounds(tool, searches: List[str], required: Set[str], max_iterations: int) -> int:
+    """
+    模拟 ReAct 循环的轮数：每轮检索一个实体，覆盖所需的表后再用一轮输出 SQL
+    
+    Returns:
+        int: LLM 轮数（未能覆盖时为 max_iterations）
+    """
+    from domain.agent.vector_search_tool import scoped_file_id
+    
+    seen = set()
+    with scoped_file_id(FILE_ID):
+        for calls, query in enumerate(searches, start=1):
+            seen |= observed_tables(tool._run(query))
+            if required <= seen:
+                return min(calls + 1, max_iterations)
+    return max_iterations
+
+
+async def glm_rounds(agent_service, question: str) -> int:
+    """真实 Agent 的 LLM 轮数（工具调用数 + 输出 SQL 的一轮）"""
+    from domain.agent.vector_search_tool import scoped_file_id
+    
+    agent_executor = agent_service._get_or_create_agent()
+    with scoped_file_id(FILE_ID):
+        result = await agent_executor.ainvoke({"input": question})
+    return len(result.get("intermediate_steps", [])) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent 轮数基准测试")
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 1, 2], help="外键扩展层数（0 为原检索）")
+    parser.add_argument("--agent", choices=["oracle", "glm"], default="oracle", help="模拟 Agent 或真实 Agent")
+    parser.add_argument("--embedding", choices=["hash", "default"], default="hash", help="离线哈希或默认模型")
+    parser.add_argument("--max-iterations", type=int, default=5, help="Agent 最大轮数")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    
+    prepare(args.embedding)
+    
+    from domain.agent.vector_search_tool import VectorSearchTool
+    
+    if args.agent == "glm":
+        from application.agent_service import AgentService
+        agent_service = AgentService()
+        tool = agent_service.tools[0]
+    else:
+        tool = VectorSearchTool()
+    
+    print(f"agent: {args.agent}, embedding: {args.embedding}, questions: {len(QUESTIONS)}")
+    print(f"{'depth':>6} {'avg rounds':>11} {'max':>4} {'multi-table avg':>16} {'vs depth 0':>11}")
+    
+    baseline = None
+    for depth in args.depths:
+        tool.expand_depth = depth
+        rounds = []
+        for question, searches, required in QUESTIONS:
+            if args.agent == "glm":
+                rounds.append(asyncio.run(glm_rounds(agent_service, question)))
+            else:
+                rounds.append(oracle_rounds(tool, searches, required, args.max_iterations))
+        
+        average = statistics.mean(rounds)
+        multi_table = statistics.mean(r for r, (_, _, required) in zip(rounds, QUESTIONS) if len(required) > 1)
+        baseline = baseline or average
+        print(
+            f"{depth:>6} {average:>11.2f} {max(rounds):>4} {multi_table:>16.2f} "
+            f"{1 - average / baseline:>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
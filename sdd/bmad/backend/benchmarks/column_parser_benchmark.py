@@ -0,0 +1,156 @@
+"""
+字段定义解析基准测试
+在超宽表（默认 500 / 2000 个字段）上对比单次扫描的记号切分器与原先的逐字符分割实现
+
+原实现原样保留在本文件中（legacy_parse_column_definitions）作为对照；
+两者在不含引号内逗号的输入上结果一致，输出中同时给出结果是否一致。
+
+用法（在 backend 目录下）：
+    python benchmarks/column_parser_benchmark.py --columns 500 2000 --repeat 20
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# 基准测试不调用 LLM，未配置时使用占位 Key 通过配置校验
+os.environ.setdefault("GLM_API_KEY", "benchmark-placeholder")
+
+from infrastructure.parser.ddl_parser import TableColumn, ddl_parser
+
+
+def legacy_split_by_comma(content: str) -> List[str]:
+    """原实现：逐字符追加，按括号外的逗号分割"""
+    result = []
+    current = []
+    paren_depth = 0
+    
+    for char in content:
+        if char == '(':
+            paren_depth += 1
+            current.append(char)
+        elif char == ')':
+            paren_depth -= 1
+            current.append(char)
+        elif char == ',' and paren_depth == 0:
+            result.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    
+    if current:
+        result.append(''.join(current))
+    
+    return result
+
+
+def legacy_parse_column_definitions(parenthesis_content: str) -> List[TableColumn]:
+    """原实现：分割后对每行做 upper() 和多次子串查找，COMMENT 每次调用 re.search"""
+    columns = []
+    
+    content = parenthesis_content.strip()
+    if content.startswith('('):
+        content = content[1:]
+    if content.endswith(')'):
+        content = content[:-1]
+    
+    for line in legacy_split_by_comma(content):
+        line = line.strip()
+        if not line:
+            continue
+        
+        line_upper = line.upper()
+        if any(keyword in line_upper for keyword in
+               ['PRIMARY KEY (', 'FOREIGN KEY (', 'CONSTRAINT ', 'INDEX ', 'KEY (']):
+            continue
+        
+        parts = line.split()
+        if len(parts) >= 2:
+            col_name = parts[0].strip('`"\' ').lower()
+            col_type = parts[1]
+            if '(' in col_type and ')' not in col_type:
+                for i in range(2, len(parts)):
+                    col_type += ' ' + parts[i]
+                    if ')' in parts[i]:
+                        break
+            
+            constraints = []
+            if 'NOT NULL' in line_upper:
+                constraints.append('NOT NULL')
+            if 'UNIQUE' in line_upper:
+                constraints.append('UNIQUE')
+            if 'PRIMARY KEY' in line_upper:
+                constraints.append('PRIMARY KEY')
+            if 'AUTO_INCREMENT' in line_upper or 'AUTOINCREMENT' in line_upper:
+                constraints.append('AUTO_INCREMENT')
+            
+            comment = None
+            comment_match = re.search(r"COMMENT\s+'([^']+)'", line, re.IGNORECASE)
+            if comment_match:
+                comment = comment_match.group(1)
+            
+            columns.append(TableColumn(col_name, col_type, constraints, comment))
+    
+    return columns
+
+
+def generate_columns(column_count: int) -> str:
+    """
+    生成超宽表的括号内容（混合类型、默认值、约束和中文注释）
+    
+    Args:
+        column_count: 字段数
+    
+    Returns:
+        str: 带外层括号的字段定义文本
+    """
+    types = ["bigint", "varchar(255)", "DECIMAL(18,4)", "datetime", "tinyint(1)", "text"]
+    definitions = ["  `id` bigint NOT NULL AUTO_INCREMENT COMMENT '主键'"]
+    for i in range(column_count - 1):
+        column_type = types[i % len(types)]
+        default = " DEFAULT NULL" if i % 2 else " NOT NULL DEFAULT '0'"
+        definitions.append(f"  `column_{i}` {column_type}{default} COMMENT '第 {i} 个业务字段'")
+    definitions.append("  PRIMARY KEY (`id`)")
+    return "(\n" + ",\n".join(definitions) + "\n)"
+
+
+def best_of(func, content: str, repeat: int) -> float:
+    """多次执行取最短耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(content)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字段定义解析基准测试")
+    parser.add_argument("--columns", type=int, nargs="+", default=[500, 2000], help="表的字段数")
+    parser.add_argument("--repeat", type=int, default=20, help="每种实现的执行次数（取最短耗时）")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    
+    print(f"{'columns':>8} {'legacy(ms)':>11} {'tokenizer(ms)':>14} {'speedup':>8} {'same':>6}")
+    
+    for column_count in args.columns:
+        content = generate_columns(column_count)
+        legacy = best_of(legacy_parse_column_definitions, content, args.repeat)
+        current = best_of(ddl_parser._parse_column_definitions, content, args.repeat)
+        same = [c.to_dict() for c in legacy_parse_column_definitions(content)] == \
+            [c.to_dict() for c in ddl_parser._parse_column_definitions(content)]
+        print(
+            f"{column_count:>8} {legacy * 1000:>11.2f} {current * 1000:>14.2f} "
+            f"{legacy / current:>7.2f}x {str(same):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+多 worker 负载测试
+按不同 worker 数启动服务，并发请求同一个 file_id 的元数据接口，对比吞吐量
+
+文件元数据写入共享的 SQLite 仓储，请求被分发到任意 worker 都能返回相同结果。
+
+用法（在 backend 目录下）：
+    python benchmarks/load_test.py --workers 1 2 4 --requests 3000 --concurrency 64
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# 负载测试不调用 LLM，未配置时使用占位 Key 通过配置校验
+os.environ.setdefault("GLM_API_KEY", "load-test-placeholder")
+
+
+def seed_file(db_path: str, table_count: int) -> str:
+    """
+    向仓储写入一个已就绪的文件（不经过向量化，避免依赖 embedding 模型）
+    
+    Args:
+        db_path: 仓储数据库路径
+        table_count: 表数量
+    
+    Returns:
+        str: 文件 ID
+    """
+    from infrastructure.repository.sqlite_file_repository import SQLiteFileRepository
+    
+    tables = [
+        {
+            "name": f"table_{i}",
+            "columns": [
+                {"name": f"column_{j}", "data_type": "VARCHAR(64)", "constraints": [], "comment": f"字段 {j}"}
+                for j in range(10)
+            ],
+            "primary_keys": ["column_0"],
+            "foreign_keys": [],
+            "indexes": [],
+            "comment": f"表 {i}",
+            "column_count": 10
+        }
+        for i in range(table_count)
+    ]
+    repository = SQLiteFileRepository(db_path)
+    file_id = "load-test-file"
+    repository.create(file_id, "load_test.sql", "CREATE TABLE t (id INT);", 24, datetime.now())
+    repository.save_parse_result(file_id, tables, embedding_count=0, schema_fingerprint="load-test")
+    return file_id
+
+
+def start_server(workers: int, port: int, data_dir: str) -> subprocess.Popen:
+    """启动指定 worker 数的服务"""
+    env = dict(os.environ)
+    env.update({
+        "FILE_REPOSITORY_PATH": str(Path(data_dir) / "files.db"),
+        "VECTOR_STORE_PATH": "",
+        "WORKERS": str(workers),
+        "LOG_LEVEL": "WARNING",
+    })
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    """等待服务就绪"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"Server at {base_url} not ready after {timeout}s")
+
+
+async def run_load(base_url: str, file_id: str, total: int, concurrency: int) -> dict:
+    """
+    并发请求文件元数据接口
+    
+    Returns:
+        dict: 吞吐量与延迟统计
+    """
+    latencies = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+    
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.get(f"/api/files/{file_id}")
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200 or response.json()["file_id"] != file_id:
+                    errors += 1
+        
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多 worker 吞吐量负载测试")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="要测试的 worker 数")
+    parser.add_argument("--requests", type=int, default=3000, help="每轮请求总数")
+    parser.add_argument("--concurrency", type=int, default=64, help="并发连接数")
+    parser.add_argument("--tables", type=int, default=50, help="测试文件的表数量（决定响应大小）")
+    parser.add_argument("--port", type=int, default=8100, help="服务端口")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    print(f"CPU cores: {os.cpu_count()}, requests: {args.requests}, concurrency: {args.concurrency}")
+    print(f"{'workers':>8} {'req/s':>10} {'p50(ms)':>10} {'p99(ms)':>10} {'errors':>8} {'speedup':>8}")
+    
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as data_dir:
+            file_id = seed_file(str(Path(data_dir) / "files.db"), args.tables)
+            server = start_server(workers, args.port, data_dir)
+            base_url = f"http://127.0.0.1:{args.port}"
+            try:
+                asyncio.run(wait_ready(base_url))
+                asyncio.run(run_load(base_url, file_id, min(200, args.requests), args.concurrency))  # 预热
+                result = asyncio.run(run_load(base_url, file_id, args.requests, args.concurrency))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        
+        baseline = baseline or result["rps"]
+        print(
+            f"{workers:>8} {result['rps']:>10.1f} {result['p50_ms']:>10.1f} "
+            f"{result['p99_ms']:>10.1f} {result['errors']:>8} {result['rps'] / baseline:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
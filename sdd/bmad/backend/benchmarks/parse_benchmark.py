@@ -0,0 +1,102 @@
+"""
+DDL 并行解析基准测试
+生成合成的 MySQL 风格 DDL（默认 1k / 10k 张表），对比顺序解析与按批分发到进程池的并行解析耗时
+
+并行解析的结果会与顺序解析逐表比对，确保顺序和内容一致。
+
+用法（在 backend 目录下）：
+    python benchmarks/parse_benchmark.py --tables 1000 10000 --workers 1 2 4 8 --batch-size 200
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# 基准测试不调用 LLM，未配置时使用占位 Key 通过配置校验
+os.environ.setdefault("GLM_API_KEY", "benchmark-placeholder")
+
+
+def generate_ddl(table_count: int, column_count: int = 12) -> str:
+    """
+    生成合成 DDL（含注释、索引和 INSERT，接近真实导出文件）
+    
+    Args:
+        table_count: 表数量
+        column_count: 每张表的字段数
+    
+    Returns:
+        str: DDL 文本
+    """
+    statements = []
+    for i in range(table_count):
+        columns = ["  `id` bigint NOT NULL AUTO_INCREMENT COMMENT '主键'"]
+        columns.extend(
+            f"  `column_{j}` {'DECIMAL(12,2)' if j % 3 == 0 else 'varchar(64)'} "
+            f"DEFAULT NULL COMMENT '字段 {j}'"
+            for j in range(column_count - 1)
+        )
+        columns.append("  PRIMARY KEY (`id`)")
+        columns.append("  KEY `idx_column_0` (`column_0`)")
+        statements.append(f"DROP TABLE IF EXISTS `table_{i}`;")
+        statements.append(
+            f"CREATE TABLE `table_{i}` (\n" + ",\n".join(columns) +
+            f"\n) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='表 {i}';"
+        )
+        statements.append(f"INSERT INTO `table_{i}` VALUES (1,'a;b');")
+    return "\n".join(statements) + "\n"
+
+
+def time_it(func) -> tuple:
+    """执行并计时，返回 (结果, 秒)"""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DDL 并行解析基准测试")
+    parser.add_argument("--tables", type=int, nargs="+", default=[1000, 10000], help="合成 DDL 的表数量")
+    parser.add_argument(
+        "--workers", type=int, nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="要测试的解析进程数"
+    )
+    parser.add_argument("--batch-size", type=int, default=200, help="每批分发的语句数")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    
+    from infrastructure.parser.ddl_parser import ddl_parser
+    
+    print(f"CPU cores: {os.cpu_count()}, batch size: {args.batch_size}")
+    print(f"{'tables':>8} {'mode':>12} {'seconds':>10} {'tables/s':>10} {'speedup':>8}")
+    
+    for table_count in args.tables:
+        ddl = generate_ddl(table_count)
+        expected, baseline = time_it(lambda: ddl_parser.parse_stream([ddl]))
+        expected = [table.to_dict() for table in expected]
+        print(f"{table_count:>8} {'sequential':>12} {baseline:>10.2f} {table_count / baseline:>10.0f} {1.0:>7.2f}x")
+        
+        for workers in args.workers:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # 预热：启动进程并导入解析模块
+                list(executor.map(ddl_parser.parse_statements, [[]] * workers))
+                tables, elapsed = time_it(
+                    lambda: ddl_parser.parse_parallel(
+                        [ddl], executor, batch_size=args.batch_size, max_pending_batches=workers * 2
+                    )
+                )
+            if [table.to_dict() for table in tables] != expected:
+                raise AssertionError(f"Parallel result differs from sequential ({workers} workers)")
+            print(
+                f"{table_count:>8} {f'{workers} procs':>12} {elapsed:>10.2f} "
+                f"{table_count / elapsed:>10.0f} {baseline / elapsed:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
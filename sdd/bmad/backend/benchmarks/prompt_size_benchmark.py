@@ -0,0 +1,186 @@
+"""
+提示词大小基准测试
+对比表结构改为紧凑单行渲染（带 token 预算）前后的提示词大小和端到端延迟
+
+两类提示词：
+1. 直接生成的 System Prompt：合成 schema（--tables 指定表数，每表 --columns 个字段，带外键）
+2. Agent 检索结果（Observation）：电商示例库上按 agent_iterations_benchmark 的问题检索
+
+"before" 为原格式（逐项 Markdown 列表 / 缩进 JSON 并重复整段检索文档），"after" 为当前格式。
+token 数为估算值（中文按字、其余按 4 个字符计）。
+--llm glm 时对每个问题用两种 System Prompt 各调用一次 LLM，统计端到端延迟（需要 GLM_API_KEY）。
+
+用法（在 backend 目录下）：
+    python benchmarks/prompt_size_benchmark.py --tables 8 50 200 --columns 12 --llm none
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# 默认不调用 LLM，未配置时使用占位 Key 通过配置校验
+os.environ.setdefault("GLM_API_KEY", "benchmark-placeholder")
+
+SCHEMA_HEADER = "## 数据库结构信息"
+RULES_HEADER = "## 生成规则"
+
+
+def build_tables(table_count: int, column_count: int) -> list:
+    """构建合成表结构（每张表的第二个字段引用前一张表）"""
+    tables = []
+    for i in range(table_count):
+        columns = [{"name": "id", "data_type": "BIGINT", "comment": None}]
+        columns += [
+            {"name": f"column_{j}", "data_type": "VARCHAR(64)", "comment": f"业务字段 {j}"}
+            for j in range(1, column_count)
+        ]
+        foreign_keys = []
+        if i > 0:
+            columns[1] = {"name": f"table_{i - 1}_id", "data_type": "BIGINT", "comment": None}
+            foreign_keys.append({
+                "name": f"fk_{i}", "column": f"table_{i - 1}_id", "ref_table": f"table_{i - 1}", "ref_column": "id"
+            })
+        tables.append({
+            "name": f"table_{i}",
+            "columns": columns,
+            "primary_keys": ["id"],
+            "foreign_keys": foreign_keys,
+            "comment": f"业务表 {i}"
+        })
+    return tables
+
+
+def legacy_schema_section(table_context: list) -> str:
+    """原 System Prompt 中的表结构部分（每个表/字段一个 Markdown 小节）"""
+    context_str = f"{SCHEMA_HEADER}\n\n"
+    for item in table_context:
+        if item.get("type") == "表":
+            context_str += f"### 表：{item.get('name')}\n"
+            context_str += f"- 描述：{item.get('description', '无')}\n"
+            context_str += f"- 字段数：{item.get('column_count', '未知')}\n"
+            context_str += f"- 相关性：{item.get('relevance', 0)}\n\n"
+        elif item.get("type") == "字段":
+            context_str += f"### 字段：{item.get('table')}.{item.get('name')}\n"
+            context_str += f"- 类型：{item.get('data_type', '未知')}\n"
+            context_str += f"- 描述：{item.get('description', '无')}\n"
+            context_str += f"- 相关性：{item.get('relevance', 0)}\n\n"
+    return context_str
+
+
+def system_prompts(generator, tables: list) -> tuple:
+    """
+    构建原格式和当前格式的 System Prompt（规则部分相同，只替换表结构部分）
+    
+    Returns:
+        tuple: (原格式, 当前格式, 构建当前格式的耗时毫秒)
+    """
+    context = generator.build_table_context(tables)
+    start = time.perf_counter()
+    compact = generator._build_system_prompt(context)
+    elapsed = (time.perf_counter() - start) * 1000
+    legacy = (
+        compact[:compact.index(SCHEMA_HEADER)] + legacy_schema_section(context) + "\n"
+        + compact[compact.index(RULES_HEADER):]
+    )
+    return legacy, compact, elapsed
+
+
+def legacy_observation(results: dict) -> str:
+    """原检索结果格式（缩进 JSON，每条结果带整段检索文档）"""
+    formatted = []
+    for doc, metadata, distance in zip(results["documents"][0], results["metadatas"][0], results["distances"][0]):
+        if metadata.get("type") == "table":
+            formatted.append({
+                "type": "表", "name": metadata.get("table_name"), "description": doc,
+                "column_count": metadata.get("column_count"), "relevance": round(1 - distance, 2)
+            })
+        else:
+            formatted.append({
+                "type": "字段", "table": metadata.get("table_name"), "name": metadata.get("column_name"),
+                "data_type": metadata.get("data_type"), "description": doc, "relevance": round(1 - distance, 2)
+            })
+    return json.dumps(formatted, ensure_ascii=False, indent=2)
+
+
+def observation_sizes(count_tokens) -> tuple:
+    """
+    电商示例库上每次检索的结果大小
+    
+    Returns:
+        tuple: (原格式, 当前格式, 当前格式含关联子图) 的平均 token 数，以及检索次数
+    """
+    from benchmarks.agent_iterations_benchmark import FILE_ID, QUESTIONS, prepare
+    from domain.agent.vector_search_tool import VectorSearchTool, scoped_file_id
+    from infrastructure.vector.vector_service import get_vector_service
+    
+    prepare("hash")
+    hits_only, expanded = VectorSearchTool(expand_depth=0), VectorSearchTool()
+    vector_service = get_vector_service()
+    sizes = ([], [], [])
+    with scoped_file_id(FILE_ID):
+        for _, searches, _ in QUESTIONS:
+            for query in searches:
+                results = vector_service.query_schema(query, n_results=hits_only.n_results, file_id=FILE_ID)
+                sizes[0].append(count_tokens(legacy_observation(results)))
+                sizes[1].append(count_tokens(hits_only._run(query)))
+                sizes[2].append(count_tokens(expanded._run(query)))
+    return tuple(statistics.mean(size) for size in sizes), len(sizes[0])
+
+
+def llm_latency(generator, prompt: str, questions: list) -> float:
+    """用指定 System Prompt 逐个问题调用 LLM 的平均延迟（毫秒）"""
+    timings = []
+    for question in questions:
+        start = time.perf_counter()
+        generator.llm_service.generate_response(
+            user_message=generator._build_user_message(question), system_prompt=prompt
+        )
+        timings.append(time.perf_counter() - start)
+    return statistics.mean(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示词大小基准测试")
+    parser.add_argument("--tables", type=int, nargs="+", default=[8, 50, 200], help="合成 schema 的表数量")
+    parser.add_argument("--columns", type=int, default=12, help="每张表的字段数")
+    parser.add_argument("--llm", choices=["none", "glm"], default="none", help="是否调用 LLM 统计端到端延迟")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    
+    # 先导入示例库模块：它在加载配置前把文件仓储和向量库指向临时目录
+    import benchmarks.agent_iterations_benchmark  # noqa: F401
+    from config import settings
+    from domain.ddl.schema_renderer import count_tokens
+    from domain.sql.sql_generator import SQLGenerator
+    
+    generator = SQLGenerator()
+    questions = ["查询每张业务表的记录数", "查询 table_1 中 column_3 为空的记录", "统计 table_2 每个 table_1_id 的数量"]
+    
+    print(f"system prompt (budget: {settings.prompt_schema_token_budget} tokens, columns per table: {args.columns})")
+    header = f"{'tables':>7} {'before tokens':>14} {'after tokens':>13} {'reduction':>10} {'build(ms)':>10}"
+    if args.llm == "glm":
+        header += f" {'before LLM(ms)':>15} {'after LLM(ms)':>14}"
+    print(header)
+    
+    for table_count in args.tables:
+        legacy, compact, elapsed = system_prompts(generator, build_tables(table_count, args.columns))
+        before, after = count_tokens(legacy), count_tokens(compact)
+        row = f"{table_count:>7} {before:>14} {after:>13} {1 - after / before:>10.0%} {elapsed:>10.2f}"
+        if args.llm == "glm":
+            row += f" {llm_latency(generator, legacy, questions):>15.0f} {llm_latency(generator, compact, questions):>14.0f}"
+        print(row)
+    
+    (before, after, expanded), searches = observation_sizes(count_tokens)
+    print(f"\nvector_search observation (budget: {settings.search_result_token_budget} tokens, {searches} searches)")
+    print(f"{'before tokens':>14} {'after tokens':>13} {'reduction':>10} {'after + subgraph':>17}")
+    print(f"{before:>14.0f} {after:>13.0f} {1 - after / before:>10.0%} {expanded:>17.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+表结构内存占用基准测试
+对比原先的 __dict__ 表结构对象 + 整份 to_dict 副本，与 __slots__ 对象 + 按需序列化的单文件内存占用
+
+统计两项（tracemalloc）：
+1. 解析结果常驻：向量化期间一直持有的 TableInfo/TableColumn 对象
+2. 保存峰值：计算 schema 指纹并序列化写入仓储时的额外峰值
+
+原实现的类原样保留在本文件中（LegacyTableInfo / LegacyTableColumn）作为对照。
+
+用法（在 backend 目录下）：
+    python benchmarks/schema_memory_benchmark.py --tables 1000 10000 --columns 30
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# 基准测试不调用 LLM，未配置时使用占位 Key 通过配置校验
+os.environ.setdefault("GLM_API_KEY", "benchmark-placeholder")
+
+from infrastructure.parser.ddl_parser import TableColumn, TableInfo, compute_schema_fingerprint, tables_to_json
+
+
+class LegacyTableColumn:
+    """原实现：普通类，每个实例带 __dict__"""
+    
+    def __init__(self, name: str, data_type: str, constraints: Optional[List[str]] = None,
+                 comment: Optional[str] = None):
+        self.name = name
+        self.data_type = data_type
+        self.constraints = constraints or []
+        self.comment = comment
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "data_type": self.data_type,
+            "constraints": self.constraints,
+            "comment": self.comment
+        }
+
+
+class LegacyTableInfo:
+    """原实现：普通类，每个实例带 __dict__"""
+    
+    def __init__(self, name: str, columns: List[LegacyTableColumn],
+                 primary_keys: Optional[List[str]] = None,
+                 foreign_keys: Optional[List[Dict[str, str]]] = None,
+                 indexes: Optional[List[str]] = None,
+                 comment: Optional[str] = None):
+        self.name = name
+        self.columns = columns
+        self.primary_keys = primary_keys or []
+        self.foreign_keys = foreign_keys or []
+        self.indexes = indexes or []
+        self.comment = comment
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "columns": [col.to_dict() for col in self.columns],
+            "primary_keys": self.primary_keys,
+            "foreign_keys": self.foreign_keys,
+            "indexes": self.indexes,
+            "comment": self.comment,
+            "column_count": len(self.columns)
+        }
+
+
+def build_tables(table_cls: type, column_cls: type, table_count: int, column_count: int) -> list:
+    """
+    构建合成表结构（与解析器一样，每个字段的名称/类型/约束都是新建的字符串和列表）
+    
+    Args:
+        table_cls: 表类
+        column_cls: 字段类
+        table_count: 表数量
+        column_count: 每张表的字段数
+    
+    Returns:
+        list: 表结构对象列表
+    """
+    types = ["bigint", "varchar(64)", "varchar(255)", "DECIMAL(18,4)", "datetime", "tinyint(1)"]
+    tables = []
+    for i in range(table_count):
+        columns = [column_cls("".join(["id"]), "".join(["bigint"]), ["NOT NULL", "AUTO_INCREMENT"], "主键")]
+        for j in range(column_count - 1):
+            constraints = ["".join(["NOT ", "NULL"])] if j % 2 else []
+            columns.append(column_cls(f"column_{j}", "".join([types[j % len(types)]]), constraints, f"字段 {j}"))
+        tables.append(table_cls(f"table_{i}", columns, primary_keys=["id"], comment=f"表 {i}"))
+    return tables
+
+
+def legacy_save(tables: list) -> None:
+    """原流程：指纹和写入各自构建整份字典副本"""
+    payload = json.dumps([table.to_dict() for table in tables], ensure_ascii=False, sort_keys=True)
+    hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    dicts = [table.to_dict() for table in tables]
+    json.dumps(dicts, ensure_ascii=False)
+
+
+def current_save(tables: list) -> None:
+    """现流程：指纹和写入都在编码时逐表转换"""
+    compute_schema_fingerprint(tables)
+    tables_to_json(tables, ensure_ascii=False)
+
+
+def measure(build: Callable[[], list], save: Callable[[list], None]) -> tuple:
+    """
+    测量常驻内存和保存时的额外峰值
+    
+    Returns:
+        tuple: (常驻字节数, 保存峰值字节数)
+    """
+    tracemalloc.start()
+    tables = build()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    save(tables)
+    peak = tracemalloc.get_traced_memory()[1] - retained
+    tracemalloc.stop()
+    del tables
+    return retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="表结构内存占用基准测试")
+    parser.add_argument("--tables", type=int, nargs="+", default=[1000, 10000], help="表数量")
+    parser.add_argument("--columns", type=int, default=30, help="每张表的字段数")
+    args = parser.parse_args()
+    
+    print(f"columns per table: {args.columns}")
+    print(f"{'tables':>8} {'model':>8} {'retained(MB)':>13} {'save peak(MB)':>14}")
+    
+    for table_count in args.tables:
+        results = {
+            "legacy": measure(
+                lambda: build_tables(LegacyTableInfo, LegacyTableColumn, table_count, args.columns), legacy_save
+            ),
+            "slots": measure(
+                lambda: build_tables(TableInfo, TableColumn, table_count, args.columns), current_save
+            ),
+        }
+        for model, (retained, peak) in results.items():
+            print(f"{table_count:>8} {model:>8} {retained / 2**20:>13.1f} {peak / 2**20:>14.1f}")
+        legacy, current = results["legacy"], results["slots"]
+        print(
+            f"{table_count:>8} {'saved':>8} {1 - current[0] / legacy[0]:>12.0%} "
+            f"{1 - current[1] / legacy[1]:>13.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+SQL 验证延迟基准测试
+生成长分析查询（--ctes 个 CTE，每个 CTE 关联 --joins 张表，带 CASE、窗口函数和子查询），
+对比多层验证改为单次解析前后的延迟
+
+"before" 为原流程：语法、引用、逻辑三层各调用一次 sqlparse.parse，语法层和结果各调用一次 sqlparse.format；
+"after" 为当前 SQLValidator.validate：解析一次，各层规则共享 token 流，在同一棵语法树上格式化。
+两者使用相同的 schema 符号表，验证结论一致。
+
+用法（在 backend 目录下）：
+    python benchmarks/validation_benchmark.py --ctes 1 4 16 --joins 4 --repeat 20
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# 基准测试不调用 LLM，未配置时使用占位 Key 通过配置校验
+os.environ.setdefault("GLM_API_KEY", "benchmark-placeholder")
+
+COLUMNS = ["id", "user_id", "status", "amount", "created_at", "region"]
+
+
+def build_schema(table_count: int) -> dict:
+    """合成 schema（table_0 ... table_n，字段相同）"""
+    return {f"table_{i}": {"columns": COLUMNS} for i in range(table_count)}
+
+
+def build_query(cte_count: int, join_count: int) -> str:
+    """
+    生成长分析查询
+    
+    Args:
+        cte_count: CTE 数量
+        join_count: 每个 CTE 关联的表数
+    
+    Returns:
+        str: SQL
+    """
+    ctes = []
+    for c in range(cte_count):
+        joins = "\n".join(
+            f"    LEFT JOIN table_{j} t{j} ON t{j}.user_id = t0.user_id AND t{j}.status <> 'deleted'"
+            for j in range(1, join_count)
+        )
+        ctes.append(f"""cte_{c} AS (
+    SELECT t0.region,
+           DATE_FORMAT(t0.created_at, '%Y-%m') AS month,
+           SUM(CASE WHEN t0.status = 'paid' THEN t0.amount ELSE 0 END) AS paid_amount,
+           COUNT(DISTINCT t0.user_id) AS buyers,
+           ROW_NUMBER() OVER (PARTITION BY t0.region ORDER BY SUM(t0.amount) DESC) AS rank_in_region
+    FROM table_0 t0
+{joins}
+    WHERE t0.created_at >= '2024-01-01'
+      AND t0.user_id IN (SELECT user_id FROM table_0 WHERE amount > 100)
+    GROUP BY t0.region, DATE_FORMAT(t0.created_at, '%Y-%m')
+    HAVING COUNT(*) > 10
+)""")
+    unions = "\nUNION ALL\n".join(
+        f"SELECT region, month, paid_amount, buyers FROM cte_{c} WHERE rank_in_region <= 10"
+        for c in range(cte_count)
+    )
+    return f"WITH {', '.join(ctes)}\n{unions}\nORDER BY paid_amount DESC\nLIMIT 100;"
+
+
+def legacy_validate(validator, sql: str) -> dict:
+    """原多层验证流程（每层单独解析，格式化两次）"""
+    import sqlparse
+    from domain.sql.parsed_sql import ParsedStatement
+    from domain.sql.validation_rules import RuleReport
+    
+    def run_layer(layer: str) -> dict:
+        report = RuleReport(validator.schema_metadata)
+        for statement in sqlparse.parse(sql):
+            parsed = ParsedStatement(statement)
+            for rule in validator.rules[layer]:
+                rule.visit(parsed, report)
+        return {"valid": not report.errors, "errors": report.errors, "warnings": report.warnings}
+    
+    syntax = run_layer("syntax")
+    sqlparse.format(sql, reindent=True, keyword_case="upper")
+    references = run_layer("references")
+    logic = run_layer("logic")
+    formatted = sqlparse.format(sql, reindent=True, keyword_case="upper", identifier_case="lower")
+    return {
+        "valid": syntax["valid"] and references["valid"],
+        "syntax": syntax, "references": references, "logic": logic, "formatted_sql": formatted
+    }
+
+
+def measure(validate, sql: str, repeat: int) -> tuple:
+    """重复验证，返回 (中位数毫秒, 最后一次的结果)"""
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = validate(sql)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQL 验证延迟基准测试")
+    parser.add_argument("--ctes", type=int, nargs="+", default=[1, 4, 16], help="查询中的 CTE 数量")
+    parser.add_argument("--joins", type=int, default=4, help="每个 CTE 关联的表数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询的验证次数（取中位数）")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    
+    from domain.sql.sql_validator import get_sql_validator
+    
+    validator = get_sql_validator(build_schema(args.joins))
+    print(f"joins per CTE: {args.joins}, repeat: {args.repeat}")
+    print(f"{'ctes':>5} {'sql chars':>10} {'before(ms)':>11} {'after(ms)':>10} {'speedup':>8} {'same result':>12}")
+    
+    for cte_count in args.ctes:
+        sql = build_query(cte_count, args.joins)
+        before, legacy = measure(lambda s: legacy_validate(validator, s), sql, args.repeat)
+        after, current = measure(validator.validate, sql, args.repeat)
+        same = legacy == current
+        print(f"{cte_count:>5} {len(sql):>10} {before:>11.2f} {after:>10.2f} {before / after:>7.2f}x {str(same):>12}")
+
+
+if __name__ == "__main__":
+    main()
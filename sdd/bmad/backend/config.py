@@ -14,10 +14,66 @@ class Settings(BaseSettings):
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8000
+    workers: int = 1  # 工作进程数（>1 时为生产模式：多进程、关闭自动重载）
     
     # Logging Configuration
     log_level: str = "INFO"
     
+    # File Repository Configuration
+    file_repository_path: str = "data/files.db"  # SQLite 文件仓储路径（多 worker 共享）
+    
+    # Vector Store Configuration
+    vector_store_path: str = ""  # Chroma 持久化目录（为空时使用内存模式，重启后需重新上传）
+    chroma_server_host: str = ""  # Chroma 服务地址（不为空时连接独立服务，多 worker 共享向量）
+    chroma_server_port: int = 8001
+    embedding_cache_path: str = ""  # embedding 缓存（SQLite）路径，为空时不启用；按模型 + 文档文本跨文件复用
+    
+    # LLM Client Pool Configuration
+    llm_client_cache_size: int = 64          # 按 API Key 缓存的 LLM 客户端数量上限
+    llm_client_ttl_seconds: float = 3600.0   # LLM 客户端缓存时间（秒）
+    llm_http_max_connections: int = 100      # 共享 HTTP 连接池最大连接数
+    llm_http_max_keepalive: int = 20         # 共享 HTTP 连接池最大 keep-alive 连接数
+    llm_http_keepalive_expiry: float = 60.0  # 空闲连接保留时间（秒）
+    llm_http_timeout: float = 60.0           # LLM HTTP 请求超时（秒）
+    
+    # SQL Response Cache Configuration
+    response_cache_size: int = 1024                   # 缓存的问题数量上限
+    response_cache_ttl_seconds: float = 3600.0        # 缓存时间（秒）
+    response_cache_similarity_threshold: float = 0.97  # 语义匹配阈值（<=0 关闭语义匹配）
+    
+    # Intent Recognition Configuration
+    intent_local_confidence_threshold: float = 0.95  # 本地分类置信度阈值（低于则升级到 LLM）
+    intent_cache_size: int = 4096                    # 意图判断缓存条目数
+    intent_classifier_max_vocabulary: int = 50000    # 本地分类器词表上限（在线学习不再加入新特征）
+    
+    # Hybrid Schema Search Configuration
+    hybrid_search_enabled: bool = True  # 指定文件时 BM25 词法检索与向量检索融合（RRF）
+    hybrid_rrf_k: int = 60              # RRF 平滑常数
+    lexical_index_cache_size: int = 32  # 缓存词法索引的文件数
+    
+    # Direct SQL Generation Configuration
+    direct_mode_max_tables: int = 8  # 表数不超过该值时完整表结构放入提示词直接生成（0 表示始终使用 Agent）
+    
+    # Prompt Token Budget Configuration
+    prompt_schema_token_budget: int = 4000   # 直接生成提示词中表结构的 token 上限（按相关性取舍，0 表示不限制）
+    search_result_token_budget: int = 1000   # 每次检索返回给 Agent 的结果 token 上限（0 表示不限制）
+    
+    # Schema Graph Configuration
+    schema_graph_cache_size: int = 32   # 缓存外键关系图的文件数
+    schema_graph_expand_depth: int = 1  # 检索结果沿外键扩展的层数（0 关闭扩展）
+    schema_graph_max_tables: int = 8    # 扩展后的关联子图表数上限
+    
+    # SQL Validation Configuration
+    symbol_table_cache_size: int = 32  # 缓存 schema 符号表（表 -> 字段 -> 类型）的文件数
+    
+    # DDL Ingestion Configuration
+    ingestion_max_concurrency: int = 2   # 同时处理的 DDL 文件数
+    ingestion_queue_size: int = 16       # 排队中的 DDL 文件上限（超出则拒绝上传）
+    ingestion_parse_workers: int = 2     # 解析进程池大小（0 表示使用线程池）
+    ingestion_embed_workers: int = 2     # 向量化线程池大小
+    ingestion_embed_batch_size: int = 256   # 每批向量化的表/字段文档数
+    ingestion_embed_batch_workers: int = 2  # 单个文件内并行处理的批次数
+    
     class Config:
         """Pydantic Settings 配置"""
         env_file = ".env"
@@ -0,0 +1,185 @@
+"""
+本地意图分类器
+基于中文字符 n-gram 和英文单词的朴素贝叶斯模型（纯 CPU），用关键词表和中英文示例语句训练，
+并可从 LLM 的判断结果中在线学习
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Literal, Tuple
+
+Intent = Literal['sql_generation', 'general_chat']
+
+# SQL 生成关键词
+SQL_KEYWORDS = [
+    '查询', '查找', '找出', '获取', '列出', '显示', '统计',
+    'select', 'query', 'find', 'get', 'show', 'list',
+    '我想看', '帮我查', '给我找', '有哪些', '多少',
+    '分析', '汇总', '总结', '计算', '求和', 'sum', 'count', 'avg',
+]
+
+# 普通对话关键词（强特征）
+CHAT_KEYWORDS = [
+    '你好', 'hello', 'hi', '谢谢', '感谢', 'thank',
+    '天气', 'weather', '时间', 'time', '日期', 'date',
+    '你是谁', '你能做什么', '帮助', 'help',
+]
+
+# 种子示例语句（与 LLM 意图识别提示词中的示例一致）
+SQL_EXAMPLES = [
+    "查询所有用户", "统计订单数量", "找出金额最高的订单", "查询所有活跃用户",
+    "列出最近一周的订单", "每个用户的订单总金额", "显示产品列表", "有多少用户注册",
+    "按月份汇总销售额", "平均订单金额是多少", "查看库存不足的商品", "订单表里有哪些记录",
+    "list all users", "show all orders", "how many orders were placed last month",
+    "find the top 10 customers by revenue", "count orders by status", "which products are out of stock",
+    "total sales per month", "average order amount", "get the latest orders of each user",
+    "select users who registered this year",
+]
+CHAT_EXAMPLES = [
+    "你好", "今天天气怎么样", "谢谢你", "你能做什么", "你是谁", "什么是 text-to-sql",
+    "这个系统怎么用", "如何上传 DDL 文件", "介绍一下你自己", "早上好", "再见",
+    "有什么功能", "怎么配置 API Key", "为什么会报错",
+    "hello", "hi there", "how are you", "thank you", "what can you do", "who are you",
+    "how do I upload a DDL file", "good morning", "bye", "what is text-to-sql", "tell me a joke",
+]
+
+_ASCII_WORD_PATTERN = re.compile(r"[a-z_][a-z0-9_]*")
+_NON_ASCII_RUN_PATTERN = re.compile(r"[^\x00-\x7f\s]+")
+
+
+def _extract_features(text: str, max_n: int = 3) -> List[str]:
+    """
+    提取特征：中文等非 ASCII 片段的字符 1~max_n gram + 英文单词
+    
+    英文不取字符 n-gram：字母片段在两类样本中都大量出现，长的英文句子会因此被推向样本较多的一类
+    
+    Args:
+        text: 输入文本
+        max_n: 最大 n-gram 长度
+    
+    Returns:
+        List[str]: 特征列表
+    """
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    features = []
+    for run in _NON_ASCII_RUN_PATTERN.findall(normalized):
+        for n in range(1, max_n + 1):
+            features.extend(run[i:i + n] for i in range(len(run) - n + 1))
+    features.extend(f"w:{word}" for word in _ASCII_WORD_PATTERN.findall(normalized))
+    return features
+
+
+def _is_informative(feature: str) -> bool:
+    """英文单词或多字 n-gram（单个汉字太常见，不足以支持本地判定）"""
+    return len(feature) > 1
+
+
+class LocalIntentClassifier:
+    """
+    本地意图分类器（多项式朴素贝叶斯，Laplace 平滑）
+    
+    置信度由两类对数似然之差按命中特征数的平方根归一化后经 sigmoid 得到（朴素贝叶斯后验随文本长度
+    趋于 0/1，不能直接作为置信度）；没有命中任何英文单词或多字 n-gram 时置信度为 0.5，交由 LLM 判断
+    """
+    
+    INTENTS: Tuple[Intent, Intent] = ('sql_generation', 'general_chat')
+    
+    def __init__(self, alpha: float = 1.0, max_vocabulary: int = 50000):
+        """
+        初始化分类器
+        
+        Args:
+            alpha: Laplace 平滑系数
+            max_vocabulary: 词表大小上限（在线学习达到上限后不再加入新特征）
+        """
+        self.alpha = alpha
+        self.max_vocabulary = max_vocabulary
+        self._feature_counts: Dict[str, Counter] = {intent: Counter() for intent in self.INTENTS}
+        self._feature_totals: Dict[str, int] = {intent: 0 for intent in self.INTENTS}
+        self._doc_counts: Dict[str, int] = {intent: 0 for intent in self.INTENTS}
+        self._vocabulary = set()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_seed_data(cls, max_vocabulary: int = 50000) -> "LocalIntentClassifier":
+        """
+        使用关键词表（与规则回退使用的关键词相同）和示例语句训练分类器
+        
+        Args:
+            max_vocabulary: 词表大小上限
+        
+        Returns:
+            LocalIntentClassifier: 训练好的分类器
+        """
+        classifier = cls(max_vocabulary=max_vocabulary)
+        classifier.fit(
+            [(text, 'sql_generation') for text in SQL_KEYWORDS + SQL_EXAMPLES] +
+            [(text, 'general_chat') for text in CHAT_KEYWORDS + CHAT_EXAMPLES]
+        )
+        return classifier
+    
+    def fit(self, examples: Iterable[Tuple[str, Intent]]) -> None:
+        """
+        批量训练
+        
+        Args:
+            examples: (文本, 意图) 列表
+        """
+        for text, intent in examples:
+            self.learn(text, intent)
+    
+    def learn(self, text: str, intent: Intent) -> None:
+        """
+        在线学习单条样本（如 LLM 的判断结果）
+        
+        Args:
+            text: 文本
+            intent: 意图
+        """
+        features = _extract_features(text)
+        with self._lock:
+            room = self.max_vocabulary - len(self._vocabulary)
+            if room < len(features):
+                new_features = list(dict.fromkeys(f for f in features if f not in self._vocabulary))
+                dropped = set(new_features[max(room, 0):])
+                features = [f for f in features if f not in dropped]
+            self._feature_counts[intent].update(features)
+            self._feature_totals[intent] += len(features)
+            self._doc_counts[intent] += 1
+            self._vocabulary.update(features)
+    
+    def predict(self, text: str) -> Tuple[Intent, float]:
+        """
+        预测意图
+        
+        Args:
+            text: 文本
+        
+        Returns:
+            Tuple[str, float]: (意图, 置信度 0.5~1.0)
+        """
+        features = _extract_features(text)
+        with self._lock:
+            known = [feature for feature in features if feature in self._vocabulary]
+            if not any(_is_informative(feature) for feature in known):
+                return 'general_chat', 0.5
+            total_docs = sum(self._doc_counts.values())
+            vocab_size = len(self._vocabulary) + 1
+            scores = {}
+            for intent in self.INTENTS:
+                score = math.log((self._doc_counts[intent] + 1) / (total_docs + len(self.INTENTS)))
+                denominator = self._feature_totals[intent] + self.alpha * vocab_size
+                counts = self._feature_counts[intent]
+                for feature in known:
+                    score += math.log((counts[feature] + self.alpha) / denominator)
+                scores[intent] = score
+        
+        # 按命中特征数归一化：长文本不会仅因特征多而得到接近 1 的置信度
+        sql_score, chat_score = scores['sql_generation'], scores['general_chat']
+        diff = max(min((sql_score - chat_score) / math.sqrt(len(known)), 50.0), -50.0)
+        sql_probability = 1.0 / (1.0 + math.exp(-diff))
+        if sql_probability >= 0.5:
+            return 'sql_generation', sql_probability
+        return 'general_chat', 1.0 - sql_probability
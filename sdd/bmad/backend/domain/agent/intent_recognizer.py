@@ -1,19 +1,132 @@
 """
 意图识别模块
-使用 LLM 智能识别用户消息是 SQL 生成类还是普通对话类
+优先使用本地分类器识别用户消息是 SQL 生成类还是普通对话类，
+置信度不足时再交由 LLM 智能判断
 """
-from typing import Literal, Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Literal, Optional
+
+from config import settings
+from domain.agent.intent_classifier import LocalIntentClassifier, SQL_KEYWORDS, CHAT_KEYWORDS
+from infrastructure.cache.response_cache import normalize_question
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("intent_recognizer")
 
+# 意图识别提示词
+INTENT_SYSTEM_PROMPT = """你是一个意图识别专家。你的任务是判断用户的消息是否是想要生成数据库查询SQL。
+
+请根据以下规则判断：
+
+**SQL查询意图的特征**：
+- 明确要求查询、统计、分析数据
+- 涉及数据库表、字段、数据
+- 包含"查询"、"找出"、"统计"、"有多少"等关键词
+- 例如："查询所有用户"、"统计订单数量"、"找出金额最高的订单"
+
+**普通对话意图的特征**：
+- 日常寒暄、问候
+- 询问天气、时间等非数据库相关问题
+- 闲聊、感谢等社交性对话
+- 询问系统功能、使用帮助
+- 例如："你好"、"今天天气怎么样"、"谢谢"、"你能做什么"
+
+请只回答"sql"或"chat"，不要有任何其他内容。
+- 如果用户意图是生成SQL查询，回答"sql"
+- 如果用户意图是普通对话，回答"chat"
+"""
+
+INTENT_USER_TEMPLATE = "用户消息：{message}\n\n这是SQL查询意图还是普通对话意图？"
+
 
 class IntentRecognizer:
-    """意图识别器（基于LLM的智能判断）"""
+    """意图识别器（本地分类优先，低置信度时升级到LLM判断）"""
     
     def __init__(self):
         """初始化意图识别器"""
         self._llm_service = None  # 延迟加载，避免循环依赖
+        
+        # 本地分类器（关键词表 + 示例语句训练，LLM 判断结果在线学习）
+        self.classifier = LocalIntentClassifier.from_seed_data(
+            max_vocabulary=settings.intent_classifier_max_vocabulary
+        )
+        self.confidence_threshold = settings.intent_local_confidence_threshold
+        
+        # 按规范化消息缓存的判断结果
+        self._decisions: "OrderedDict[str, str]" = OrderedDict()
+        self._max_decisions = settings.intent_cache_size
+        self._lock = threading.Lock()
+        
+        # 指标
+        self._stats = {"total": 0, "cache_hits": 0, "local": 0, "llm": 0, "fallback": 0}
+    
+    def _record(self, source: str) -> None:
+        """记录一次判断的来源"""
+        with self._lock:
+            self._stats["total"] += 1
+            self._stats[source] += 1
+    
+    def _remember(self, normalized: str, intent: str) -> None:
+        """缓存判断结果（LRU）"""
+        with self._lock:
+            self._decisions[normalized] = intent
+            self._decisions.move_to_end(normalized)
+            while len(self._decisions) > self._max_decisions:
+                self._decisions.popitem(last=False)
+    
+    def _recognize_locally(self, message: str) -> Optional[Literal['sql_generation', 'general_chat']]:
+        """
+        本地识别：先查判断缓存，再用本地分类器
+        
+        Args:
+            message: 用户消息
+        
+        Returns:
+            str: 识别结果，置信度不足时返回 None（需要升级到 LLM）
+        """
+        normalized = normalize_question(message)
+        
+        with self._lock:
+            cached = self._decisions.get(normalized)
+            if cached is not None:
+                self._decisions.move_to_end(normalized)
+        if cached is not None:
+            self._record("cache_hits")
+            logger.info(f"Intent recognized: {cached} (cached)")
+            return cached
+        
+        intent, confidence = self.classifier.predict(normalized)
+        if confidence >= self.confidence_threshold:
+            self._record("local")
+            self._remember(normalized, intent)
+            logger.info(f"Intent recognized: {intent} (local, confidence={confidence:.3f})")
+            return intent
+        
+        logger.info(
+            f"Local intent confidence too low ({intent}, {confidence:.3f}), escalating to LLM"
+        )
+        return None
+    
+    def _learn_from_llm(self, message: str, intent: Literal['sql_generation', 'general_chat']) -> None:
+        """缓存 LLM 的判断结果，并作为本地分类器的训练样本"""
+        normalized = normalize_question(message)
+        self._record("llm")
+        self._remember(normalized, intent)
+        self.classifier.learn(normalized, intent)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取意图识别统计信息
+        
+        Returns:
+            Dict[str, Any]: 统计信息（含 LLM 升级率）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        decided = stats["total"] - stats["cache_hits"]
+        stats["escalation_rate"] = round((stats["llm"] + stats["fallback"]) / decided, 4) if decided else 0.0
+        return stats
     
     def _get_llm_service(self):
         """延迟加载LLM服务（避免循环依赖）"""
@@ -22,76 +135,128 @@ class IntentRecognizer:
             self._llm_service = get_llm_service()
         return self._llm_service
     
+    def _should_use_fallback(self, api_key: Optional[str]) -> bool:
+        """LLM不可用且没有提供API Key时，回退到规则匹配"""
+        llm_service = self._get_llm_service()
+        if not llm_service.is_available() and not api_key:
+            logger.warning("LLM not available, using fallback rule-based recognition")
+            return True
+        return False
+    
+    def _parse_llm_response(self, response: str) -> Optional[Literal['sql_generation', 'general_chat']]:
+        """
+        解析LLM的意图判断结果
+        
+        Args:
+            response: LLM响应
+        
+        Returns:
+            str: 'sql_generation' 或 'general_chat'，响应不明确时返回 None
+        """
+        response_lower = response.strip().lower()
+        
+        if 'sql' in response_lower:
+            return 'sql_generation'
+        if 'chat' in response_lower:
+            return 'general_chat'
+        return None
+    
+    def _resolve_llm_response(
+        self,
+        message: str,
+        response: str
+    ) -> Literal['sql_generation', 'general_chat']:
+        """
+        根据LLM响应确定意图：判断明确时缓存并学习；不明确时回退到规则匹配（不缓存、不学习）
+        
+        Args:
+            message: 用户消息
+            response: LLM响应
+        
+        Returns:
+            str: 'sql_generation' 或 'general_chat'
+        """
+        intent = self._parse_llm_response(response)
+        if intent is None:
+            logger.warning(f"Unclear LLM response: {response}, using fallback")
+            return self._fallback_recognize(message)
+        
+        logger.info(f"Intent recognized: {intent} (by LLM: {response.strip()})")
+        self._learn_from_llm(message, intent)
+        return intent
+    
     def recognize(
         self,
         message: str,
         api_key: Optional[str] = None
     ) -> Literal['sql_generation', 'general_chat']:
         """
-        使用LLM识别用户意图
+        识别用户意图（同步）：本地分类优先，低置信度时使用LLM
         
         Args:
             message: 用户消息
             api_key: 用户的API Key（可选）
-            
+        
         Returns:
             str: 'sql_generation' 或 'general_chat'
         """
         logger.info(f"Recognizing intent for message: {message[:50]}...")
         
+        local_intent = self._recognize_locally(message)
+        if local_intent is not None:
+            return local_intent
+        
         try:
-            llm_service = self._get_llm_service()
-            
-            # 如果LLM不可用且没有提供API Key，回退到规则匹配
-            if not llm_service.is_available() and not api_key:
-                logger.warning("LLM not available, using fallback rule-based recognition")
+            if self._should_use_fallback(api_key):
                 return self._fallback_recognize(message)
             
-            # 构建意图识别提示词
-            system_prompt = """你是一个意图识别专家。你的任务是判断用户的消息是否是想要生成数据库查询SQL。
-
-请根据以下规则判断：
-
-**SQL查询意图的特征**：
-- 明确要求查询、统计、分析数据
-- 涉及数据库表、字段、数据
-- 包含"查询"、"找出"、"统计"、"有多少"等关键词
-- 例如："查询所有用户"、"统计订单数量"、"找出金额最高的订单"
-
-**普通对话意图的特征**：
-- 日常寒暄、问候
-- 询问天气、时间等非数据库相关问题
-- 闲聊、感谢等社交性对话
-- 询问系统功能、使用帮助
-- 例如："你好"、"今天天气怎么样"、"谢谢"、"你能做什么"
-
-请只回答"sql"或"chat"，不要有任何其他内容。
-- 如果用户意图是生成SQL查询，回答"sql"
-- 如果用户意图是普通对话，回答"chat"
-"""
-            
             # 调用LLM判断
-            response = llm_service.generate_response(
-                user_message=f"用户消息：{message}\n\n这是SQL查询意图还是普通对话意图？",
-                system_prompt=system_prompt,
+            response = self._get_llm_service().generate_response(
+                user_message=INTENT_USER_TEMPLATE.format(message=message),
+                system_prompt=INTENT_SYSTEM_PROMPT,
                 api_key=api_key
             )
             
-            # 解析响应
-            response_lower = response.strip().lower()
-            
-            if 'sql' in response_lower:
-                intent = 'sql_generation'
-            elif 'chat' in response_lower:
-                intent = 'general_chat'
-            else:
-                # 如果LLM响应不明确，回退到规则匹配
-                logger.warning(f"Unclear LLM response: {response}, using fallback")
-                intent = self._fallback_recognize(message)
+            return self._resolve_llm_response(message, response)
+        
+        except Exception as e:
+            logger.error(f"LLM intent recognition failed: {e}, using fallback")
+            return self._fallback_recognize(message)
+    
+    async def arecognize(
+        self,
+        message: str,
+        api_key: Optional[str] = None
+    ) -> Literal['sql_generation', 'general_chat']:
+        """
+        识别用户意图（异步，不阻塞事件循环）：本地分类优先，低置信度时使用LLM
+        
+        Args:
+            message: 用户消息
+            api_key: 用户的API Key（可选）
+        
+        Returns:
+            str: 'sql_generation' 或 'general_chat'
+        """
+        logger.info(f"Recognizing intent for message: {message[:50]}...")
+        
+        local_intent = self._recognize_locally(message)
+        if local_intent is not None:
+            return local_intent
+        
+        try:
+            if self._should_use_fallback(api_key):
+                return self._fallback_recognize(message)
             
-            logger.info(f"Intent recognized: {intent} (by LLM: {response.strip()})")
-            return intent
+            # 异步调用LLM判断
+            response = await self._get_llm_service().agenerate_response(
+                user_message=INTENT_USER_TEMPLATE.format(message=message),
+                system_prompt=INTENT_SYSTEM_PROMPT,
+                api_key=api_key
+            )
             
+            return self._resolve_llm_response(message, response)
+        
         except Exception as e:
             logger.error(f"LLM intent recognition failed: {e}, using fallback")
             return self._fallback_recognize(message)
@@ -102,27 +267,13 @@ class IntentRecognizer:
         
         Args:
             message: 用户消息
-            
+        
         Returns:
             str: 'sql_generation' 或 'general_chat'
         """
+        self._record("fallback")
         message_lower = message.lower()
         
-        # SQL 生成关键词
-        SQL_KEYWORDS = [
-            '查询', '查找', '找出', '获取', '列出', '显示', '统计',
-            'select', 'query', 'find', 'get', 'show', 'list',
-            '我想看', '帮我查', '给我找', '有哪些', '多少',
-            '分析', '汇总', '总结', '计算', '求和', 'sum', 'count', 'avg',
-        ]
-        
-        # 普通对话关键词（强特征）
-        CHAT_KEYWORDS = [
-            '你好', 'hello', 'hi', '谢谢', '感谢', 'thank',
-            '天气', 'weather', '时间', 'time', '日期', 'date',
-            '你是谁', '你能做什么', '帮助', 'help',
-        ]
-        
         # 计算关键词匹配分数
         sql_score = sum(1 for keyword in SQL_KEYWORDS if keyword in message_lower)
         chat_score = sum(1 for keyword in CHAT_KEYWORDS if keyword in message_lower)
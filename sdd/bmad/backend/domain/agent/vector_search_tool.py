@@ -2,17 +2,51 @@
 向量检索工具
 为 Agent 提供向量检索能力
 """
-from typing import List, Dict, Any
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+import asyncio
 import json
 
 from langchain_core.tools import BaseTool
 from pydantic import Field
 
+from config import settings
+from domain.ddl.schema_graph import get_schema_graph_registry
+from domain.ddl.schema_renderer import count_tokens
 from infrastructure.vector.vector_service import get_vector_service
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("vector_search_tool")
 
+# 关联子图中每张表最多列出的字段数（超宽表只给出前面的字段和总数）
+_MAX_SUBGRAPH_COLUMNS = 40
+
+# 当前请求检索的文件 ID
+# Agent Executor 按 LLM 客户端缓存、在请求间共享，因此不能把 file_id 存在工具实例上，
+# 而是放在上下文变量中（asyncio 任务和 asyncio.to_thread 都会复制当前上下文）
+_active_file_id: ContextVar[Optional[str]] = ContextVar("vector_search_file_id", default=None)
+
+
+def _dumps(value: Any) -> str:
+    """紧凑 JSON（不缩进、分隔符不带空格）"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+@contextmanager
+def scoped_file_id(file_id: Optional[str]) -> Iterator[None]:
+    """
+    在当前上下文中限定向量检索的文件范围
+    
+    Args:
+        file_id: 文件 ID（为空时检索所有文件）
+    """
+    token = _active_file_id.set(file_id)
+    try:
+        yield
+    finally:
+        _active_file_id.reset(token)
+
 
 class VectorSearchTool(BaseTool):
     """
@@ -24,11 +58,23 @@ class VectorSearchTool(BaseTool):
     description: str = (
         "搜索数据库结构信息。"
         "输入：用户查询的自然语言描述（如'用户表'、'订单信息'）。"
-        "输出：相关的表和字段结构信息。"
+        "输出：相关的表和字段结构信息，以及沿外键扩展的关联表和连接条件。"
         "使用场景：需要了解数据库中有哪些表、字段时调用。"
     )
     
     n_results: int = Field(default=5, description="返回结果数量")
+    expand_depth: int = Field(
+        default_factory=lambda: settings.schema_graph_expand_depth,
+        description="沿外键扩展的层数（0 表示只返回检索结果）"
+    )
+    max_subgraph_tables: int = Field(
+        default_factory=lambda: settings.schema_graph_max_tables,
+        description="关联子图中的表数上限"
+    )
+    token_budget: int = Field(
+        default_factory=lambda: settings.search_result_token_budget,
+        description="每次检索返回结果的 token 上限（0 表示不限制）"
+    )
     
     def _run(self, query: str) -> str:
         """
@@ -36,18 +82,19 @@ class VectorSearchTool(BaseTool):
         
         Args:
             query: 查询文本
-            
+        
         Returns:
             str: 检索结果（JSON 格式字符串）
         """
-        logger.info(f"VectorSearchTool called with query: {query}")
+        file_id = _active_file_id.get()
+        logger.info(f"VectorSearchTool called with query: {query} (file_id={file_id})")
         
         try:
             # 获取向量服务
             vector_service = get_vector_service()
             
-            # 执行检索
-            results = vector_service.query_schema(query, n_results=self.n_results)
+            # 执行检索（限定在当前文件的表结构中）
+            results = vector_service.query_schema(query, n_results=self.n_results, file_id=file_id)
             
             if not results or not results.get('documents'):
                 logger.warning("No results found from vector search")
@@ -58,7 +105,7 @@ class VectorSearchTool(BaseTool):
             metadatas = results['metadatas'][0] if results['metadatas'] else []
             distances = results['distances'][0] if results['distances'] else []
             
-            # 构建结构化结果
+            # 构建结构化结果（表命中返回紧凑表结构，字段命中只返回类型和注释，不重复整段检索文档）
             formatted_results = []
             
             for i, (doc, metadata, distance) in enumerate(zip(documents, metadatas, distances)):
@@ -68,31 +115,126 @@ class VectorSearchTool(BaseTool):
                     formatted_results.append({
                         "type": "表",
                         "name": metadata.get('table_name'),
-                        "description": doc,
-                        "column_count": metadata.get('column_count'),
+                        "schema": metadata.get('schema') or doc,  # 旧数据没有紧凑表结构时使用检索文档
                         "relevance": round(1 - distance, 2)  # 距离转相关性
                     })
                 elif item_type == 'column':
-                    formatted_results.append({
+                    item = {
                         "type": "字段",
                         "table": metadata.get('table_name'),
                         "name": metadata.get('column_name'),
                         "data_type": metadata.get('data_type'),
-                        "description": doc,
                         "relevance": round(1 - distance, 2)
-                    })
+                    }
+                    if metadata.get('comment'):
+                        item["comment"] = metadata['comment']
+                    formatted_results.append(item)
+            
+            # 按相关性在 token 预算内保留检索结果
+            formatted_results, used_tokens = self._fit_to_budget(formatted_results)
             
-            logger.info(f"Vector search returned {len(formatted_results)} results")
+            # 沿外键扩展命中的表，一次返回多表查询所需的关联表和连接条件（使用剩余预算）
+            subgraph = self._expand_subgraph(file_id, metadatas, used_tokens)
+            if subgraph:
+                formatted_results.append(subgraph)
             
-            return json.dumps(formatted_results, ensure_ascii=False, indent=2)
+            observation = _dumps(formatted_results)
+            logger.info(f"Vector search returned {len(formatted_results)} results (~{count_tokens(observation)} tokens)")
+            return observation
         
         except Exception as e:
             logger.error(f"Vector search failed: {e}", exc_info=True)
             return json.dumps({"error": str(e)}, ensure_ascii=False)
     
+    def _fit_to_budget(self, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        按相关性顺序保留 token 预算内的检索结果（至少保留第一条）
+        
+        Args:
+            items: 检索结果（按相关性排序）
+        
+        Returns:
+            Tuple: (保留的结果, 已使用的 token 数)
+        """
+        kept, used = [], 0
+        for item in items:
+            tokens = count_tokens(_dumps(item))
+            if self.token_budget <= 0 or not kept or used + tokens <= self.token_budget:
+                kept.append(item)
+                used += tokens
+        if len(kept) < len(items):
+            logger.info(f"Search results truncated to token budget: {len(kept)}/{len(items)} kept")
+        return kept, used
+    
+    def _expand_subgraph(
+        self,
+        file_id: Optional[str],
+        metadatas: List[Dict[str, Any]],
+        used_tokens: int = 0
+    ) -> Optional[Dict[str, Any]]:
+        """
+        将检索命中的表沿外键扩展为关联子图
+        
+        超出剩余 token 预算时从最后扩展到的表开始去掉，直到放得下
+        
+        Args:
+            file_id: 当前文件 ID
+            metadatas: 检索结果的元数据（按相关性排序）
+            used_tokens: 检索结果已使用的 token 数
+        
+        Returns:
+            Dict: 关联子图（表、字段和连接条件），未启用、文件未就绪或没有外键关联时返回 None
+        """
+        if self.expand_depth <= 0 or not file_id:
+            return None
+        
+        graph = get_schema_graph_registry().get(file_id)
+        if graph is None:
+            return None
+        
+        seeds = [metadata.get('table_name') for metadata in metadatas]
+        tables, edges = graph.expand(seeds, depth=self.expand_depth, max_tables=self.max_subgraph_tables)
+        if not edges:
+            return None
+        
+        subgraph_tables = []
+        for table_name in tables:
+            columns = graph.columns(table_name)
+            column_list = [f"{name} {data_type}" for name, data_type in columns[:_MAX_SUBGRAPH_COLUMNS]]
+            if len(columns) > _MAX_SUBGRAPH_COLUMNS:
+                column_list.append(f"...（共 {len(columns)} 个字段）")
+            subgraph_tables.append({"name": table_name, "columns": column_list})
+        
+        while True:
+            names = {table["name"] for table in subgraph_tables}
+            joins = [
+                edge.condition() for edge in edges
+                if edge.source_table in names and edge.target_table in names
+            ]
+            if not joins:
+                return None
+            subgraph = {"type": "关联子图", "tables": subgraph_tables, "joins": joins}
+            if self.token_budget <= 0 or used_tokens + count_tokens(_dumps(subgraph)) <= self.token_budget:
+                break
+            subgraph_tables = subgraph_tables[:-1]
+        
+        logger.info(f"Schema subgraph expanded: {len(subgraph_tables)} tables, {len(joins)} joins")
+        return subgraph
+    
     async def _arun(self, query: str) -> str:
-        """异步执行（调用同步方法）"""
-        return self._run(query)
+        """
+        异步执行向量检索
+        
+        Chroma 查询与 Embedding 计算是同步的 CPU 操作，放到线程中执行，
+        避免 Agent 异步调用工具时阻塞事件循环
+        
+        Args:
+            query: 查询文本
+        
+        Returns:
+            str: 检索结果（JSON 格式字符串）
+        """
+        return await asyncio.to_thread(self._run, query)
 
 
 def get_vector_search_tool() -> VectorSearchTool:
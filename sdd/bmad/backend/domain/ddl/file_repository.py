@@ -0,0 +1,217 @@
+"""
+DDL 文件仓储接口
+定义文件元数据、DDL 原文和处理状态的存取方式，由基础设施层实现
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+
+class FileRepository(ABC):
+    """
+    DDL 文件仓储
+    
+    文件数据以字典表示，字段与原内存存储一致：
+    filename, status, uploaded_at, file_size, error_message,
+    tables, table_count, column_count, embedding_count, schema_fingerprint,
+    progress_embedded, progress_total（处理中的向量化进度）
+    （DDL 原文不随元数据返回，按需通过 get_content 读取）
+    """
+    
+    @abstractmethod
+    def create(
+        self,
+        file_id: str,
+        filename: str,
+        content: str,
+        file_size: int,
+        uploaded_at: datetime
+    ) -> None:
+        """
+        保存新上传的文件（状态为 pending）
+        
+        Args:
+            file_id: 文件 ID
+            filename: 文件名
+            content: DDL 原文
+            file_size: 文件大小（字节）
+            uploaded_at: 上传时间
+        """
+    
+    @abstractmethod
+    def create_from_chunks(
+        self,
+        file_id: str,
+        filename: str,
+        chunks: Iterable[bytes],
+        uploaded_at: datetime
+    ) -> int:
+        """
+        逐块保存新上传的文件（状态为 pending，不需要完整内容常驻内存）
+        
+        Args:
+            file_id: 文件 ID
+            filename: 文件名
+            chunks: UTF-8 编码的 DDL 原文块（迭代过程中抛出异常时不保存）
+            uploaded_at: 上传时间
+        
+        Returns:
+            int: 文件大小（字节）
+        """
+    
+    @abstractmethod
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取文件元数据
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            Dict: 文件元数据，不存在时返回 None
+        """
+    
+    @abstractmethod
+    def get_metadata(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取文件元数据（不含 tables，无需读取和解码表结构；如按表数决定直接生成）
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            Dict: 文件元数据（不含 tables），不存在时返回 None
+        """
+    
+    @abstractmethod
+    def get_content(self, file_id: str) -> Optional[str]:
+        """
+        获取 DDL 原文
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            str: DDL 原文，不存在时返回 None
+        """
+    
+    @abstractmethod
+    def iter_content(self, file_id: str) -> Optional[Iterable[str]]:
+        """
+        按块读取 DDL 原文
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            Iterable[str]: 可迭代的文本块（可 pickle，供解析进程流式读取），不存在返回 None
+        """
+    
+    @abstractmethod
+    def exists(self, file_id: str) -> bool:
+        """
+        检查文件是否存在
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            bool: True 如果存在
+        """
+    
+    @abstractmethod
+    def update_status(self, file_id: str, status: str, error_message: Optional[str] = None) -> bool:
+        """
+        更新处理状态（同时清空向量化进度）
+        
+        Args:
+            file_id: 文件 ID
+            status: 新状态（pending/parsing/ready/error）
+            error_message: 错误信息（仅 error 状态）
+        
+        Returns:
+            bool: True 如果文件存在并已更新
+        """
+    
+    @abstractmethod
+    def update_progress(self, file_id: str, embedded: int, total: int) -> bool:
+        """
+        更新向量化进度
+        
+        Args:
+            file_id: 文件 ID
+            embedded: 已处理的向量条目数
+            total: 向量条目总数
+        
+        Returns:
+            bool: True 如果文件存在并已更新
+        """
+    
+    @abstractmethod
+    def save_parse_result(
+        self,
+        file_id: str,
+        tables: Sequence[Any],
+        embedding_count: int,
+        schema_fingerprint: str
+    ) -> bool:
+        """
+        保存解析结果并将状态置为 ready（一次原子写入）
+        
+        Args:
+            file_id: 文件 ID
+            tables: 表结构（TableInfo 或其 to_dict 字典列表，写入时逐表序列化）
+            embedding_count: 向量条目数
+            schema_fingerprint: schema 指纹
+        
+        Returns:
+            bool: True 如果文件存在并已更新
+        """
+    
+    @abstractmethod
+    def delete(self, file_id: str) -> bool:
+        """
+        删除文件（含 DDL 原文）
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            bool: True 如果文件存在并已删除
+        """
+    
+    @abstractmethod
+    def list_files(self, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        列出文件元数据（不含表结构详情）
+        
+        Args:
+            statuses: 按状态过滤（可选）
+        
+        Returns:
+            List[Dict]: 文件元数据列表（含 file_id），按上传时间排序
+        """
+    
+    @abstractmethod
+    def try_acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        尝试获取跨进程租约（多 worker 下保证某项任务只由一个进程执行）
+        
+        Args:
+            name: 租约名称
+            owner: 持有者标识
+            ttl_seconds: 租约有效期（持有者异常退出后过期可被重新获取）
+        
+        Returns:
+            bool: True 如果获取成功
+        """
+    
+    @abstractmethod
+    def release_lease(self, name: str, owner: str) -> None:
+        """
+        释放租约（仅持有者可释放）
+        
+        Args:
+            name: 租约名称
+            owner: 持有者标识
+        """
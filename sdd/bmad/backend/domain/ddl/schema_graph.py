@@ -0,0 +1,267 @@
+"""
+表结构关系图模块
+按文件构建外键关系图（表为节点，外键为边），检索时沿外键扩展出关联表和连接字段
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import settings
+from infrastructure.logging.logger import get_logger
+
+logger = get_logger("schema_graph")
+
+
+class JoinEdge:
+    """
+    连接边：source_table.source_columns = target_table.target_columns
+    
+    外键边从引用表指向被引用表，reversed() 得到反方向的边
+    """
+    
+    __slots__ = ("source_table", "source_columns", "target_table", "target_columns")
+    
+    def __init__(self, source_table: str, source_columns: Tuple[str, ...],
+                 target_table: str, target_columns: Tuple[str, ...]):
+        self.source_table = source_table
+        self.source_columns = source_columns
+        self.target_table = target_table
+        self.target_columns = target_columns
+    
+    def reversed(self) -> "JoinEdge":
+        """反方向的边"""
+        return JoinEdge(self.target_table, self.target_columns, self.source_table, self.source_columns)
+    
+    def condition(self) -> str:
+        """连接条件（如 orders.user_id = users.id）"""
+        return " AND ".join(
+            f"{self.source_table}.{source} = {self.target_table}.{target}"
+            for source, target in zip(self.source_columns, self.target_columns)
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "source_table": self.source_table,
+            "source_columns": list(self.source_columns),
+            "target_table": self.target_table,
+            "target_columns": list(self.target_columns)
+        }
+    
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, JoinEdge) and self.to_dict() == other.to_dict()
+    
+    def __hash__(self) -> int:
+        return hash((self.source_table, self.source_columns, self.target_table, self.target_columns))
+    
+    def __repr__(self) -> str:
+        return f"JoinEdge({self.condition()})"
+
+
+class SchemaGraph:
+    """
+    单个文件的外键关系图
+    
+    核心设计：
+    1. 节点为表名，每个外键约束对应一条双向可走的边（复合外键合并为一条边）
+    2. 引用列为空的外键（REFERENCES users）解析为被引用表的主键
+    3. 指向文件中不存在的表的外键被忽略
+    4. 节点同时保存字段名和类型，检索时可直接返回关联表的结构
+    """
+    
+    def __init__(
+        self,
+        table_names: Iterable[str],
+        edges: Iterable[JoinEdge],
+        columns: Optional[Dict[str, List[Tuple[str, str]]]] = None
+    ):
+        """
+        初始化关系图
+        
+        Args:
+            table_names: 表名
+            edges: 外键边（引用表 -> 被引用表）
+            columns: 每张表的 (字段名, 类型) 列表（可选）
+        """
+        self._adjacency: Dict[str, List[JoinEdge]] = {name: [] for name in table_names}
+        self._columns = columns or {}
+        self.edges: List[JoinEdge] = []
+        
+        for edge in edges:
+            if edge.source_table not in self._adjacency or edge.target_table not in self._adjacency:
+                continue
+            self.edges.append(edge)
+            self._adjacency[edge.source_table].append(edge)
+            if edge.source_table != edge.target_table:
+                self._adjacency[edge.target_table].append(edge.reversed())
+    
+    @classmethod
+    def from_tables(cls, tables: List[Dict[str, Any]]) -> "SchemaGraph":
+        """
+        从表结构字典（TableInfo.to_dict 的结果）构建关系图
+        
+        Args:
+            tables: 表结构列表
+        
+        Returns:
+            SchemaGraph: 关系图
+        """
+        primary_keys = {table["name"]: table.get("primary_keys", []) for table in tables}
+        columns = {
+            table["name"]: [(column["name"], column["data_type"]) for column in table.get("columns", [])]
+            for table in tables
+        }
+        edges = []
+        
+        for table in tables:
+            # 同名外键的多个字段属于同一个复合外键
+            grouped: "OrderedDict[Tuple[str, str], List[Dict[str, str]]]" = OrderedDict()
+            for fk in table.get("foreign_keys", []):
+                grouped.setdefault((fk.get("name", ""), fk["ref_table"]), []).append(fk)
+            
+            for (_, ref_table), fks in grouped.items():
+                target_columns = [fk.get("ref_column") for fk in fks]
+                if not all(target_columns):
+                    # 未指定引用列时引用对方主键
+                    target_columns = primary_keys.get(ref_table, [])[:len(fks)]
+                if len(target_columns) != len(fks):
+                    continue
+                edges.append(JoinEdge(
+                    table["name"], tuple(fk["column"] for fk in fks), ref_table, tuple(target_columns)
+                ))
+        
+        return cls(primary_keys.keys(), edges, columns)
+    
+    @property
+    def table_names(self) -> List[str]:
+        """所有表名"""
+        return list(self._adjacency)
+    
+    def columns(self, table_name: str) -> List[Tuple[str, str]]:
+        """
+        获取表的字段
+        
+        Args:
+            table_name: 表名
+        
+        Returns:
+            List[Tuple[str, str]]: (字段名, 类型) 列表，表不存在时为空
+        """
+        return list(self._columns.get(table_name, []))
+    
+    def expand(self, seeds: Iterable[str], depth: int = 1, max_tables: int = 8) -> Tuple[List[str], List[JoinEdge]]:
+        """
+        从命中的表出发沿外键扩展，得到包含关联表和连接字段的子图
+        
+        按广度优先逐层扩展，先命中的表的邻居优先；达到表数上限时停止
+        
+        Args:
+            seeds: 命中的表（按相关性排序）
+            depth: 扩展的外键层数（0 表示不扩展）
+            max_tables: 子图中的表数上限（不少于命中的表数）
+        
+        Returns:
+            Tuple[List[str], List[JoinEdge]]: 子图中的表（命中的表在前）和表之间的外键边
+        """
+        selected = [name for name in dict.fromkeys(seeds) if name in self._adjacency]
+        limit = max(max_tables, len(selected))
+        selected_set = set(selected)
+        frontier = list(selected)
+        
+        for _ in range(depth):
+            next_frontier = []
+            for table_name in frontier:
+                for edge in self._adjacency[table_name]:
+                    if len(selected) >= limit:
+                        break
+                    if edge.target_table not in selected_set:
+                        selected_set.add(edge.target_table)
+                        selected.append(edge.target_table)
+                        next_frontier.append(edge.target_table)
+            frontier = next_frontier
+        
+        edges = [
+            edge for edge in self.edges
+            if edge.source_table in selected_set and edge.target_table in selected_set
+        ]
+        return selected, edges
+
+
+class SchemaGraphRegistry:
+    """
+    按文件缓存的关系图（LRU）
+    
+    首次使用时从文件仓储读取表结构构建；文件重新处理或删除时失效
+    """
+    
+    def __init__(self, loader: Callable[[str], Optional[Dict[str, Any]]], max_size: int = 32):
+        """
+        初始化关系图缓存
+        
+        Args:
+            loader: 按 file_id 读取文件记录（含 status 和 tables）的函数
+            max_size: 缓存的文件数上限
+        """
+        self._loader = loader
+        self.max_size = max(1, max_size)
+        self._graphs: "OrderedDict[str, SchemaGraph]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, file_id: str) -> Optional[SchemaGraph]:
+        """
+        获取文件的关系图
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            SchemaGraph: 关系图，文件不存在或尚未就绪时返回 None
+        """
+        with self._lock:
+            graph = self._graphs.get(file_id)
+            if graph is not None:
+                self._graphs.move_to_end(file_id)
+                return graph
+        
+        file_data = self._loader(file_id)
+        if not file_data or file_data.get("status") != "ready":
+            return None
+        graph = SchemaGraph.from_tables(file_data.get("tables") or [])
+        logger.debug(f"Schema graph built for {file_id}: {len(graph.table_names)} tables, {len(graph.edges)} edges")
+        
+        with self._lock:
+            self._graphs[file_id] = graph
+            self._graphs.move_to_end(file_id)
+            while len(self._graphs) > self.max_size:
+                self._graphs.popitem(last=False)
+        return graph
+    
+    def invalidate(self, file_id: str) -> None:
+        """
+        使文件的关系图失效
+        
+        Args:
+            file_id: 文件 ID
+        """
+        with self._lock:
+            self._graphs.pop(file_id, None)
+
+
+# 全局单例
+_schema_graph_registry = None
+
+
+def get_schema_graph_registry() -> SchemaGraphRegistry:
+    """
+    获取关系图缓存单例
+    
+    Returns:
+        SchemaGraphRegistry: 关系图缓存实例
+    """
+    global _schema_graph_registry
+    if _schema_graph_registry is None:
+        from infrastructure.repository.sqlite_file_repository import get_file_repository
+        _schema_graph_registry = SchemaGraphRegistry(
+            get_file_repository().get, max_size=settings.schema_graph_cache_size
+        )
+    return _schema_graph_registry
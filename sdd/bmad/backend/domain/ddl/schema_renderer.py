@@ -0,0 +1,160 @@
+"""
+表结构紧凑渲染模块
+把表结构渲染为提示词中的单行格式（如 orders(id BIGINT PK, user_id BIGINT FK→users.id) -- 订单），
+并按相关性在 token 预算内取舍表和字段
+"""
+import math
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+# 中文字符（GLM 等模型的分词器中约一个字一个 token）
+_CJK_PATTERN = re.compile(r"[一-鿿　-〿＀-￯]")
+
+# 英文、数字和符号平均每个 token 对应的字符数
+_CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text: str) -> int:
+    """
+    估算文本的 token 数（中文按字计数，其余字符按 4 个字符一个 token）
+    
+    不依赖具体模型的分词器，用于提示词预算控制和大小统计
+    
+    Args:
+        text: 文本
+    
+    Returns:
+        int: 估算的 token 数
+    """
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / _CHARS_PER_TOKEN)
+
+
+def _render_column(column: Dict[str, Any], primary_keys: Sequence[str], references: Dict[str, str]) -> str:
+    """渲染单个字段：名称 类型 [PK] [FK→表.字段] ['注释']"""
+    parts = [column["name"]]
+    if column.get("data_type"):
+        parts.append(column["data_type"])
+    if column["name"] in primary_keys:
+        parts.append("PK")
+    if column["name"] in references:
+        parts.append(f"FK→{references[column['name']]}")
+    if column.get("comment"):
+        parts.append(f"'{column['comment']}'")
+    return " ".join(parts)
+
+
+def render_table(table: Dict[str, Any], max_columns: Optional[int] = None) -> str:
+    """
+    渲染单张表：表名(字段, ...) -- 表注释
+    
+    Args:
+        table: 表结构（TableInfo.to_dict 的格式：name、columns、primary_keys、foreign_keys、comment）
+        max_columns: 最多列出的字段数（主键、外键字段优先保留，其余按原顺序；为空表示全部列出）
+    
+    Returns:
+        str: 单行表结构
+    """
+    columns = table.get("columns") or []
+    primary_keys = table.get("primary_keys") or []
+    references = {
+        fk["column"]: f"{fk['ref_table']}.{fk['ref_column']}" if fk.get("ref_column") else fk["ref_table"]
+        for fk in table.get("foreign_keys") or []
+    }
+    
+    shown = columns
+    if max_columns is not None and len(columns) > max_columns:
+        is_key = [c["name"] in primary_keys or c["name"] in references for c in columns]
+        keys = [index for index, key in enumerate(is_key) if key][:max_columns]
+        others = [index for index, key in enumerate(is_key) if not key][:max_columns - len(keys)]
+        shown = [columns[index] for index in sorted(keys + others)]
+    
+    rendered = [_render_column(column, primary_keys, references) for column in shown]
+    if len(shown) < len(columns):
+        rendered.append(f"...+{len(columns) - len(shown)}")
+    
+    line = f"{table['name']}({', '.join(rendered)})"
+    if table.get("comment"):
+        line += f" -- {table['comment']}"
+    return line
+
+
+class RenderedSchema:
+    """
+    预算内渲染的表结构
+    
+    text 为每表一行的表结构文本；tables 为完整列出的表，
+    truncated 为只列出部分字段的表，omitted 为超出预算未列出的表
+    """
+    
+    __slots__ = ("text", "tokens", "tables", "truncated", "omitted")
+    
+    def __init__(self, text: str, tokens: int, tables: List[str], truncated: List[str], omitted: List[str]):
+        self.text = text
+        self.tokens = tokens
+        self.tables = tables
+        self.truncated = truncated
+        self.omitted = omitted
+
+
+def render_schema(
+    tables: Sequence[Dict[str, Any]],
+    token_budget: int = 0,
+    relevance: Optional[Dict[str, float]] = None
+) -> RenderedSchema:
+    """
+    在 token 预算内渲染多张表
+    
+    表按相关性从高到低依次加入；放不下的第一张表缩减字段（保留主键、外键字段）后尝试加入，
+    之后的表不再列出，只在末尾注明省略的表数
+    
+    Args:
+        tables: 表结构列表（TableInfo.to_dict 的格式）
+        token_budget: token 预算（<=0 表示不限制）
+        relevance: 表名 -> 相关性（为空时保持原顺序）
+    
+    Returns:
+        RenderedSchema: 渲染结果
+    """
+    if relevance:
+        tables = sorted(tables, key=lambda table: relevance.get(table["name"], 0.0), reverse=True)
+    
+    lines, included, truncated, omitted = [], [], [], []
+    used = 0
+    exhausted = False
+    for table in tables:
+        if exhausted:
+            omitted.append(table["name"])
+            continue
+        
+        line = render_table(table)
+        tokens = count_tokens(line) + 1  # 换行
+        if token_budget <= 0 or used + tokens <= token_budget:
+            lines.append(line)
+            included.append(table["name"])
+            used += tokens
+            continue
+        
+        # 按剩余预算缩减字段（至少要能列出一个字段），之后的表不再列出
+        exhausted = True
+        remaining = token_budget - used
+        best = None
+        low, high = 1, len(table.get("columns") or []) - 1
+        while low <= high:  # 二分查找放得下的最多字段数
+            middle = (low + high) // 2
+            candidate = render_table(table, max_columns=middle)
+            if count_tokens(candidate) + 1 <= remaining:
+                best, low = candidate, middle + 1
+            else:
+                high = middle - 1
+        if best is not None:
+            lines.append(best)
+            truncated.append(table["name"])
+            used += count_tokens(best) + 1
+        else:
+            omitted.append(table["name"])
+    
+    if omitted:
+        lines.append(f"-- 另有 {len(omitted)} 张表超出长度限制未列出")
+    text = "\n".join(lines)
+    return RenderedSchema(text, count_tokens(text), included, truncated, omitted)
@@ -0,0 +1,228 @@
+"""
+SQL 解析结果模块
+SQL 只解析一次，语法、引用、逻辑各层验证规则共享同一份语法树和 token 流，格式化也复用同一棵语法树
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+import sqlparse
+from sqlparse import filters
+from sqlparse.sql import Statement, Token
+from sqlparse.tokens import Comment, Keyword, DML, Literal, Name, Punctuation, Wildcard
+
+# 表名位置（FROM/JOIN 之后）遇到这些关键字表示表列表结束
+TABLE_CLAUSE_END = frozenset({
+    "WHERE", "GROUP BY", "ORDER BY", "HAVING", "LIMIT", "OFFSET", "ON", "USING", "SET", "VALUES",
+    "UNION", "UNION ALL", "EXCEPT", "INTERSECT", "WINDOW", "SELECT"
+})
+
+# 表名位置上修饰表或子查询的关键字（JOIN LATERAL (...)、FROM ONLY t），不是表名
+TABLE_MODIFIERS = frozenset({"LATERAL", "ONLY"})
+
+# sqlparse 标记为 Name 的 SQL 关键字（不是字段）；类型名、INTERVAL 等为 Name.Builtin，另行排除
+_NON_COLUMN_WORDS = frozenset({"nulls", "filter", "top", "epoch", "separator"})
+
+
+class SQLReferences:
+    """
+    一条 SQL 语句中的表和字段引用（一次遍历 token 收集）
+    
+    tables 为 FROM/JOIN/INTO/UPDATE 引用的表；aliases 为 别名 -> 表名；
+    derived 为 CTE 和子查询别名（其字段来自子查询，不在 schema 中）；
+    qualified 为 (表名或别名, 字段) 引用；columns 为不带表名的字段；output_aliases 为 SELECT 中定义的别名
+    """
+    
+    __slots__ = ("tables", "aliases", "derived", "qualified", "columns", "output_aliases")
+    
+    def __init__(self):
+        self.tables: List[str] = []
+        self.aliases: Dict[str, str] = {}
+        self.derived: Set[str] = set()
+        self.qualified: List[Tuple[str, str]] = []
+        self.columns: List[str] = []
+        self.output_aliases: Set[str] = set()
+
+
+def _is_name(token: Token) -> bool:
+    """标识符（含反引号、双引号包围的标识符）"""
+    return token.ttype in Name or token.ttype is Literal.String.Symbol
+
+
+def _identifier(token: Token) -> str:
+    """去掉引号并转为小写的标识符"""
+    return token.value.strip('`"[]').lower()
+
+
+def collect_references(tokens: List[Token]) -> SQLReferences:
+    """
+    一次遍历语句的 token，收集表、别名和字段引用
+    
+    括号按用途区分：子查询（以 SELECT/WITH 开头）内的 FROM 照常处理，
+    函数调用（如 EXTRACT(YEAR FROM created_at)）内的 FROM 不是表列表
+    
+    Args:
+        tokens: 语句的 token 流（已去掉空白和注释）
+    
+    Returns:
+        SQLReferences: 引用集合
+    """
+    refs = SQLReferences()
+    
+    expect_table = False      # 下一个标识符是表名
+    in_table_list = False     # 处于 FROM 表列表中（逗号后继续是表名）
+    alias_target = None       # 刚读到的表名（或子查询），其后的标识符是别名
+    stack = []                # 括号栈：(是否子查询, 进入时的 in_table_list, 是否在表名位置)
+    previous = None           # 上一个有意义的 token
+    
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        upper = token.value.upper()
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        
+        if token.ttype is Punctuation and token.value == "(":
+            subquery = following is not None and (following.ttype is DML or following.ttype in Keyword.CTE)
+            stack.append((subquery, in_table_list, expect_table))
+            expect_table = in_table_list = False
+            alias_target = None
+        
+        elif token.ttype is Punctuation and token.value == ")":
+            if stack:
+                _, in_table_list, was_table = stack.pop()
+                alias_target = "" if was_table else None  # 子查询作为表时，其后是子查询别名
+        
+        elif token.ttype is Punctuation and token.value == ",":
+            expect_table, alias_target = in_table_list, None
+        
+        elif token.ttype in Keyword and not _is_name(token):
+            if upper == "AS":
+                pass
+            elif upper == "FROM" and stack and not stack[-1][0]:
+                pass  # 函数参数中的 FROM
+            elif upper in ("FROM", "INTO") or upper.endswith("JOIN") or (token.ttype is DML and upper == "UPDATE"):
+                expect_table, in_table_list, alias_target = True, upper == "FROM", None
+            elif expect_table and upper in TABLE_MODIFIERS:
+                pass  # 修饰词之后仍是表名或子查询
+            elif expect_table and upper not in TABLE_CLAUSE_END and not upper.endswith("JOIN"):
+                # 与关键字同名的表（如 user）
+                refs.tables.append(_identifier(token))
+                expect_table, alias_target = False, _identifier(token)
+            else:
+                expect_table = in_table_list = False
+                alias_target = None
+        
+        elif _is_name(token):
+            # 读取 a.b.c 形式的完整标识符
+            parts = [token]
+            while (i + 2 < len(tokens) and tokens[i + 1].ttype is Punctuation and tokens[i + 1].value == "."
+                   and (_is_name(tokens[i + 2]) or tokens[i + 2].ttype in Keyword or tokens[i + 2].ttype is Wildcard)):
+                parts.append(tokens[i + 2])
+                i += 2
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            
+            if following is not None and following.ttype is Punctuation and following.value == "(":
+                pass  # 函数调用
+            elif (len(parts) == 1 and following is not None and following.value.upper() == "AS"
+                  and i + 2 < len(tokens) and tokens[i + 2].value == "("):
+                refs.derived.add(_identifier(token))  # CTE：name AS (SELECT ...)
+            elif expect_table:
+                table_name = _identifier(parts[-1])  # 去掉库名前缀
+                refs.tables.append(table_name)
+                expect_table, alias_target = False, table_name
+            elif alias_target is not None and len(parts) == 1:
+                alias = _identifier(token)
+                if alias_target:
+                    refs.aliases[alias] = alias_target
+                else:
+                    refs.derived.add(alias)
+                alias_target = None
+            elif len(parts) > 1:
+                refs.qualified.append((_identifier(parts[-2]), _identifier(parts[-1])))  # 别名.* 的字段为 *
+            elif previous is not None and (
+                previous.value.upper() in ("AS", "END") or _is_name(previous) or previous.ttype in Literal
+                or (previous.ttype is Punctuation and previous.value == ")")
+            ):
+                refs.output_aliases.add(_identifier(token))  # 输出列别名（可省略 AS）
+            elif token.ttype is not Name.Builtin and _identifier(token) not in _NON_COLUMN_WORDS:
+                refs.columns.append(_identifier(token))
+        
+        previous = tokens[i]
+        i += 1
+    
+    return refs
+
+
+class ParsedStatement:
+    """
+    解析后的单条语句
+    
+    statement 为 sqlparse 语法树；tokens 为去掉空白和注释后的 token 流（规则按顺序遍历）；
+    references 在第一次使用时收集，之后各规则共享
+    """
+    
+    __slots__ = ("statement", "tokens", "_references")
+    
+    def __init__(self, statement: Statement):
+        self.statement = statement
+        self.tokens: List[Token] = [
+            token for token in statement.flatten() if not token.is_whitespace and token.ttype not in Comment
+        ]
+        self._references: Optional[SQLReferences] = None
+    
+    @property
+    def references(self) -> SQLReferences:
+        """表、别名和字段引用"""
+        if self._references is None:
+            self._references = collect_references(self.tokens)
+        return self._references
+    
+    def keywords(self) -> Set[str]:
+        """语句中出现的关键字（大写，如 JOIN、LEFT JOIN、WHERE）"""
+        return {token.normalized for token in self.tokens if token.is_keyword}
+
+
+class ParsedSQL:
+    """
+    解析后的 SQL（可包含多条语句）
+    
+    format 会把关键字/标识符大小写和缩进直接写回语法树，因此应在所有验证规则之后调用
+    """
+    
+    __slots__ = ("sql", "statements", "_formatted")
+    
+    def __init__(self, sql: str):
+        """
+        解析 SQL（sqlparse 词法分析和分组各一次）
+        
+        Args:
+            sql: SQL 语句
+        """
+        self.sql = sql
+        self.statements: List[ParsedStatement] = [ParsedStatement(statement) for statement in sqlparse.parse(sql)]
+        self._formatted: Optional[str] = None
+    
+    def format(self) -> str:
+        """
+        格式化 SQL（关键字大写、标识符小写、重新缩进），结果与
+        sqlparse.format(sql, reindent=True, keyword_case='upper', identifier_case='lower') 相同，但不重新解析
+        
+        Returns:
+            str: 格式化后的 SQL
+        """
+        if self._formatted is None:
+            case_filters = (filters.KeywordCaseFilter("upper"), filters.IdentifierCaseFilter("lower"))
+            strip_whitespace, reindent = filters.StripWhitespaceFilter(), filters.ReindentFilter()
+            output = []
+            for parsed in self.statements:
+                leaves = list(parsed.statement.flatten())
+                stream = ((token.ttype, token.value) for token in leaves)
+                for case_filter in case_filters:
+                    stream = case_filter.process(stream)
+                for token, (_, value) in zip(leaves, stream):
+                    if value != token.value:
+                        token.value = value
+                        token.normalized = value.upper() if token.is_keyword else value
+                strip_whitespace.process(parsed.statement)
+                reindent.process(parsed.statement)
+                output.append(filters.SerializerUnicode.process(parsed.statement))
+            self._formatted = "".join(output)
+        return self._formatted
@@ -2,11 +2,14 @@
 SQL 生成器
 基于用户查询和表结构上下文生成 SQL
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
 import json
 
+from config import settings
+from domain.ddl.schema_renderer import render_schema
 from infrastructure.llm.llm_service import get_llm_service
 from domain.sql.sql_validator import get_sql_validator
+from domain.sql.symbol_table import SchemaSymbolTable
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("sql_generator")
@@ -24,16 +27,18 @@ class SQLGenerator:
         self,
         user_query: str,
         table_context: List[Dict[str, Any]],
-        schema_metadata: Optional[Dict[str, Any]] = None
+        schema_metadata: Optional[Union[Dict[str, Any], SchemaSymbolTable]] = None,
+        api_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         生成 SQL
         
         Args:
             user_query: 用户查询
-            table_context: 表结构上下文（从向量检索获取）
-            schema_metadata: 完整 schema 元数据（用于验证）
-            
+            table_context: 表结构上下文（从向量检索获取，或由 build_table_context 从完整表结构构建）
+            schema_metadata: 完整 schema 元数据或文件的符号表（用于验证）
+            api_key: 用户提供的API Key（可选）
+        
         Returns:
             Dict: 生成结果
                 - sql: str - 生成的 SQL
@@ -56,7 +61,8 @@ class SQLGenerator:
             logger.debug("Calling LLM for SQL generation...")
             llm_response = self.llm_service.generate_response(
                 user_message=user_message,
-                system_prompt=system_prompt
+                system_prompt=system_prompt,
+                api_key=api_key
             )
             
             # 提取 SQL（LLM 可能返回带解释的文本）
@@ -110,30 +116,75 @@ class SQLGenerator:
                 "explanation": ""
             }
     
+    @staticmethod
+    def build_table_context(tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        将完整表结构转换为表结构上下文（与向量检索结果格式一致）
+        
+        Args:
+            tables: 表结构列表（TableInfo.to_dict 的结果）
+        
+        Returns:
+            List[Dict]: 表和字段条目（表的描述包含注释、主键和外键；
+                同时保留 comment、primary_keys、foreign_keys，用于渲染紧凑表结构）
+        """
+        context = []
+        for table in tables:
+            description = [table.get("comment") or "无"]
+            if table.get("primary_keys"):
+                description.append(f"主键: {', '.join(table['primary_keys'])}")
+            if table.get("foreign_keys"):
+                description.append("外键: " + ", ".join(
+                    f"{fk['column']} -> {fk['ref_table']}.{fk['ref_column']}" if fk.get("ref_column")
+                    else f"{fk['column']} -> {fk['ref_table']}"
+                    for fk in table["foreign_keys"]
+                ))
+            context.append({
+                "type": "表",
+                "name": table["name"],
+                "description": " | ".join(description),
+                "column_count": len(table.get("columns", [])),
+                "comment": table.get("comment"),
+                "primary_keys": table.get("primary_keys") or [],
+                "foreign_keys": table.get("foreign_keys") or [],
+                "relevance": 1.0
+            })
+            context.extend(
+                {
+                    "type": "字段",
+                    "table": table["name"],
+                    "name": column["name"],
+                    "data_type": column.get("data_type"),
+                    "description": column.get("comment") or "无",
+                    "comment": column.get("comment"),
+                    "relevance": 1.0
+                }
+                for column in table.get("columns", [])
+            )
+        return context
+    
     def _build_system_prompt(self, table_context: List[Dict[str, Any]]) -> str:
         """
         构建 System Prompt
         
         Args:
             table_context: 表结构上下文
-            
+        
         Returns:
             str: System Prompt
         """
-        # 格式化表结构信息
-        context_str = "## 数据库结构信息\n\n"
-        
-        for item in table_context:
-            if item.get("type") == "表":
-                context_str += f"### 表：{item.get('name')}\n"
-                context_str += f"- 描述：{item.get('description', '无')}\n"
-                context_str += f"- 字段数：{item.get('column_count', '未知')}\n"
-                context_str += f"- 相关性：{item.get('relevance', 0)}\n\n"
-            elif item.get("type") == "字段":
-                context_str += f"### 字段：{item.get('table')}.{item.get('name')}\n"
-                context_str += f"- 类型：{item.get('data_type', '未知')}\n"
-                context_str += f"- 描述：{item.get('description', '无')}\n"
-                context_str += f"- 相关性：{item.get('relevance', 0)}\n\n"
+        # 每表一行的紧凑表结构，按相关性在 token 预算内取舍
+        tables, relevance = self._group_context_by_table(table_context)
+        schema = render_schema(tables, settings.prompt_schema_token_budget, relevance)
+        logger.info(
+            f"Schema context: {len(schema.tables)} tables, {len(schema.truncated)} truncated, "
+            f"{len(schema.omitted)} omitted, ~{schema.tokens} tokens"
+        )
+        context_str = (
+            "## 数据库结构信息\n\n"
+            "格式：表名(字段 类型 [PK 主键] [FK→被引用表.字段] ['注释'], ...) -- 表注释\n\n"
+            f"{schema.text}\n"
+        )
         
         # 构建完整 Prompt
         prompt = f"""你是一个专业的 SQL 生成助手。
@@ -168,16 +219,55 @@ WHERE condition = 'value';
 
 现在请根据用户查询生成 SQL。
 """
-        
+
         return prompt
     
+    @staticmethod
+    def _group_context_by_table(
+        table_context: List[Dict[str, Any]]
+    ) -> tuple[List[Dict[str, Any]], Dict[str, float]]:
+        """
+        将表/字段条目按表合并为表结构
+        
+        Args:
+            table_context: 表结构上下文
+        
+        Returns:
+            tuple: (表结构列表, 表名 -> 相关性)，表的相关性取其表条目和字段条目的最大值
+        """
+        tables: Dict[str, Dict[str, Any]] = {}
+        relevance: Dict[str, float] = {}
+        for item in table_context:
+            if item.get("type") == "表":
+                name = item.get("name")
+            elif item.get("type") == "字段":
+                name = item.get("table")
+            else:
+                continue
+            if not name:
+                continue
+            
+            table = tables.setdefault(name, {"name": name, "columns": [], "primary_keys": [], "foreign_keys": []})
+            relevance[name] = max(relevance.get(name, 0.0), item.get("relevance") or 0.0)
+            if item["type"] == "表":
+                table["comment"] = item.get("comment")
+                table["primary_keys"] = item.get("primary_keys") or []
+                table["foreign_keys"] = item.get("foreign_keys") or []
+            else:
+                table["columns"].append({
+                    "name": item.get("name"),
+                    "data_type": item.get("data_type"),
+                    "comment": item.get("comment")
+                })
+        return list(tables.values()), relevance
+    
     def _build_user_message(self, user_query: str) -> str:
         """
         构建用户消息
         
         Args:
             user_query: 用户查询
-            
+        
         Returns:
             str: 用户消息
         """
@@ -189,7 +279,7 @@ WHERE condition = 'value';
         
         Args:
             response: LLM 响应
-            
+        
         Returns:
             tuple: (sql, explanation)
         """
@@ -254,7 +344,7 @@ WHERE condition = 'value';
         Args:
             sql: 生成的 SQL
             table_context: 表结构上下文
-            
+        
         Returns:
             List[Dict]: 引用信息列表
         """
@@ -2,11 +2,11 @@
 SQL 验证器
 验证 SQL 语法正确性和表/字段引用有效性
 """
-from typing import Dict, Any, List, Optional
-import sqlparse
-from sqlparse.sql import IdentifierList, Identifier, Where, Token
-from sqlparse.tokens import Keyword, DML
+from typing import Dict, Any, List, Optional, Sequence, Union
 
+from domain.sql.parsed_sql import ParsedSQL, ParsedStatement
+from domain.sql.symbol_table import SchemaSymbolTable
+from domain.sql.validation_rules import DEFAULT_RULES, LAYERS, RuleReport, ValidationRule
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("sql_validator")
@@ -15,23 +15,67 @@ logger = get_logger("sql_validator")
 class SQLValidator:
     """SQL 验证器"""
     
-    def __init__(self, schema_metadata: Optional[Dict[str, Any]] = None):
+    def __init__(
+        self,
+        schema_metadata: Optional[Union[Dict[str, Any], SchemaSymbolTable]] = None,
+        rules: Optional[Sequence[ValidationRule]] = None
+    ):
         """
         初始化 SQL 验证器
         
         Args:
-            schema_metadata: 数据库 schema 元数据（表和字段信息）
+            schema_metadata: 数据库 schema 元数据（文件的符号表，或 {表名: {"columns": [...]}}）
+            rules: 验证规则（为空时使用 DEFAULT_RULES）
         """
-        self.schema_metadata = schema_metadata or {}
+        if isinstance(schema_metadata, SchemaSymbolTable):
+            self.schema_metadata = schema_metadata
+        else:
+            self.schema_metadata = SchemaSymbolTable.from_metadata(schema_metadata or {})
+        self.rules = {layer: [] for layer in LAYERS}
+        for rule in DEFAULT_RULES if rules is None else rules:
+            self.rules[rule.layer].append(rule)
         logger.debug(f"SQLValidator initialized with {len(self.schema_metadata)} tables")
     
-    def validate_syntax(self, sql: str) -> Dict[str, Any]:
+    def parse(self, sql: Union[str, ParsedSQL]) -> ParsedSQL:
+        """
+        解析 SQL（已解析的直接返回），解析结果供各层验证和格式化共享
+        
+        Args:
+            sql: SQL 语句或解析结果
+        
+        Returns:
+            ParsedSQL: 解析结果
+        """
+        return sql if isinstance(sql, ParsedSQL) else ParsedSQL(sql)
+    
+    def _run_rules(self, layer: str, parsed: ParsedSQL) -> Dict[str, Any]:
+        """
+        对每条语句依次执行一个验证层的规则
+        
+        Args:
+            layer: 验证层（syntax / references / logic）
+            parsed: 解析结果
+        
+        Returns:
+            Dict: 验证结果（valid、errors、warnings）
+        """
+        report = RuleReport(self.schema_metadata)
+        for statement in parsed.statements:
+            for rule in self.rules[layer]:
+                rule.visit(statement, report)
+        return {
+            "valid": len(report.errors) == 0,
+            "errors": report.errors,
+            "warnings": report.warnings
+        }
+    
+    def validate_syntax(self, sql: Union[str, ParsedSQL]) -> Dict[str, Any]:
         """
         验证 SQL 语法
         
         Args:
-            sql: SQL 语句
-            
+            sql: SQL 语句（或 parse 的解析结果）
+        
         Returns:
             Dict: 验证结果
                 - valid: bool - 是否有效
@@ -40,52 +84,19 @@ class SQLValidator:
         """
         logger.info(f"Validating SQL syntax...")
         
-        errors = []
-        warnings = []
-        
         try:
-            # 使用 sqlparse 解析 SQL
-            parsed = sqlparse.parse(sql)
-            
-            if not parsed:
-                errors.append("SQL 为空或无法解析")
-                return {"valid": False, "errors": errors, "warnings": warnings}
-            
-            # 基础语法检查
-            for statement in parsed:
-                # 检查是否是有效的 SQL 语句
-                if not statement.get_type():
-                    errors.append("无效的 SQL 语句类型")
-                
-                # 检查是否有明显的语法错误
-                tokens = list(statement.flatten())
-                
-                # 检查是否有未闭合的括号
-                paren_count = sum(1 if str(t) == '(' else -1 if str(t) == ')' else 0 for t in tokens)
-                if paren_count != 0:
-                    errors.append(f"括号不匹配（差值：{paren_count}）")
-                
-                # 检查是否有未闭合的引号
-                quote_tokens = [str(t) for t in tokens if str(t) in ["'", '"', '`']]
-                if len(quote_tokens) % 2 != 0:
-                    errors.append("引号不匹配")
+            parsed = self.parse(sql)
             
-            # 格式化检查（美化后是否改变语义）
-            formatted = sqlparse.format(sql, reindent=True, keyword_case='upper')
-            if not formatted:
-                warnings.append("SQL 格式化失败")
+            if not parsed.statements:
+                return {"valid": False, "errors": ["SQL 为空或无法解析"], "warnings": []}
             
-            is_valid = len(errors) == 0
+            result = self._run_rules("syntax", parsed)
             
-            logger.info(f"Syntax validation result: {'PASS' if is_valid else 'FAIL'}")
-            if errors:
-                logger.warning(f"Syntax errors: {errors}")
+            logger.info(f"Syntax validation result: {'PASS' if result['valid'] else 'FAIL'}")
+            if result["errors"]:
+                logger.warning(f"Syntax errors: {result['errors']}")
             
-            return {
-                "valid": is_valid,
-                "errors": errors,
-                "warnings": warnings
-            }
+            return result
         
         except Exception as e:
             logger.error(f"Syntax validation error: {e}", exc_info=True)
@@ -95,13 +106,13 @@ class SQLValidator:
                 "warnings": []
             }
     
-    def validate_references(self, sql: str) -> Dict[str, Any]:
+    def validate_references(self, sql: Union[str, ParsedSQL]) -> Dict[str, Any]:
         """
-        验证 SQL 中的表和字段引用
+        验证 SQL 中的表和字段引用（表名、别名.字段、不带表名的字段）
         
         Args:
-            sql: SQL 语句
-            
+            sql: SQL 语句（或 parse 的解析结果）
+        
         Returns:
             Dict: 验证结果
                 - valid: bool - 是否有效
@@ -118,38 +129,15 @@ class SQLValidator:
                 "warnings": ["缺少 schema 元数据，无法验证引用"]
             }
         
-        errors = []
-        warnings = []
-        
         try:
-            # 解析 SQL
-            parsed = sqlparse.parse(sql)
+            # 每条语句的引用只收集一次，每个引用在符号表中查找一次
+            result = self._run_rules("references", self.parse(sql))
             
-            for statement in parsed:
-                # 提取表名
-                table_names = self._extract_table_names(statement)
-                
-                # 验证表名是否存在
-                for table_name in table_names:
-                    if table_name not in self.schema_metadata:
-                        errors.append(f"表不存在：{table_name}")
-                    else:
-                        logger.debug(f"Table reference valid: {table_name}")
-                
-                # TODO: 提取字段名并验证（更复杂，需要解析 SELECT、WHERE 子句）
-                # 当前版本仅验证表名
+            logger.info(f"Reference validation result: {'PASS' if result['valid'] else 'FAIL'}")
+            if result["errors"]:
+                logger.warning(f"Reference errors: {result['errors']}")
             
-            is_valid = len(errors) == 0
-            
-            logger.info(f"Reference validation result: {'PASS' if is_valid else 'FAIL'}")
-            if errors:
-                logger.warning(f"Reference errors: {errors}")
-            
-            return {
-                "valid": is_valid,
-                "errors": errors,
-                "warnings": warnings
-            }
+            return result
         
         except Exception as e:
             logger.error(f"Reference validation error: {e}", exc_info=True)
@@ -159,13 +147,13 @@ class SQLValidator:
                 "warnings": []
             }
     
-    def validate_logic(self, sql: str) -> Dict[str, Any]:
+    def validate_logic(self, sql: Union[str, ParsedSQL]) -> Dict[str, Any]:
         """
-        验证 SQL 逻辑（JOIN 条件、类型匹配等）
+        验证 SQL 逻辑（JOIN 条件、SELECT *、DELETE/UPDATE 缺少 WHERE 等）
         
         Args:
-            sql: SQL 语句
-            
+            sql: SQL 语句（或 parse 的解析结果）
+        
         Returns:
             Dict: 验证结果
                 - valid: bool - 是否有效
@@ -174,38 +162,14 @@ class SQLValidator:
         """
         logger.info("Validating SQL logic...")
         
-        errors = []
-        warnings = []
-        
         try:
-            parsed = sqlparse.parse(sql)
-            
-            for statement in parsed:
-                sql_upper = str(statement).upper()
-                
-                # 检查 JOIN 但没有 ON 条件
-                if 'JOIN' in sql_upper and 'ON' not in sql_upper:
-                    warnings.append("JOIN 语句缺少 ON 条件，可能导致笛卡尔积")
-                
-                # 检查 SELECT * 的使用（不推荐）
-                if 'SELECT *' in sql_upper or 'SELECT*' in sql_upper:
-                    warnings.append("使用 SELECT * 可能影响性能，建议明确列出字段")
-                
-                # 检查缺少 WHERE 条件的 DELETE/UPDATE
-                if ('DELETE' in sql_upper or 'UPDATE' in sql_upper) and 'WHERE' not in sql_upper:
-                    errors.append("DELETE/UPDATE 语句缺少 WHERE 条件，可能影响所有数据")
+            result = self._run_rules("logic", self.parse(sql))
             
-            is_valid = len(errors) == 0
+            logger.info(f"Logic validation result: {'PASS' if result['valid'] else 'FAIL'}")
+            if result["warnings"]:
+                logger.info(f"Logic warnings: {result['warnings']}")
             
-            logger.info(f"Logic validation result: {'PASS' if is_valid else 'FAIL'}")
-            if warnings:
-                logger.info(f"Logic warnings: {warnings}")
-            
-            return {
-                "valid": is_valid,
-                "errors": errors,
-                "warnings": warnings
-            }
+            return result
         
         except Exception as e:
             logger.error(f"Logic validation error: {e}", exc_info=True)
@@ -219,9 +183,11 @@ class SQLValidator:
         """
         完整验证 SQL（语法 + 引用 + 逻辑）
         
+        SQL 只解析一次，三层验证共享解析结果，最后在同一棵语法树上格式化
+        
         Args:
             sql: SQL 语句
-            
+        
         Returns:
             Dict: 验证结果
                 - valid: bool - 是否有效
@@ -232,22 +198,30 @@ class SQLValidator:
         """
         logger.info("Starting multi-layer SQL validation...")
         
+        try:
+            parsed = self.parse(sql)
+        except Exception as e:
+            logger.error(f"SQL parse error: {e}", exc_info=True)
+            failed = {"valid": False, "errors": [f"验证过程出错：{str(e)}"], "warnings": []}
+            return {
+                "valid": False,
+                "syntax": failed,
+                "references": dict(failed),
+                "logic": {"valid": True, "errors": [], "warnings": []},
+                "formatted_sql": sql
+            }
+        
         # 第一层：语法验证
-        syntax_result = self.validate_syntax(sql)
+        syntax_result = self.validate_syntax(parsed)
         
         # 第二层：引用验证
-        references_result = self.validate_references(sql)
+        references_result = self.validate_references(parsed)
         
         # 第三层：逻辑验证
-        logic_result = self.validate_logic(sql)
+        logic_result = self.validate_logic(parsed)
         
-        # 格式化 SQL
-        formatted_sql = sqlparse.format(
-            sql,
-            reindent=True,
-            keyword_case='upper',
-            identifier_case='lower'
-        )
+        # 格式化 SQL（会改写语法树，放在所有验证之后）
+        formatted_sql = parsed.format()
         
         # 综合结果（只有语法和引用错误才判定为无效，逻辑问题只警告）
         is_valid = syntax_result["valid"] and references_result["valid"]
@@ -266,70 +240,32 @@ class SQLValidator:
     
     def _extract_table_names(self, statement) -> List[str]:
         """
-        从 SQL 语句中提取表名
+        从 SQL 语句中提取表名（FROM/JOIN 引用的表，不含 CTE 和子查询别名）
         
         Args:
             statement: sqlparse 解析的语句对象
-            
+        
         Returns:
             List[str]: 表名列表
         """
-        table_names = []
-        
-        # 将 SQL 转为字符串进行简单解析
-        sql_str = str(statement).upper()
-        
-        # 简单方法：查找 FROM 和 JOIN 后的标识符
-        import re
-        
-        # 匹配 FROM table_name 或 JOIN table_name
-        patterns = [
-            r'FROM\s+([a-zA-Z_][a-zA-Z0-9_]*)',  # FROM table
-            r'JOIN\s+([a-zA-Z_][a-zA-Z0-9_]*)',  # JOIN table
-        ]
-        
-        original_sql = str(statement)
-        for pattern in patterns:
-            matches = re.finditer(pattern, sql_str)
-            for match in matches:
-                table_name = original_sql[match.start(1):match.end(1)].strip().lower()
-                if table_name and table_name not in table_names:
-                    table_names.append(table_name)
-        
-        # 处理逗号分隔的多表（FROM table1, table2）
-        # 匹配 FROM 之后到 WHERE/GROUP/ORDER/LIMIT/JOIN/分号之前的内容
-        from_match = re.search(r'FROM\s+(.*?)(?:WHERE|GROUP|ORDER|LIMIT|JOIN|;|$)', sql_str, re.IGNORECASE | re.DOTALL)
-        if from_match:
-            from_clause_start = from_match.start(1)
-            from_clause_end = from_match.end(1)
-            from_clause = original_sql[from_clause_start:from_clause_end].strip()
-            
-            # 分割逗号，提取每个表名
-            parts = [p.strip() for p in from_clause.split(',')]
-            for part in parts:
-                # 移除空白
-                part = part.strip().lower()
-                # 移除分号
-                part = part.rstrip(';')
-                # 提取表名（移除别名，如 "users u" -> "users"）
-                name = part.split()[0] if ' ' in part else part
-                name = name.strip()
-                # 过滤无效名称
-                if name and name not in table_names and len(name) > 0:
-                    table_names.append(name)
-        
+        refs = ParsedStatement(statement).references
+        table_names = [name for name in dict.fromkeys(refs.tables) if name not in refs.derived]
         logger.debug(f"Extracted table names: {table_names}")
-        return list(set(table_names))  # 去重
+        return table_names
 
 
-def get_sql_validator(schema_metadata: Optional[Dict[str, Any]] = None) -> SQLValidator:
+def get_sql_validator(
+    schema_metadata: Optional[Union[Dict[str, Any], SchemaSymbolTable]] = None,
+    rules: Optional[Sequence[ValidationRule]] = None
+) -> SQLValidator:
     """
     获取 SQL 验证器实例
     
     Args:
         schema_metadata: 数据库 schema 元数据
-        
+        rules: 验证规则（为空时使用默认规则）
+    
     Returns:
         SQLValidator: 验证器实例
     """
-    return SQLValidator(schema_metadata)
+    return SQLValidator(schema_metadata, rules)
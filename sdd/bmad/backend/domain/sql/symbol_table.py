@@ -0,0 +1,194 @@
+"""
+Schema 符号表模块
+按文件预先构建 表 -> 字段 -> 类型 的哈希表，SQL 引用验证时每个表名/字段名只需一次查找
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from config import settings
+from infrastructure.logging.logger import get_logger
+
+logger = get_logger("symbol_table")
+
+
+class SchemaSymbolTable:
+    """
+    单个文件的 schema 符号表
+    
+    核心设计：
+    1. 表名、字段名统一小写，查找不区分大小写
+    2. 另建 字段 -> 所在表 的反向索引，用于验证不带表名/别名的字段
+    3. 构建后只读，可在请求间共享
+    """
+    
+    __slots__ = ("_columns", "_column_tables")
+    
+    def __init__(self, columns: Mapping[str, Mapping[str, Optional[str]]]):
+        """
+        初始化符号表
+        
+        Args:
+            columns: 表名 -> {字段名 -> 类型}（类型未知时为 None）
+        """
+        self._columns: Dict[str, Dict[str, Optional[str]]] = {}
+        self._column_tables: Dict[str, List[str]] = {}
+        for table_name, table_columns in columns.items():
+            table_key = table_name.lower()
+            fields = self._columns.setdefault(table_key, {})
+            for column_name, data_type in table_columns.items():
+                column_key = column_name.lower()
+                if column_key not in fields:
+                    self._column_tables.setdefault(column_key, []).append(table_key)
+                fields[column_key] = data_type
+    
+    @classmethod
+    def from_tables(cls, tables: Iterable[Dict[str, Any]]) -> "SchemaSymbolTable":
+        """
+        从表结构列表构建（TableInfo.to_dict 的格式）
+        
+        Args:
+            tables: 表结构列表
+        
+        Returns:
+            SchemaSymbolTable: 符号表
+        """
+        return cls({
+            table["name"]: {column["name"]: column.get("data_type") for column in table.get("columns") or []}
+            for table in tables
+        })
+    
+    @classmethod
+    def from_metadata(cls, schema_metadata: Mapping[str, Any]) -> "SchemaSymbolTable":
+        """
+        从验证器的 schema 元数据构建（{表名: {"columns": [字段名或字段字典, ...]}}）
+        
+        Args:
+            schema_metadata: schema 元数据
+        
+        Returns:
+            SchemaSymbolTable: 符号表
+        """
+        columns = {}
+        for table_name, table in schema_metadata.items():
+            fields = {}
+            for column in (table or {}).get("columns") or []:
+                if isinstance(column, dict):
+                    fields[column["name"]] = column.get("data_type")
+                else:
+                    fields[column] = None
+            columns[table_name] = fields
+        return cls(columns)
+    
+    def __len__(self) -> int:
+        return len(self._columns)
+    
+    def __contains__(self, table_name: str) -> bool:
+        return table_name.lower() in self._columns
+    
+    @property
+    def table_names(self) -> List[str]:
+        """所有表名（小写）"""
+        return list(self._columns)
+    
+    def has_column(self, table_name: str, column_name: str) -> bool:
+        """表中是否有该字段"""
+        return column_name.lower() in self._columns.get(table_name.lower(), {})
+    
+    def column_type(self, table_name: str, column_name: str) -> Optional[str]:
+        """字段类型（表或字段不存在、类型未知时返回 None）"""
+        return self._columns.get(table_name.lower(), {}).get(column_name.lower())
+    
+    def tables_with_column(self, column_name: str) -> List[str]:
+        """包含该字段的表（小写表名）"""
+        return self._column_tables.get(column_name.lower(), [])
+
+
+class SymbolTableRegistry:
+    """
+    按文件缓存的符号表（LRU）
+    
+    文件解析完成时直接放入；缓存中没有时（重启、被淘汰）从文件仓储读取表结构构建；
+    文件重新处理或删除时失效
+    """
+    
+    def __init__(self, loader: Callable[[str], Optional[Dict[str, Any]]], max_size: int = 32):
+        """
+        初始化符号表缓存
+        
+        Args:
+            loader: 按 file_id 读取文件记录（含 status 和 tables）的函数
+            max_size: 缓存的文件数上限
+        """
+        self._loader = loader
+        self.max_size = max(1, max_size)
+        self._symbols: "OrderedDict[str, SchemaSymbolTable]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, file_id: str) -> Optional[SchemaSymbolTable]:
+        """
+        获取文件的符号表
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            SchemaSymbolTable: 符号表，文件不存在或尚未就绪时返回 None
+        """
+        with self._lock:
+            symbols = self._symbols.get(file_id)
+            if symbols is not None:
+                self._symbols.move_to_end(file_id)
+                return symbols
+        
+        file_data = self._loader(file_id)
+        if not file_data or file_data.get("status") != "ready":
+            return None
+        symbols = SchemaSymbolTable.from_tables(file_data.get("tables") or [])
+        self.put(file_id, symbols)
+        return symbols
+    
+    def put(self, file_id: str, symbols: SchemaSymbolTable) -> None:
+        """
+        放入文件的符号表（文件解析完成时调用）
+        
+        Args:
+            file_id: 文件 ID
+            symbols: 符号表
+        """
+        logger.debug(f"Symbol table cached for {file_id}: {len(symbols)} tables")
+        with self._lock:
+            self._symbols[file_id] = symbols
+            self._symbols.move_to_end(file_id)
+            while len(self._symbols) > self.max_size:
+                self._symbols.popitem(last=False)
+    
+    def invalidate(self, file_id: str) -> None:
+        """
+        使文件的符号表失效
+        
+        Args:
+            file_id: 文件 ID
+        """
+        with self._lock:
+            self._symbols.pop(file_id, None)
+
+
+# 全局单例
+_symbol_table_registry = None
+
+
+def get_symbol_table_registry() -> SymbolTableRegistry:
+    """
+    获取符号表缓存单例
+    
+    Returns:
+        SymbolTableRegistry: 符号表缓存实例
+    """
+    global _symbol_table_registry
+    if _symbol_table_registry is None:
+        from infrastructure.repository.sqlite_file_repository import get_file_repository
+        _symbol_table_registry = SymbolTableRegistry(
+            get_file_repository().get, max_size=settings.symbol_table_cache_size
+        )
+    return _symbol_table_registry
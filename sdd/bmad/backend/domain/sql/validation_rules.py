@@ -0,0 +1,204 @@
+"""
+SQL 验证规则模块
+每条规则是一个访问者，访问解析好的语句（共享的语法树、token 流和引用集合），把错误或警告写入所属验证层的报告
+新增规则只需继承 ValidationRule 并加入验证器的规则列表
+"""
+from typing import List, Optional
+
+from sqlparse.tokens import DML, Punctuation, Wildcard
+
+from domain.sql.parsed_sql import TABLE_CLAUSE_END, ParsedStatement, SQLReferences
+from domain.sql.symbol_table import SchemaSymbolTable
+
+# 验证层（按执行顺序）
+LAYERS = ("syntax", "references", "logic")
+
+
+class RuleReport:
+    """
+    单个验证层的报告
+    
+    symbols 为文件的 schema 符号表（引用验证使用）；规则把问题追加到 errors / warnings
+    """
+    
+    __slots__ = ("symbols", "errors", "warnings")
+    
+    def __init__(self, symbols: Optional[SchemaSymbolTable] = None):
+        self.symbols = symbols
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+
+
+class ValidationRule:
+    """验证规则基类（layer 为所属验证层）"""
+    
+    layer = "syntax"
+    
+    def visit(self, statement: ParsedStatement, report: RuleReport) -> None:
+        """
+        访问一条语句
+        
+        Args:
+            statement: 解析好的语句
+            report: 所属验证层的报告
+        """
+        raise NotImplementedError
+
+
+# ==================== 语法层 ====================
+
+class StatementTypeRule(ValidationRule):
+    """语句类型必须可识别"""
+    
+    def visit(self, statement: ParsedStatement, report: RuleReport) -> None:
+        if not statement.statement.get_type():
+            report.errors.append("无效的 SQL 语句类型")
+
+
+class BalancedParenthesesRule(ValidationRule):
+    """括号必须成对"""
+    
+    def visit(self, statement: ParsedStatement, report: RuleReport) -> None:
+        paren_count = 0
+        for token in statement.tokens:
+            if token.value == "(":
+                paren_count += 1
+            elif token.value == ")":
+                paren_count -= 1
+        if paren_count != 0:
+            report.errors.append(f"括号不匹配（差值：{paren_count}）")
+
+
+class BalancedQuotesRule(ValidationRule):
+    """引号必须闭合（未闭合的引号被词法分析为单独的引号 token）"""
+    
+    def visit(self, statement: ParsedStatement, report: RuleReport) -> None:
+        quotes = sum(1 for token in statement.tokens if token.value in ("'", '"', "`"))
+        if quotes % 2 != 0:
+            report.errors.append("引号不匹配")
+
+
+class MissingTableRule(ValidationRule):
+    """FROM/JOIN/INTO 之后必须有表名（如 SELECT id FROM WHERE）"""
+    
+    def visit(self, statement: ParsedStatement, report: RuleReport) -> None:
+        tokens = statement.tokens
+        for i, token in enumerate(tokens):
+            keyword = token.normalized if token.is_keyword else None
+            if keyword not in ("FROM", "INTO") and not (keyword or "").endswith("JOIN"):
+                continue
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            if (following is None or (following.ttype is Punctuation and following.value in (";", ")"))
+                    or (following.is_keyword and following.normalized in TABLE_CLAUSE_END)):
+                report.errors.append(f"{keyword} 后缺少表名")
+
+
+# ==================== 引用层 ====================
+
+def check_references(refs: SQLReferences, symbols: SchemaSymbolTable) -> List[str]:
+    """
+    在符号表中查找收集到的引用
+    
+    Args:
+        refs: 引用集合
+        symbols: schema 符号表
+    
+    Returns:
+        List[str]: 错误列表（表不存在、未知别名、字段不存在）
+    """
+    errors = []
+    
+    tables = []
+    for table_name in dict.fromkeys(refs.tables):
+        if table_name in refs.derived:
+            continue
+        if table_name in symbols:
+            tables.append(table_name)
+        else:
+            errors.append(f"表不存在：{table_name}")
+    
+    for qualifier, column in dict.fromkeys(refs.qualified):
+        if qualifier in refs.derived:
+            continue
+        table_name = refs.aliases.get(qualifier, qualifier)
+        if table_name in refs.derived or (table_name not in symbols and table_name in refs.tables):
+            continue  # 子查询别名，或已报告不存在的表
+        if table_name not in symbols:
+            errors.append(f"未知的表或别名：{qualifier}（{qualifier}.{column}）")
+        elif column != "*" and not symbols.has_column(table_name, column):
+            errors.append(f"字段不存在：{table_name}.{column}")
+    
+    # 不带表名的字段：有子查询/CTE 时字段可能来自子查询，不做验证
+    if tables and not refs.derived:
+        scope = set(tables)
+        for column in dict.fromkeys(refs.columns):
+            if column in refs.output_aliases or column in refs.aliases or column in scope:
+                continue
+            if not scope.intersection(symbols.tables_with_column(column)):
+                errors.append(f"字段不存在：{column}")
+    
+    return errors
+
+
+class SchemaReferenceRule(ValidationRule):
+    """表名、别名.字段、不带表名的字段必须存在于 schema 中"""
+    
+    layer = "references"
+    
+    def visit(self, statement: ParsedStatement, report: RuleReport) -> None:
+        report.errors.extend(check_references(statement.references, report.symbols))
+
+
+# ==================== 逻辑层 ====================
+
+class JoinConditionRule(ValidationRule):
+    """JOIN 缺少 ON/USING 条件时警告（CROSS JOIN、NATURAL JOIN 除外）"""
+    
+    layer = "logic"
+    
+    def visit(self, statement: ParsedStatement, report: RuleReport) -> None:
+        keywords = statement.keywords()
+        joins = [
+            keyword for keyword in keywords
+            if keyword.endswith("JOIN") and not keyword.startswith(("CROSS", "NATURAL"))
+        ]
+        if joins and "ON" not in keywords and "USING" not in keywords:
+            report.warnings.append("JOIN 语句缺少 ON 条件，可能导致笛卡尔积")
+
+
+class SelectStarRule(ValidationRule):
+    """SELECT * 时警告"""
+    
+    layer = "logic"
+    
+    def visit(self, statement: ParsedStatement, report: RuleReport) -> None:
+        tokens = statement.tokens
+        for i, token in enumerate(tokens[:-1]):
+            if token.ttype is DML and token.normalized == "SELECT":
+                following = tokens[i + 2] if tokens[i + 1].normalized == "DISTINCT" and i + 2 < len(tokens) else tokens[i + 1]
+                if following.ttype is Wildcard:
+                    report.warnings.append("使用 SELECT * 可能影响性能，建议明确列出字段")
+                    return
+
+
+class WhereRequiredRule(ValidationRule):
+    """DELETE/UPDATE 必须带 WHERE 条件"""
+    
+    layer = "logic"
+    
+    def visit(self, statement: ParsedStatement, report: RuleReport) -> None:
+        if statement.statement.get_type() in ("DELETE", "UPDATE") and "WHERE" not in statement.keywords():
+            report.errors.append("DELETE/UPDATE 语句缺少 WHERE 条件，可能影响所有数据")
+
+
+# 默认规则（同一层内按顺序执行）
+DEFAULT_RULES = (
+    StatementTypeRule(),
+    BalancedParenthesesRule(),
+    BalancedQuotesRule(),
+    MissingTableRule(),
+    SchemaReferenceRule(),
+    JoinConditionRule(),
+    SelectStarRule(),
+    WhereRequiredRule(),
+)
@@ -0,0 +1,151 @@
+"""
+Embedding 缓存模块
+按 (embedding 模型, 文档文本) 的内容哈希缓存向量，存储在 SQLite 中，
+跨文件、跨重启复用（如 dev/staging/prod 导出的几乎相同的 DDL）
+"""
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from config import settings
+from infrastructure.logging.logger import get_logger
+
+logger = get_logger("embedding_cache")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    vector BLOB NOT NULL
+);
+"""
+
+# SQLite 单条语句的参数数量上限内，每批查询的键数量
+_LOOKUP_BATCH_SIZE = 500
+
+
+def embedding_cache_key(model_id: str, document: str) -> str:
+    """
+    计算缓存键：sha256(模型标识 + 文档文本)
+    
+    Args:
+        model_id: embedding 模型标识
+        document: 文档文本
+    
+    Returns:
+        str: 缓存键
+    """
+    return hashlib.sha256(f"{model_id}\0{document}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    基于 SQLite 的 embedding 缓存（内容寻址，只增不改）
+    
+    向量以 float32 字节存储；数据库文件可被多个 worker 共享
+    """
+    
+    def __init__(self, db_path: str, busy_timeout: float = 5.0):
+        """
+        初始化缓存（自动建表）
+        
+        Args:
+            db_path: 数据库文件路径
+            busy_timeout: 等待其他进程释放写锁的时间（秒）
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._open()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        
+        logger.info(f"Embedding cache initialized: {db_path}")
+    
+    def _open(self) -> sqlite3.Connection:
+        """创建数据库连接"""
+        return sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """获取当前线程的连接并在事务中执行（异常时回滚）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        with conn:
+            yield conn
+    
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        批量查询缓存
+        
+        Args:
+            keys: 缓存键列表
+        
+        Returns:
+            Dict[str, List[float]]: 命中的缓存键 -> 向量
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._transaction() as conn:
+            for start in range(0, len(unique_keys), _LOOKUP_BATCH_SIZE):
+                batch = unique_keys[start:start + _LOOKUP_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+    
+    def put_many(self, items: Dict[str, Sequence[float]]) -> None:
+        """
+        批量写入缓存（已存在的键保持不变）
+        
+        Args:
+            items: 缓存键 -> 向量
+        """
+        if not items:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in items.items()
+                ]
+            )
+    
+    def count(self) -> int:
+        """
+        获取缓存条目数
+        
+        Returns:
+            int: 条目数
+        """
+        with self._transaction() as conn:
+            return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+# 全局单例
+_embedding_cache_instance: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    获取 embedding 缓存单例
+    
+    Returns:
+        EmbeddingCache: 缓存实例，EMBEDDING_CACHE_PATH 为空时返回 None（不启用缓存）
+    """
+    global _embedding_cache_instance
+    if _embedding_cache_instance is None and settings.embedding_cache_path:
+        _embedding_cache_instance = EmbeddingCache(settings.embedding_cache_path)
+    return _embedding_cache_instance
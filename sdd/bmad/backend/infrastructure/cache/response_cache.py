@@ -0,0 +1,283 @@
+"""
+SQL 响应缓存模块
+在 Agent 之前拦截重复问题：先按规范化问题精确匹配，再按问题向量相似度匹配
+"""
+import copy
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+from infrastructure.vector.vector_service import get_vector_service
+from infrastructure.logging.logger import get_logger
+
+logger = get_logger("response_cache")
+
+# 问题末尾可忽略的标点
+_TRAILING_PUNCTUATION = "。.？?！!；;，,、 "
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# 决定查询条件的字面量：数字（含中文数字）、引号内的值、否定词。
+# 语义相近但这些字面量不同的问题（前10 / 前20、已支付 / 未支付）对应不同的 SQL，不能共用缓存
+_LITERAL_PATTERN = re.compile(
+    r"[\"'“‘「『《]([^\"'”’」』》]*)[\"'”’」』》]"
+    r"|\d+(?:\.\d+)?"
+    r"|[零一二两三四五六七八九十百千万亿]+"
+    r"|[未不没无非否]"
+    r"|\b(?:not|no|without|never|exclud\w*)\b"
+)
+
+# 缓存键：(file_id, schema 指纹, 规范化问题)
+CacheKey = Tuple[str, str, str]
+
+
+@dataclass
+class _CacheEntry:
+    """缓存条目"""
+    response: Dict[str, Any]
+    created_at: float
+    embedding: Optional[np.ndarray] = None
+    literals: Tuple[str, ...] = ()
+
+
+def normalize_question(question: str) -> str:
+    """
+    规范化用户问题（全角转半角、小写、合并空白、去除末尾标点）
+    
+    Args:
+        question: 用户问题
+    
+    Returns:
+        str: 规范化后的问题
+    """
+    normalized = unicodedata.normalize("NFKC", question).lower()
+    normalized = _WHITESPACE_PATTERN.sub(" ", normalized).strip()
+    return normalized.rstrip(_TRAILING_PUNCTUATION)
+
+
+def question_literals(normalized: str) -> Tuple[str, ...]:
+    """
+    提取规范化问题中的字面量（数字、引号内的值、否定词），语义匹配要求两者完全一致
+    
+    Args:
+        normalized: 规范化后的问题
+    
+    Returns:
+        Tuple[str, ...]: 按出现顺序排列的字面量
+    """
+    return tuple(
+        match.group(1) if match.group(1) is not None else match.group(0)
+        for match in _LITERAL_PATTERN.finditer(normalized)
+    )
+
+
+class ResponseCache:
+    """
+    SQL 响应缓存（LRU + TTL）
+    
+    核心设计：
+    1. 精确匹配：(file_id, schema 指纹, 规范化问题)
+    2. 语义匹配：同一 file_id + 指纹下，字面量（数字、引号内的值、否定词）完全一致，且问题向量余弦相似度 >= 阈值
+    3. 文件重新处理或删除时按 file_id 失效；schema 变化时指纹变化，旧条目自然不可达
+    """
+    
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        similarity_threshold: float,
+        embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None
+    ):
+        """
+        初始化响应缓存
+        
+        Args:
+            max_size: 最大缓存条目数
+            ttl_seconds: 条目存活时间（秒）
+            similarity_threshold: 语义匹配阈值（<= 0 表示关闭语义匹配）
+            embed_fn: 文本向量化函数（为空时仅做精确匹配）
+        """
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        
+        self._entries: "OrderedDict[CacheKey, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # 指标
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._evictions = 0
+    
+    @property
+    def semantic_enabled(self) -> bool:
+        """是否启用语义匹配"""
+        return self.embed_fn is not None and self.similarity_threshold > 0
+    
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """计算归一化的问题向量（模型不可用时返回 None）"""
+        if not self.semantic_enabled:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn([text])[0], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Question embedding failed, semantic cache skipped: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+    
+    def _is_expired(self, entry: _CacheEntry, now: float) -> bool:
+        """检查条目是否过期"""
+        return now - entry.created_at >= self.ttl_seconds
+    
+    def get(self, file_id: str, schema_version: str, question: str) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存
+        
+        Args:
+            file_id: 文件 ID
+            schema_version: schema 指纹
+            question: 用户问题
+        
+        Returns:
+            Dict: 缓存的响应副本，未命中返回 None
+        """
+        normalized = normalize_question(question)
+        key = (file_id, schema_version, normalized)
+        now = time.monotonic()
+        
+        # 第一级：精确匹配
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._is_expired(entry, now):
+                    self._entries.move_to_end(key)
+                    self._exact_hits += 1
+                    logger.info(f"Response cache exact hit: {normalized[:50]}")
+                    return copy.deepcopy(entry.response)
+                del self._entries[key]
+                self._evictions += 1
+            
+            literals = question_literals(normalized)
+            candidates = [
+                (k, e) for k, e in self._entries.items()
+                if k[0] == file_id and k[1] == schema_version and e.embedding is not None
+                and e.literals == literals and not self._is_expired(e, now)
+            ]
+        
+        # 第二级：语义匹配（在锁外计算向量）
+        if candidates:
+            query_vector = self._embed(normalized)
+            if query_vector is not None:
+                matrix = np.stack([e.embedding for _, e in candidates])
+                scores = matrix @ query_vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    best_key, best_entry = candidates[best]
+                    with self._lock:
+                        if best_key in self._entries:
+                            self._entries.move_to_end(best_key)
+                        self._semantic_hits += 1
+                    logger.info(
+                        f"Response cache semantic hit: {normalized[:50]} ~ {best_key[2][:50]} "
+                        f"(similarity={scores[best]:.3f})"
+                    )
+                    return copy.deepcopy(best_entry.response)
+        
+        with self._lock:
+            self._misses += 1
+        return None
+    
+    def put(self, file_id: str, schema_version: str, question: str, response: Dict[str, Any]) -> None:
+        """
+        写入缓存
+        
+        Args:
+            file_id: 文件 ID
+            schema_version: schema 指纹
+            question: 用户问题
+            response: Agent 响应
+        """
+        normalized = normalize_question(question)
+        key = (file_id, schema_version, normalized)
+        embedding = self._embed(normalized)
+        
+        with self._lock:
+            self._entries[key] = _CacheEntry(
+                response=copy.deepcopy(response),
+                created_at=time.monotonic(),
+                embedding=embedding,
+                literals=question_literals(normalized)
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+    
+    def invalidate_file(self, file_id: str) -> int:
+        """
+        使指定文件的所有缓存条目失效
+        
+        Args:
+            file_id: 文件 ID
+        
+        Returns:
+            int: 失效的条目数
+        """
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == file_id]
+            for k in keys:
+                del self._entries[k]
+        if keys:
+            logger.info(f"Response cache invalidated for file_id={file_id}: {len(keys)} entries")
+        return len(keys)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+        
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        with self._lock:
+            hits = self._exact_hits + self._semantic_hits
+            total = hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "exact_hits": self._exact_hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "evictions": self._evictions
+            }
+
+
+# 全局单例
+_response_cache_instance: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    获取响应缓存单例（语义匹配复用向量库的 embedding 模型）
+    
+    Returns:
+        ResponseCache: 响应缓存实例
+    """
+    global _response_cache_instance
+    if _response_cache_instance is None:
+        _response_cache_instance = ResponseCache(
+            max_size=settings.response_cache_size,
+            ttl_seconds=settings.response_cache_ttl_seconds,
+            similarity_threshold=settings.response_cache_similarity_threshold,
+            embed_fn=get_vector_service().embed_texts
+        )
+    return _response_cache_instance
@@ -0,0 +1,231 @@
+"""
+DDL 摄取执行器
+将 DDL 解析（CPU 密集）和向量化（Embedding 计算）移出事件循环，
+并通过并发上限 + 有界队列提供背压
+"""
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from config import settings
+from infrastructure.logging.logger import get_logger
+
+logger = get_logger("ingestion_executor")
+
+T = TypeVar("T")
+
+
+class IngestionQueueFullError(Exception):
+    """摄取队列已满（用于触发上传背压）"""
+
+
+class IngestionExecutor:
+    """
+    DDL 摄取执行器
+    
+    核心设计：
+    1. 解析使用进程池（绕过 GIL，不阻塞 Web 进程），单个文件的语句可分批并行解析
+    2. 向量化使用线程池（Embedding 计算会释放 GIL）
+    3. 信号量限制同时处理的文件数，有界队列限制排队数
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: int,
+        queue_size: int,
+        parse_workers: int,
+        embed_workers: int
+    ):
+        """
+        初始化执行器
+        
+        Args:
+            max_concurrency: 同时处理的文件数上限
+            queue_size: 已接收但未完成的文件数上限（含正在处理的）
+            parse_workers: 解析进程数（0 表示在线程池中解析）
+            embed_workers: 向量化线程数
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_size = max(self.max_concurrency, queue_size)
+        self.parse_workers = parse_workers
+        self.embed_workers = max(1, embed_workers)
+        
+        # 线程池/进程池延迟创建，避免导入时即 fork 子进程
+        self._parse_pool: Optional[Executor] = None
+        self._embed_pool: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        
+        self._pending = 0
+        self._running = 0
+        
+        logger.info(
+            f"Ingestion executor configured: concurrency={self.max_concurrency}, "
+            f"queue={self.queue_size}, parse_workers={parse_workers}, "
+            f"embed_workers={self.embed_workers}"
+        )
+    
+    def _get_parse_pool(self) -> Executor:
+        """获取解析池（进程池，parse_workers<=0 时退化为向量化线程池）"""
+        if self._parse_pool is None:
+            if self.parse_workers > 0:
+                self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            else:
+                self._parse_pool = self._get_embed_pool()
+        return self._parse_pool
+    
+    def _get_embed_pool(self) -> ThreadPoolExecutor:
+        """获取向量化线程池"""
+        if self._embed_pool is None:
+            self._embed_pool = ThreadPoolExecutor(
+                max_workers=self.embed_workers,
+                thread_name_prefix="ddl-embed"
+            )
+        return self._embed_pool
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取并发信号量"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+    
+    def has_capacity(self) -> bool:
+        """
+        检查队列是否还能接收新文件
+        
+        Returns:
+            bool: True 如果队列未满
+        """
+        return self._pending < self.queue_size
+    
+    def reserve(self) -> None:
+        """
+        预占一个队列位置（在接收上传时调用）
+        
+        Raises:
+            IngestionQueueFullError: 队列已满
+        """
+        if not self.has_capacity():
+            logger.warning(f"Ingestion queue full: {self._pending}/{self.queue_size}")
+            raise IngestionQueueFullError(
+                f"DDL 处理队列已满（{self._pending}/{self.queue_size}），请稍后重试"
+            )
+        self._pending += 1
+    
+    def release(self) -> None:
+        """
+        归还 reserve() 预占、但不会再交给 run() 执行的队列位置（如上传保存失败）
+        """
+        self._pending = max(0, self._pending - 1)
+    
+    async def run(self, job: Callable[[], Awaitable[T]], reserved: bool = False) -> T:
+        """
+        在并发上限内执行一个摄取任务
+        
+        Args:
+            job: 返回协程的任务工厂
+            reserved: 调用方是否已通过 reserve() 预占队列位置
+        
+        Returns:
+            任务返回值
+        """
+        if not reserved:
+            self.reserve()
+        
+        try:
+            async with self._get_semaphore():
+                self._running += 1
+                try:
+                    return await job()
+                finally:
+                    self._running -= 1
+        finally:
+            self._pending -= 1
+    
+    async def run_parse(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        在解析池中执行（func 与参数需可 pickle）
+        
+        Args:
+            func: 解析函数（模块级函数或可序列化对象的方法）
+            *args: 参数
+        
+        Returns:
+            解析结果
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_parse_pool(), func, *args)
+    
+    async def run_parse_parallel(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        并行解析：在协调线程中执行 func(*args, executor=解析池)，由 func 分批提交子任务到解析池
+        
+        解析池为进程池（parse_workers>0）时才能获得多核加速，否则应使用 run_parse
+        
+        Args:
+            func: 并行解析函数（接受 executor 关键字参数）
+            *args: 参数
+        
+        Returns:
+            解析结果
+        """
+        return await asyncio.to_thread(func, *args, executor=self._get_parse_pool())
+    
+    async def run_embed(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        在向量化线程池中执行
+        
+        Args:
+            func: 向量化函数
+            *args: 参数
+        
+        Returns:
+            向量化结果
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_embed_pool(), func, *args)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取执行器统计信息
+        
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return {
+            "running": self._running,
+            "pending": self._pending,
+            "max_concurrency": self.max_concurrency,
+            "queue_size": self.queue_size
+        }
+    
+    def shutdown(self) -> None:
+        """关闭线程池/进程池"""
+        if self._parse_pool is not None and self._parse_pool is not self._embed_pool:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+        if self._embed_pool is not None:
+            self._embed_pool.shutdown(wait=False, cancel_futures=True)
+        self._parse_pool = None
+        self._embed_pool = None
+        logger.info("Ingestion executor shut down")
+
+
+# 全局单例
+_ingestion_executor_instance = None
+
+
+def get_ingestion_executor() -> IngestionExecutor:
+    """
+    获取摄取执行器单例
+    
+    Returns:
+        IngestionExecutor: 摄取执行器实例
+    """
+    global _ingestion_executor_instance
+    if _ingestion_executor_instance is None:
+        _ingestion_executor_instance = IngestionExecutor(
+            max_concurrency=settings.ingestion_max_concurrency,
+            queue_size=settings.ingestion_queue_size,
+            parse_workers=settings.ingestion_parse_workers,
+            embed_workers=settings.ingestion_embed_workers
+        )
+    return _ingestion_executor_instance
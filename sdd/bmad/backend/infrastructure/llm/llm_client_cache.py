@@ -0,0 +1,178 @@
+"""
+LLM 客户端缓存模块
+按 API Key（哈希）缓存 ChatOpenAI 实例，所有实例共享 keep-alive HTTP 连接池
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from config import settings
+from infrastructure.logging.logger import get_logger
+
+logger = get_logger("llm_client_cache")
+
+
+def hash_api_key(api_key: str) -> str:
+    """
+    计算 API Key 的哈希（缓存键，避免明文 Key 常驻内存结构/日志）
+    
+    Args:
+        api_key: API Key
+    
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class LLMClientCache:
+    """
+    LLM 客户端缓存（LRU + TTL）
+    
+    核心设计：
+    1. 缓存键为 API Key 的 SHA-256，值为 (客户端, 创建时间)
+    2. 超过容量时淘汰最久未使用的客户端，超过 TTL 的客户端在访问时淘汰
+    3. 所有客户端共享同一组 httpx 连接池（同步 + 异步），复用 TCP/TLS 连接
+    """
+    
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        timeout: float
+    ):
+        """
+        初始化客户端缓存
+        
+        Args:
+            max_size: 最多缓存的客户端数量
+            ttl_seconds: 客户端存活时间（秒）
+            max_connections: 连接池最大连接数
+            max_keepalive_connections: 连接池最大空闲 keep-alive 连接数
+            keepalive_expiry: 空闲连接保留时间（秒）
+            timeout: HTTP 请求超时（秒）
+        """
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http_client = httpx.Client(limits=limits, timeout=timeout)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        
+        self._clients: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # 指标
+        self._hits = 0
+        self._misses = 0
+        self._evictions_capacity = 0
+        self._evictions_expired = 0
+        
+        logger.info(
+            f"LLM client cache initialized: max_size={self.max_size}, ttl={ttl_seconds}s, "
+            f"max_connections={max_connections}, max_keepalive={max_keepalive_connections}"
+        )
+    
+    def get_or_create(self, api_key: str, factory: Callable[[str], Any]) -> Any:
+        """
+        获取 API Key 对应的客户端，不存在或已过期时通过 factory 创建
+        
+        Args:
+            api_key: API Key
+            factory: 客户端工厂函数（参数为 API Key）
+        
+        Returns:
+            LLM 客户端实例
+        """
+        key = hash_api_key(api_key)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                client, created_at = entry
+                if now - created_at < self.ttl_seconds:
+                    self._clients.move_to_end(key)
+                    self._hits += 1
+                    return client
+                # 已过期
+                del self._clients[key]
+                self._evictions_expired += 1
+                logger.debug(f"LLM client expired: {key[:8]}")
+            
+            self._misses += 1
+            client = factory(api_key)
+            self._clients[key] = (client, now)
+            
+            while len(self._clients) > self.max_size:
+                evicted_key, _ = self._clients.popitem(last=False)
+                self._evictions_capacity += 1
+                logger.debug(f"LLM client evicted (capacity): {evicted_key[:8]}")
+            
+            return client
+    
+    def clear(self) -> None:
+        """清空缓存的客户端（不关闭共享连接池）"""
+        with self._lock:
+            self._clients.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+        
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._clients),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+                "evictions_capacity": self._evictions_capacity,
+                "evictions_expired": self._evictions_expired
+            }
+    
+    async def aclose(self) -> None:
+        """关闭共享连接池"""
+        self.clear()
+        self.http_client.close()
+        await self.http_async_client.aclose()
+        logger.info("LLM client cache closed")
+
+
+# 全局单例
+_llm_client_cache_instance: Optional[LLMClientCache] = None
+
+
+def get_llm_client_cache() -> LLMClientCache:
+    """
+    获取 LLM 客户端缓存单例
+    
+    Returns:
+        LLMClientCache: 客户端缓存实例
+    """
+    global _llm_client_cache_instance
+    if _llm_client_cache_instance is None:
+        _llm_client_cache_instance = LLMClientCache(
+            max_size=settings.llm_client_cache_size,
+            ttl_seconds=settings.llm_client_ttl_seconds,
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive_connections=settings.llm_http_max_keepalive,
+            keepalive_expiry=settings.llm_http_keepalive_expiry,
+            timeout=settings.llm_http_timeout
+        )
+    return _llm_client_cache_instance
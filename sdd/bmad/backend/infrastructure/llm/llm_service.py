@@ -2,7 +2,7 @@
 LLM 服务模块
 封装大语言模型调用（支持 GLM/DeepSeek/OpenAI 等）
 """
-from typing import Dict, Any, Optional, List
+from typing import AsyncIterator, Dict, Any, Optional, List
 import json
 
 from fastapi import HTTPException
@@ -11,6 +11,7 @@ from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_openai import ChatOpenAI
 
 from config import settings
+from infrastructure.llm.llm_client_cache import get_llm_client_cache
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("llm_service")
@@ -23,6 +24,9 @@ class LLMService:
         """初始化 LLM 服务（默认使用环境变量中的API Key）"""
         logger.info("Initializing LLM service...")
         
+        # 按 API Key 缓存的客户端（共享 keep-alive 连接池）
+        self.client_cache = get_llm_client_cache()
+        
         # 默认 LLM（使用环境变量配置）
         # 注意：用户可以在运行时通过 generate_response 的 api_key 参数覆盖
         try:
@@ -34,11 +38,11 @@ class LLMService:
     
     def _create_llm(self, api_key: str) -> ChatOpenAI:
         """
-        创建 LLM 实例
+        创建 LLM 实例（使用共享 HTTP 连接池）
         
         Args:
             api_key: GLM API Key
-            
+        
         Returns:
             ChatOpenAI: LLM 实例
         """
@@ -48,8 +52,82 @@ class LLMService:
             base_url="https://open.bigmodel.cn/api/paas/v4",  # ✅ GLM API
             temperature=0,  # 完全确定性输出
             top_p=1.0,
+            http_client=self.client_cache.http_client,
+            http_async_client=self.client_cache.http_async_client,
         )
     
+    def _get_cached_llm(self, api_key: str) -> ChatOpenAI:
+        """
+        获取用户 API Key 对应的 LLM 实例（命中缓存时复用，避免每次请求重建客户端）
+        
+        Args:
+            api_key: 用户提供的API Key
+        
+        Returns:
+            ChatOpenAI: LLM 实例
+        """
+        return self.client_cache.get_or_create(api_key, self._create_llm)
+    
+    def _select_llm(self, api_key: Optional[str] = None) -> Optional[ChatOpenAI]:
+        """
+        选择 LLM 实例：用户提供的API Key优先
+        
+        Args:
+            api_key: 用户提供的API Key（可选）
+        
+        Returns:
+            ChatOpenAI: LLM 实例（默认 LLM 未初始化时为 None）
+        
+        Raises:
+            HTTPException: 使用用户 API Key 创建 LLM 失败时抛出 401 错误
+        """
+        if api_key:
+            logger.info("Using cached LLM instance for user-provided API Key")
+            try:
+                return self._get_cached_llm(api_key)
+            except Exception as e:
+                logger.error(f"Failed to create LLM with user API Key: {e}")
+                raise HTTPException(
+                    status_code=401,
+                    detail="API Key验证失败，请检查您的GLM API Key是否正确"
+                )
+        
+        logger.info("Using default LLM instance")
+        return self.default_llm
+    
+    def _build_messages(
+        self,
+        user_message: str,
+        system_prompt: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """
+        构建 LLM 消息列表
+        
+        Args:
+            user_message: 用户消息
+            system_prompt: 系统提示（可选）
+            context: 上下文信息（可选）
+        
+        Returns:
+            List: 消息列表
+        """
+        messages = []
+        
+        # 添加系统提示
+        if system_prompt:
+            messages.append(SystemMessage(content=system_prompt))
+        
+        # 添加上下文（如果有）
+        if context:
+            context_str = json.dumps(context, ensure_ascii=False, indent=2)
+            messages.append(SystemMessage(content=f"上下文信息：\n{context_str}"))
+        
+        # 添加用户消息
+        messages.append(HumanMessage(content=user_message))
+        
+        return messages
+    
     def generate_response(
         self,
         user_message: str,
@@ -58,50 +136,25 @@ class LLMService:
         api_key: Optional[str] = None
     ) -> str:
         """
-        生成 LLM 响应
+        生成 LLM 响应（同步，会阻塞调用线程）
         
         Args:
             user_message: 用户消息
             system_prompt: 系统提示（可选）
             context: 上下文信息（可选）
             api_key: 用户提供的API Key（可选，优先级高于默认）
-            
+        
         Returns:
             str: LLM 生成的响应
         """
-        # 选择 LLM 实例：用户提供的API Key优先
-        if api_key:
-            logger.info("Creating LLM instance with user-provided API Key")
-            try:
-                llm = self._create_llm(api_key)
-            except Exception as e:
-                logger.error(f"Failed to create LLM with user API Key: {e}")
-                raise HTTPException(
-                    status_code=401,
-                    detail="API Key验证失败，请检查您的GLM API Key是否正确"
-                )
-        else:
-            logger.info("Using default LLM instance")
-            llm = self.default_llm
-            
+        llm = self._select_llm(api_key)
+        
         if llm is None:
             logger.warning("LLM not initialized, returning mock response")
             return "LLM 服务未初始化。请在设置中配置 GLM API Key。"
         
         try:
-            messages = []
-            
-            # 添加系统提示
-            if system_prompt:
-                messages.append(SystemMessage(content=system_prompt))
-            
-            # 添加上下文（如果有）
-            if context:
-                context_str = json.dumps(context, ensure_ascii=False, indent=2)
-                messages.append(SystemMessage(content=f"上下文信息：\n{context_str}"))
-            
-            # 添加用户消息
-            messages.append(HumanMessage(content=user_message))
+            messages = self._build_messages(user_message, system_prompt, context)
             
             # 调用 LLM
             logger.debug(f"Calling LLM with {len(messages)} messages")
@@ -116,6 +169,83 @@ class LLMService:
             logger.error(f"LLM generation failed: {e}", exc_info=True)
             raise
     
+    async def agenerate_response(
+        self,
+        user_message: str,
+        system_prompt: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        api_key: Optional[str] = None
+    ) -> str:
+        """
+        生成 LLM 响应（异步，不阻塞事件循环）
+        
+        Args:
+            user_message: 用户消息
+            system_prompt: 系统提示（可选）
+            context: 上下文信息（可选）
+            api_key: 用户提供的API Key（可选，优先级高于默认）
+        
+        Returns:
+            str: LLM 生成的响应
+        """
+        llm = self._select_llm(api_key)
+        
+        if llm is None:
+            logger.warning("LLM not initialized, returning mock response")
+            return "LLM 服务未初始化。请在设置中配置 GLM API Key。"
+        
+        try:
+            messages = self._build_messages(user_message, system_prompt, context)
+            
+            # 异步调用 LLM
+            logger.debug(f"Calling LLM (async) with {len(messages)} messages")
+            response = await llm.ainvoke(messages)
+            
+            result = response.content
+            logger.info(f"LLM response generated: {len(result)} characters")
+            
+            return result
+        
+        except Exception as e:
+            logger.error(f"LLM generation failed: {e}", exc_info=True)
+            raise
+    
+    async def astream_response(
+        self,
+        user_message: str,
+        system_prompt: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        api_key: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        流式生成 LLM 响应（逐个返回 token 片段）
+        
+        Args:
+            user_message: 用户消息
+            system_prompt: 系统提示（可选）
+            context: 上下文信息（可选）
+            api_key: 用户提供的API Key（可选，优先级高于默认）
+        
+        Yields:
+            str: 响应片段
+        """
+        llm = self._select_llm(api_key)
+        
+        if llm is None:
+            logger.warning("LLM not initialized, returning mock response")
+            yield "LLM 服务未初始化。请在设置中配置 GLM API Key。"
+            return
+        
+        messages = self._build_messages(user_message, system_prompt, context)
+        
+        logger.debug(f"Streaming LLM response with {len(messages)} messages")
+        length = 0
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                length += len(chunk.content)
+                yield chunk.content
+        logger.info(f"LLM response streamed: {length} characters")
+    
     def is_available(self) -> bool:
         """
         检查 LLM 服务是否可用（检查默认LLM实例）
@@ -125,19 +255,28 @@ class LLMService:
         """
         return self.default_llm is not None
     
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取 LLM 客户端缓存统计信息
+        
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        return self.client_cache.get_stats()
+    
     def get_chat_model(self, api_key: Optional[str] = None) -> BaseChatModel:
         """
         获取 ChatModel 实例（供 Agent 使用）
         
         Args:
             api_key: 用户提供的API Key（可选）
-            
+        
         Returns:
             BaseChatModel: Chat Model 实例
         """
         if api_key:
-            logger.info("Creating ChatModel with user-provided API Key")
-            return self._create_llm(api_key)
+            logger.info("Using cached ChatModel for user-provided API Key")
+            return self._get_cached_llm(api_key)
         else:
             if self.default_llm is None:
                 raise ValueError("LLM not initialized. Please configure GLM API Key.")
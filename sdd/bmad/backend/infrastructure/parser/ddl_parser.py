@@ -2,25 +2,184 @@
 DDL Parser 模块
 使用 sqlparse 解析 DDL 文件，提取表结构信息
 """
+import hashlib
+import json
 import re
-from typing import List, Dict, Any, Optional
+import sys
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import sqlparse
 from sqlparse.sql import Statement, Identifier, IdentifierList, Parenthesis, Function
-from sqlparse.tokens import Keyword, Name, Punctuation
+from sqlparse.tokens import Punctuation
 
+from infrastructure.parser.ddl_splitter import iter_schema_statements
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("ddl_parser")
 
+# 字段定义中的字符串和引号标识符（支持 '' 和反斜杠转义）
+_STRING_PATTERN = r"'(?:[^'\\]|\\.|'')*'"
+_QUOTED_PATTERN = r'`(?:[^`]|``)*`|"(?:[^"\\]|\\.|"")*"'
+
+
+def _group_pattern(depth: int) -> str:
+    """构建括号表达式的正则（最多嵌套 depth 层，括号内的字符串和引号标识符整体跳过）"""
+    inner = rf"[^()'\"`]|{_STRING_PATTERN}|{_QUOTED_PATTERN}"
+    if depth > 1:
+        inner += "|" + _group_pattern(depth - 1)
+    return rf"\((?:{inner})*\)"
+
+
+# 括号可嵌套三层，如 DEFAULT (now()) 或 CHECK (a IN (1, 2))
+_GROUP_PATTERN = _group_pattern(3)
+# 标识符，可带 schema 前缀（如 public.users、`db`.`users`）
+_NAME_PATTERN = rf"(?:{_QUOTED_PATTERN}|[^\s,()'\"`.;]+)"
+_QUALIFIED_NAME_PATTERN = rf"{_NAME_PATTERN}(?:\s*\.\s*{_NAME_PATTERN})*"
+
+# 一次匹配一条顶层定义（到括号外、引号外的逗号为止）：字段名、数据类型，
+# 其余部分逐词扫描，约束关键字和注释记录在命名分组中（字符串、引号标识符、括号整体跳过）
+_COLUMN_DEFINITION = re.compile(
+    rf"""
+    \s*
+    (?:(?P<name>{_QUOTED_PATTERN}|[^\s,()'"`]+) \s+ (?P<type>[^\s,()'"`]+(?:{_GROUP_PATTERN})?))?
+    (?:
+        \s*
+        (?:
+            (?P<not_null>NOT\s+NULL)\b
+          | (?P<unique>UNIQUE)\b
+          | (?P<primary_key>PRIMARY\s+KEY)\b
+          | (?P<auto_increment>AUTO_?INCREMENT)\b
+          | COMMENT\s+(?P<comment>{_STRING_PATTERN})
+          | REFERENCES\s+(?P<ref_table>{_QUALIFIED_NAME_PATTERN})\s*(?P<ref_columns>{_GROUP_PATTERN})?
+          | {_STRING_PATTERN} | {_QUOTED_PATTERN} | {_GROUP_PATTERN}
+          | [^\s,()'"`]+
+          | [()'"`]
+        )
+    )*
+    \s*(?:,|$)
+    """,
+    re.VERBOSE | re.IGNORECASE | re.DOTALL
+)
+_STRING_ESCAPE = re.compile(r"''|\\(.)", re.DOTALL)
+# 表级约束/索引定义（CREATE TABLE 括号内，或 ALTER TABLE ... ADD 之后）
+_TABLE_CONSTRAINT = re.compile(
+    rf"""
+    \s*
+    (?:CONSTRAINT (?:\s+(?!(?:PRIMARY|FOREIGN|UNIQUE|CHECK)\b)(?P<constraint>{_NAME_PATTERN}))? \s+)?
+    (?:
+        (?P<primary_key>PRIMARY\s+KEY)
+      | (?P<foreign_key>FOREIGN\s+KEY)
+      | (?P<unique>UNIQUE)(?:\s+(?:KEY|INDEX))?
+      | (?:(?:FULLTEXT|SPATIAL)\s+)?(?:KEY|INDEX)
+    )
+    (?:\s+(?!USING\b)(?P<index_name>{_NAME_PATTERN}))?
+    (?:\s+USING\s+\w+)?
+    \s*(?P<columns>{_GROUP_PATTERN})
+    (?:\s*REFERENCES\s+(?P<ref_table>{_QUALIFIED_NAME_PATTERN})\s*(?P<ref_columns>{_GROUP_PATTERN})?)?
+    """,
+    re.VERBOSE | re.IGNORECASE | re.DOTALL
+)
+# 表选项中的表注释（COMMENT='...' 或 COMMENT '...'）
+_TABLE_COMMENT = re.compile(rf"\bCOMMENT\s*=?\s*({_STRING_PATTERN})", re.IGNORECASE)
+_COLUMN_LIST_ITEM = re.compile(rf"(?:^|,)\s*({_NAME_PATTERN})")
+_NAME_PART = re.compile(_NAME_PATTERN)
+# 语句开头的空白和注释
+_LEADING_COMMENTS = re.compile(r"(?:\s+|--[^\n]*|/\*.*?\*/)*", re.DOTALL)
+_CREATE_TABLE_NAME = re.compile(
+    rf"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?P<table>{_QUALIFIED_NAME_PATTERN})",
+    re.IGNORECASE
+)
+_ALTER_TABLE = re.compile(
+    rf"ALTER\s+TABLE\s+(?:ONLY\s+)?(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?(?P<table>{_QUALIFIED_NAME_PATTERN})",
+    re.IGNORECASE
+)
+_CREATE_INDEX = re.compile(
+    rf"""
+    CREATE\s+(?P<unique>UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?
+    (?P<name>{_QUALIFIED_NAME_PATTERN})\s+ON\s+(?:ONLY\s+)?(?P<table>{_QUALIFIED_NAME_PATTERN})
+    (?:\s+USING\s+\w+)?\s*(?P<columns>{_GROUP_PATTERN})
+    """,
+    re.VERBOSE | re.IGNORECASE | re.DOTALL
+)
+# ALTER TABLE 的各个子句（按括号外、引号外的逗号切分）
+_ALTER_ACTION = re.compile(rf"(?:{_STRING_PATTERN}|{_QUOTED_PATTERN}|{_GROUP_PATTERN}|[^,()'\"`;]+|[()'\"`])+")
+_ADD_PREFIX = re.compile(r"\s*ADD\s+", re.IGNORECASE)
+# 以这些关键字开头的定义是表级约束/索引，不是字段
+_TABLE_CONSTRAINT_KEYWORDS = frozenset({
+    "PRIMARY", "FOREIGN", "CONSTRAINT", "KEY", "INDEX", "UNIQUE", "FULLTEXT", "SPATIAL", "CHECK"
+})
+# 字段约束（按输出顺序，对应 _COLUMN_DEFINITION 中的约束分组）
+_COLUMN_CONSTRAINTS = ('NOT NULL', 'UNIQUE', 'PRIMARY KEY', 'AUTO_INCREMENT')
+
+
+def _identifier(name: str) -> str:
+    """标识符规范化：去掉 schema 前缀和引号，转为小写"""
+    part = _NAME_PART.findall(name)[-1]
+    if part[0] in '`"':
+        part = part[1:-1]
+    return part.strip().lower()
+
+
+def _column_names(group: str) -> List[str]:
+    """解析括号中的字段列表，如 (`a`, b(10) DESC) -> ['a', 'b']"""
+    return [_identifier(name) for name in _COLUMN_LIST_ITEM.findall(group[1:-1])]
+
+
+def _unquote_string(literal: str) -> str:
+    """去掉 SQL 字符串字面量的引号并还原转义（'' 和反斜杠转义）"""
+    body = literal[1:-1]
+    if "'" not in body and "\\" not in body:
+        return body
+    return _STRING_ESCAPE.sub(lambda m: m.group(1) or "'", body)
+
+
+def _add_foreign_keys(existing: List[Dict[str, str]], added: Iterable[Dict[str, str]]) -> None:
+    """
+    追加外键，跳过 (column, ref_table, ref_column) 已存在的项
+    
+    Args:
+        existing: 已有外键列表（原地追加）
+        added: 新外键
+    """
+    seen = {(fk["column"], fk["ref_table"], fk["ref_column"]) for fk in existing}
+    for fk in added:
+        key = (fk["column"], fk["ref_table"], fk["ref_column"])
+        if key not in seen:
+            seen.add(key)
+            existing.append(fk)
+
+
+# 相同的约束组合共享同一个元组（宽表中绝大多数字段的约束组合只有几种）
+_CONSTRAINT_TUPLES: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _intern_constraints(constraints: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """返回共享的约束元组"""
+    if not constraints:
+        return ()
+    key = tuple(constraints)
+    shared = _CONSTRAINT_TUPLES.get(key)
+    if shared is None:
+        shared = _CONSTRAINT_TUPLES.setdefault(key, tuple(sys.intern(c) for c in key))
+    return shared
+
 
 class TableColumn:
-    """表字段信息"""
+    """
+    表字段信息
+    
+    使用 __slots__ 省去每个实例的 __dict__；字段名和类型字符串驻留（intern），
+    约束为共享的元组，大量字段的表只保留一份重复字符串
+    """
     
-    def __init__(self, name: str, data_type: str, constraints: Optional[List[str]] = None, 
+    __slots__ = ("name", "data_type", "constraints", "comment")
+    
+    def __init__(self, name: str, data_type: str, constraints: Optional[Iterable[str]] = None, 
                  comment: Optional[str] = None):
-        self.name = name
-        self.data_type = data_type
-        self.constraints = constraints or []
+        self.name = sys.intern(name)
+        self.data_type = sys.intern(data_type)
+        self.constraints = _intern_constraints(constraints)
         self.comment = comment
     
     def to_dict(self) -> Dict[str, Any]:
@@ -28,18 +187,24 @@ class TableColumn:
         return {
             "name": self.name,
             "data_type": self.data_type,
-            "constraints": self.constraints,
+            "constraints": list(self.constraints),
             "comment": self.comment
         }
 
 
 class TableInfo:
-    """表结构信息"""
+    """
+    表结构信息
+    
+    只在需要时（写入仓储、计算指纹）通过 to_dict 逐表转换，不长期保留字典副本
+    """
+    
+    __slots__ = ("name", "columns", "primary_keys", "foreign_keys", "indexes", "comment")
     
     def __init__(self, name: str, columns: List[TableColumn], 
                  primary_keys: Optional[List[str]] = None,
                  foreign_keys: Optional[List[Dict[str, str]]] = None,
-                 indexes: Optional[List[str]] = None,
+                 indexes: Optional[List[Dict[str, Any]]] = None,
                  comment: Optional[str] = None):
         self.name = name
         self.columns = columns
@@ -61,6 +226,71 @@ class TableInfo:
         }
 
 
+class TableConstraints:
+    """
+    表级约束集合：CREATE TABLE 中的表级定义，或 ALTER TABLE / CREATE INDEX 为已定义的表追加的约束
+    
+    foreign_keys 每项对应一对字段：{"name", "column", "ref_table", "ref_column"}，
+    复合外键的各项 name 相同；ref_column 为空表示引用对方主键；
+    (column, ref_table, ref_column) 相同的外键只保留先出现的一项（如内联 REFERENCES 与表级 FOREIGN KEY 重复声明）
+    indexes 每项为 {"name", "columns", "unique"}
+    """
+    
+    __slots__ = ("table_name", "primary_keys", "foreign_keys", "indexes")
+    
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.primary_keys: List[str] = []
+        self.foreign_keys: List[Dict[str, str]] = []
+        self.indexes: List[Dict[str, Any]] = []
+    
+    def __bool__(self) -> bool:
+        return bool(self.primary_keys or self.foreign_keys or self.indexes)
+    
+    def add_foreign_key(self, name: str, columns: List[str], ref_table: str, ref_columns: List[str]) -> None:
+        """
+        添加外键（复合外键按字段拆分为多项）
+        
+        Args:
+            name: 约束名
+            columns: 本表字段
+            ref_table: 引用的表
+            ref_columns: 引用的字段（为空表示引用对方主键）
+        """
+        for i, column in enumerate(columns):
+            _add_foreign_keys(self.foreign_keys, [{
+                "name": name,
+                "column": column,
+                "ref_table": ref_table,
+                "ref_column": ref_columns[i] if i < len(ref_columns) else ""
+            }])
+
+
+SchemaItem = Union[TableInfo, TableConstraints]
+
+
+def tables_to_json(tables: Iterable[Any], **kwargs: Any) -> str:
+    """
+    将表结构列表序列化为 JSON（TableInfo 在编码时逐表转换为字典，不构建整份字典副本）
+    
+    Args:
+        tables: TableInfo（或已是字典的表结构）列表
+        **kwargs: 传给 json.dumps 的其他参数
+    
+    Returns:
+        str: JSON 文本
+    """
+    return json.dumps(tables, default=_to_serializable, **kwargs)
+
+
+def _to_serializable(obj: Any) -> Any:
+    """json.dumps 的 default 钩子：按需调用 to_dict"""
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return to_dict()
+
+
 class DDLParser:
     """DDL 解析器"""
     
@@ -70,37 +300,179 @@ class DDLParser:
         
         Args:
             ddl_content: DDL 文件内容
-            
+        
         Returns:
             List[TableInfo]: 表结构信息列表
         """
-        logger.info("Starting DDL parsing...")
+        return self.parse_stream([ddl_content])
+    
+    def parse_stream(self, chunks: Iterable[str]) -> List[TableInfo]:
+        """
+        流式解析 DDL 文本块，提取所有表结构信息
         
-        # 使用 sqlparse 解析 SQL
-        statements = sqlparse.parse(ddl_content)
-        tables = []
-        
-        for statement in statements:
-            # 仅处理 CREATE TABLE 语句
-            if self._is_create_table(statement):
-                try:
-                    table_info = self._parse_create_table(statement)
-                    if table_info:
-                        tables.append(table_info)
-                        logger.debug(f"Parsed table: {table_info.name} with {len(table_info.columns)} columns")
-                except Exception as e:
-                    logger.error(f"Failed to parse CREATE TABLE statement: {e}", exc_info=True)
-                    # 继续解析其他表
-                    continue
+        先用流式切分器筛出表结构语句，只为 CREATE TABLE 构建 sqlparse 语法树；
+        ALTER TABLE / CREATE INDEX 追加的主键、外键和索引在最后合并到对应的表
         
+        Args:
+            chunks: DDL 文本块
+        
+        Returns:
+            List[TableInfo]: 表结构信息列表
+        """
+        logger.info("Starting DDL parsing...")
+        tables = self._merge_constraints(self.parse_statements(iter_schema_statements(chunks)))
         logger.info(f"DDL parsing completed: {len(tables)} tables extracted")
         return tables
     
-    def _is_create_table(self, statement: Statement) -> bool:
-        """判断是否是 CREATE TABLE 语句"""
-        # 使用 normalized 并去除前导空格
-        normalized = statement.normalized.upper().strip()
-        return 'CREATE TABLE' in normalized
+    def parse_parallel(
+        self,
+        chunks: Iterable[str],
+        executor: Executor,
+        batch_size: int = 200,
+        max_pending_batches: int = 8
+    ) -> List[TableInfo]:
+        """
+        并行解析 DDL 文本块：在当前线程切分语句，按批分发到进程池解析，按原始顺序合并结果
+        
+        每条语句的解析互不依赖；按批提交以摊薄进程间传输开销，
+        同时在途的批次数有上限，内存占用与文件大小无关
+        
+        Args:
+            chunks: DDL 文本块
+            executor: 解析池（进程池才能绕过 GIL 获得加速）
+            batch_size: 每批语句数
+            max_pending_batches: 同时在途的批次数上限
+        
+        Returns:
+            List[TableInfo]: 表结构信息列表（与 parse_stream 结果一致）
+        """
+        logger.info("Starting parallel DDL parsing...")
+        items: List[SchemaItem] = []
+        pending = deque()
+        batch_count = 0
+        
+        for batch in self._iter_statement_batches(chunks, batch_size):
+            if len(pending) >= max_pending_batches:
+                items.extend(pending.popleft().result())
+            pending.append(executor.submit(self.parse_statements, batch))
+            batch_count += 1
+        while pending:
+            items.extend(pending.popleft().result())
+        
+        tables = self._merge_constraints(items)
+        logger.info(f"DDL parsing completed: {len(tables)} tables extracted in {batch_count} batches")
+        return tables
+    
+    def parse_statements(self, statements: Iterable[str]) -> List[SchemaItem]:
+        """
+        解析一组表结构语句（并行解析时在进程池中执行）
+        
+        Args:
+            statements: CREATE TABLE / ALTER TABLE / CREATE INDEX 语句文本
+        
+        Returns:
+            List[SchemaItem]: CREATE TABLE 得到 TableInfo，ALTER TABLE / CREATE INDEX 得到 TableConstraints
+            （解析失败或不含约束的语句被跳过）
+        """
+        items = []
+        
+        for statement_text in statements:
+            try:
+                item = self._parse_statement(statement_text)
+                if item:
+                    items.append(item)
+            except Exception as e:
+                logger.error(f"Failed to parse DDL statement: {e}", exc_info=True)
+                # 继续解析其他语句
+                continue
+        
+        return items
+    
+    def _parse_statement(self, statement_text: str) -> Optional[SchemaItem]:
+        """按语句类型解析单条语句"""
+        start = _LEADING_COMMENTS.match(statement_text).end()
+        
+        alter = _ALTER_TABLE.match(statement_text, start)
+        if alter:
+            return self._parse_alter_table(statement_text, alter)
+        
+        create_index = _CREATE_INDEX.match(statement_text, start)
+        if create_index:
+            constraints = TableConstraints(_identifier(create_index.group('table')))
+            constraints.indexes.append({
+                "name": _identifier(create_index.group('name')),
+                "columns": _column_names(create_index.group('columns')),
+                "unique": bool(create_index.group('unique'))
+            })
+            return constraints
+        
+        statement = sqlparse.parse(statement_text)[0]
+        table_info = self._parse_create_table(statement)
+        if table_info:
+            logger.debug(f"Parsed table: {table_info.name} with {len(table_info.columns)} columns")
+        return table_info
+    
+    def _parse_alter_table(self, statement_text: str, alter: re.Match) -> Optional[TableConstraints]:
+        """
+        解析 ALTER TABLE 语句中 ADD 的主键、外键和索引（其他子句忽略）
+        
+        Args:
+            statement_text: 语句文本
+            alter: ALTER TABLE 表名部分的匹配结果
+        
+        Returns:
+            TableConstraints: 追加的约束，不含约束时返回 None
+        """
+        table_name = _identifier(alter.group('table'))
+        constraints = TableConstraints(table_name)
+        
+        for action in _ALTER_ACTION.finditer(statement_text, alter.end()):
+            text = action.group()
+            add = _ADD_PREFIX.match(text)
+            if add:
+                self._parse_table_constraint(text[add.end():], constraints)
+        
+        return constraints or None
+    
+    def _merge_constraints(self, items: List[SchemaItem]) -> List[TableInfo]:
+        """
+        将 ALTER TABLE / CREATE INDEX 追加的约束合并到对应的表（语句顺序不限）
+        
+        Args:
+            items: parse_statements 的结果
+        
+        Returns:
+            List[TableInfo]: 表结构信息列表
+        """
+        tables = [item for item in items if isinstance(item, TableInfo)]
+        tables_by_name = {table.name: table for table in tables}
+        
+        for item in items:
+            if not isinstance(item, TableConstraints):
+                continue
+            table = tables_by_name.get(item.table_name)
+            if table is None:
+                logger.debug(f"Constraints for unknown table skipped: {item.table_name}")
+                continue
+            for existing, added in (
+                (table.primary_keys, item.primary_keys),
+                (table.indexes, item.indexes),
+            ):
+                existing.extend(value for value in added if value not in existing)
+            _add_foreign_keys(table.foreign_keys, item.foreign_keys)
+        
+        return tables
+    
+    def _iter_statement_batches(self, chunks: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+        """按批切分表结构语句"""
+        batch = []
+        for statement_text in iter_schema_statements(chunks):
+            batch.append(statement_text)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
     
     def _parse_create_table(self, statement: Statement) -> Optional[TableInfo]:
         """
@@ -108,7 +480,7 @@ class DDLParser:
         
         Args:
             statement: sqlparse Statement 对象
-            
+        
         Returns:
             TableInfo: 表结构信息，解析失败返回 None
         """
@@ -118,20 +490,14 @@ class DDLParser:
             logger.warning("Failed to extract table name from CREATE TABLE")
             return None
         
-        # 提取字段定义
-        columns = self._extract_columns(statement)
+        # 提取字段定义和表级约束（外键、索引）
+        columns, constraints = self._extract_definitions(statement, table_name)
         if not columns:
             logger.warning(f"No columns found for table: {table_name}")
             return None
         
-        # 提取主键
-        primary_keys = self._extract_primary_keys(statement, columns)
-        
-        # 提取外键（简化实现）
-        foreign_keys = []
-        
-        # 提取索引（简化实现）
-        indexes = []
+        # 提取主键（字段约束和表级 PRIMARY KEY）
+        primary_keys = self._extract_primary_keys(columns, constraints)
         
         # 提取表注释
         comment = self._extract_table_comment(statement)
@@ -140,47 +506,63 @@ class DDLParser:
             name=table_name,
             columns=columns,
             primary_keys=primary_keys,
-            foreign_keys=foreign_keys,
-            indexes=indexes,
+            foreign_keys=constraints.foreign_keys,
+            indexes=constraints.indexes,
             comment=comment
         )
     
     def _extract_table_name(self, statement: Statement) -> Optional[str]:
-        """提取表名"""
-        tokens = list(statement.flatten())
-        
-        # 查找 TABLE 关键字后的标识符
-        found_table = False
-        for token in tokens:
-            if found_table and token.ttype in (Name, None) and token.value.strip():
-                # 移除引号和反引号，保持原始大小写
-                name = token.value.strip('`"\' ')
-                # 转换为小写以保持一致性
-                return name.lower()
-            if token.ttype is Keyword and token.value.upper() == 'TABLE':
-                found_table = True
-        
+        """提取表名（去掉 schema 前缀和引号，转换为小写以保持一致性）"""
+        match = _CREATE_TABLE_NAME.search(statement.value)
+        if match:
+            return _identifier(match.group('table'))
         return None
     
-    def _extract_columns(self, statement: Statement) -> List[TableColumn]:
-        """提取字段列表"""
-        columns = []
-        
-        # 查找括号中的字段定义
-        for token in statement.tokens:
+    @staticmethod
+    def _column_list_index(statement: Statement) -> Optional[int]:
+        """字段定义括号在语句顶层 token 中的位置（没有时返回 None）"""
+        for index, token in enumerate(statement.tokens):
             if isinstance(token, Parenthesis):
-                col_definitions = self._parse_column_definitions(token.value)
-                columns.extend(col_definitions)
-                break
+                return index
+        return None
+    
+    def _extract_definitions(self, statement: Statement, table_name: str) -> Tuple[List[TableColumn], TableConstraints]:
+        """提取括号中的字段定义和表级约束"""
+        index = self._column_list_index(statement)
+        if index is not None:
+            return self._parse_definitions(statement.tokens[index].value, table_name)
         
-        return columns
+        return [], TableConstraints(table_name)
     
     def _parse_column_definitions(self, parenthesis_content: str) -> List[TableColumn]:
         """
         解析字段定义（括号内容）
-        使用改进的逻辑处理各种 DDL 格式
+        
+        Args:
+            parenthesis_content: 括号内容
+        
+        Returns:
+            List[TableColumn]: 字段列表（表级约束不计入）
+        """
+        return self._parse_definitions(parenthesis_content, "")[0]
+    
+    def _parse_definitions(self, parenthesis_content: str, table_name: str) -> Tuple[List[TableColumn], TableConstraints]:
+        """
+        解析字段定义和表级约束（括号内容）
+        
+        每条定义由一次预编译正则匹配得到字段名、数据类型、约束、注释和内联外键，
+        字符串、引号标识符和嵌套括号内的逗号不会切分字段；
+        表级约束（PRIMARY KEY (...)、FOREIGN KEY、KEY、INDEX、CONSTRAINT 等）单独解析
+        
+        Args:
+            parenthesis_content: 括号内容
+            table_name: 表名（用于为未命名的外键生成约束名）
+        
+        Returns:
+            Tuple[List[TableColumn], TableConstraints]: 字段列表和表级约束
         """
         columns = []
+        constraints = TableConstraints(table_name)
         
         # 移除外层括号
         content = parenthesis_content.strip()
@@ -189,113 +571,98 @@ class DDLParser:
         if content.endswith(')'):
             content = content[:-1]
         
-        # 处理多行格式：先规范化为单行，然后按逗号分割
-        # 保护括号内的逗号（如 VARCHAR(100)）
-        lines = self._split_by_comma(content)
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
+        for match in _COLUMN_DEFINITION.finditer(content):
+            (name, col_type, not_null, unique, primary_key, auto_increment,
+             comment, ref_table, ref_columns) = match.groups()
+            if name is None or (name[0] not in '`"' and name.upper() in _TABLE_CONSTRAINT_KEYWORDS):
+                if match.group().strip():
+                    self._parse_table_constraint(match.group(), constraints)
                 continue
+            name = _identifier(name)
             
-            # 跳过表级约束定义
-            line_upper = line.upper()
-            if any(keyword in line_upper for keyword in 
-                   ['PRIMARY KEY (', 'FOREIGN KEY (', 'CONSTRAINT ', 'INDEX ', 'KEY (']):
-                continue
+            if not col_type.isprintable():
+                # 类型参数跨行时合并空白（如 DECIMAL(10,\n 2)）
+                col_type = " ".join(col_type.split())
             
-            # 解析字段定义：字段名 数据类型 [约束...]
-            parts = line.split()
-            if len(parts) >= 2:
-                col_name = parts[0].strip('`"\' ').lower()  # 转换为小写
-                
-                # 提取数据类型（可能包含括号，如 VARCHAR(100)）
-                col_type = parts[1]
-                # 如果有括号，可能跨越多个 parts
-                if '(' in col_type and ')' not in col_type:
-                    for i in range(2, len(parts)):
-                        col_type += ' ' + parts[i]
-                        if ')' in parts[i]:
-                            break
-                
-                # 提取约束
-                constraints = []
-                if 'NOT NULL' in line_upper:
-                    constraints.append('NOT NULL')
-                if 'UNIQUE' in line_upper:
-                    constraints.append('UNIQUE')
-                if 'PRIMARY KEY' in line_upper:
-                    constraints.append('PRIMARY KEY')
-                if 'AUTO_INCREMENT' in line_upper or 'AUTOINCREMENT' in line_upper:
-                    constraints.append('AUTO_INCREMENT')
-                
-                # 提取注释
-                comment = None
-                comment_match = re.search(r"COMMENT\s+'([^']+)'", line, re.IGNORECASE)
-                if comment_match:
-                    comment = comment_match.group(1)
-                
-                columns.append(TableColumn(col_name, col_type, constraints, comment))
-        
-        return columns
-    
-    def _split_by_comma(self, content: str) -> List[str]:
+            flags = (not_null, unique, primary_key, auto_increment)
+            column_constraints = [constraint for constraint, flag in zip(_COLUMN_CONSTRAINTS, flags) if flag]
+            if comment is not None:
+                comment = _unquote_string(comment) or None
+            if ref_table is not None:
+                # 内联外键：col INT REFERENCES users(id)
+                constraints.add_foreign_key(
+                    f"fk_{table_name}_{name}", [name], _identifier(ref_table),
+                    _column_names(ref_columns) if ref_columns else []
+                )
+            
+            columns.append(TableColumn(name, col_type, column_constraints, comment))
+        
+        return columns, constraints
+    
+    def _parse_table_constraint(self, definition: str, constraints: TableConstraints) -> bool:
         """
-        按逗号分割，但保护括号内的逗号
-        例如：DECIMAL(10,2) 中的逗号不应分割
+        解析一条表级约束/索引定义，结果追加到 constraints
+        
+        Args:
+            definition: 定义文本（如 CONSTRAINT fk FOREIGN KEY (a) REFERENCES t (id)）
+            constraints: 约束集合
+        
+        Returns:
+            bool: True 如果识别为主键、外键或索引
         """
-        result = []
-        current = []
-        paren_depth = 0
-        
-        for char in content:
-            if char == '(':
-                paren_depth += 1
-                current.append(char)
-            elif char == ')':
-                paren_depth -= 1
-                current.append(char)
-            elif char == ',' and paren_depth == 0:
-                # 遇到逗号且不在括号内，分割
-                result.append(''.join(current))
-                current = []
-            else:
-                current.append(char)
-        
-        # 添加最后一段
-        if current:
-            result.append(''.join(current))
-        
-        return result
-    
-    def _extract_primary_keys(self, statement: Statement, columns: List[TableColumn]) -> List[str]:
-        """提取主键字段"""
-        primary_keys = []
-        
-        # 方法 1：从字段约束中查找 PRIMARY KEY
-        for col in columns:
-            if 'PRIMARY KEY' in ' '.join(col.constraints).upper():
-                primary_keys.append(col.name)
-        
-        # 方法 2：查找 PRIMARY KEY (...) 语句
-        content = statement.value.upper()
-        pk_match = re.search(r'PRIMARY\s+KEY\s*\(([^)]+)\)', content)
-        if pk_match:
-            pk_fields = pk_match.group(1)
-            # 分割多个字段，转换为小写
-            pk_list = [f.strip('` "\'').lower() for f in pk_fields.split(',')]
-            primary_keys.extend(pk_list)
-        
-        # 去重并保持小写
-        return list(set([pk.lower() for pk in primary_keys]))
+        match = _TABLE_CONSTRAINT.match(definition)
+        if match is None:
+            return False
+        
+        columns = _column_names(match.group('columns'))
+        name = match.group('constraint') or match.group('index_name')
+        name = _identifier(name) if name else ""
+        if match.group('primary_key'):
+            constraints.primary_keys.extend(column for column in columns if column not in constraints.primary_keys)
+        elif match.group('foreign_key'):
+            if match.group('ref_table') is None:
+                return False
+            constraints.add_foreign_key(
+                name or f"fk_{constraints.table_name}_{'_'.join(columns)}",
+                columns,
+                _identifier(match.group('ref_table')),
+                _column_names(match.group('ref_columns')) if match.group('ref_columns') else []
+            )
+        else:
+            constraints.indexes.append({"name": name, "columns": columns, "unique": bool(match.group('unique'))})
+        return True
+    
+    def _extract_primary_keys(self, columns: List[TableColumn], constraints: TableConstraints) -> List[str]:
+        """提取主键字段：字段约束 PRIMARY KEY 和解析好的表级 PRIMARY KEY (...)（按出现顺序去重，保证表结构指纹稳定）"""
+        primary_keys = [col.name for col in columns if 'PRIMARY KEY' in col.constraints]
+        primary_keys.extend(constraints.primary_keys)
+        return list(dict.fromkeys(primary_keys))
     
     def _extract_table_comment(self, statement: Statement) -> Optional[str]:
-        """提取表注释"""
-        comment_match = re.search(r"COMMENT\s*=?\s*'([^']+)'", statement.value, re.IGNORECASE)
+        """提取表注释（只在字段定义括号之后的表选项中查找，字段注释不作为表注释；注释内可含括号和转义引号）"""
+        index = self._column_list_index(statement)
+        if index is None:
+            return None
+        options = "".join(token.value for token in statement.tokens[index + 1:])
+        comment_match = _TABLE_COMMENT.search(options)
         if comment_match:
-            return comment_match.group(1)
+            return _unquote_string(comment_match.group(1)) or None
         return None
 
 
+def compute_schema_fingerprint(tables: List[TableInfo]) -> str:
+    """
+    计算表结构指纹（表结构不变则指纹不变，用于缓存失效和向量库校验）
+    
+    Args:
+        tables: 表结构信息列表
+    
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    payload = tables_to_json(tables, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 # 单例实例
 ddl_parser = DDLParser()
@@ -0,0 +1,178 @@
+"""
+DDL 语句流式切分模块
+按块扫描 DDL 文本，在字符串和注释之外按分号切分语句，只保留描述表结构的语句
+（CREATE TABLE、ALTER TABLE、CREATE INDEX）；
+其他语句（INSERT、视图、SET 等）只扫描不缓存，内存占用与文件大小无关
+"""
+import re
+from typing import Iterable, Iterator, List, Optional
+
+# 普通状态下需要处理的记号：语句结束、字符串/标识符引号、注释开始
+_NORMAL_TOKEN = re.compile(r"[;'\"`]|--|/\*")
+# 各状态的结束记号（字符串中跳过反斜杠转义）
+_CLOSING_TOKEN = {
+    "'": re.compile(r"\\.|'", re.DOTALL),
+    '"': re.compile(r'\\.|"', re.DOTALL),
+    "`": re.compile(r"`"),
+    "--": re.compile(r"\n"),
+    "/*": re.compile(r"\*/"),
+}
+# 块末尾可能是两字符记号前半部分的字符（留到下一块再处理）
+_PARTIAL_TOKEN_CHARS = {
+    None: "-/",
+    "'": "\\",
+    '"': "\\",
+    "`": "",
+    "--": "",
+    "/*": "*",
+}
+
+# 需要保留的语句（语句开头已合并空白并转为大写）
+_SCHEMA_STATEMENT_PATTERN = re.compile(r"(?:CREATE\s+TABLE|ALTER\s+TABLE|CREATE\s+(?:UNIQUE\s+)?INDEX)\b")
+_SCHEMA_STATEMENT_PREFIXES = ("CREATE TABLE ", "ALTER TABLE ", "CREATE INDEX ", "CREATE UNIQUE INDEX ")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_HEAD_LENGTH = 64
+
+
+class SchemaStatementSplitter:
+    """
+    表结构语句流式切分器
+    
+    通过 feed 逐块输入文本，返回已完整的 CREATE TABLE / ALTER TABLE / CREATE INDEX 语句（含结尾分号）；
+    输入结束后调用 close 取出最后一条没有分号结尾的语句
+    """
+    
+    def __init__(self):
+        """初始化切分器"""
+        self._pending = ""                 # 上一块末尾留待处理的字符
+        self._state: Optional[str] = None  # None 表示普通状态，否则为所在的字符串/注释类型
+        self._parts: List[str] = []        # 当前语句文本（确定不需要保留后不再缓存）
+        self._head = ""                    # 当前语句开头的有效文本（不含注释），用于判断语句类型
+        self._keep: Optional[bool] = None  # 是否需要保留（None 表示尚未确定）
+    
+    def feed(self, chunk: str) -> List[str]:
+        """
+        输入一块文本
+        
+        Args:
+            chunk: 文本块
+        
+        Returns:
+            List[str]: 本块中结束的表结构语句
+        """
+        return self._scan(self._pending + chunk, final=False)
+    
+    def close(self) -> List[str]:
+        """
+        结束输入
+        
+        Returns:
+            List[str]: 最后一条没有分号结尾的表结构语句（如果有）
+        """
+        statements = self._scan(self._pending, final=True)
+        statement = self._finish_statement()
+        if statement is not None:
+            statements.append(statement)
+        return statements
+    
+    def _scan(self, text: str, final: bool) -> List[str]:
+        """扫描文本，切分出已结束的语句（非最后一块时，末尾不完整的记号留到下一块）"""
+        self._pending = ""
+        statements = []
+        position = 0
+        length = len(text)
+        while position < length:
+            if self._state is None:
+                match = _NORMAL_TOKEN.search(text, position)
+                if match is None:
+                    self._append(self._hold_partial_token(text, position, final), significant=True)
+                    break
+                self._append(text[position:match.start()], significant=True)
+                token = match.group()
+                position = match.end()
+                if token == ";":
+                    self._append(token, significant=False)
+                    statement = self._finish_statement()
+                    if statement is not None:
+                        statements.append(statement)
+                else:
+                    # 引号计入语句开头（如 CREATE TABLE `users`），注释不计入
+                    self._append(token, significant=token in "'\"`")
+                    self._state = token
+            else:
+                position = self._scan_closing(text, position, final)
+        return statements
+    
+    def _hold_partial_token(self, text: str, position: int, final: bool) -> str:
+        """返回 text[position:] 中可以处理的部分，末尾可能是记号前半部分的字符留到下一块"""
+        if not final and position < len(text) and text[-1] in _PARTIAL_TOKEN_CHARS[self._state]:
+            self._pending = text[-1]
+            return text[position:-1]
+        return text[position:]
+    
+    def _scan_closing(self, text: str, position: int, final: bool) -> int:
+        """在字符串/注释状态下查找结束记号，返回新的扫描位置"""
+        pattern = _CLOSING_TOKEN[self._state]
+        while True:
+            match = pattern.search(text, position)
+            if match is None:
+                self._append(self._hold_partial_token(text, position, final), significant=False)
+                return len(text)
+            if match.group()[0] == "\\" and len(match.group()) == 2:
+                # 转义字符：继续查找
+                self._append(text[position:match.end()], significant=False)
+                position = match.end()
+                continue
+            self._append(text[position:match.end()], significant=self._state in "'\"`")
+            self._state = None
+            return match.end()
+    
+    def _append(self, text: str, significant: bool) -> None:
+        """追加当前语句的文本"""
+        if not text:
+            return
+        if self._keep is not False:
+            self._parts.append(text)
+        if significant and self._keep is None:
+            # 只需语句开头的少量字符即可判断类型
+            fragment = (text if self._head else text.lstrip())[:_HEAD_LENGTH]
+            self._head = _WHITESPACE_PATTERN.sub(" ", self._head + fragment).upper()
+            self._decide()
+    
+    def _decide(self) -> None:
+        """根据语句开头判断是否需要保留（开头仍可能是某个保留语句的前缀时保持未定）"""
+        if _SCHEMA_STATEMENT_PATTERN.match(self._head):
+            self._keep = True
+        elif not any(
+            len(self._head) < len(prefix) and prefix.startswith(self._head)
+            for prefix in _SCHEMA_STATEMENT_PREFIXES
+        ):
+            self._keep = False
+            self._parts = []
+    
+    def _finish_statement(self) -> Optional[str]:
+        """结束当前语句，返回需要保留的语句文本"""
+        keep = self._keep is True or (
+            self._keep is None and _SCHEMA_STATEMENT_PATTERN.match(self._head) is not None
+        )
+        statement = "".join(self._parts) if keep else None
+        self._parts = []
+        self._head = ""
+        self._keep = None
+        return statement
+
+
+def iter_schema_statements(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    从文本块流中切分出表结构语句（CREATE TABLE / ALTER TABLE / CREATE INDEX）
+    
+    Args:
+        chunks: DDL 文本块（可为完整字符串的单元素列表）
+    
+    Yields:
+        str: 语句文本
+    """
+    splitter = SchemaStatementSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
@@ -0,0 +1,351 @@
+"""
+SQLite 文件仓储
+文件元数据按 file_id 索引存储，DDL 原文压缩后单独存放，状态更新为单行原子写入；
+数据库文件可被多个 uvicorn worker 共享
+"""
+import codecs
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import closing, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from config import settings
+from domain.ddl.file_repository import FileRepository
+from infrastructure.logging.logger import get_logger
+from infrastructure.parser.ddl_parser import tables_to_json
+
+logger = get_logger("file_repository")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL,
+    uploaded_at TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    error_message TEXT,
+    tables_json TEXT,
+    table_count INTEGER,
+    column_count INTEGER,
+    embedding_count INTEGER,
+    schema_fingerprint TEXT,
+    progress_embedded INTEGER,
+    progress_total INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_files_status ON files (status);
+CREATE TABLE IF NOT EXISTS file_contents (
+    file_id TEXT PRIMARY KEY REFERENCES files (file_id) ON DELETE CASCADE,
+    content BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+_METADATA_COLUMNS = (
+    "file_id, filename, status, uploaded_at, file_size, error_message, "
+    "table_count, column_count, embedding_count, schema_fingerprint, progress_embedded, progress_total"
+)
+
+# 旧版本数据库中缺少的列（启动时补齐）
+_ADDED_COLUMNS = {
+    "progress_embedded": "INTEGER",
+    "progress_total": "INTEGER",
+}
+
+
+# 流式压缩/解压 DDL 原文时每块的大小（字节）
+CONTENT_CHUNK_SIZE = 64 * 1024
+
+
+class CompressedContent:
+    """
+    zlib 压缩的 DDL 原文
+    
+    迭代时流式解压为 UTF-8 文本块；对象只持有压缩数据，可 pickle 后交给解析进程
+    """
+    
+    def __init__(self, data: bytes, chunk_size: int = CONTENT_CHUNK_SIZE):
+        """
+        Args:
+            data: zlib 压缩数据
+            chunk_size: 每次解压输出的最大字节数
+        """
+        self.data = data
+        self.chunk_size = chunk_size
+    
+    def __iter__(self) -> Iterator[str]:
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        remaining = self.data
+        while remaining:
+            text = decoder.decode(decompressor.decompress(remaining, self.chunk_size))
+            remaining = decompressor.unconsumed_tail
+            if text:
+                yield text
+        text = decoder.decode(decompressor.flush(), final=True)
+        if text:
+            yield text
+
+
+class SQLiteFileRepository(FileRepository):
+    """SQLite 文件仓储实现"""
+    
+    def __init__(self, db_path: str, busy_timeout: float = 5.0):
+        """
+        初始化仓储（自动建表）
+        
+        Args:
+            db_path: 数据库文件路径
+            busy_timeout: 等待其他进程释放写锁的时间（秒）
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._open()) as conn:
+            # WAL 模式：读写互不阻塞，适合多 worker 共享
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._add_missing_columns(conn)
+        
+        logger.info(f"SQLite file repository initialized: {db_path}")
+    
+    @staticmethod
+    def _add_missing_columns(conn: sqlite3.Connection) -> None:
+        """为旧版本创建的 files 表补齐新增列"""
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(files)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column in existing:
+                continue
+            try:
+                conn.execute(f"ALTER TABLE files ADD COLUMN {column} {column_type}")
+            except sqlite3.OperationalError as e:
+                # 多个 worker 同时启动时，其他 worker 可能已添加该列
+                if "duplicate column" not in str(e):
+                    raise
+    
+    def _open(self) -> sqlite3.Connection:
+        """创建数据库连接"""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """获取当前线程的连接并在事务中执行（异常时回滚）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        with conn:
+            yield conn
+    
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        """数据库行转换为文件数据字典"""
+        data = dict(row)
+        data["uploaded_at"] = datetime.fromisoformat(data["uploaded_at"])
+        if "tables_json" in data:
+            tables_json = data.pop("tables_json")
+            if tables_json is not None:
+                data["tables"] = json.loads(tables_json)
+        return data
+    
+    def create(
+        self,
+        file_id: str,
+        filename: str,
+        content: str,
+        file_size: int,
+        uploaded_at: datetime
+    ) -> None:
+        """保存新上传的文件（状态为 pending，DDL 原文 zlib 压缩存储）"""
+        self._insert(file_id, filename, zlib.compress(content.encode("utf-8")), file_size, uploaded_at)
+    
+    def create_from_chunks(
+        self,
+        file_id: str,
+        filename: str,
+        chunks: Iterable[bytes],
+        uploaded_at: datetime
+    ) -> int:
+        """逐块压缩并保存新上传的文件（状态为 pending）"""
+        compressor = zlib.compressobj()
+        compressed = []
+        file_size = 0
+        for chunk in chunks:
+            file_size += len(chunk)
+            compressed.append(compressor.compress(chunk))
+        compressed.append(compressor.flush())
+        self._insert(file_id, filename, b"".join(compressed), file_size, uploaded_at)
+        return file_size
+    
+    def _insert(
+        self,
+        file_id: str,
+        filename: str,
+        compressed: bytes,
+        file_size: int,
+        uploaded_at: datetime
+    ) -> None:
+        """写入文件元数据和压缩后的 DDL 原文"""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO files (file_id, filename, status, uploaded_at, file_size) "
+                "VALUES (?, ?, 'pending', ?, ?)",
+                (file_id, filename, uploaded_at.isoformat(), file_size)
+            )
+            conn.execute(
+                "INSERT INTO file_contents (file_id, content) VALUES (?, ?)",
+                (file_id, compressed)
+            )
+    
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """获取文件元数据（含表结构）"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT {_METADATA_COLUMNS}, tables_json FROM files WHERE file_id = ?",
+                (file_id,)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+    
+    def get_metadata(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """获取文件元数据（不含表结构，不解码 tables_json）"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT {_METADATA_COLUMNS} FROM files WHERE file_id = ?",
+                (file_id,)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+    
+    def get_content(self, file_id: str) -> Optional[str]:
+        """获取并解压 DDL 原文"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT content FROM file_contents WHERE file_id = ?", (file_id,)
+            ).fetchone()
+        return zlib.decompress(row["content"]).decode("utf-8") if row else None
+    
+    def iter_content(self, file_id: str) -> Optional[CompressedContent]:
+        """按块读取 DDL 原文（流式解压）"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT content FROM file_contents WHERE file_id = ?", (file_id,)
+            ).fetchone()
+        return CompressedContent(row["content"]) if row else None
+    
+    def exists(self, file_id: str) -> bool:
+        """检查文件是否存在"""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT 1 FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        return row is not None
+    
+    def update_status(self, file_id: str, status: str, error_message: Optional[str] = None) -> bool:
+        """更新处理状态（单行原子写入，同时清空向量化进度）"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE files SET status = ?, error_message = ?, "
+                "progress_embedded = NULL, progress_total = NULL WHERE file_id = ?",
+                (status, error_message, file_id)
+            )
+        return cursor.rowcount > 0
+    
+    def update_progress(self, file_id: str, embedded: int, total: int) -> bool:
+        """更新向量化进度（单行原子写入）"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE files SET progress_embedded = ?, progress_total = ? WHERE file_id = ?",
+                (embedded, total, file_id)
+            )
+        return cursor.rowcount > 0
+    
+    def save_parse_result(
+        self,
+        file_id: str,
+        tables: Sequence[Any],
+        embedding_count: int,
+        schema_fingerprint: str
+    ) -> bool:
+        """保存解析结果并将状态置为 ready（单行原子写入，TableInfo 在编码时逐表转换）"""
+        tables_json = tables_to_json(tables, ensure_ascii=False)
+        column_count = sum(
+            len(table.get("columns", [])) if isinstance(table, dict) else len(table.columns)
+            for table in tables
+        )
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE files SET status = 'ready', error_message = NULL, tables_json = ?, "
+                "table_count = ?, column_count = ?, embedding_count = ?, schema_fingerprint = ? "
+                "WHERE file_id = ?",
+                (
+                    tables_json,
+                    len(tables),
+                    column_count,
+                    embedding_count,
+                    schema_fingerprint,
+                    file_id
+                )
+            )
+        return cursor.rowcount > 0
+    
+    def delete(self, file_id: str) -> bool:
+        """删除文件（DDL 原文级联删除）"""
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+        return cursor.rowcount > 0
+    
+    def list_files(self, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """列出文件元数据（不含表结构详情）"""
+        sql = f"SELECT {_METADATA_COLUMNS} FROM files"
+        params: List[Any] = []
+        if statuses:
+            sql += f" WHERE status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        sql += " ORDER BY uploaded_at"
+        with self._transaction() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+    
+    def try_acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """尝试获取跨进程租约（不存在或已过期时获取成功）"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.expires_at < ?",
+                (name, owner, now + ttl_seconds, now)
+            )
+        return cursor.rowcount > 0
+    
+    def release_lease(self, name: str, owner: str) -> None:
+        """释放租约（仅持有者可释放）"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+
+# 全局单例
+_file_repository_instance: Optional[SQLiteFileRepository] = None
+
+
+def get_file_repository() -> SQLiteFileRepository:
+    """
+    获取文件仓储单例
+    
+    Returns:
+        SQLiteFileRepository: 文件仓储实例
+    """
+    global _file_repository_instance
+    if _file_repository_instance is None:
+        _file_repository_instance = SQLiteFileRepository(settings.file_repository_path)
+    return _file_repository_instance
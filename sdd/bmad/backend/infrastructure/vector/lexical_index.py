@@ -0,0 +1,194 @@
+"""
+表结构词法索引模块
+按文件构建的 BM25 倒排索引，与向量检索并行查询并按倒数排名融合（RRF）；
+问题只包含表名/字段名时直接由词法索引回答，不需要计算 embedding
+"""
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 标识符（可带表名前缀，如 orders.total_amount）
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+# 驼峰命名的单词（totalAmount -> total, amount）
+_CAMEL_WORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z0-9]+")
+_CJK_PATTERN = re.compile(r"[一-鿿]+")
+
+# BM25 参数
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def _identifier_terms(identifier: str) -> List[str]:
+    """标识符本身、点号分隔的各部分，以及下划线/驼峰拆分出的单词（小写、去重）"""
+    terms = [identifier.lower()]
+    for part in identifier.split("."):
+        terms.append(part.lower())
+        for word in part.split("_"):
+            terms.extend(match.lower() for match in _CAMEL_WORD_PATTERN.findall(word))
+    return list(dict.fromkeys(term for term in terms if term))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切分检索词：标识符按 snake_case / 驼峰 / 表名前缀拆分，中文取单字和双字
+    
+    Args:
+        text: 文档或问题文本
+    
+    Returns:
+        List[str]: 检索词列表（可重复，用于词频统计）
+    """
+    normalized = unicodedata.normalize("NFKC", text)
+    terms = []
+    for identifier in _IDENTIFIER_PATTERN.findall(normalized):
+        terms.extend(_identifier_terms(identifier))
+    for run in _CJK_PATTERN.findall(normalized):
+        terms.extend(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+class LexicalIndex:
+    """
+    单个文件的 BM25 倒排索引
+    
+    核心设计：
+    1. 文档与向量库中的表/字段文档一一对应（相同的 ID、文本和元数据）
+    2. 元数据中的表名、字段名和 表名.字段名 也作为检索词，保证精确命中
+    3. 另建 名称 -> 文档 的精确匹配表，用于识别只包含表名/字段名的问题
+    """
+    
+    def __init__(self, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        """
+        构建索引
+        
+        Args:
+            ids: 文档 ID
+            documents: 文档文本
+            metadatas: 文档元数据（type、table_name、column_name）
+        """
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._names: Dict[str, List[int]] = defaultdict(list)
+        lengths = []
+        
+        for index, (document, metadata) in enumerate(zip(self.documents, self.metadatas)):
+            table_name = metadata.get("table_name", "")
+            column_name = metadata.get("column_name")
+            if metadata.get("type") == "column" and column_name:
+                names = [f"{table_name}.{column_name}", column_name]
+            else:
+                names = [table_name]
+            for name in names:
+                if name:
+                    self._names[name.lower()].append(index)
+            
+            terms = tokenize(document)
+            for name in names:
+                terms.extend(_identifier_terms(name))
+            for term, frequency in Counter(terms).items():
+                self._postings[term].append((index, frequency))
+            lengths.append(len(terms))
+        
+        count = len(self.documents)
+        average_length = sum(lengths) / count if count else 0.0
+        # BM25 分母中与文档长度相关的部分，查询时直接使用
+        self._length_norms = [
+            BM25_K1 * (1 - BM25_B + BM25_B * length / average_length) if average_length else BM25_K1
+            for length in lengths
+        ]
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+    
+    def __len__(self) -> int:
+        return len(self.documents)
+    
+    def search(self, query_text: str, n_results: int) -> List[Tuple[int, float]]:
+        """
+        BM25 检索
+        
+        Args:
+            query_text: 查询文本
+            n_results: 返回结果数量
+        
+        Returns:
+            List[Tuple[int, float]]: (文档序号, 得分)，按得分降序
+        """
+        terms = [term for term in set(tokenize(query_text)) if term in self._idf]
+        # 出现在半数以上文档中的词（"表"、"字段"、公共前缀）区分度很低，
+        # 有更具区分度的词时跳过，避免遍历几乎整个倒排表
+        selective = [term for term in terms if len(self._postings[term]) * 2 <= len(self.documents)]
+        
+        scores: Dict[int, float] = defaultdict(float)
+        for term in selective or terms:
+            idf = self._idf[term]
+            for index, frequency in self._postings[term]:
+                scores[index] += idf * frequency * (BM25_K1 + 1) / (frequency + self._length_norms[index])
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+    
+    def exact_matches(self, query_text: str) -> Optional[List[int]]:
+        """
+        识别只包含表名/字段名的问题（如 "orders.total_amount"、"user_id"）
+        
+        Args:
+            query_text: 查询文本
+        
+        Returns:
+            List[int]: 命中的文档序号（按问题中出现的顺序）；
+                问题包含中文或无法精确匹配的词时返回 None
+        """
+        normalized = unicodedata.normalize("NFKC", query_text)
+        identifiers = _IDENTIFIER_PATTERN.findall(normalized)
+        if not identifiers or _CJK_PATTERN.search(normalized):
+            return None
+        
+        matches = {}
+        for identifier in identifiers:
+            indexes = self._names.get(identifier.lower())
+            if not indexes:
+                return None
+            matches.update(dict.fromkeys(indexes))
+        return list(matches)
+    
+    def to_results(self, ranked: Sequence[Tuple[int, float]]) -> Dict[str, List[List[Any]]]:
+        """
+        转换为与向量库查询相同的结果格式
+        
+        Args:
+            ranked: (文档序号, 距离) 列表
+        
+        Returns:
+            Dict: ids / documents / metadatas / distances（每项为单个查询的嵌套列表）
+        """
+        return {
+            "ids": [[self.ids[index] for index, _ in ranked]],
+            "documents": [[self.documents[index] for index, _ in ranked]],
+            "metadatas": [[self.metadatas[index] for index, _ in ranked]],
+            "distances": [[distance for _, distance in ranked]]
+        }
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    倒数排名融合：score(d) = Σ 1 / (k + rank)
+    
+    Args:
+        rankings: 多路检索结果的文档 ID（各自按相关性排序）
+        k: 平滑常数（越大，排名靠后的结果权重越接近靠前的结果）
+    
+    Returns:
+        List[Tuple[str, float]]: (文档 ID, 融合得分)，按得分降序
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
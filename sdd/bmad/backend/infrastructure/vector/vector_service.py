@@ -2,55 +2,422 @@
 向量化服务模块
 负责表结构的向量化和向量库管理
 """
+import hashlib
+import json
+import os
+import threading
 import time
-from typing import List, Dict, Any
+from contextlib import contextmanager
+from pathlib import Path
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import chromadb
 from chromadb.config import Settings as ChromaSettings
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
 
+from config import settings
+from domain.ddl.schema_renderer import render_table
 from infrastructure.parser.ddl_parser import TableInfo, TableColumn
+from infrastructure.cache.embedding_cache import EmbeddingCache, embedding_cache_key, get_embedding_cache
+from infrastructure.vector.lexical_index import LexicalIndex, reciprocal_rank_fusion
 from infrastructure.logging.logger import get_logger
 
+try:
+    import fcntl  # 清单文件的跨进程锁（POSIX）
+except ImportError:  # pragma: no cover - Windows 下退化为进程内锁
+    fcntl = None
+
 logger = get_logger("vector_service")
 
+# 向量化进度回调：(已处理条目数, 条目总数)
+ProgressCallback = Callable[[int, int], None]
+
+
+def _content_hash(document: str) -> str:
+    """计算向量文档文本的内容哈希（用于增量向量化）"""
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
 
 class VectorService:
     """向量化服务"""
     
-    def __init__(self):
-        """初始化向量库（内存模式）"""
-        logger.info("Initializing Chroma vector store (in-memory mode)...")
+    MANIFEST_FILENAME = "manifest.json"
+    # 按内容哈希查找已有 embedding 时每批的哈希数量
+    HASH_LOOKUP_BATCH_SIZE = 500
+    
+    def __init__(
+        self,
+        persist_path: Optional[str] = None,
+        embedding_cache: Optional[EmbeddingCache] = None
+    ):
+        """
+        初始化向量库
+        
+        Args:
+            persist_path: 持久化目录（为空时按配置选择：CHROMA_SERVER_HOST 不为空时连接 Chroma 服务，
+                否则使用 VECTOR_STORE_PATH，均为空则使用内存模式）
+            embedding_cache: embedding 缓存（为空时按 EMBEDDING_CACHE_PATH 配置创建，未配置则不启用）
+        """
+        self.persist_path = persist_path if persist_path is not None else settings.vector_store_path
+        self.server_host = settings.chroma_server_host if persist_path is None else ""
+        
+        if self.server_host:
+            # 独立的 Chroma 服务：多个 worker 共享同一份向量
+            logger.info(
+                f"Connecting to Chroma server at {self.server_host}:{settings.chroma_server_port}..."
+            )
+            self.persist_path = ""  # 持久化由 Chroma 服务负责，本地不维护清单
+            self.client = chromadb.HttpClient(
+                host=self.server_host,
+                port=settings.chroma_server_port,
+                settings=ChromaSettings(anonymized_telemetry=False)
+            )
+        elif self.persist_path:
+            logger.info(f"Initializing Chroma vector store (persistent mode: {self.persist_path})...")
+            Path(self.persist_path).mkdir(parents=True, exist_ok=True)
+            self.client = chromadb.PersistentClient(
+                path=self.persist_path,
+                settings=ChromaSettings(anonymized_telemetry=False)
+            )
+        else:
+            logger.info("Initializing Chroma vector store (in-memory mode)...")
+            
+            # 创建内存向量库
+            self.client = chromadb.Client(ChromaSettings(
+                is_persistent=False,  # 内存模式
+                anonymized_telemetry=False
+            ))
         
-        # 创建内存向量库
-        self.client = chromadb.Client(ChromaSettings(
-            is_persistent=False,  # 内存模式
-            anonymized_telemetry=False
-        ))
+        # 默认的 embedding function（sentence-transformers，ONNX 运行）
+        # 显式持有实例，供查询缓存等模块复用同一模型
+        self.embedding_function = DefaultEmbeddingFunction()
+        # 模型标识参与 embedding 缓存键，更换模型后旧缓存自然失效
+        self.embedding_model_id = (
+            f"{self.embedding_function.name()}:"
+            f"{json.dumps(self.embedding_function.get_config(), sort_keys=True)}"
+        )
+        self.embedding_cache = embedding_cache if embedding_cache is not None else get_embedding_cache()
+        self.embed_batch_size = max(1, settings.ingestion_embed_batch_size)
+        self.embed_batch_workers = max(1, settings.ingestion_embed_batch_workers)
         
         # 创建集合（用于存储表结构向量）
-        # 使用默认的 embedding function（sentence-transformers）
         self.collection = self.client.get_or_create_collection(
             name="ddl_schema",
-            metadata={"description": "Database schema embeddings"}
+            metadata={"description": "Database schema embeddings"},
+            embedding_function=self.embedding_function
         )
         
+        # 文件清单：file_id -> {schema_fingerprint, embedding_count}
+        # 持久化模式下写入 manifest.json，重启时据此校验已持久化的向量
+        self._manifest_lock = threading.Lock()
+        self._manifest: Dict[str, Dict[str, Any]] = self._load_manifest()
+        
+        # 按文件的词法索引（LRU，首次检索时从向量库读取文档构建，文件重新向量化或删除时失效）
+        self._lexical_lock = threading.Lock()
+        self._lexical_indexes: "OrderedDict[str, LexicalIndex]" = OrderedDict()
+        if self.persist_path:
+            self._validate_persisted_vectors()
+        
         logger.info(f"Vector store initialized: collection=ddl_schema")
     
-    def vectorize_tables(self, tables: List[TableInfo], file_id: str) -> int:
+    @property
+    def is_persistent(self) -> bool:
+        """是否为持久化模式（本地目录或 Chroma 服务）"""
+        return bool(self.persist_path or self.server_host)
+    
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """读取文件清单（内存模式或文件不存在时为空）"""
+        if not self.persist_path:
+            return {}
+        manifest_path = Path(self.persist_path) / self.MANIFEST_FILENAME
+        if not manifest_path.exists():
+            return {}
+        try:
+            return json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read vector store manifest, ignoring it: {e}")
+            return {}
+    
+    @contextmanager
+    def _manifest_file_lock(self) -> Iterator[None]:
+        """清单文件的跨进程排他锁（同一目录可能被其他进程写入）"""
+        with self._manifest_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_path = Path(self.persist_path) / f"{self.MANIFEST_FILENAME}.lock"
+            with open(lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _save_manifest(self, changes: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        """
+        合并写入文件清单
+        
+        在跨进程锁内重新读取磁盘上的清单，只更新本次变化的文件（None 表示删除），
+        避免用本进程的视图覆盖其他进程写入的条目；先写临时文件再替换，避免写到一半时进程退出导致清单损坏
+        
+        Args:
+            changes: file_id -> 清单条目（None 表示删除）
+        """
+        if not self.persist_path:
+            with self._manifest_lock:
+                for file_id, entry in changes.items():
+                    if entry is None:
+                        self._manifest.pop(file_id, None)
+                    else:
+                        self._manifest[file_id] = entry
+            return
+        
+        manifest_path = Path(self.persist_path) / self.MANIFEST_FILENAME
+        tmp_path = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with self._manifest_file_lock():
+            manifest = self._load_manifest()
+            for file_id, entry in changes.items():
+                if entry is None:
+                    manifest.pop(file_id, None)
+                else:
+                    manifest[file_id] = entry
+            tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp_path, manifest_path)
+            self._manifest = manifest
+    
+    def _validate_persisted_vectors(self) -> None:
+        """
+        启动时校验持久化的向量与文件清单是否一致
+        
+        清单中有记录、但条目数或 schema 指纹不一致的文件会被删除，对应文件需要重新处理。
+        清单中没有记录的向量不在这里删除（可能是其他进程刚写入的），
+        由 drop_orphaned_vectors 按文件仓储清理
+        """
+        start_time = time.time()
+        stored = self.collection.get(include=["metadatas"])
+        
+        counts: Dict[str, int] = {}
+        fingerprints: Dict[str, set] = {}
+        for metadata in stored.get("metadatas") or []:
+            file_id = metadata.get("file_id")
+            counts[file_id] = counts.get(file_id, 0) + 1
+            fingerprints.setdefault(file_id, set()).add(metadata.get("schema_fingerprint", ""))
+        
+        with self._manifest_file_lock():
+            manifest = self._load_manifest()
+        stale = [
+            file_id for file_id, entry in manifest.items()
+            if counts.get(file_id) != entry.get("embedding_count")
+            or fingerprints.get(file_id) != {entry.get("schema_fingerprint", "")}
+        ]
+        
+        for file_id in stale:
+            logger.warning(f"Dropping stale persisted vectors for file_id={file_id}")
+            self._delete_file_vectors(file_id)
+        self._manifest = manifest
+        if stale:
+            self._save_manifest({file_id: None for file_id in stale})
+        
+        unrecorded = [file_id for file_id in counts if file_id not in self._manifest]
+        if unrecorded:
+            logger.info(f"{len(unrecorded)} files have vectors but no manifest entry, left untouched")
+        
+        elapsed = time.time() - start_time
+        logger.info(
+            f"Persisted vector store loaded: {len(self._manifest)} files, "
+            f"{sum(counts.get(f, 0) for f in self._manifest)} embeddings in {elapsed:.2f}s"
+        )
+    
+    def drop_orphaned_vectors(self, list_file_ids: Callable[[], Iterable[str]]) -> List[str]:
+        """
+        删除文件仓储中已不存在的文件的向量（如删除文件时进程退出留下的向量）
+        
+        以共享的文件仓储为准，而不是本进程的清单；先读取向量再读取文件列表，
+        读取期间新上传的文件已在仓储中，不会被误删
+        
+        Args:
+            list_file_ids: 返回文件仓储中所有 file_id 的函数
+        
+        Returns:
+            List[str]: 被清理的 file_id
+        """
+        stored = self.collection.get(include=["metadatas"])
+        vector_file_ids = {metadata.get("file_id") for metadata in stored.get("metadatas") or []}
+        orphaned = sorted(vector_file_ids - set(list_file_ids()))
+        for file_id in orphaned:
+            logger.warning(f"Dropping vectors of deleted file_id={file_id}")
+            self.delete_file(file_id)
+        return orphaned
+    
+    def _reuse_vectors(
+        self,
+        file_id: str,
+        schema_fingerprint: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Optional[Dict[str, int]]:
+        """
+        schema 指纹未变化时复用已有向量，避免重新计算 embedding
+        
+        Args:
+            file_id: 文件 ID
+            schema_fingerprint: schema 指纹
+            progress_callback: 进度回调 (已处理条目数, 条目总数)，复制向量时每页完成后调用
+        
+        Returns:
+            Dict[str, int]: 复用统计（同 _sync_file_vectors），无可复用向量时返回 None
+        """
+        # 同一文件重新处理且 schema 未变化：向量保持不变
+        count = self._count_file_vectors(file_id, schema_fingerprint)
+        if count is not None:
+            logger.info(f"Schema unchanged for file_id={file_id}, reusing {count} embeddings")
+            if progress_callback:
+                progress_callback(count, count)
+            return {"count": count, "embedded": 0, "copied": 0, "cache_hits": 0, "unchanged": count, "deleted": 0}
+        
+        # 按向量元数据查找 schema 相同的其他文件（共享向量库时可复用其他 worker 写入的向量）
+        match = self.collection.get(
+            where={"$and": [{"schema_fingerprint": schema_fingerprint}, {"file_id": {"$ne": file_id}}]},
+            limit=1,
+            include=["metadatas"]
+        )
+        source_id = match["metadatas"][0]["file_id"] if match["ids"] else None
+        
+        # 其他文件的 schema 完全相同（如重复上传）：按 embed_batch_size 分页复制其向量
+        # （内存占用与 schema 大小无关，且每次写入不超过向量库的单批上限）
+        total = self._count_file_vectors(source_id, schema_fingerprint) if source_id else None
+        if total:
+            self._delete_file_vectors(file_id)
+            prefix = f"{source_id}:"
+            count = 0
+            if progress_callback:
+                progress_callback(0, total)
+            while True:
+                page = self.collection.get(
+                    where={"file_id": source_id},
+                    limit=self.embed_batch_size,
+                    offset=count,
+                    include=["embeddings", "documents", "metadatas"]
+                )
+                if not page["ids"]:
+                    break
+                self.collection.add(
+                    ids=[f"{file_id}:{id_[len(prefix):]}" for id_ in page["ids"]],
+                    embeddings=page["embeddings"],
+                    documents=page["documents"],
+                    metadatas=[{**metadata, "file_id": file_id} for metadata in page["metadatas"]]
+                )
+                count += len(page["ids"])
+                if progress_callback:
+                    progress_callback(count, total)
+            self._record_vectors(file_id, schema_fingerprint, count)
+            logger.info(f"Copied {count} embeddings from file_id={source_id} (identical schema)")
+            return {"count": count, "embedded": 0, "copied": count, "cache_hits": 0, "unchanged": 0, "deleted": 0}
+        
+        return None
+    
+    def _record_vectors(self, file_id: str, schema_fingerprint: str, embedding_count: int) -> None:
+        """在文件清单中记录文件的向量信息"""
+        self._save_manifest({
+            file_id: {"schema_fingerprint": schema_fingerprint, "embedding_count": embedding_count}
+        })
+    
+    def has_file_vectors(self, file_id: str, schema_fingerprint: Optional[str]) -> bool:
+        """
+        检查向量库中是否有该文件指定 schema 指纹的完整向量
+        
+        Args:
+            file_id: 文件 ID
+            schema_fingerprint: schema 指纹
+        
+        Returns:
+            bool: True 如果向量完整可用
+        """
+        return self._count_file_vectors(file_id, schema_fingerprint) is not None
+    
+    def _count_file_vectors(self, file_id: str, schema_fingerprint: Optional[str]) -> Optional[int]:
+        """
+        统计文件指定 schema 指纹的向量条目数
+        
+        以向量元数据为准（共享向量库时其他 worker 写入的向量同样可见）；
+        本进程清单中有记录时，同时校验条目数是否完整
+        
+        Returns:
+            int: 条目数，向量不存在、指纹不一致或不完整时返回 None
+        """
+        if not schema_fingerprint:
+            return None
+        stored = self.collection.get(where={"file_id": file_id}, include=["metadatas"])
+        metadatas = stored.get("metadatas") or []
+        if not metadatas or any(m.get("schema_fingerprint") != schema_fingerprint for m in metadatas):
+            return None
+        with self._manifest_lock:
+            entry = self._manifest.get(file_id)
+        if entry and entry.get("embedding_count") != len(metadatas):
+            return None
+        return len(metadatas)
+    
+    def delete_file(self, file_id: str) -> None:
+        """
+        删除文件的所有向量和清单记录
+        
+        Args:
+            file_id: 文件 ID
+        """
+        self._delete_file_vectors(file_id)
+        self._invalidate_lexical_index(file_id)
+        self._save_manifest({file_id: None})
+    
+    def vectorize_tables(
+        self,
+        tables: List[TableInfo],
+        file_id: str,
+        schema_fingerprint: Optional[str] = None
+    ) -> int:
         """
-        向量化表结构信息
+        向量化表结构信息（按文档内容哈希增量更新，只为新增或变化的表/字段计算 embedding）
         
         Args:
             tables: 表结构信息列表
             file_id: 文件 ID（用于关联）
-            
+            schema_fingerprint: schema 指纹（可选，提供时指纹相同的已有向量直接复用）
+        
         Returns:
             int: 向量化的条目数量
         """
+        return self.vectorize_tables_with_stats(tables, file_id, schema_fingerprint)["count"]
+    
+    def vectorize_tables_with_stats(
+        self,
+        tables: List[TableInfo],
+        file_id: str,
+        schema_fingerprint: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        向量化表结构信息并返回统计
+        
+        文档按表逐个生成、按批处理：每批独立完成差异比较、embedding 计算和写入，
+        多个批次在线程池中并行，同时在途的批次数有上限，内存占用与 schema 规模无关
+        
+        Args:
+            tables: 表结构信息列表
+            file_id: 文件 ID（用于关联）
+            schema_fingerprint: schema 指纹（可选，提供时指纹相同的已有向量直接复用）
+            progress_callback: 进度回调 (已处理条目数, 条目总数)，每批完成后调用
+        
+        Returns:
+            Dict[str, Any]: 条目总数（count）、各来源的条目数（embedded 重新计算、copied 从向量库复制、
+                cache_hits 命中 embedding 缓存、unchanged 保持不变）、deleted 删除数和
+                cache_hit_ratio（cache_hits / (cache_hits + embedded)）
+        """
         logger.info(f"Starting vectorization for {len(tables)} tables...")
         start_time = time.time()
         
-        # 🔧 先删除该文件的旧向量（避免重复上传导致 ID 冲突）
-        self._delete_file_vectors(file_id)
+        if schema_fingerprint:
+            reused = self._reuse_vectors(file_id, schema_fingerprint, progress_callback)
+            if reused is not None:
+                return self._with_hit_ratio(reused)
         
         # 🔍 检查并去重表名（保留第一个出现的表）
         seen_names = set()
@@ -66,52 +433,248 @@ class VectorService:
             logger.warning(f"Removed {len(tables) - len(unique_tables)} duplicate tables")
             tables = unique_tables  # 使用去重后的表列表
         
-        documents = []  # 文本内容
-        metadatas = []  # 元数据
-        ids = []        # 唯一 ID
+        total = len(tables) + sum(len(table.columns) for table in tables)
+        if progress_callback:
+            progress_callback(0, total)
+        
+        stats = {"count": 0, "embedded": 0, "copied": 0, "cache_hits": 0, "unchanged": 0, "deleted": 0}
+        wanted_ids = set()
+        max_in_flight = self.embed_batch_workers * 2
+        
+        def collect(future: Future) -> None:
+            for key, value in future.result().items():
+                stats[key] += value
+            if progress_callback:
+                progress_callback(stats["count"], total)
+        
+        with ThreadPoolExecutor(
+            max_workers=self.embed_batch_workers, thread_name_prefix="embed-batch"
+        ) as pool:
+            in_flight: Deque[Future] = deque()
+            batches = self._iter_document_batches(tables, file_id, schema_fingerprint or "")
+            for ids, documents, metadatas in batches:
+                wanted_ids.update(ids)
+                in_flight.append(pool.submit(self._sync_batch, ids, documents, metadatas))
+                if len(in_flight) >= max_in_flight:
+                    collect(in_flight.popleft())
+            while in_flight:
+                collect(in_flight.popleft())
+        
+        stats["deleted"] = self._delete_stale_vectors(file_id, wanted_ids)
+        stats = self._with_hit_ratio(stats)
+        self._invalidate_lexical_index(file_id)
+        self._record_vectors(file_id, schema_fingerprint or "", stats["count"])
+        
+        elapsed = time.time() - start_time
+        logger.info(
+            f"Vectorization completed: {stats['count']} entries in {elapsed:.2f}s "
+            f"(embedded={stats['embedded']}, copied={stats['copied']}, "
+            f"cache_hits={stats['cache_hits']}, unchanged={stats['unchanged']}, "
+            f"deleted={stats['deleted']}, hit_ratio={stats['cache_hit_ratio']:.2%})"
+        )
+        
+        return stats
+    
+    @staticmethod
+    def _with_hit_ratio(stats: Dict[str, Any]) -> Dict[str, Any]:
+        """补充 embedding 缓存命中率：查询缓存的条目中命中的占比（复制和未变化的条目不查询缓存，不计入）"""
+        lookups = stats["cache_hits"] + stats["embedded"]
+        stats["cache_hit_ratio"] = round(stats["cache_hits"] / lookups, 4) if lookups else 0.0
+        return stats
+    
+    def _iter_document_batches(
+        self,
+        tables: List[TableInfo],
+        file_id: str,
+        schema_fingerprint: str
+    ) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]]]]:
+        """
+        逐表生成表/字段文档，按 embed_batch_size 分批产出
+        
+        Args:
+            tables: 表结构信息列表（已去重）
+            file_id: 文件 ID
+            schema_fingerprint: schema 指纹
         
+        Yields:
+            Tuple: (条目 ID 列表, 文档文本列表, 元数据列表)
+        """
+        ids, documents, metadatas = [], [], []
         for table in tables:
             # 为每个表生成向量
             table_doc = self._generate_table_document(table)
-            table_id = f"{file_id}:table:{table.name}"
-            
+            ids.append(f"{file_id}:table:{table.name}")
             documents.append(table_doc)
             metadatas.append({
                 "type": "table",
                 "file_id": file_id,
+                "schema_fingerprint": schema_fingerprint,
+                "content_hash": _content_hash(table_doc),
                 "table_name": table.name,
-                "column_count": len(table.columns)
+                "column_count": len(table.columns),
+                # 紧凑表结构（检索命中该表时直接返回给 Agent）
+                "schema": render_table(table.to_dict())
             })
-            ids.append(table_id)
             
             # 为每个字段生成向量
             for col in table.columns:
                 col_doc = self._generate_column_document(table.name, col)
-                col_id = f"{file_id}:column:{table.name}.{col.name}"
-                
+                ids.append(f"{file_id}:column:{table.name}.{col.name}")
                 documents.append(col_doc)
-                metadatas.append({
+                col_metadata = {
                     "type": "column",
                     "file_id": file_id,
+                    "schema_fingerprint": schema_fingerprint,
+                    "content_hash": _content_hash(col_doc),
                     "table_name": table.name,
                     "column_name": col.name,
                     "data_type": col.data_type
-                })
-                ids.append(col_id)
-        
-        # 批量添加到向量库
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+                }
+                if col.comment:
+                    col_metadata["comment"] = col.comment
+                metadatas.append(col_metadata)
+            
+            # 同一张表的文档放在同一批，避免字段 ID 跨批重复时被静默覆盖
+            if len(ids) >= self.embed_batch_size:
+                yield ids, documents, metadatas
+                ids, documents, metadatas = [], [], []
         
-        elapsed = time.time() - start_time
-        logger.info(
-            f"Vectorization completed: {len(documents)} embeddings in {elapsed:.2f}s"
+        if ids:
+            yield ids, documents, metadatas
+    
+    def _sync_batch(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> Dict[str, int]:
+        """
+        按文档内容哈希增量同步一批向量：
+        内容未变的条目只更新元数据，内容相同的条目（任意文件）复制已有 embedding，
+        其余条目先查 embedding 缓存、未命中再计算
+        
+        Args:
+            ids: 条目 ID 列表
+            documents: 文档文本列表
+            metadatas: 元数据列表（含 content_hash）
+        
+        Returns:
+            Dict[str, int]: 各类条目数量（count/embedded/copied/cache_hits/unchanged）
+        """
+        existing = self.collection.get(ids=ids, include=["metadatas"])
+        existing_metadatas = dict(zip(existing["ids"], existing["metadatas"]))
+        
+        unchanged_ids, unchanged_metadatas = [], []
+        pending = []
+        for index, (id_, metadata) in enumerate(zip(ids, metadatas)):
+            old_metadata = existing_metadatas.get(id_)
+            if old_metadata and old_metadata.get("content_hash") == metadata["content_hash"]:
+                # 内容未变：保留 embedding，仅在元数据（如 schema 指纹）变化时更新
+                if old_metadata != metadata:
+                    unchanged_ids.append(id_)
+                    unchanged_metadatas.append(metadata)
+            else:
+                pending.append(index)
+        
+        if unchanged_ids:
+            self.collection.update(ids=unchanged_ids, metadatas=unchanged_metadatas)
+        
+        # 内容相同的文档（如重新上传后的新文件）直接复制向量库中已有的 embedding
+        embeddings = {}
+        known_embeddings = self._find_embeddings_by_hash(
+            {metadatas[index]["content_hash"] for index in pending}
         )
+        for index in pending:
+            if metadatas[index]["content_hash"] in known_embeddings:
+                embeddings[index] = known_embeddings[metadatas[index]["content_hash"]]
+        copied = len(embeddings)
+        
+        # 其次查询 embedding 缓存（跨文件、跨重启，按模型 + 文档文本寻址）
+        cache_hits = 0
+        if self.embedding_cache is not None:
+            cache_keys = {
+                index: embedding_cache_key(self.embedding_model_id, documents[index])
+                for index in pending
+            }
+            cached = self.embedding_cache.get_many(
+                [cache_keys[index] for index in pending if index not in embeddings]
+            )
+            for index in pending:
+                if index not in embeddings and cache_keys[index] in cached:
+                    embeddings[index] = cached[cache_keys[index]]
+                    cache_hits += 1
         
-        return len(documents)
+        # 剩余条目计算 embedding（启用缓存时显式计算以便写入缓存，否则交给集合的 embedding function）
+        missing = [index for index in pending if index not in embeddings]
+        if missing and self.embedding_cache is not None:
+            computed = self.embedding_function([documents[index] for index in missing])
+            embeddings.update(zip(missing, computed))
+        
+        known = [index for index in pending if index in embeddings]
+        if known:
+            self.collection.upsert(
+                ids=[ids[index] for index in known],
+                embeddings=[embeddings[index] for index in known],
+                documents=[documents[index] for index in known],
+                metadatas=[metadatas[index] for index in known]
+            )
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many({cache_keys[index]: embeddings[index] for index in known})
+        
+        unknown = [index for index in pending if index not in embeddings]
+        if unknown:
+            self.collection.upsert(
+                ids=[ids[index] for index in unknown],
+                documents=[documents[index] for index in unknown],
+                metadatas=[metadatas[index] for index in unknown]
+            )
+        
+        return {
+            "count": len(ids),
+            "embedded": len(missing),
+            "copied": copied,
+            "cache_hits": cache_hits,
+            "unchanged": len(ids) - len(pending)
+        }
+    
+    def _delete_stale_vectors(self, file_id: str, wanted_ids: Set[str]) -> int:
+        """
+        删除文件中已不存在的表/字段的向量
+        
+        Args:
+            file_id: 文件 ID
+            wanted_ids: 本次向量化的全部条目 ID
+        
+        Returns:
+            int: 删除的条目数
+        """
+        existing = self.collection.get(where={"file_id": file_id}, include=[])
+        stale_ids = [id_ for id_ in existing["ids"] if id_ not in wanted_ids]
+        if stale_ids:
+            self.collection.delete(ids=stale_ids)
+        return len(stale_ids)
+    
+    def _find_embeddings_by_hash(self, content_hashes: set) -> Dict[str, Any]:
+        """
+        按内容哈希查找向量库中已有的 embedding
+        
+        Args:
+            content_hashes: 内容哈希集合
+        
+        Returns:
+            Dict[str, Any]: 内容哈希 -> embedding
+        """
+        found = {}
+        hashes = list(content_hashes)
+        for start in range(0, len(hashes), self.HASH_LOOKUP_BATCH_SIZE):
+            batch = hashes[start:start + self.HASH_LOOKUP_BATCH_SIZE]
+            result = self.collection.get(
+                where={"content_hash": {"$in": batch}},
+                include=["embeddings", "metadatas"]
+            )
+            for embedding, metadata in zip(result["embeddings"], result["metadatas"]):
+                found.setdefault(metadata["content_hash"], embedding)
+        return found
     
     def _delete_file_vectors(self, file_id: str) -> None:
         """
@@ -135,7 +698,7 @@ class VectorService:
                 logger.info(f"Successfully deleted old vectors")
             else:
                 logger.debug(f"No existing vectors found for file_id={file_id}")
-                
+        
         except Exception as e:
             logger.warning(f"Failed to delete old vectors: {e}")
             # 不阻塞主流程，继续添加新向量
@@ -146,7 +709,7 @@ class VectorService:
         
         Args:
             table: 表结构信息
-            
+        
         Returns:
             str: 表的文本描述
         """
@@ -163,6 +726,15 @@ class VectorService:
         if table.primary_keys:
             doc_parts.append(f"主键: {', '.join(table.primary_keys)}")
         
+        # 添加外键（关联关系）
+        if table.foreign_keys:
+            references = [
+                f"{fk['column']} -> {fk['ref_table']}.{fk['ref_column']}" if fk['ref_column']
+                else f"{fk['column']} -> {fk['ref_table']}"
+                for fk in table.foreign_keys
+            ]
+            doc_parts.append(f"外键: {', '.join(references)}")
+        
         # 添加注释
         if table.comment:
             doc_parts.append(f"说明: {table.comment}")
@@ -176,7 +748,7 @@ class VectorService:
         Args:
             table_name: 表名
             column: 字段信息
-            
+        
         Returns:
             str: 字段的文本描述
         """
@@ -196,23 +768,114 @@ class VectorService:
         
         return " | ".join(doc_parts)
     
-    def query_schema(self, query_text: str, n_results: int = 5) -> List[Dict[str, Any]]:
+    def query_schema(
+        self,
+        query_text: str,
+        n_results: int = 5,
+        file_id: Optional[str] = None
+    ) -> Dict[str, List[List[Any]]]:
         """
         查询相关的表结构信息
         
+        指定文件时使用混合检索：
+        1. 问题只包含表名/字段名（如 orders.total_amount）时直接由词法索引返回，不计算 embedding
+        2. 否则 BM25 与向量检索各取候选，按倒数排名融合（RRF）；
+           融合结果的距离为 1 - 融合得分 / 最高融合得分
+        
         Args:
             query_text: 查询文本
             n_results: 返回结果数量
-            
+            file_id: 文件 ID（可选，提供时只在该文件的表结构中检索）
+        
         Returns:
-            List[Dict[str, Any]]: 相关的表结构信息
+            Dict: 向量库查询格式的结果（ids / documents / metadatas / distances）
         """
-        results = self.collection.query(
+        index = self._get_lexical_index(file_id) if file_id and settings.hybrid_search_enabled else None
+        if index is None:
+            return self._query_vectors(query_text, n_results, file_id)
+        
+        exact = index.exact_matches(query_text)
+        if exact is not None:
+            logger.info(f"Exact schema name match, embedding skipped: {query_text[:50]}")
+            ranked = exact[:n_results]
+            ranked += [i for i, _ in index.search(query_text, n_results + len(ranked)) if i not in ranked]
+            return index.to_results([(i, 0.0) for i in ranked[:n_results]])
+        
+        candidates = n_results * 2
+        lexical = [i for i, _ in index.search(query_text, candidates)]
+        vector_results = self._query_vectors(query_text, candidates, file_id)
+        
+        # 候选文档（两路检索的文档来自同一份向量库）
+        entries = {
+            doc_id: (document, metadata)
+            for doc_id, document, metadata in zip(
+                vector_results["ids"][0], vector_results["documents"][0], vector_results["metadatas"][0]
+            )
+        }
+        entries.update((index.ids[i], (index.documents[i], index.metadatas[i])) for i in lexical)
+        lexical_ids = [index.ids[i] for i in lexical]
+        
+        fused = reciprocal_rank_fusion([lexical_ids, vector_results["ids"][0]], k=settings.hybrid_rrf_k)[:n_results]
+        top_score = fused[0][1] if fused else 1.0
+        return {
+            "ids": [[doc_id for doc_id, _ in fused]],
+            "documents": [[entries[doc_id][0] for doc_id, _ in fused]],
+            "metadatas": [[entries[doc_id][1] for doc_id, _ in fused]],
+            "distances": [[round(1 - score / top_score, 4) for _, score in fused]]
+        }
+    
+    def _query_vectors(self, query_text: str, n_results: int, file_id: Optional[str]) -> Dict[str, List[List[Any]]]:
+        """向量检索（计算问题的 embedding）"""
+        return self.collection.query(
             query_texts=[query_text],
-            n_results=n_results
+            n_results=n_results,
+            where={"file_id": file_id} if file_id else None
         )
+    
+    def _get_lexical_index(self, file_id: str) -> Optional[LexicalIndex]:
+        """
+        获取文件的词法索引（不存在时从向量库读取文档构建，不需要 embedding）
+        
+        Args:
+            file_id: 文件 ID
         
-        return results
+        Returns:
+            LexicalIndex: 词法索引，文件尚未向量化时返回 None
+        """
+        with self._lexical_lock:
+            index = self._lexical_indexes.get(file_id)
+            if index is not None:
+                self._lexical_indexes.move_to_end(file_id)
+                return index
+        
+        stored = self.collection.get(where={"file_id": file_id}, include=["documents", "metadatas"])
+        if not stored["ids"]:
+            return None
+        index = LexicalIndex(stored["ids"], stored["documents"], stored["metadatas"])
+        logger.info(f"Lexical index built for {file_id}: {len(index)} documents")
+        
+        with self._lexical_lock:
+            self._lexical_indexes[file_id] = index
+            while len(self._lexical_indexes) > max(1, settings.lexical_index_cache_size):
+                self._lexical_indexes.popitem(last=False)
+        return index
+    
+    def _invalidate_lexical_index(self, file_id: str) -> None:
+        """使文件的词法索引失效"""
+        with self._lexical_lock:
+            self._lexical_indexes.pop(file_id, None)
+    
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        使用向量库相同的 embedding 模型计算文本向量
+        
+        Args:
+            texts: 文本列表
+        
+        Returns:
+            List[List[float]]: 向量列表
+        """
+        return [list(map(float, vector)) for vector in self.embedding_function(texts)]
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -225,6 +888,10 @@ class VectorService:
         return {
             "total_embeddings": count,
             "collection_name": self.collection.name,
+            "persistent": self.is_persistent,
+            "shared": bool(self.server_host),
+            "file_count": len(self._manifest),
+            "embedding_cache": self.embedding_cache is not None,
             "status": "initialized" if count > 0 else "empty"
         }
 
@@ -2,23 +2,63 @@
 对话控制器
 处理用户消息、意图识别、SQL 生成或普通对话
 """
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException, Header
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, Optional
 
 from interface.dto.chat_dto import ChatRequest, ChatResponse
 from domain.agent.intent_recognizer import get_intent_recognizer
 from application.agent_service import get_agent_service
+from domain.sql.sql_validator import get_sql_validator
+from domain.sql.symbol_table import get_symbol_table_registry
+from infrastructure.repository.sqlite_file_repository import get_file_repository
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("chat_controller")
 router = APIRouter()
 
+# 普通对话系统提示
+GENERAL_CHAT_SYSTEM_PROMPT = """你是一个友好的 RAG Text-to-SQL 智能助手。
+
+你的主要功能是：
+1. 帮助用户将自然语言转换为SQL查询（需要用户上传DDL文件）
+2. 回答用户的日常问题和提供帮助
+
+当用户进行普通对话时：
+- 友好、自然地回应
+- 如果用户询问你的功能，简要介绍你的SQL生成能力
+- 保持简洁，避免过长的回复
+- 如果用户问天气、时间等，友好地回答或说明你没有实时数据
+"""
+
+
+def _no_api_key_reply(message: str) -> str:
+    """
+    未配置 API Key 时普通对话的回复
+    
+    Args:
+        message: 用户消息
+    
+    Returns:
+        str: 回复文本
+    """
+    return f"您好！我是 RAG Text-to-SQL 助手。😊\n\n您问：「{message}」\n\n抱歉，我现在无法回答普通问题。请在右上角设置中配置 GLM API Key，这样我就可以和您聊天了！\n\n💡 我的主要功能是帮您生成 SQL 查询，上传 DDL 文件后，您可以用自然语言描述查询需求，我会为您生成对应的 SQL。"
+
+
 # 意图识别器
 intent_recognizer = get_intent_recognizer()
 
 # Agent 服务
 agent_service = get_agent_service()
 
+# 文件仓储
+file_repository = get_file_repository()
+
+# 按文件缓存的 schema 符号表（SQL 引用验证）
+symbol_tables = get_symbol_table_registry()
+
 
 @router.post("", response_model=ChatResponse)
 async def chat(
@@ -30,25 +70,31 @@ async def chat(
     
     Args:
         request: 对话请求（消息、文件 ID）
-        
+    
     Returns:
         ChatResponse: AI 响应（类型、内容、SQL 等）
     """
     logger.info(f"Chat request received: {request.message[:50]}...")
     logger.info(f"API Key received: {'Yes' if x_api_key else 'No (using default)'}")
     
-    # Step 1: 意图识别（使用LLM智能判断）
-    intent = intent_recognizer.recognize(request.message, api_key=x_api_key)
+    # Step 1: 意图识别（使用LLM智能判断，异步调用）
+    intent = await intent_recognizer.arecognize(request.message, api_key=x_api_key)
     logger.info(f"Intent: {intent}")
     
     # Step 2: 根据意图处理
     if intent == 'sql_generation':
         # SQL 生成类（Story 3.2-3.3）
         try:
+            # schema 指纹（文件就绪后才有）用于 SQL 响应缓存，表数用于选择直接生成（只查询元数据）
+            file_data = await asyncio.to_thread(file_repository.get_metadata, request.file_id) if request.file_id else None
+            schema_version = file_data.get('schema_fingerprint') if file_data else None
+            
             result = await agent_service.process_message(
                 user_message=request.message,
                 file_id=request.file_id,
-                api_key=x_api_key  # 传递用户的API Key
+                api_key=x_api_key,  # 传递用户的API Key
+                schema_version=schema_version,
+                table_count=file_data.get('table_count') if file_data else None  # 小 schema 直接生成
             )
             
             return ChatResponse(
@@ -77,28 +123,14 @@ async def chat(
                 logger.warning("LLM service not available for general chat")
                 return ChatResponse(
                     type="text",
-                    content=f"您好！我是 RAG Text-to-SQL 助手。😊\n\n您问：「{request.message}」\n\n抱歉，我现在无法回答普通问题。请在右上角设置中配置 GLM API Key，这样我就可以和您聊天了！\n\n💡 我的主要功能是帮您生成 SQL 查询，上传 DDL 文件后，您可以用自然语言描述查询需求，我会为您生成对应的 SQL。",
+                    content=_no_api_key_reply(request.message),
                     intent=intent
                 )
             
-            # 构建对话系统提示
-            system_prompt = """你是一个友好的 RAG Text-to-SQL 智能助手。
-
-你的主要功能是：
-1. 帮助用户将自然语言转换为SQL查询（需要用户上传DDL文件）
-2. 回答用户的日常问题和提供帮助
-
-当用户进行普通对话时：
-- 友好、自然地回应
-- 如果用户询问你的功能，简要介绍你的SQL生成能力
-- 保持简洁，避免过长的回复
-- 如果用户问天气、时间等，友好地回答或说明你没有实时数据
-"""
-            
-            # 调用LLM生成回复
-            response = llm_service.generate_response(
+            # 调用LLM生成回复（异步调用）
+            response = await llm_service.agenerate_response(
                 user_message=request.message,
-                system_prompt=system_prompt,
+                system_prompt=GENERAL_CHAT_SYSTEM_PROMPT,
                 api_key=x_api_key
             )
             
@@ -116,6 +148,126 @@ async def chat(
             )
 
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    格式化 Server-Sent Events 消息
+    
+    Args:
+        event: 事件名
+        data: 事件数据
+    
+    Returns:
+        str: SSE 文本
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _validate_sql(sql: str, file_id: Optional[str]) -> Dict[str, Any]:
+    """
+    使用文件的符号表验证生成的 SQL（表、别名和字段引用）
+    
+    Args:
+        sql: SQL 语句
+        file_id: 文件 ID（可选，文件就绪时验证引用）
+    
+    Returns:
+        Dict: 验证结果（valid、errors、warnings）
+    """
+    result = get_sql_validator(symbol_tables.get(file_id) if file_id else None).validate(sql)
+    return {
+        "valid": result["valid"],
+        "errors": result["syntax"]["errors"] + result["references"]["errors"],
+        "warnings": (
+            result["syntax"]["warnings"] + result["references"]["warnings"] + result["logic"]["warnings"]
+        )
+    }
+
+
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    x_api_key: Optional[str] = Header(None, alias="X-API-Key")
+) -> StreamingResponse:
+    """
+    流式处理用户对话请求（Server-Sent Events）
+    
+    事件顺序：
+    - intent: 意图识别结果
+    - SQL 生成：step（Agent 工具调用/检索到的表）→ token（SQL 片段）→ sql（最终结果）→ validation（验证结果）
+    - 普通对话：token（回复片段）
+    - error: 处理失败
+    - done: 结束
+    
+    Args:
+        request: 对话请求（消息、文件 ID）
+    
+    Returns:
+        StreamingResponse: text/event-stream 响应
+    """
+    logger.info(f"Chat stream request received: {request.message[:50]}...")
+    
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            intent = await intent_recognizer.arecognize(request.message, api_key=x_api_key)
+            logger.info(f"Intent: {intent}")
+            yield _sse("intent", {"intent": intent})
+            
+            if intent == 'sql_generation':
+                file_data = await asyncio.to_thread(file_repository.get_metadata, request.file_id) if request.file_id else None
+                schema_version = file_data.get('schema_fingerprint') if file_data else None
+                
+                sql = ""
+                async for event in agent_service.stream_message(
+                    user_message=request.message,
+                    file_id=request.file_id,
+                    api_key=x_api_key,
+                    schema_version=schema_version,
+                    table_count=file_data.get('table_count') if file_data else None
+                ):
+                    name = event.pop("event")
+                    if name == "sql":
+                        sql = event.get("sql", "")
+                    yield _sse(name, event)
+                
+                if sql:
+                    # 符号表加载和完整验证都是同步计算，放到线程中执行，不阻塞事件循环
+                    validation = await asyncio.to_thread(_validate_sql, sql, request.file_id)
+                    yield _sse("validation", validation)
+            else:
+                from infrastructure.llm.llm_service import get_llm_service
+                llm_service = get_llm_service()
+                
+                # 与非流式接口一致：没有可用的 LLM 时直接返回提示
+                if not llm_service.is_available() and not x_api_key:
+                    logger.warning("LLM service not available for general chat")
+                    yield _sse("token", {"text": _no_api_key_reply(request.message)})
+                    yield _sse("done", {})
+                    return
+                
+                async for text in llm_service.astream_response(
+                    user_message=request.message,
+                    system_prompt=GENERAL_CHAT_SYSTEM_PROMPT,
+                    api_key=x_api_key
+                ):
+                    yield _sse("token", {"text": text})
+        except HTTPException as e:
+            yield _sse("error", {"message": e.detail})
+        except Exception as e:
+            logger.error(f"Chat stream failed: {e}", exc_info=True)
+            yield _sse("error", {"message": f"抱歉，处理失败：{str(e)}。请检查 API 配置或重试。"})
+        
+        yield _sse("done", {})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 禁用反向代理缓冲，保证事件即时送达
+        }
+    )
+
+
 @router.get("/history")
 async def get_chat_history():
     """
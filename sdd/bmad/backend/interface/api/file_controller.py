@@ -3,58 +3,142 @@
 处理 DDL 文件上传和验证
 """
 from datetime import datetime
+from typing import BinaryIO, Iterator
 from uuid import uuid4
 import asyncio
+import codecs
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse
 
 from interface.dto.file_dto import FileUploadResponse
 from application.ddl_service import get_ddl_service
+from infrastructure.repository.sqlite_file_repository import get_file_repository
+from infrastructure.executor.ingestion_executor import IngestionQueueFullError
 from infrastructure.logging.logger import get_logger
 
 logger = get_logger("file_controller")
 router = APIRouter()
 
-# 内存存储（临时）
-# 注意：后续 Story 中会替换为持久化存储
-file_store = {}
+# 文件仓储（SQLite 持久化，多 worker 共享）
+file_repository = get_file_repository()
 
 # DDL 服务
 ddl_service = get_ddl_service()
 
 
-async def process_ddl_background(file_id: str, content: str):
+# 上传文件大小上限（字节）
+MAX_FILE_SIZE = 10 * 1024 * 1024
+# 流式读取上传文件时每块的大小（字节）
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def process_ddl_background(file_id: str):
     """
-    后台任务：处理 DDL 解析和向量化
+    后台任务：处理 DDL 解析和向量化（在摄取执行器中排队执行，DDL 原文从文件仓储流式读取）
     
     Args:
         file_id: 文件 ID
-        content: DDL 内容
     """
     try:
-        result = await ddl_service.process_ddl_file(file_id, content, file_store)
+        result = await ddl_service.enqueue_ddl_file(file_id)
         logger.info(f"Background DDL processing completed: {result}")
     except Exception as e:
         logger.error(f"Background DDL processing failed: {e}", exc_info=True)
 
 
+def _iter_upload_chunks(upload: BinaryIO) -> Iterator[bytes]:
+    """
+    从头逐块读取上传文件
+    
+    Args:
+        upload: 上传文件对象（已由框架缓存到内存或临时文件）
+    
+    Yields:
+        bytes: 文件内容块
+    """
+    upload.seek(0)
+    while True:
+        chunk = upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _validate_upload(upload: BinaryIO, filename: str) -> int:
+    """
+    逐块校验上传文件：大小、UTF-8 编码、包含 CREATE TABLE 语句
+    
+    Args:
+        upload: 上传文件对象
+        filename: 文件名（用于日志）
+    
+    Returns:
+        int: 文件大小（字节）
+    
+    Raises:
+        HTTPException: 校验失败时抛出 400 错误
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    file_size = 0
+    has_create_table = False
+    tail = ""
+    
+    try:
+        for chunk in _iter_upload_chunks(upload):
+            file_size += len(chunk)
+            text = decoder.decode(chunk)
+            if not has_create_table:
+                # 保留上一块末尾，避免关键字跨块时漏判
+                window = (tail + text).upper()
+                has_create_table = 'CREATE TABLE' in window
+                tail = window[-len('CREATE TABLE'):]
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        logger.error(f"File encoding error: {filename}")
+        raise HTTPException(
+            status_code=400,
+            detail="文件编码错误，请确保文件为 UTF-8 格式"
+        )
+    
+    # 验证文件大小（< 10MB）
+    if file_size > MAX_FILE_SIZE:
+        logger.warning(
+            f"File too large rejected: {filename} "
+            f"({file_size / 1024 / 1024:.2f} MB > 10 MB)"
+        )
+        raise HTTPException(
+            status_code=400,
+            detail=f"文件大小超过限制（最大 10MB），当前文件：{file_size / 1024 / 1024:.2f} MB"
+        )
+    
+    # 验证包含有效的 DDL 语句（至少包含 CREATE TABLE）
+    if not has_create_table:
+        logger.warning(f"Invalid DDL content: {filename} - missing CREATE TABLE")
+        raise HTTPException(
+            status_code=400,
+            detail="文件不包含有效的 DDL 语句（需要至少一个 CREATE TABLE 语句）"
+        )
+    
+    return file_size
+
+
 @router.post("/upload", response_model=FileUploadResponse, status_code=201)
 async def upload_file(
     file: UploadFile = File(...),
     background_tasks: BackgroundTasks = None
 ):
     """
-    上传 DDL 文件
+    上传 DDL 文件（逐块校验并压缩存储，不需要完整内容常驻内存）
     
     Args:
         file: 上传的文件对象
         background_tasks: FastAPI 后台任务
-        
+    
     Returns:
         FileUploadResponse: 文件上传响应（文件 ID、文件名、状态等）
-        
+    
     Raises:
-        HTTPException: 验证失败时抛出 400 错误
+        HTTPException: 验证失败时抛出 400 错误，处理队列已满时抛出 503 错误
     """
     logger.info(f"File upload started: {file.filename}")
     
@@ -66,61 +150,54 @@ async def upload_file(
             detail="仅支持 .sql 格式的 DDL 文件"
         )
     
-    # 读取文件内容
-    try:
-        content = await file.read()
-    except Exception as e:
-        logger.error(f"Failed to read file {file.filename}: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=400,
-            detail=f"文件读取失败: {str(e)}"
-        )
-    
-    file_size = len(content)
-    
-    # 验证文件大小（< 10MB）
-    max_size = 10 * 1024 * 1024  # 10MB in bytes
-    if file_size > max_size:
+    # 大小已知时直接拒绝过大的文件，无需读取内容
+    if file.size is not None and file.size > MAX_FILE_SIZE:
         logger.warning(
             f"File too large rejected: {file.filename} "
-            f"({file_size / 1024 / 1024:.2f} MB > 10 MB)"
+            f"({file.size / 1024 / 1024:.2f} MB > 10 MB)"
         )
         raise HTTPException(
             status_code=400,
-            detail=f"文件大小超过限制（最大 10MB），当前文件：{file_size / 1024 / 1024:.2f} MB"
+            detail=f"文件大小超过限制（最大 10MB），当前文件：{file.size / 1024 / 1024:.2f} MB"
         )
     
-    # 解码内容
+    # 逐块校验文件内容（在线程中执行）
     try:
-        content_str = content.decode('utf-8')
-    except UnicodeDecodeError:
-        logger.error(f"File encoding error: {file.filename}")
+        await asyncio.to_thread(_validate_upload, file.file, file.filename)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to read file {file.filename}: {e}", exc_info=True)
         raise HTTPException(
             status_code=400,
-            detail="文件编码错误，请确保文件为 UTF-8 格式"
+            detail=f"文件读取失败: {str(e)}"
         )
     
-    # 验证包含有效的 DDL 语句（至少包含 CREATE TABLE）
-    if 'CREATE TABLE' not in content_str.upper():
-        logger.warning(f"Invalid DDL content: {file.filename} - missing CREATE TABLE")
-        raise HTTPException(
-            status_code=400,
-            detail="文件不包含有效的 DDL 语句（需要至少一个 CREATE TABLE 语句）"
-        )
+    # 预占处理队列位置（队列已满时拒绝上传，避免无限堆积）
+    if background_tasks:
+        try:
+            ddl_service.reserve_slot()
+        except IngestionQueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
     
     # 生成唯一文件 ID
     file_id = str(uuid4())
     uploaded_at = datetime.now()
     
-    # 保存到内存存储
-    file_store[file_id] = {
-        'filename': file.filename,
-        'content': content_str,
-        'status': 'pending',  # 待解析
-        'uploaded_at': uploaded_at,
-        'file_size': file_size,
-        'error_message': None
-    }
+    # 保存到文件仓储（状态为待解析；DDL 原文逐块压缩存储，在线程中执行）
+    try:
+        file_size = await asyncio.to_thread(
+            file_repository.create_from_chunks,
+            file_id,
+            file.filename,
+            _iter_upload_chunks(file.file),
+            uploaded_at
+        )
+    except Exception:
+        # 文件未能保存，不会进入处理队列：归还预占的队列位置
+        if background_tasks:
+            ddl_service.release_slot()
+        raise
     
     logger.info(
         f"File upload successful: {file.filename} "
@@ -129,7 +206,7 @@ async def upload_file(
     
     # 触发后台解析任务（Story 2.2）
     if background_tasks:
-        background_tasks.add_task(process_ddl_background, file_id, content_str)
+        background_tasks.add_task(process_ddl_background, file_id)
         logger.info(f"Background DDL processing task scheduled for: {file_id}")
     
     # 返回上传响应
@@ -149,18 +226,17 @@ async def get_file_metadata(file_id: str):
     
     Args:
         file_id: 文件 ID
-        
+    
     Returns:
         Dict: 文件元数据（包含表结构信息）
-        
+    
     Raises:
         HTTPException: 文件不存在时抛出 404 错误
     """
-    if file_id not in file_store:
+    file_data = file_repository.get(file_id)
+    if file_data is None:
         raise HTTPException(status_code=404, detail="文件不存在")
     
-    file_data = file_store[file_id]
-    
     # 构建响应（包含所有可用信息）
     response = {
         "file_id": file_id,
@@ -170,6 +246,13 @@ async def get_file_metadata(file_id: str):
         "file_size": file_data['file_size']
     }
     
+    # 处理中：包含向量化进度
+    if file_data['status'] == 'parsing' and file_data.get('progress_total'):
+        response["embedding_progress"] = {
+            "embedded": file_data['progress_embedded'],
+            "total": file_data['progress_total']
+        }
+    
     # 如果已解析，包含解析结果
     if file_data['status'] == 'ready':
         response.update({
@@ -193,27 +276,31 @@ async def delete_file(file_id: str):
     
     Args:
         file_id: 文件 ID
-        
+    
     Returns:
         Dict: 删除结果
-        
+    
     Raises:
         HTTPException: 文件不存在时抛出 404 错误
     """
-    if file_id not in file_store:
-        raise HTTPException(status_code=404, detail="文件不存在")
-    
     # 获取文件信息用于日志
-    file_data = file_store[file_id]
+    file_data = file_repository.get(file_id)
+    if file_data is None:
+        raise HTTPException(status_code=404, detail="文件不存在")
     filename = file_data['filename']
     
-    # 从存储中删除
-    del file_store[file_id]
+    # 从仓储中删除
+    file_repository.delete(file_id)
     
-    logger.info(f"File deleted: {filename} (ID: {file_id})")
+    # 清理该文件的 SQL 响应缓存、表关系图和符号表
+    ddl_service.response_cache.invalidate_file(file_id)
+    ddl_service.schema_graphs.invalidate(file_id)
+    ddl_service.symbol_tables.invalidate(file_id)
     
-    # TODO: 在后续 Story 中同时清理向量库中的相关数据
-    # vector_service.delete_file_vectors(file_id)
+    # 清理向量库中的相关数据（持久化模式下否则重启后会被恢复）
+    ddl_service.vector_service.delete_file(file_id)
+    
+    logger.info(f"File deleted: {filename} (ID: {file_id})")
     
     return {
         "success": True,
@@ -111,6 +111,61 @@ async def root_health_check():
     return await health_check()
 
 
+def check_vector_store_deployment() -> None:
+    """
+    检查多 worker 部署的向量库配置
+    
+    多个 worker 不能共用同一个本地持久化目录：每个 worker 都会在该目录上打开 PersistentClient，
+    并发写入会相互覆盖，启动校验还会删除其他 worker 写入的向量。此时拒绝启动，需要配置 CHROMA_SERVER_HOST。
+    
+    Raises:
+        RuntimeError: WORKERS>1、配置了 VECTOR_STORE_PATH 且未配置 CHROMA_SERVER_HOST
+    """
+    if settings.workers <= 1 or settings.chroma_server_host:
+        return
+    if settings.vector_store_path:
+        raise RuntimeError(
+            f"WORKERS={settings.workers} with VECTOR_STORE_PATH={settings.vector_store_path} is not supported: "
+            "workers cannot share an embedded Chroma directory. Set CHROMA_SERVER_HOST, "
+            "or clear VECTOR_STORE_PATH to run with per-worker in-memory vector stores."
+        )
+    logger.warning(
+        f"Running {settings.workers} workers without CHROMA_SERVER_HOST: each worker uses its own in-memory "
+        "vector store, a file is only searchable in the worker that vectorized it"
+    )
+
+
+@app.on_event("startup")
+async def recover_files():
+    """
+    应用启动时在后台恢复未处理完成或缺少向量的文件（不阻塞启动）
+    """
+    import asyncio
+    from application.ddl_service import get_ddl_service
+    
+    check_vector_store_deployment()
+    
+    app.state.recovery_task = asyncio.create_task(get_ddl_service().recover_files())
+
+
+@app.on_event("shutdown")
+async def shutdown_ingestion_executor():
+    """
+    应用关闭时释放 DDL 摄取执行器的进程池/线程池
+    """
+    from infrastructure.executor.ingestion_executor import get_ingestion_executor
+    get_ingestion_executor().shutdown()
+
+
+@app.on_event("shutdown")
+async def close_llm_client_pool():
+    """
+    应用关闭时关闭 LLM 共享 HTTP 连接池
+    """
+    from infrastructure.llm.llm_client_cache import get_llm_client_cache
+    await get_llm_client_cache().aclose()
+
+
 # 其他 API 路由将在此处注册
 # app.include_router(chat_router, prefix="/api/chat")
 
@@ -144,10 +199,24 @@ else:
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        "main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=True,
-        log_level=settings.log_level.lower()
-    )
+    
+    check_vector_store_deployment()
+    
+    if settings.workers > 1:
+        # 生产模式：多进程（文件元数据、向量库为共享存储，任意 worker 可处理任意 file_id）
+        uvicorn.run(
+            "main:app",
+            host=settings.host,
+            port=settings.port,
+            workers=settings.workers,
+            log_level=settings.log_level.lower()
+        )
+    else:
+        # 开发模式：单进程 + 自动重载
+        uvicorn.run(
+            "main:app",
+            host=settings.host,
+            port=settings.port,
+            reload=True,
+            log_level=settings.log_level.lower()
+        )
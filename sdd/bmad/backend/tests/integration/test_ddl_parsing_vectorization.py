@@ -130,9 +130,10 @@ class TestVectorization:
 class TestDDLServiceIntegration:
     """DDL 服务集成测试"""
     
-    def test_process_ddl_file_success(self):
+    def test_process_ddl_file_success(self, tmp_path):
         """测试完整的 DDL 处理流程（解析 + 向量化）"""
-        from application.ddl_service import get_ddl_service
+        from application.ddl_service import DDLService
+        from infrastructure.repository.sqlite_file_repository import SQLiteFileRepository
         
         ddl = """
         CREATE TABLE users (
@@ -148,22 +149,16 @@ class TestDDLServiceIntegration:
         );
         """
         
-        # 模拟文件存储
+        # 临时文件仓储
         file_id = "test_integration_file"
-        test_store = {
-            file_id: {
-                'filename': 'test.sql',
-                'content': ddl,
-                'status': 'pending',
-                'uploaded_at': datetime.now(),
-                'file_size': len(ddl)
-            }
-        }
+        repository = SQLiteFileRepository(str(tmp_path / "files.db"))
+        repository.create(file_id, 'test.sql', ddl, len(ddl), datetime.now())
         
         # 执行处理
-        service = get_ddl_service()
+        service = DDLService()
+        service.file_repository = repository
         import asyncio
-        result = asyncio.run(service.process_ddl_file(file_id, ddl, test_store))
+        result = asyncio.run(service.process_ddl_file(file_id, ddl))
         
         # 验证结果
         assert result['success'] is True, "处理失败"
@@ -173,8 +168,8 @@ class TestDDLServiceIntegration:
         assert result['elapsed_time'] < 10, f"处理时间过长: {result['elapsed_time']}s"
         
         # 验证状态更新
-        assert test_store[file_id]['status'] == 'ready', \
-            f"状态未更新: {test_store[file_id]['status']}"
+        assert repository.get(file_id)['status'] == 'ready', \
+            f"状态未更新: {repository.get(file_id)['status']}"
 
 
 class TestAsyncParsing:
@@ -0,0 +1,75 @@
+"""
+Agent Executor 缓存测试
+验证提示词模板和 Agent 只构建一次，并按 LLM 客户端复用
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import application.agent_service as agent_module
+from application.agent_service import AgentService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """创建 Agent 服务，LLM 按 API Key 返回固定的假模型"""
+    service = AgentService()
+    models = {}
+    
+    def get_chat_model(api_key=None):
+        key = api_key or "default"
+        if key not in models:
+            models[key] = FakeListChatModel(responses=["Final Answer: SELECT 1;"])
+        return models[key]
+    
+    monkeypatch.setattr(service.llm_service, "get_chat_model", get_chat_model)
+    return service
+
+
+class TestAgentExecutorCache:
+    """测试 Agent Executor 缓存"""
+    
+    def test_executor_reused_for_same_llm(self, service, monkeypatch):
+        """测试同一 LLM 客户端只构建一次 Agent"""
+        calls = []
+        original = agent_module.create_react_agent
+        
+        def counting_create_react_agent(**kwargs):
+            calls.append(kwargs)
+            return original(**kwargs)
+        
+        monkeypatch.setattr(agent_module, "create_react_agent", counting_create_react_agent)
+        
+        first = service._get_or_create_agent()
+        second = service._get_or_create_agent()
+        
+        assert first is second
+        assert len(calls) == 1
+        assert calls[0]["prompt"] is service.agent_prompt
+    
+    def test_different_llm_gets_different_executor(self, service):
+        """测试不同 API Key（不同 LLM 客户端）使用各自的执行器"""
+        default_executor = service._get_or_create_agent()
+        user_executor = service._get_or_create_agent(api_key="user-key")
+        
+        assert default_executor is not user_executor
+        assert service._get_or_create_agent(api_key="user-key") is user_executor
+    
+    def test_executor_cache_is_bounded(self, service):
+        """测试执行器缓存有容量上限"""
+        service._max_cached_agents = 2
+        
+        service._get_or_create_agent(api_key="k1")
+        service._get_or_create_agent(api_key="k2")
+        service._get_or_create_agent(api_key="k3")
+        
+        assert len(service._agent_executors) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
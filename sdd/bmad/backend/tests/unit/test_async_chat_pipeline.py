@@ -0,0 +1,100 @@
+"""
+异步对话链路测试
+验证意图识别、LLM 调用在事件循环上并发执行而不是串行阻塞
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+from typing import Any, List, Optional
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from infrastructure.llm.llm_service import LLMService
+from domain.agent.intent_recognizer import IntentRecognizer
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """模拟网络延迟的 ChatModel（异步调用时让出事件循环）"""
+    
+    reply: str = "sql"
+    delay: float = 0.2
+    
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+
+@pytest.fixture
+def llm_service():
+    """创建使用慢速假模型的 LLM 服务"""
+    service = LLMService()
+    service.default_llm = SlowFakeChatModel()
+    return service
+
+
+class TestAsyncLLMService:
+    """测试异步 LLM 调用"""
+    
+    def test_agenerate_response_returns_content(self, llm_service):
+        """测试异步生成返回模型内容"""
+        result = asyncio.run(llm_service.agenerate_response("你好", system_prompt="test"))
+        assert result == "sql"
+    
+    def test_concurrent_calls_do_not_serialize(self, llm_service):
+        """测试并发调用总耗时接近单次调用，而不是累加"""
+        async def main():
+            return await asyncio.gather(*[
+                llm_service.agenerate_response(f"消息 {i}") for i in range(5)
+            ])
+        
+        start = time.perf_counter()
+        results = asyncio.run(main())
+        elapsed = time.perf_counter() - start
+        
+        assert results == ["sql"] * 5
+        assert elapsed < 0.2 * 3, f"并发调用被串行化: {elapsed:.2f}s"
+
+
+class TestAsyncIntentRecognizer:
+    """测试异步意图识别"""
+    
+    def test_arecognize_uses_llm(self, llm_service):
+        """测试异步意图识别使用 LLM 结果"""
+        recognizer = IntentRecognizer()
+        recognizer._llm_service = llm_service
+        recognizer.confidence_threshold = 1.01  # 关闭本地分类，强制走 LLM
+        
+        intent = asyncio.run(recognizer.arecognize("统计订单数量"))
+        assert intent == "sql_generation"
+    
+    def test_arecognize_falls_back_without_llm(self):
+        """测试 LLM 不可用时异步意图识别回退到规则匹配"""
+        service = LLMService()
+        service.default_llm = None
+        recognizer = IntentRecognizer()
+        recognizer._llm_service = service
+        recognizer.confidence_threshold = 1.01
+        
+        assert asyncio.run(recognizer.arecognize("查询所有用户")) == "sql_generation"
+        assert asyncio.run(recognizer.arecognize("你好")) == "general_chat"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
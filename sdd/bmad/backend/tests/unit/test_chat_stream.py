@@ -0,0 +1,188 @@
+"""
+流式对话接口测试
+验证 SSE 事件顺序：意图 → Agent 步骤 → SQL token → 最终结果 → 验证结果
+"""
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import application.agent_service as agent_module
+import domain.agent.vector_search_tool as tool_module
+import interface.api.chat_controller as chat_module
+from application.agent_service import AgentService
+from domain.sql.symbol_table import SymbolTableRegistry
+
+AGENT_RESPONSES = [
+    "Thought: 需要表结构\nAction: vector_search\nAction Input: 用户表",
+    "Thought: 完成\nFinal Answer: SELECT * FROM users;",
+]
+TABLES = [{"name": "users", "columns": [{"name": "id"}, {"name": "name"}]}]
+
+
+class FakeVectorService:
+    """返回固定 users 表的假向量服务"""
+    
+    def query_schema(self, query_text, n_results=5, file_id=None):
+        return {
+            "documents": [["表名: users"]],
+            "metadatas": [[{"type": "table", "table_name": "users", "column_count": 2}]],
+            "distances": [[0.1]]
+        }
+
+
+class FakeFileRepository:
+    """只包含一个就绪文件的假仓储"""
+    
+    def get(self, file_id):
+        if file_id != "file-a":
+            return None
+        return {"status": "ready", "tables": TABLES, "schema_fingerprint": None}
+    
+    def get_metadata(self, file_id):
+        if file_id != "file-a":
+            return None
+        return {"status": "ready", "table_count": len(TABLES), "schema_fingerprint": None}
+
+
+def parse_sse(body: str):
+    """解析 SSE 文本为 (事件名, 数据) 列表"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def agent_service(monkeypatch):
+    """使用假 LLM 和假向量服务的 Agent 服务（关闭小 schema 直接生成，始终走 Agent）"""
+    monkeypatch.setattr(agent_module.settings, "direct_mode_max_tables", 0)
+    monkeypatch.setattr(tool_module, "get_vector_service", lambda: FakeVectorService())
+    service = AgentService()
+    llm = FakeListChatModel(responses=AGENT_RESPONSES)
+    monkeypatch.setattr(service.llm_service, "get_chat_model", lambda api_key=None: llm)
+    return service
+
+
+class TestAgentStreamMessage:
+    """测试 Agent 流式处理"""
+    
+    def test_stream_events(self, agent_service):
+        """测试先返回工具步骤，再逐段返回 SQL，最后返回完整结果"""
+        async def collect():
+            return [event async for event in agent_service.stream_message("查询所有用户", file_id="file-a")]
+        
+        events = asyncio.run(collect())
+        kinds = [event["event"] for event in events]
+        
+        assert kinds[:2] == ["step", "step"]
+        assert events[0]["type"] == "tool_start" and events[0]["input"] == "用户表"
+        assert events[1]["type"] == "tool_end" and events[1]["tables"] == [{"table": "users"}]
+        assert kinds[-1] == "sql"
+        assert "".join(e["text"] for e in events if e["event"] == "token") == "SELECT * FROM users;"
+        assert events[-1]["sql"] == "SELECT * FROM users;"
+        assert events[-1]["references"] == [{"table": "users"}]
+
+
+class TestChatStreamEndpoint:
+    """测试 SSE 接口"""
+    
+    @pytest.fixture
+    def client(self, monkeypatch, agent_service):
+        """挂载对话路由的测试客户端"""
+        async def recognize(message, api_key=None):
+            return "sql_generation"
+        
+        monkeypatch.setattr(chat_module.intent_recognizer, "arecognize", recognize)
+        monkeypatch.setattr(chat_module, "agent_service", agent_service)
+        monkeypatch.setattr(chat_module, "file_repository", FakeFileRepository())
+        monkeypatch.setattr(chat_module, "symbol_tables", SymbolTableRegistry(FakeFileRepository().get))
+        
+        app = FastAPI()
+        app.include_router(chat_module.router, prefix="/api/chat")
+        return TestClient(app)
+    
+    def test_sql_stream(self, client):
+        """测试 SQL 生成的事件顺序与验证结果"""
+        response = client.post("/api/chat/stream", json={"message": "查询所有用户", "file_id": "file-a"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        
+        events = parse_sse(response.text)
+        kinds = [name for name, _ in events]
+        assert kinds[0] == "intent" and events[0][1] == {"intent": "sql_generation"}
+        assert kinds.index("step") < kinds.index("token") < kinds.index("sql") < kinds.index("validation")
+        assert kinds[-1] == "done"
+        
+        validation = dict(events)["validation"]
+        assert validation["valid"] is True
+        assert validation["errors"] == []
+    
+    def test_general_chat_stream(self, client, monkeypatch):
+        """测试普通对话逐段返回 LLM 回复"""
+        import infrastructure.llm.llm_service as llm_module
+        
+        async def recognize(message, api_key=None):
+            return "general_chat"
+        
+        async def astream_response(user_message, system_prompt=None, api_key=None):
+            for text in ["你好", "！"]:
+                yield text
+        
+        service = llm_module.get_llm_service()
+        monkeypatch.setattr(chat_module.intent_recognizer, "arecognize", recognize)
+        monkeypatch.setattr(service, "astream_response", astream_response)
+        
+        events = parse_sse(client.post("/api/chat/stream", json={"message": "你好"}).text)
+        
+        assert events == [
+            ("intent", {"intent": "general_chat"}),
+            ("token", {"text": "你好"}),
+            ("token", {"text": "！"}),
+            ("done", {}),
+        ]
+    
+    def test_intent_failure_ends_with_error_and_done(self, client, monkeypatch):
+        """测试意图识别失败时仍返回 error 和 done 事件"""
+        async def recognize(message, api_key=None):
+            raise RuntimeError("intent service down")
+        
+        monkeypatch.setattr(chat_module.intent_recognizer, "arecognize", recognize)
+        
+        events = parse_sse(client.post("/api/chat/stream", json={"message": "你好"}).text)
+        
+        assert [name for name, _ in events] == ["error", "done"]
+        assert "intent service down" in events[0][1]["message"]
+    
+    def test_general_chat_stream_without_api_key(self, client, monkeypatch):
+        """测试没有可用 LLM 且未提供 API Key 时返回与非流式接口相同的提示"""
+        import infrastructure.llm.llm_service as llm_module
+        
+        async def recognize(message, api_key=None):
+            return "general_chat"
+        
+        service = llm_module.get_llm_service()
+        monkeypatch.setattr(chat_module.intent_recognizer, "arecognize", recognize)
+        monkeypatch.setattr(service, "is_available", lambda: False)
+        
+        events = parse_sse(client.post("/api/chat/stream", json={"message": "你好"}).text)
+        
+        assert events == [
+            ("intent", {"intent": "general_chat"}),
+            ("token", {"text": chat_module._no_api_key_reply("你好")}),
+            ("done", {}),
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
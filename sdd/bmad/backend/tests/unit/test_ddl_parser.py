@@ -0,0 +1,197 @@
+"""
+DDL 解析器测试
+验证字段定义解析（引号和括号内的逗号、约束关键字、注释转义、表级约束的识别）、外键和索引解析，以及紧凑的表结构模型
+"""
+import sys
+import json
+import pickle
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+
+from infrastructure.parser.ddl_parser import ddl_parser, tables_to_json
+
+
+def parse_columns(body: str):
+    """解析括号内容，返回字段字典列表"""
+    return [column.to_dict() for column in ddl_parser._parse_column_definitions(f"({body})")]
+
+
+class TestColumnDefinitions:
+    """测试字段定义解析"""
+    
+    def test_name_type_constraints_comment(self):
+        """测试字段名、类型、约束和注释在一次扫描中提取"""
+        columns = parse_columns(
+            "`ID` bigint NOT NULL AUTO_INCREMENT COMMENT '主键',"
+            " amount DECIMAL(10, 2) UNIQUE,"
+            " code int autoincrement primary key"
+        )
+        
+        assert columns == [
+            {"name": "id", "data_type": "bigint", "constraints": ["NOT NULL", "AUTO_INCREMENT"], "comment": "主键"},
+            {"name": "amount", "data_type": "DECIMAL(10, 2)", "constraints": ["UNIQUE"], "comment": None},
+            {"name": "code", "data_type": "int", "constraints": ["PRIMARY KEY", "AUTO_INCREMENT"], "comment": None},
+        ]
+    
+    def test_commas_inside_quotes_and_parentheses(self):
+        """测试注释、默认值、ENUM 和嵌套括号中的逗号不会切分字段"""
+        columns = parse_columns(
+            "name varchar(64) DEFAULT 'a,b' COMMENT '姓名, 昵称',"
+            " kind ENUM('x,y', 'z)') NOT NULL,"
+            " created datetime DEFAULT (now()) CHECK (kind IN ('x', (1, 2)))"
+        )
+        
+        assert [c["name"] for c in columns] == ["name", "kind", "created"]
+        assert columns[0]["comment"] == "姓名, 昵称"
+        assert columns[1]["data_type"] == "ENUM('x,y', 'z)')"
+        assert columns[1]["constraints"] == ["NOT NULL"]
+    
+    def test_keywords_inside_strings_ignored(self):
+        """测试字符串中的约束关键字不计为约束，注释中的转义被还原"""
+        columns = parse_columns(
+            "flag tinyint DEFAULT 'NOT NULL' COMMENT 'unique index, it''s \\'primary key\\''"
+        )
+        
+        assert columns[0]["constraints"] == []
+        assert columns[0]["comment"] == "unique index, it's 'primary key'"
+    
+    def test_table_constraints_skipped(self):
+        """测试表级约束和索引不会被当作字段，反引号中的关键字可作为字段名"""
+        columns = parse_columns(
+            "id int, `key` varchar(8), PRIMARY KEY (id), KEY `idx_key` (`key`),"
+            " UNIQUE KEY uk (id, `key`), INDEX idx (id), CONSTRAINT fk FOREIGN KEY (id) REFERENCES t (id)"
+        )
+        
+        assert [c["name"] for c in columns] == ["id", "key"]
+    
+    def test_multiline_type_whitespace_collapsed(self):
+        """测试跨行的类型参数合并空白"""
+        columns = parse_columns("price DECIMAL(10,\n    2) NOT\n  NULL")
+        
+        assert columns[0]["data_type"] == "DECIMAL(10, 2)"
+        assert columns[0]["constraints"] == ["NOT NULL"]
+    
+    @pytest.mark.parametrize("options,expected", [
+        ("COMMENT='订单(主表)'", "订单(主表)"),
+        ("ENGINE=InnoDB COMMENT='a) b'", "a) b"),
+        ("COMMENT 'it''s (main)'", "it's (main)"),
+        ("", None),
+    ])
+    def test_table_comment_with_parentheses(self, options, expected):
+        """测试表注释中的括号和转义引号不影响提取，字段注释不作为表注释"""
+        tables = ddl_parser.parse(f"CREATE TABLE orders (id int COMMENT '编号(主键)') {options};")
+        
+        assert tables[0].comment == expected
+
+
+class TestForeignKeysAndIndexes:
+    """测试外键和索引解析"""
+    
+    def test_table_level_and_inline_foreign_keys(self):
+        """测试表级外键（含复合外键、未命名外键）和内联 REFERENCES"""
+        tables = ddl_parser.parse(
+            "CREATE TABLE users (id int PRIMARY KEY, org_id int, region char(2));"
+            "CREATE TABLE orders ("
+            "  id int, user_id int NOT NULL REFERENCES users(id), org_id int, region char(2),"
+            "  PRIMARY KEY (id), UNIQUE KEY uk_user (user_id, id), INDEX (org_id),"
+            "  CONSTRAINT `fk_org` FOREIGN KEY (`org_id`, `region`) REFERENCES `users` (`org_id`, `region`) ON DELETE CASCADE,"
+            "  FOREIGN KEY (region) REFERENCES users"
+            ");"
+        )
+        orders = tables[1].to_dict()
+        
+        assert [c["name"] for c in orders["columns"]] == ["id", "user_id", "org_id", "region"]
+        assert orders["columns"][1]["constraints"] == ["NOT NULL"]
+        assert orders["primary_keys"] == ["id"]
+        assert orders["foreign_keys"] == [
+            {"name": "fk_orders_user_id", "column": "user_id", "ref_table": "users", "ref_column": "id"},
+            {"name": "fk_org", "column": "org_id", "ref_table": "users", "ref_column": "org_id"},
+            {"name": "fk_org", "column": "region", "ref_table": "users", "ref_column": "region"},
+            {"name": "fk_orders_region", "column": "region", "ref_table": "users", "ref_column": ""},
+        ]
+        assert orders["indexes"] == [
+            {"name": "uk_user", "columns": ["user_id", "id"], "unique": True},
+            {"name": "", "columns": ["org_id"], "unique": False},
+        ]
+    
+    def test_duplicate_foreign_key_declarations_merged(self):
+        """测试内联 REFERENCES 与表级 FOREIGN KEY / ALTER TABLE 重复声明同一外键时只保留一项"""
+        tables = ddl_parser.parse(
+            "CREATE TABLE users (id int PRIMARY KEY);"
+            "CREATE TABLE orders ("
+            "  id int PRIMARY KEY, user_id int REFERENCES users(id),"
+            "  CONSTRAINT fk_user FOREIGN KEY (user_id) REFERENCES users (id)"
+            ");"
+            "ALTER TABLE orders ADD CONSTRAINT fk_user_again FOREIGN KEY (user_id) REFERENCES users (id);"
+        )
+        
+        assert tables[1].to_dict()["foreign_keys"] == [
+            {"name": "fk_orders_user_id", "column": "user_id", "ref_table": "users", "ref_column": "id"}
+        ]
+    
+    def test_primary_key_from_parsed_constraint(self):
+        """测试主键只取自字段约束和表级 PRIMARY KEY，注释和字符串中的 PRIMARY KEY (...) 不计入"""
+        tables = ddl_parser.parse(
+            "CREATE TABLE t ("
+            "  a int COMMENT 'PRIMARY KEY (x)', b int, c int,"
+            "  CONSTRAINT pk_t PRIMARY KEY (`b`, c)"
+            ") COMMENT='see PRIMARY KEY (y)';"
+        )
+        
+        assert tables[0].primary_keys == ["b", "c"]
+    
+    def test_alter_table_and_create_index(self):
+        """测试 ALTER TABLE ADD 和 CREATE INDEX 合并到对应的表（mysqldump / pg_dump 风格，语句顺序不限）"""
+        tables = ddl_parser.parse(
+            "ALTER TABLE `orders` ADD KEY `idx_user` (`user_id`),"
+            "  ADD CONSTRAINT `fk_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`), MODIFY `id` int;"
+            "CREATE TABLE public.users (id integer NOT NULL, email text);"
+            "CREATE TABLE `orders` (`id` int NOT NULL, `user_id` int);"
+            "ALTER TABLE ONLY public.users ADD CONSTRAINT users_pkey PRIMARY KEY (id);"
+            "CREATE UNIQUE INDEX users_email_key ON public.users USING btree (email);"
+            "ALTER TABLE missing ADD PRIMARY KEY (id);"
+        )
+        users, orders = [table.to_dict() for table in tables]
+        
+        assert users["name"] == "users"
+        assert users["primary_keys"] == ["id"]
+        assert users["indexes"] == [{"name": "users_email_key", "columns": ["email"], "unique": True}]
+        assert orders["foreign_keys"] == [
+            {"name": "fk_user", "column": "user_id", "ref_table": "users", "ref_column": "id"}
+        ]
+        assert orders["indexes"] == [{"name": "idx_user", "columns": ["user_id"], "unique": False}]
+
+
+class TestCompactSchemaModel:
+    """测试紧凑的表结构模型"""
+    
+    def test_columns_share_strings_and_constraints(self):
+        """测试字段无 __dict__，相同的类型和约束组合共享同一对象"""
+        columns = ddl_parser._parse_column_definitions(
+            "(a varchar(64) NOT NULL, b varchar(64) NOT NULL, c int)"
+        )
+        
+        assert not hasattr(columns[0], "__dict__")
+        assert columns[0].data_type is columns[1].data_type
+        assert columns[0].constraints is columns[1].constraints
+        assert columns[2].constraints == ()
+        assert columns[0].to_dict()["constraints"] == ["NOT NULL"]
+    
+    def test_lazy_json_matches_to_dict(self):
+        """测试按需序列化与整份 to_dict 的 JSON 一致，对象可 pickle（解析进程返回结果）"""
+        tables = ddl_parser.parse(
+            "CREATE TABLE users (id BIGINT PRIMARY KEY, name VARCHAR(64) NOT NULL COMMENT '姓名');"
+        )
+        restored = pickle.loads(pickle.dumps(tables))
+        
+        assert tables_to_json(restored, ensure_ascii=False, sort_keys=True) == json.dumps(
+            [table.to_dict() for table in tables], ensure_ascii=False, sort_keys=True
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,150 @@
+"""
+直接生成模式测试
+验证小 schema 一次 LLM 调用生成 SQL（不经过 ReAct 循环），大 schema 和直接生成失败时使用 Agent
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import application.agent_service as agent_module
+import domain.agent.vector_search_tool as tool_module
+from application.agent_service import AgentService, AGENT_EXPLANATION, DIRECT_EXPLANATION
+from domain.sql.sql_generator import SQLGenerator
+
+TABLES = [
+    {
+        "name": "users",
+        "columns": [{"name": "id", "data_type": "BIGINT"}, {"name": "name", "data_type": "VARCHAR(64)", "comment": "姓名"}],
+        "primary_keys": ["id"],
+        "comment": "用户"
+    },
+    {
+        "name": "orders",
+        "columns": [{"name": "id", "data_type": "BIGINT"}, {"name": "user_id", "data_type": "BIGINT"}],
+        "primary_keys": ["id"],
+        "foreign_keys": [{"name": "fk", "column": "user_id", "ref_table": "users", "ref_column": "id"}]
+    },
+]
+
+
+class FakeFileRepository:
+    """按文件 ID 返回表结构的假仓储"""
+    
+    def __init__(self, tables):
+        self.tables = tables
+    
+    def get(self, file_id):
+        return {"status": "ready", "tables": self.tables} if file_id == "file-a" else None
+
+
+class FakeVectorService:
+    """返回固定 users 表的假向量服务"""
+    
+    def query_schema(self, query_text, n_results=5, file_id=None):
+        return {
+            "documents": [["表名: users"]],
+            "metadatas": [[{"type": "table", "table_name": "users", "column_count": 2}]],
+            "distances": [[0.1]]
+        }
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """直接生成阈值为 2 张表、LLM 调用被记录的服务"""
+    monkeypatch.setattr(agent_module.settings, "direct_mode_max_tables", 2)
+    monkeypatch.setattr(tool_module, "get_vector_service", lambda: FakeVectorService())
+    service = AgentService()
+    service.file_repository = FakeFileRepository(TABLES)
+    service.prompts = []
+    service.direct_response = "SELECT u.name FROM users u JOIN orders o ON o.user_id = u.id;"
+    
+    def generate_response(user_message, system_prompt=None, context=None, api_key=None):
+        service.prompts.append(system_prompt)
+        return service.direct_response
+    
+    agent_llm = FakeListChatModel(responses=[
+        "Thought: 需要表结构\nAction: vector_search\nAction Input: 用户表",
+        "Thought: 完成\nFinal Answer: SELECT * FROM users;",
+    ])
+    monkeypatch.setattr(service.sql_generator.llm_service, "generate_response", generate_response)
+    monkeypatch.setattr(service.llm_service, "get_chat_model", lambda api_key=None: agent_llm)
+    return service
+
+
+class TestDirectGeneration:
+    """测试直接生成模式"""
+    
+    def test_small_schema_single_llm_call(self, service):
+        """测试小 schema 把完整表结构（含外键）放入提示词，一次调用生成"""
+        result = asyncio.run(service.process_message("每个用户的订单", file_id="file-a", table_count=len(TABLES)))
+        
+        assert len(service.prompts) == 1
+        assert "orders(id BIGINT PK, user_id BIGINT FK→users.id)" in service.prompts[0]
+        assert result["sql"] == service.direct_response
+        assert result["explanation"] == DIRECT_EXPLANATION
+        assert {reference["table"] for reference in result["references"]} == {"users", "orders"}
+    
+    def test_large_schema_uses_agent(self, service):
+        """测试表数超过阈值时使用 Agent，且不加载完整表结构"""
+        service.file_repository = None
+        
+        result = asyncio.run(service.process_message("查询所有用户", file_id="file-a", table_count=3))
+        
+        assert service.prompts == []
+        assert result["sql"] == "SELECT * FROM users;"
+        assert result["explanation"] == AGENT_EXPLANATION
+    
+    def test_falls_back_to_agent_without_sql(self, service):
+        """测试直接生成未得到 SQL 时由 Agent 兜底"""
+        service.direct_response = "抱歉，我无法回答"
+        
+        result = asyncio.run(service.process_message("查询所有用户", file_id="file-a", table_count=len(TABLES)))
+        
+        assert len(service.prompts) == 1
+        assert result["sql"] == "SELECT * FROM users;"
+    
+    def test_falls_back_to_agent_on_unknown_column(self, service):
+        """测试直接生成的 SQL 引用了不存在的字段时由 Agent 兜底"""
+        service.direct_response = "SELECT u.email FROM users u;"
+        
+        result = asyncio.run(service.process_message("查询用户邮箱", file_id="file-a", table_count=len(TABLES)))
+        
+        assert len(service.prompts) == 1
+        assert result["explanation"] == AGENT_EXPLANATION
+    
+    def test_stream_direct(self, service):
+        """测试流式接口在直接生成模式下返回 direct 步骤、SQL 和最终结果"""
+        async def collect():
+            return [event async for event in service.stream_message("每个用户的订单", file_id="file-a", table_count=len(TABLES))]
+        
+        events = asyncio.run(collect())
+        
+        assert [event["event"] for event in events] == ["step", "token", "sql"]
+        assert events[0] == {"event": "step", "type": "direct", "tables": ["users", "orders"]}
+        assert events[1]["text"] == events[2]["sql"] == service.direct_response
+
+
+class TestBuildTableContext:
+    """测试完整表结构转换为提示词上下文"""
+    
+    def test_tables_and_columns(self):
+        """测试表条目包含注释、主键和外键，字段条目包含类型和注释"""
+        context = SQLGenerator.build_table_context(TABLES)
+        
+        assert [item["type"] for item in context] == ["表", "字段", "字段", "表", "字段", "字段"]
+        assert context[0]["description"] == "用户 | 主键: id"
+        assert context[2] == {
+            "type": "字段", "table": "users", "name": "name", "data_type": "VARCHAR(64)",
+            "description": "姓名", "comment": "姓名", "relevance": 1.0
+        }
+        assert context[3]["description"] == "无 | 主键: id | 外键: user_id -> users.id"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
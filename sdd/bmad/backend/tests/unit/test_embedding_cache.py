@@ -0,0 +1,137 @@
+"""
+Embedding 缓存测试
+验证按模型 + 文档文本寻址的缓存，以及向量化时跨文件、跨向量库复用 embedding
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+import infrastructure.vector.vector_service as vector_module
+from infrastructure.cache.embedding_cache import EmbeddingCache, embedding_cache_key
+from infrastructure.vector.vector_service import VectorService
+from infrastructure.parser.ddl_parser import TableColumn, TableInfo, compute_schema_fingerprint
+
+
+class CountingEmbedding(EmbeddingFunction):
+    """按字符计数的离线 embedding，并统计被调用的文本数量"""
+    
+    embedded_texts = 0
+    
+    def __init__(self, *args, **kwargs):
+        pass
+    
+    def __call__(self, input: Documents) -> Embeddings:
+        CountingEmbedding.embedded_texts += len(input)
+        vectors = []
+        for text in input:
+            vector = [0.0] * 64
+            for ch in text:
+                vector[ord(ch) % 64] += 1.0
+            vectors.append(vector)
+        return vectors
+    
+    @staticmethod
+    def name() -> str:
+        return "default"
+    
+    def get_config(self):
+        return {}
+    
+    @staticmethod
+    def build_from_config(config):
+        return CountingEmbedding()
+
+
+@pytest.fixture(autouse=True)
+def offline_embedding(monkeypatch):
+    """使用离线 embedding（测试环境无法下载模型）"""
+    monkeypatch.setattr(vector_module, "DefaultEmbeddingFunction", CountingEmbedding)
+    CountingEmbedding.embedded_texts = 0
+
+
+TABLES = [
+    TableInfo(name="users", columns=[TableColumn("id", "BIGINT"), TableColumn("name", "VARCHAR(64)")]),
+    TableInfo(name="orders", columns=[TableColumn("id", "BIGINT"), TableColumn("user_id", "BIGINT")]),
+]
+FINGERPRINT = compute_schema_fingerprint(TABLES)
+
+
+class TestEmbeddingCache:
+    """测试 embedding 缓存存储"""
+    
+    def test_round_trip(self, tmp_path):
+        """测试写入后可批量读取，未写入的键不返回"""
+        cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+        cache.put_many({"k1": [0.5, 1.0], "k2": [2.0, 0.0]})
+        
+        found = cache.get_many(["k1", "k2", "k3"])
+        
+        assert found == {"k1": [0.5, 1.0], "k2": [2.0, 0.0]}
+        assert cache.count() == 2
+    
+    def test_key_depends_on_model(self):
+        """测试相同文本在不同模型下使用不同的缓存键"""
+        assert embedding_cache_key("model-a", "表: users") != embedding_cache_key("model-b", "表: users")
+        assert embedding_cache_key("model-a", "表: users") == embedding_cache_key("model-a", "表: users")
+
+
+class TestVectorizeWithEmbeddingCache:
+    """测试向量化复用 embedding 缓存"""
+    
+    def test_identical_documents_served_from_cache(self, tmp_path):
+        """测试另一个向量库（如其他环境）中相同的文档直接使用缓存的 embedding"""
+        cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+        first = VectorService(persist_path=str(tmp_path / "dev"), embedding_cache=cache)
+        count = first.vectorize_tables(TABLES, "file-dev", FINGERPRINT)
+        embedded = CountingEmbedding.embedded_texts
+        
+        second = VectorService(persist_path=str(tmp_path / "prod"), embedding_cache=cache)
+        stats = second.vectorize_tables_with_stats(TABLES, "file-prod", FINGERPRINT)
+        
+        assert CountingEmbedding.embedded_texts == embedded
+        assert stats["count"] == count
+        assert stats["cache_hits"] == count
+        assert stats["cache_hit_ratio"] == 1.0
+        assert second.query_schema("users", file_id="file-prod")
+    
+    def test_hit_ratio_for_near_identical_schema(self, tmp_path):
+        """测试几乎相同的 schema 只为变化的文档计算 embedding"""
+        cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+        VectorService(persist_path=str(tmp_path / "dev"), embedding_cache=cache).vectorize_tables(
+            TABLES, "file-dev", FINGERPRINT
+        )
+        embedded = CountingEmbedding.embedded_texts
+        
+        changed = TABLES[:1] + [
+            TableInfo(name="orders", columns=[TableColumn("id", "BIGINT"), TableColumn("user_id", "INT")])
+        ]
+        service = VectorService(persist_path=str(tmp_path / "staging"), embedding_cache=cache)
+        stats = service.vectorize_tables_with_stats(changed, "file-staging", compute_schema_fingerprint(changed))
+        
+        assert CountingEmbedding.embedded_texts == embedded + 1
+        assert stats["embedded"] == 1
+        assert stats["cache_hit_ratio"] == round(5 / 6, 4)
+    
+    def test_unchanged_documents_not_counted_as_hits(self, tmp_path):
+        """测试同一文件重新向量化时，未变化的条目不计入缓存命中率"""
+        service = VectorService(
+            persist_path=str(tmp_path / "dev"), embedding_cache=EmbeddingCache(str(tmp_path / "embeddings.db"))
+        )
+        service.vectorize_tables(TABLES, "file-dev", FINGERPRINT)
+        
+        changed = TABLES[:1] + [
+            TableInfo(name="orders", columns=[TableColumn("id", "BIGINT"), TableColumn("user_id", "INT")])
+        ]
+        stats = service.vectorize_tables_with_stats(changed, "file-dev", compute_schema_fingerprint(changed))
+        
+        assert (stats["unchanged"], stats["embedded"], stats["cache_hits"]) == (5, 1, 0)
+        assert stats["cache_hit_ratio"] == 0.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,158 @@
+"""
+SQLite 文件仓储测试
+验证文件元数据存取、DDL 原文压缩存储、原子状态更新和多连接共享
+"""
+import sys
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from infrastructure.parser.ddl_parser import TableColumn, TableInfo
+from infrastructure.repository.sqlite_file_repository import SQLiteFileRepository
+
+DDL = "CREATE TABLE users (id BIGINT PRIMARY KEY, name VARCHAR(64));\n" * 200
+TABLES = [{"name": "users", "columns": [{"name": "id"}, {"name": "name"}]}]
+
+
+@pytest.fixture
+def repository(tmp_path):
+    """创建临时仓储并写入一个文件"""
+    repository = SQLiteFileRepository(str(tmp_path / "files.db"))
+    repository.create("file-a", "a.sql", DDL, len(DDL), datetime(2024, 1, 1, 12, 0))
+    return repository
+
+
+class TestSQLiteFileRepository:
+    """测试 SQLite 文件仓储"""
+    
+    def test_create_and_get(self, repository):
+        """测试新文件为 pending 状态，元数据不含 DDL 原文"""
+        file_data = repository.get("file-a")
+        
+        assert file_data["filename"] == "a.sql"
+        assert file_data["status"] == "pending"
+        assert file_data["uploaded_at"] == datetime(2024, 1, 1, 12, 0)
+        assert "content" not in file_data
+        assert repository.exists("file-a")
+        assert repository.get("missing") is None
+    
+    def test_content_stored_compressed(self, repository):
+        """测试 DDL 原文压缩存储且可完整读回"""
+        assert repository.get_content("file-a") == DDL
+        
+        with sqlite3.connect(repository.db_path) as conn:
+            stored = conn.execute("SELECT length(content) FROM file_contents").fetchone()[0]
+        assert stored < len(DDL) / 10
+    
+    def test_status_transitions(self, repository):
+        """测试状态更新与解析结果保存"""
+        assert repository.update_status("file-a", "parsing")
+        assert repository.get("file-a")["status"] == "parsing"
+        
+        assert repository.save_parse_result("file-a", TABLES, embedding_count=3, schema_fingerprint="fp")
+        file_data = repository.get("file-a")
+        assert file_data["status"] == "ready"
+        assert file_data["tables"] == TABLES
+        assert file_data["table_count"] == 1
+        assert file_data["column_count"] == 2
+        assert file_data["schema_fingerprint"] == "fp"
+        
+        assert repository.update_status("file-a", "error", "boom")
+        assert repository.get("file-a")["error_message"] == "boom"
+        assert not repository.update_status("missing", "parsing")
+    
+    def test_get_metadata_without_tables(self, repository):
+        """测试只读取元数据：含表数和 schema 指纹，不含表结构"""
+        repository.save_parse_result("file-a", TABLES, embedding_count=3, schema_fingerprint="fp")
+        metadata = repository.get_metadata("file-a")
+        
+        assert metadata["table_count"] == 1
+        assert metadata["schema_fingerprint"] == "fp"
+        assert "tables" not in metadata
+        assert repository.get_metadata("missing") is None
+    
+    def test_save_table_objects(self, repository):
+        """测试直接保存 TableInfo 对象，读回与 to_dict 结果一致"""
+        tables = [TableInfo("users", [TableColumn("id", "BIGINT", ["NOT NULL"]), TableColumn("name", "VARCHAR(64)")])]
+        
+        assert repository.save_parse_result("file-a", tables, embedding_count=3, schema_fingerprint="fp")
+        file_data = repository.get("file-a")
+        assert file_data["tables"] == [table.to_dict() for table in tables]
+        assert (file_data["table_count"], file_data["column_count"]) == (1, 2)
+    
+    def test_delete_cascades_content(self, repository):
+        """测试删除文件同时删除 DDL 原文"""
+        assert repository.delete("file-a")
+        assert not repository.exists("file-a")
+        assert repository.get_content("file-a") is None
+        assert not repository.delete("file-a")
+    
+    def test_list_files_by_status(self, repository):
+        """测试按状态列出文件"""
+        repository.create("file-b", "b.sql", DDL, len(DDL), datetime(2024, 1, 2))
+        repository.update_status("file-b", "ready")
+        
+        assert [f["file_id"] for f in repository.list_files()] == ["file-a", "file-b"]
+        assert [f["file_id"] for f in repository.list_files(statuses=["ready"])] == ["file-b"]
+    
+    def test_shared_between_instances_and_threads(self, repository):
+        """测试多个仓储实例（模拟多 worker）和多线程共享同一数据库"""
+        other = SQLiteFileRepository(repository.db_path)
+        
+        def update():
+            other.update_status("file-a", "parsing")
+        
+        thread = threading.Thread(target=update)
+        thread.start()
+        thread.join()
+        
+        assert repository.get("file-a")["status"] == "parsing"
+    
+    def test_progress(self, repository):
+        """测试向量化进度更新，状态变化时清空进度"""
+        repository.update_status("file-a", "parsing")
+        assert repository.update_progress("file-a", 256, 1000)
+        file_data = repository.get("file-a")
+        assert (file_data["progress_embedded"], file_data["progress_total"]) == (256, 1000)
+        
+        repository.update_status("file-a", "error", "boom")
+        assert repository.get("file-a")["progress_total"] is None
+        assert not repository.update_progress("missing", 1, 1)
+    
+    def test_old_database_gets_new_columns(self, tmp_path):
+        """测试旧版本创建的数据库在启动时补齐新增列"""
+        db_path = tmp_path / "old.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE files (file_id TEXT PRIMARY KEY, filename TEXT NOT NULL, status TEXT NOT NULL, "
+            "uploaded_at TEXT NOT NULL, file_size INTEGER NOT NULL, error_message TEXT, tables_json TEXT, "
+            "table_count INTEGER, column_count INTEGER, embedding_count INTEGER, schema_fingerprint TEXT)"
+        )
+        conn.commit()
+        conn.close()
+        
+        repository = SQLiteFileRepository(str(db_path))
+        repository.create("file-a", "a.sql", DDL, len(DDL), datetime(2024, 1, 1))
+        assert repository.update_progress("file-a", 1, 2)
+        assert repository.get("file-a")["progress_embedded"] == 1
+    
+    def test_lease(self, repository):
+        """测试租约互斥、仅持有者可释放、过期后可重新获取"""
+        assert repository.try_acquire_lease("recovery", "worker-1", ttl_seconds=60)
+        assert not repository.try_acquire_lease("recovery", "worker-2", ttl_seconds=60)
+        
+        repository.release_lease("recovery", "worker-2")
+        assert not repository.try_acquire_lease("recovery", "worker-2", ttl_seconds=60)
+        
+        repository.release_lease("recovery", "worker-1")
+        assert repository.try_acquire_lease("recovery", "worker-2", ttl_seconds=0)
+        assert repository.try_acquire_lease("recovery", "worker-3", ttl_seconds=60)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,154 @@
+"""
+混合表结构检索测试
+验证 BM25 词法索引（标识符拆分、精确名称匹配）、与向量检索的倒数排名融合，以及精确名称问题不计算 embedding
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+import infrastructure.vector.vector_service as vector_module
+from infrastructure.parser.ddl_parser import TableColumn, TableInfo
+from infrastructure.vector.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+from infrastructure.vector.vector_service import VectorService
+
+
+class CountingEmbedding(EmbeddingFunction):
+    """按字符计数的离线 embedding，并统计被调用的文本数量"""
+
+    embedded_texts = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, input: Documents) -> Embeddings:
+        CountingEmbedding.embedded_texts += len(input)
+        vectors = []
+        for text in input:
+            vector = [0.0] * 64
+            for ch in text:
+                vector[ord(ch) % 64] += 1.0
+            vectors.append(vector)
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "default"
+
+    def get_config(self):
+        return {}
+
+    @staticmethod
+    def build_from_config(config):
+        return CountingEmbedding()
+
+
+@pytest.fixture(autouse=True)
+def offline_embedding(monkeypatch):
+    """使用离线 embedding（测试环境无法下载模型）"""
+    monkeypatch.setattr(vector_module, "DefaultEmbeddingFunction", CountingEmbedding)
+    CountingEmbedding.embedded_texts = 0
+
+
+TABLES = [
+    TableInfo(name="users", columns=[TableColumn("id", "BIGINT"), TableColumn("user_name", "VARCHAR(64)")],
+              comment="用户"),
+    TableInfo(name="orders", columns=[
+        TableColumn("id", "BIGINT"), TableColumn("user_id", "BIGINT"),
+        TableColumn("total_amount", "DECIMAL(10,2)", comment="订单金额")
+    ], comment="订单"),
+    TableInfo(name="payments", columns=[TableColumn("id", "BIGINT"), TableColumn("order_id", "BIGINT")],
+              comment="支付记录"),
+]
+
+
+@pytest.fixture
+def service(tmp_path):
+    """已向量化示例表的向量服务"""
+    service = VectorService(persist_path=str(tmp_path))
+    service.vectorize_tables(TABLES, "file-a")
+    CountingEmbedding.embedded_texts = 0
+    return service
+
+
+class TestLexicalIndex:
+    """测试词法索引"""
+
+    def test_tokenize_identifiers_and_chinese(self):
+        """测试标识符按表名前缀、snake_case 和驼峰拆分，中文取单字和双字"""
+        assert tokenize("orders.total_amount") == ["orders.total_amount", "orders", "total_amount", "total", "amount"]
+        assert tokenize("userId") == ["userid", "user", "id"]
+        assert tokenize("订单金额") == ["订", "单", "金", "额", "订单", "单金", "金额"]
+
+    def test_bm25_and_exact_matches(self):
+        """测试 BM25 排序，以及只包含表名/字段名的问题被识别为精确匹配"""
+        index = LexicalIndex(
+            ["t:orders", "c:orders.total_amount", "c:payments.order_id"],
+            ["表名: orders | 说明: 订单", "表: orders | 字段: total_amount | 说明: 订单金额", "表: payments | 字段: order_id"],
+            [
+                {"type": "table", "table_name": "orders"},
+                {"type": "column", "table_name": "orders", "column_name": "total_amount"},
+                {"type": "column", "table_name": "payments", "column_name": "order_id"},
+            ]
+        )
+
+        assert index.search("金额", 3)[0][0] == 1
+        assert index.search("amount", 3)[0][0] == 1
+        assert index.exact_matches("orders.total_amount") == [1]
+        assert index.exact_matches("order_id, orders") == [2, 0]
+        assert index.exact_matches("orders 金额") is None
+        assert index.exact_matches("show orders") is None
+
+    def test_reciprocal_rank_fusion(self):
+        """测试两路都靠前的文档排在最前"""
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]], k=60)
+
+        assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
+
+
+class TestHybridQuerySchema:
+    """测试混合检索"""
+
+    def test_exact_name_skips_embedding(self, service):
+        """测试精确名称问题由词法索引返回，不计算 embedding"""
+        results = service.query_schema("orders.total_amount", n_results=3, file_id="file-a")
+
+        assert CountingEmbedding.embedded_texts == 0
+        assert results["ids"][0][0] == "file-a:column:orders.total_amount"
+        assert results["distances"][0][0] == 0.0
+        assert len(results["ids"][0]) == 3
+
+    def test_fused_results(self, service):
+        """测试自然语言问题融合词法和向量结果，词法命中的字段排在前面"""
+        results = service.query_schema("每个用户的订单金额 total_amount", n_results=4, file_id="file-a")
+
+        assert CountingEmbedding.embedded_texts == 1
+        assert results["ids"][0][0] == "file-a:column:orders.total_amount"
+        assert results["distances"][0][0] == 0.0
+        assert len(set(results["ids"][0])) == 4
+        assert {m["file_id"] for m in results["metadatas"][0]} == {"file-a"}
+
+    def test_index_rebuilt_after_revectorize(self, service):
+        """测试文件重新向量化后词法索引失效并重建"""
+        assert service.query_schema("refunds", n_results=1, file_id="file-a")["ids"][0][0] != "file-a:table:refunds"
+
+        service.vectorize_tables(TABLES + [TableInfo(name="refunds", columns=[TableColumn("id", "BIGINT")])], "file-a")
+        CountingEmbedding.embedded_texts = 0
+
+        results = service.query_schema("refunds", n_results=1, file_id="file-a")
+        assert results["ids"][0] == ["file-a:table:refunds"]
+        assert CountingEmbedding.embedded_texts == 0
+
+    def test_without_file_id_uses_vectors(self, service):
+        """测试未指定文件时只做向量检索"""
+        service.query_schema("orders", n_results=2)
+
+        assert CountingEmbedding.embedded_texts == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
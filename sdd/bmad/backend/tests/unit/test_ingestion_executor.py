@@ -0,0 +1,104 @@
+"""
+DDL 摄取执行器测试
+验证解析/向量化离开事件循环执行，以及并发上限和队列背压
+"""
+import sys
+import asyncio
+import functools
+import threading
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from infrastructure.executor.ingestion_executor import IngestionExecutor, IngestionQueueFullError
+from infrastructure.parser.ddl_parser import ddl_parser
+
+
+class TestIngestionExecutor:
+    """测试摄取执行器"""
+    
+    @pytest.fixture
+    def executor(self):
+        """创建执行器实例"""
+        executor = IngestionExecutor(max_concurrency=1, queue_size=2, parse_workers=1, embed_workers=1)
+        yield executor
+        executor.shutdown()
+    
+    def test_reserve_rejects_when_queue_full(self, executor):
+        """测试队列满时拒绝新任务"""
+        executor.reserve()
+        executor.reserve()
+        
+        assert executor.has_capacity() is False
+        with pytest.raises(IngestionQueueFullError):
+            executor.reserve()
+    
+    def test_run_releases_slot(self, executor):
+        """测试任务完成（含异常）后释放队列位置"""
+        async def ok():
+            return 42
+        
+        async def fail():
+            raise ValueError("boom")
+        
+        assert asyncio.run(executor.run(ok)) == 42
+        with pytest.raises(ValueError):
+            asyncio.run(executor.run(fail))
+        
+        assert executor.get_stats()["pending"] == 0
+    
+    def test_concurrency_limit(self, executor):
+        """测试同时运行的任务数不超过上限"""
+        peak = {"running": 0, "max": 0}
+        
+        async def job():
+            peak["running"] += 1
+            peak["max"] = max(peak["max"], peak["running"])
+            await asyncio.sleep(0.01)
+            peak["running"] -= 1
+        
+        async def main():
+            await asyncio.gather(executor.run(job), executor.run(job))
+        
+        asyncio.run(main())
+        assert peak["max"] == 1
+    
+    def test_parse_runs_in_process_pool(self, executor):
+        """测试 DDL 解析在进程池中执行并返回表结构"""
+        ddl = "CREATE TABLE users (id INT PRIMARY KEY, name VARCHAR(100));"
+        
+        tables = asyncio.run(executor.run_parse(ddl_parser.parse, ddl))
+        
+        assert len(tables) == 1
+        assert tables[0].name == "users"
+        assert [col.name for col in tables[0].columns] == ["id", "name"]
+    
+    def test_parallel_parse_keeps_statement_order(self, executor):
+        """测试分批并行解析在进程池中执行，结果保持语句原始顺序"""
+        ddl = "\n".join(f"CREATE TABLE t{i} (id INT PRIMARY KEY, v{i} VARCHAR(10));" for i in range(25))
+        
+        async def main():
+            return await executor.run_parse_parallel(
+                functools.partial(ddl_parser.parse_parallel, batch_size=4), [ddl]
+            )
+        
+        tables = asyncio.run(main())
+        
+        assert [table.name for table in tables] == [f"t{i}" for i in range(25)]
+        assert [table.to_dict() for table in tables] == [table.to_dict() for table in ddl_parser.parse(ddl)]
+    
+    def test_embed_runs_off_event_loop(self, executor):
+        """测试向量化在线程池中执行（不在事件循环线程）"""
+        async def main():
+            loop_thread = threading.get_ident()
+            worker_thread = await executor.run_embed(threading.get_ident)
+            return loop_thread, worker_thread
+        
+        loop_thread, worker_thread = asyncio.run(main())
+        assert loop_thread != worker_thread
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,196 @@
+"""
+本地意图分类测试
+验证本地分类器、低置信度升级到 LLM、判断缓存和升级率统计
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from config import settings
+from domain.agent.intent_classifier import LocalIntentClassifier
+from domain.agent.intent_recognizer import IntentRecognizer
+
+
+class FakeLLMService:
+    """记录调用次数的假 LLM 服务"""
+    
+    def __init__(self, answer: str):
+        self.answer = answer
+        self.default_llm = object()
+        self.calls = []
+    
+    def is_available(self):
+        return self.default_llm is not None
+    
+    def generate_response(self, user_message, system_prompt=None, api_key=None):
+        self.calls.append(user_message)
+        return self.answer
+    
+    async def agenerate_response(self, user_message, system_prompt=None, api_key=None):
+        self.calls.append(user_message)
+        return self.answer
+
+
+class TestLocalIntentClassifier:
+    """测试本地分类器"""
+    
+    @pytest.mark.parametrize("message,expected", [
+        ("查询所有用户", "sql_generation"),
+        ("统计订单数量", "sql_generation"),
+        ("列出最近一周的订单", "sql_generation"),
+        ("你好", "general_chat"),
+        ("谢谢你", "general_chat"),
+        ("你能做什么", "general_chat"),
+    ])
+    def test_seed_predictions(self, message, expected):
+        """测试常见消息的本地分类结果"""
+        intent, confidence = LocalIntentClassifier.from_seed_data().predict(message)
+        assert intent == expected
+        assert 0.5 <= confidence <= 1.0
+    
+    def test_learn_shifts_prediction(self):
+        """测试在线学习后分类结果跟随样本"""
+        classifier = LocalIntentClassifier.from_seed_data()
+        
+        for _ in range(3):
+            classifier.learn("给我讲个笑话", "general_chat")
+        intent, confidence = classifier.predict("给我讲个笑话")
+        
+        assert intent == "general_chat"
+        assert confidence > 0.9
+    
+    
+    def test_unknown_text_not_confident(self):
+        """测试没有命中已知英文单词或多字 n-gram 的文本置信度为 0.5"""
+        assert LocalIntentClassifier.from_seed_data().predict("xyzzy plugh")[1] == 0.5
+    
+    def test_long_text_not_pushed_to_certainty(self):
+        """测试长文本的置信度按命中特征数归一化，不会因特征多而接近 1"""
+        message = "which customers placed more than 5 orders in the last year and spent over 100 on each order"
+        intent, confidence = LocalIntentClassifier.from_seed_data().predict(message)
+        
+        assert intent == "sql_generation" or confidence < settings.intent_local_confidence_threshold
+    
+    def test_learn_respects_vocabulary_cap(self):
+        """测试在线学习达到词表上限后不再加入新特征"""
+        classifier = LocalIntentClassifier.from_seed_data()
+        classifier.max_vocabulary = len(classifier._vocabulary) + 2
+        
+        classifier.learn("alpha beta gamma delta", "general_chat")
+        classifier.learn("epsilon zeta", "general_chat")
+        
+        assert len(classifier._vocabulary) == classifier.max_vocabulary
+        assert "w:gamma" not in classifier._vocabulary
+
+
+class TestTieredIntentRecognizer:
+    """测试分级意图识别"""
+    
+    @pytest.mark.parametrize("message", [
+        "which customers placed more than 5 orders",
+        "hi, list all orders",
+        "show me the top 10 products by revenue",
+        "how many users signed up yesterday",
+        "hi, 查询所有订单",
+        "帮我查一下 users 表",
+    ])
+    def test_english_and_mixed_sql_requests_at_default_threshold(self, message):
+        """测试默认阈值下，英文和中英混合的 SQL 请求不会被本地误判为普通对话"""
+        recognizer = IntentRecognizer()
+        recognizer._llm_service = FakeLLMService("sql")
+        
+        assert recognizer.confidence_threshold == settings.intent_local_confidence_threshold
+        assert recognizer.recognize(message) == "sql_generation"
+    
+    @pytest.mark.parametrize("message", ["hello", "how are you", "what can you do", "你好", "谢谢你"])
+    def test_english_and_chinese_chat_at_default_threshold(self, message):
+        """测试默认阈值下，普通对话不会被本地误判为 SQL 请求"""
+        recognizer = IntentRecognizer()
+        recognizer._llm_service = FakeLLMService("chat")
+        
+        assert recognizer.recognize(message) == "general_chat"
+    
+    def test_confident_message_skips_llm(self):
+        """测试高置信度消息在本地判定，不调用 LLM"""
+        recognizer = IntentRecognizer()
+        recognizer.confidence_threshold = 0.5
+        fake = FakeLLMService("general_chat")
+        recognizer._llm_service = fake
+        
+        assert recognizer.recognize("查询所有用户") == "sql_generation"
+        assert fake.calls == []
+        assert recognizer.get_stats()["local"] == 1
+    
+    def test_low_confidence_escalates_and_learns(self):
+        """测试低置信度消息升级到 LLM，并学习 LLM 的判断"""
+        recognizer = IntentRecognizer()
+        recognizer.confidence_threshold = 1.01
+        fake = FakeLLMService("general_chat")
+        recognizer._llm_service = fake
+        
+        assert asyncio.run(recognizer.arecognize("给我讲个笑话")) == "general_chat"
+        assert len(fake.calls) == 1
+        assert recognizer.get_stats()["llm"] == 1
+        assert recognizer.classifier.predict("给我讲个笑话")[0] == "general_chat"
+    
+    def test_decision_cache_hit(self):
+        """测试规范化后相同的消息命中判断缓存"""
+        recognizer = IntentRecognizer()
+        recognizer.confidence_threshold = 1.01
+        fake = FakeLLMService("sql_generation")
+        recognizer._llm_service = fake
+        
+        recognizer.recognize("订单表的总金额")
+        assert recognizer.recognize("订单表的总金额？") == "sql_generation"
+        assert len(fake.calls) == 1
+        assert recognizer.get_stats()["cache_hits"] == 1
+    
+    def test_fallback_result_not_cached(self):
+        """测试 LLM 不可用时的规则判断结果不进入缓存"""
+        recognizer = IntentRecognizer()
+        recognizer.confidence_threshold = 1.01
+        fake = FakeLLMService("sql_generation")
+        fake.default_llm = None
+        recognizer._llm_service = fake
+        
+        assert recognizer.recognize("查询所有用户") == "sql_generation"
+        assert recognizer._decisions == {}
+        assert recognizer.get_stats()["fallback"] == 1
+    
+    def test_unclear_llm_response_not_learned(self):
+        """测试 LLM 响应不明确时按规则判断，只计一次回退，不缓存也不学习"""
+        recognizer = IntentRecognizer()
+        recognizer.confidence_threshold = 1.01
+        recognizer._llm_service = FakeLLMService("不确定")
+        before = recognizer.classifier.predict("给我讲个笑话")
+        
+        assert recognizer.recognize("给我讲个笑话") == "general_chat"
+        
+        stats = recognizer.get_stats()
+        assert (stats["total"], stats["llm"], stats["fallback"]) == (1, 0, 1)
+        assert stats["escalation_rate"] == 1.0
+        assert recognizer._decisions == {}
+        assert recognizer.classifier.predict("给我讲个笑话") == before
+    
+    def test_escalation_rate(self):
+        """测试升级率统计（不含缓存命中）"""
+        recognizer = IntentRecognizer()
+        recognizer._llm_service = FakeLLMService("general_chat")
+        
+        recognizer.confidence_threshold = 0.5
+        recognizer.recognize("查询所有用户")
+        recognizer.confidence_threshold = 1.01
+        recognizer.recognize("给我讲个笑话")
+        recognizer.recognize("给我讲个笑话")
+        
+        stats = recognizer.get_stats()
+        assert stats["total"] == 3
+        assert stats["escalation_rate"] == 0.5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,100 @@
+"""
+LLM 客户端缓存测试
+验证按 API Key 复用客户端、LRU/TTL 淘汰和共享连接池
+"""
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from infrastructure.llm.llm_client_cache import LLMClientCache, hash_api_key
+from infrastructure.llm.llm_service import LLMService
+
+
+def make_cache(max_size: int = 2, ttl_seconds: float = 60.0) -> LLMClientCache:
+    """创建测试用客户端缓存"""
+    return LLMClientCache(
+        max_size=max_size,
+        ttl_seconds=ttl_seconds,
+        max_connections=10,
+        max_keepalive_connections=5,
+        keepalive_expiry=5.0,
+        timeout=5.0
+    )
+
+
+class TestLLMClientCache:
+    """测试客户端缓存"""
+    
+    def test_same_key_reuses_client(self):
+        """测试相同 API Key 复用同一客户端"""
+        cache = make_cache()
+        created = []
+        
+        def factory(api_key):
+            created.append(api_key)
+            return object()
+        
+        first = cache.get_or_create("key-a", factory)
+        second = cache.get_or_create("key-a", factory)
+        
+        assert first is second
+        assert created == ["key-a"]
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+    
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的客户端"""
+        cache = make_cache(max_size=2)
+        
+        a = cache.get_or_create("key-a", lambda k: object())
+        cache.get_or_create("key-b", lambda k: object())
+        cache.get_or_create("key-a", lambda k: object())  # a 变为最近使用
+        cache.get_or_create("key-c", lambda k: object())  # 淘汰 b
+        
+        assert cache.get_or_create("key-a", lambda k: object()) is a
+        stats = cache.get_stats()
+        assert stats["size"] == 2
+        assert stats["evictions_capacity"] == 1
+    
+    def test_ttl_expiry(self):
+        """测试超过 TTL 的客户端被重建"""
+        cache = make_cache(ttl_seconds=0.01)
+        
+        first = cache.get_or_create("key-a", lambda k: object())
+        time.sleep(0.02)
+        second = cache.get_or_create("key-a", lambda k: object())
+        
+        assert first is not second
+        assert cache.get_stats()["evictions_expired"] == 1
+    
+    def test_key_is_hashed(self):
+        """测试缓存中不保存明文 API Key"""
+        cache = make_cache()
+        cache.get_or_create("secret-key", lambda k: object())
+        
+        assert "secret-key" not in cache._clients
+        assert hash_api_key("secret-key") in cache._clients
+
+
+class TestLLMServiceClientReuse:
+    """测试 LLM 服务复用客户端"""
+    
+    def test_user_key_model_is_cached(self):
+        """测试用户 API Key 的 ChatModel 被复用且共享连接池"""
+        service = LLMService()
+        
+        first = service.get_chat_model(api_key="user-key-1")
+        second = service.get_chat_model(api_key="user-key-1")
+        other = service.get_chat_model(api_key="user-key-2")
+        
+        assert first is second
+        assert first is not other
+        assert first.http_async_client is other.http_async_client
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
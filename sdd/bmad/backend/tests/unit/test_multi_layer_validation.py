@@ -9,7 +9,11 @@ BACKEND_DIR = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(BACKEND_DIR))
 
 import pytest
+import sqlparse
+
+import domain.sql.parsed_sql as parsed_module
 from domain.sql.sql_validator import SQLValidator, get_sql_validator
+from domain.sql.validation_rules import DEFAULT_RULES, ValidationRule
 
 
 class TestLogicValidation:
@@ -181,5 +185,60 @@ class TestValidationPerformance:
         assert "valid" in result
 
 
+class TestSharedParse:
+    """单次解析、规则访问者测试"""
+    
+    SQL = """
+    select u.id, count(o.id) as order_count
+    from users u left join orders o on u.id = o.user_id
+    where u.name like 'a%' group by u.id;
+    """
+    
+    def test_validate_parses_once_and_formats_same_tree(self, monkeypatch):
+        """测试完整验证只调用一次 sqlparse.parse，不再调用 sqlparse.format，格式化结果与 sqlparse.format 相同"""
+        expected = sqlparse.format(self.SQL, reindent=True, keyword_case="upper", identifier_case="lower")
+        calls = []
+        original_parse = sqlparse.parse
+        monkeypatch.setattr(parsed_module.sqlparse, "parse", lambda sql: calls.append(sql) or original_parse(sql))
+        monkeypatch.setattr(parsed_module.sqlparse, "format", lambda *args, **kwargs: pytest.fail("不应重新解析格式化"))
+        
+        result = get_sql_validator({
+            "users": {"columns": ["id", "name"]},
+            "orders": {"columns": ["id", "user_id"]}
+        }).validate(self.SQL)
+        
+        assert len(calls) == 1
+        assert result["valid"] is True
+        assert result["formatted_sql"] == expected
+    
+    def test_custom_rule(self):
+        """测试自定义规则按所属层执行，与默认规则共享解析结果"""
+        class NoLimitRule(ValidationRule):
+            layer = "logic"
+            
+            def visit(self, statement, report):
+                if "LIMIT" not in statement.keywords():
+                    report.warnings.append("缺少 LIMIT")
+        
+        validator = get_sql_validator(rules=[*DEFAULT_RULES, NoLimitRule()])
+        
+        assert "缺少 LIMIT" in validator.validate("SELECT id FROM users;")["logic"]["warnings"]
+        assert validator.validate("SELECT id FROM users LIMIT 1;")["logic"]["warnings"] == []
+    
+    def test_logic_rules_match_tokens_not_substrings(self):
+        """测试逻辑规则按关键字 token 判断，字段名中的 update/on 不再误判"""
+        validator = get_sql_validator()
+        
+        assert validator.validate_logic("SELECT updated_at FROM users;")["errors"] == []
+        assert any("JOIN" in w for w in validator.validate_logic("SELECT c.id FROM users JOIN contacts c;")["warnings"])
+    
+    def test_missing_table_name(self):
+        """测试 FROM 后缺少表名的语法错误"""
+        result = get_sql_validator().validate_syntax("SELECT id FROM WHERE;")
+        
+        assert result["valid"] is False
+        assert result["errors"] == ["FROM 后缺少表名"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,351 @@
+"""
+持久化向量库测试
+验证重启后恢复向量、按 schema 指纹校验和复用向量，以及启动时恢复文件
+"""
+import sys
+import asyncio
+import threading
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+import infrastructure.vector.vector_service as vector_module
+from infrastructure.vector.vector_service import VectorService
+from infrastructure.parser.ddl_parser import TableColumn, TableInfo, compute_schema_fingerprint
+import application.ddl_service as ddl_service_module
+from application.ddl_service import DDLService
+from infrastructure.repository.sqlite_file_repository import SQLiteFileRepository
+
+
+class CountingEmbedding(EmbeddingFunction):
+    """按字符计数的离线 embedding，并统计被调用的文本数量"""
+    
+    embedded_texts = 0
+    batch_sizes = []
+    
+    def __init__(self, *args, **kwargs):
+        pass
+    
+    def __call__(self, input: Documents) -> Embeddings:
+        CountingEmbedding.embedded_texts += len(input)
+        CountingEmbedding.batch_sizes.append(len(input))
+        vectors = []
+        for text in input:
+            vector = [0.0] * 64
+            for ch in text:
+                vector[ord(ch) % 64] += 1.0
+            vectors.append(vector)
+        return vectors
+    
+    @staticmethod
+    def name() -> str:
+        return "default"
+    
+    def get_config(self):
+        return {}
+    
+    @staticmethod
+    def build_from_config(config):
+        return CountingEmbedding()
+
+
+@pytest.fixture(autouse=True)
+def offline_embedding(monkeypatch):
+    """使用离线 embedding（测试环境无法下载模型）"""
+    monkeypatch.setattr(vector_module, "DefaultEmbeddingFunction", CountingEmbedding)
+    CountingEmbedding.embedded_texts = 0
+    CountingEmbedding.batch_sizes = []
+
+
+TABLES = [
+    TableInfo(name="users", columns=[TableColumn("id", "BIGINT"), TableColumn("name", "VARCHAR(64)")]),
+    TableInfo(name="orders", columns=[TableColumn("id", "BIGINT"), TableColumn("user_id", "BIGINT")]),
+]
+FINGERPRINT = compute_schema_fingerprint(TABLES)
+DDL = "CREATE TABLE users (id BIGINT, name VARCHAR(64));"
+
+
+class TestPersistentVectorStore:
+    """测试持久化向量库"""
+    
+    def test_vectors_survive_restart(self, tmp_path):
+        """测试重启后向量和文件元数据仍然可用，且不重新计算 embedding"""
+        service = VectorService(persist_path=str(tmp_path))
+        count = service.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        embedded = CountingEmbedding.embedded_texts
+        
+        restarted = VectorService(persist_path=str(tmp_path))
+        
+        assert restarted.collection.count() == count
+        assert restarted.has_file_vectors("file-a", FINGERPRINT)
+        assert restarted.vectorize_tables(TABLES, "file-a", FINGERPRINT) == count
+        assert CountingEmbedding.embedded_texts == embedded
+    
+    def test_stale_vectors_dropped_on_startup(self, tmp_path):
+        """测试与清单不一致的向量在启动时被清理"""
+        service = VectorService(persist_path=str(tmp_path))
+        service.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        service.collection.delete(ids=["file-a:table:users"])
+        
+        restarted = VectorService(persist_path=str(tmp_path))
+        
+        assert restarted.collection.count() == 0
+        assert not restarted.has_file_vectors("file-a", FINGERPRINT)
+    
+    def test_identical_schema_copies_vectors(self, tmp_path):
+        """测试相同 schema 的文件复制已有向量而不是重新计算"""
+        service = VectorService(persist_path=str(tmp_path))
+        count = service.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        embedded = CountingEmbedding.embedded_texts
+        
+        assert service.vectorize_tables(TABLES, "file-b", FINGERPRINT) == count
+        assert CountingEmbedding.embedded_texts == embedded
+        assert len(service.collection.get(where={"file_id": "file-b"})["ids"]) == count
+    
+    def test_vectors_visible_without_local_manifest(self, tmp_path):
+        """测试共享向量库场景：其他进程写入的向量按元数据即可识别和复用"""
+        writer = VectorService(persist_path=str(tmp_path))
+        count = writer.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        embedded = CountingEmbedding.embedded_texts
+        
+        reader = VectorService(persist_path=str(tmp_path))
+        reader._manifest.clear()
+        
+        assert reader.has_file_vectors("file-a", FINGERPRINT)
+        assert reader.vectorize_tables(TABLES, "file-b", FINGERPRINT) == count
+        assert CountingEmbedding.embedded_texts == embedded
+    
+    def test_manifest_merged_across_processes(self, tmp_path):
+        """测试两个实例写同一目录时清单合并写入，重启后不会把对方的向量当作过期数据删除"""
+        first = VectorService(persist_path=str(tmp_path))
+        second = VectorService(persist_path=str(tmp_path))
+        first.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        second.vectorize_tables(TABLES[:1], "file-b", compute_schema_fingerprint(TABLES[:1]))
+        
+        restarted = VectorService(persist_path=str(tmp_path))
+        
+        assert restarted.has_file_vectors("file-a", FINGERPRINT)
+        assert restarted.has_file_vectors("file-b", compute_schema_fingerprint(TABLES[:1]))
+        assert set(restarted._load_manifest()) == {"file-a", "file-b"}
+    
+    def test_unrecorded_vectors_kept_until_orphaned(self, tmp_path):
+        """测试清单中没有记录的向量启动时保留，只有文件仓储中不存在时才清理"""
+        service = VectorService(persist_path=str(tmp_path))
+        count = service.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        service.vectorize_tables(TABLES[:1], "file-b", compute_schema_fingerprint(TABLES[:1]))
+        (tmp_path / VectorService.MANIFEST_FILENAME).write_text("{}", encoding="utf-8")
+        
+        restarted = VectorService(persist_path=str(tmp_path))
+        assert restarted.has_file_vectors("file-a", FINGERPRINT)
+        
+        assert restarted.drop_orphaned_vectors(lambda: ["file-a"]) == ["file-b"]
+        assert restarted.collection.count() == count
+    
+    def test_delete_file(self, tmp_path):
+        """测试删除文件后重启不再恢复"""
+        service = VectorService(persist_path=str(tmp_path))
+        service.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        service.delete_file("file-a")
+        
+        restarted = VectorService(persist_path=str(tmp_path))
+        assert restarted.collection.count() == 0
+        assert not restarted.has_file_vectors("file-a", FINGERPRINT)
+
+
+class TestIncrementalVectorization:
+    """测试按内容哈希增量向量化"""
+    
+    def _changed_tables(self):
+        """修改 orders.user_id 类型后的表结构"""
+        return [
+            TABLES[0],
+            TableInfo(name="orders", columns=[TableColumn("id", "BIGINT"), TableColumn("user_id", "INT")]),
+        ]
+    
+    def test_changed_column_embeds_one_document(self, tmp_path):
+        """测试只修改一个字段时只重新计算该字段的 embedding"""
+        service = VectorService(persist_path=str(tmp_path))
+        count = service.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        embedded = CountingEmbedding.embedded_texts
+        
+        changed = self._changed_tables()
+        fingerprint = compute_schema_fingerprint(changed)
+        assert service.vectorize_tables(changed, "file-a", fingerprint) == count
+        assert CountingEmbedding.embedded_texts == embedded + 1
+        
+        # 未变化条目的元数据同步到新指纹
+        assert service.has_file_vectors("file-a", fingerprint)
+        result = service.collection.get(ids=["file-a:column:orders.user_id"], include=["documents"])
+        assert "INT" in result["documents"][0] and "BIGINT" not in result["documents"][0]
+    
+    def test_removed_table_vectors_deleted(self, tmp_path):
+        """测试删除的表和字段的向量被移除"""
+        service = VectorService(persist_path=str(tmp_path))
+        service.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        embedded = CountingEmbedding.embedded_texts
+        
+        remaining = TABLES[:1]
+        assert service.vectorize_tables(remaining, "file-a", compute_schema_fingerprint(remaining)) == 3
+        assert CountingEmbedding.embedded_texts == embedded
+        assert service.collection.count() == 3
+        assert not service.collection.get(where={"table_name": "orders"})["ids"]
+    
+    def test_reupload_copies_unchanged_documents(self, tmp_path):
+        """测试重新上传（新 file_id）时内容相同的文档复制已有 embedding"""
+        service = VectorService(persist_path=str(tmp_path))
+        count = service.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        embedded = CountingEmbedding.embedded_texts
+        
+        changed = self._changed_tables()
+        assert service.vectorize_tables(changed, "file-b", compute_schema_fingerprint(changed)) == count
+        assert CountingEmbedding.embedded_texts == embedded + 1
+        assert len(service.collection.get(where={"file_id": "file-b"})["ids"]) == count
+
+
+class TestBatchedVectorization:
+    """测试分批向量化与进度上报"""
+    
+    def test_embeds_in_batches_and_reports_progress(self, tmp_path):
+        """测试按表分批计算 embedding，每批完成后上报进度"""
+        tables = [
+            TableInfo(name=f"t{i}", columns=[TableColumn("id", "BIGINT"), TableColumn("name", "VARCHAR(64)")])
+            for i in range(10)
+        ]
+        service = VectorService(persist_path=str(tmp_path))
+        service.embed_batch_size = 6
+        progress = []
+        
+        stats = service.vectorize_tables_with_stats(
+            tables, "file-a", compute_schema_fingerprint(tables),
+            progress_callback=lambda embedded, total: progress.append((embedded, total))
+        )
+        
+        assert stats["count"] == 30
+        assert service.collection.count() == 30
+        assert max(CountingEmbedding.batch_sizes) == 6
+        assert progress[0] == (0, 30)
+        assert progress[-1] == (30, 30)
+        assert [embedded for embedded, _ in progress] == sorted(embedded for embedded, _ in progress)
+        assert len(progress) == 1 + 5
+    
+    def test_identical_schema_copied_in_pages(self, tmp_path):
+        """测试复制相同 schema 的向量时按批分页读取和写入，每页完成后上报进度"""
+        tables = [
+            TableInfo(name=f"t{i}", columns=[TableColumn("id", "BIGINT"), TableColumn("name", "VARCHAR(64)")])
+            for i in range(10)
+        ]
+        fingerprint = compute_schema_fingerprint(tables)
+        service = VectorService(persist_path=str(tmp_path))
+        service.embed_batch_size = 8
+        service.vectorize_tables(tables, "file-a", fingerprint)
+        embedded = CountingEmbedding.embedded_texts
+        
+        added = []
+        add = service.collection.add
+        service.collection.add = lambda **kwargs: (added.append(len(kwargs["ids"])), add(**kwargs))[1]
+        progress = []
+        stats = service.vectorize_tables_with_stats(
+            tables, "file-b", fingerprint,
+            progress_callback=lambda copied, total: progress.append((copied, total))
+        )
+        
+        assert stats["copied"] == 30
+        assert CountingEmbedding.embedded_texts == embedded
+        assert added == [8, 8, 8, 6]
+        assert progress == [(0, 30), (8, 30), (16, 30), (24, 30), (30, 30)]
+        file_b = service.collection.get(where={"file_id": "file-b"})["ids"]
+        assert sorted(file_b) == sorted(id_.replace("file-a:", "file-b:", 1)
+                                        for id_ in service.collection.get(where={"file_id": "file-a"})["ids"])
+    
+    def test_reused_vectors_report_complete_progress(self, tmp_path):
+        """测试复用已有向量时直接上报完成"""
+        service = VectorService(persist_path=str(tmp_path))
+        count = service.vectorize_tables(TABLES, "file-a", FINGERPRINT)
+        progress = []
+        
+        service.vectorize_tables_with_stats(
+            TABLES, "file-a", FINGERPRINT,
+            progress_callback=lambda embedded, total: progress.append((embedded, total))
+        )
+        assert progress == [(count, count)]
+
+
+class TestRecoverFiles:
+    """测试启动时恢复文件"""
+    
+    def test_ready_file_with_persisted_vectors_not_reprocessed(self, tmp_path):
+        """测试向量已持久化的就绪文件重启后无需重新处理"""
+        repository = SQLiteFileRepository(str(tmp_path / "files.db"))
+        repository.create("file-a", "a.sql", DDL, len(DDL), datetime.now())
+        
+        service = DDLService()
+        service.file_repository = repository
+        service.vector_service = VectorService(persist_path=str(tmp_path / "chroma"))
+        asyncio.run(service.process_ddl_file("file-a", DDL))
+        assert repository.get("file-a")["status"] == "ready"
+        
+        restarted = DDLService()
+        restarted.file_repository = SQLiteFileRepository(str(tmp_path / "files.db"))
+        restarted.vector_service = VectorService(persist_path=str(tmp_path / "chroma"))
+        
+        assert asyncio.run(restarted.recover_files()) == 0
+    
+    def test_interrupted_file_reprocessed(self, tmp_path):
+        """测试重启前未处理完成的文件被重新处理"""
+        repository = SQLiteFileRepository(str(tmp_path / "files.db"))
+        repository.create("file-a", "a.sql", DDL, len(DDL), datetime.now())
+        repository.update_status("file-a", "parsing")
+        
+        service = DDLService()
+        service.file_repository = repository
+        service.vector_service = VectorService(persist_path=str(tmp_path / "chroma"))
+        
+        assert asyncio.run(service.recover_files()) == 1
+        assert repository.get("file-a")["status"] == "ready"
+    
+    def test_schema_encoding_and_writes_off_event_loop(self, tmp_path, monkeypatch):
+        """测试指纹计算、解析结果保存、状态更新和符号表构建都不在事件循环线程中执行"""
+        repository = SQLiteFileRepository(str(tmp_path / "files.db"))
+        repository.create("file-a", "a.sql", DDL, len(DDL), datetime.now())
+        on_loop = []
+        
+        def record(name, func):
+            def wrapper(*args, **kwargs):
+                if threading.current_thread() is threading.main_thread():
+                    on_loop.append(name)
+                return func(*args, **kwargs)
+            return wrapper
+        
+        monkeypatch.setattr(ddl_service_module, "compute_schema_fingerprint",
+                            record("fingerprint", ddl_service_module.compute_schema_fingerprint))
+        for name in ("update_status", "save_parse_result"):
+            monkeypatch.setattr(repository, name, record(name, getattr(repository, name)))
+        service = DDLService()
+        service.file_repository = repository
+        service.vector_service = VectorService(persist_path=str(tmp_path / "chroma"))
+        monkeypatch.setattr(service.symbol_tables, "put", record("symbol_table", service.symbol_tables.put))
+        
+        assert asyncio.run(service.process_ddl_file("file-a", DDL))["success"]
+        assert on_loop == []
+    
+    def test_recovery_runs_in_one_worker(self, tmp_path):
+        """测试其他 worker 持有恢复租约时跳过恢复"""
+        repository = SQLiteFileRepository(str(tmp_path / "files.db"))
+        repository.create("file-a", "a.sql", DDL, len(DDL), datetime.now())
+        repository.try_acquire_lease("startup-recovery", "other-worker", ttl_seconds=60)
+        
+        service = DDLService()
+        service.file_repository = repository
+        service.vector_service = VectorService(persist_path=str(tmp_path / "chroma"))
+        
+        assert asyncio.run(service.recover_files()) == 0
+        assert repository.get("file-a")["status"] == "pending"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
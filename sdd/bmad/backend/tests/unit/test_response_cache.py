@@ -0,0 +1,158 @@
+"""
+SQL 响应缓存测试
+验证精确匹配、语义匹配、LRU/TTL 淘汰和按文件失效
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from infrastructure.cache.response_cache import ResponseCache, normalize_question, question_literals
+from application.agent_service import AgentService
+
+
+def char_embed(texts):
+    """按字符计数的简单向量化函数（字符集合相同则向量相同）"""
+    vectors = []
+    for text in texts:
+        vector = [0.0] * 64
+        for ch in text:
+            vector[ord(ch) % 64] += 1.0
+        vectors.append(vector)
+    return vectors
+
+
+RESPONSE = {"sql": "SELECT COUNT(*) FROM orders;", "explanation": "test", "references": []}
+
+
+class TestNormalizeQuestion:
+    """测试问题规范化"""
+    
+    def test_normalize_whitespace_case_and_punctuation(self):
+        """测试忽略大小写、全角字符、空白和末尾标点"""
+        assert normalize_question("  统计 订单数量？ ") == normalize_question("统计 订单数量")
+        assert normalize_question("Count  ORDERS!") == "count orders"
+        assert normalize_question("ＳＥＬＥＣＴ") == "select"
+
+
+class TestResponseCache:
+    """测试响应缓存"""
+    
+    def test_exact_hit(self):
+        """测试规范化后精确命中"""
+        cache = ResponseCache(max_size=10, ttl_seconds=60, similarity_threshold=0)
+        cache.put("f1", "v1", "统计订单数量", RESPONSE)
+        
+        assert cache.get("f1", "v1", "统计订单数量。") == RESPONSE
+        assert cache.get_stats()["exact_hits"] == 1
+    
+    def test_scoped_by_file_and_schema_version(self):
+        """测试不同文件或不同 schema 指纹不会命中"""
+        cache = ResponseCache(max_size=10, ttl_seconds=60, similarity_threshold=0)
+        cache.put("f1", "v1", "统计订单数量", RESPONSE)
+        
+        assert cache.get("f2", "v1", "统计订单数量") is None
+        assert cache.get("f1", "v2", "统计订单数量") is None
+    
+    def test_semantic_hit(self):
+        """测试相似问题通过向量相似度命中"""
+        cache = ResponseCache(max_size=10, ttl_seconds=60, similarity_threshold=0.99, embed_fn=char_embed)
+        cache.put("f1", "v1", "统计订单数量", RESPONSE)
+        
+        # 字符相同、顺序不同 -> 向量相同
+        assert cache.get("f1", "v1", "订单数量统计") == RESPONSE
+        assert cache.get_stats()["semantic_hits"] == 1
+        assert cache.get("f1", "v1", "查询所有活跃用户") is None
+    
+    @pytest.mark.parametrize("cached,question", [
+        ("查询金额最高的前10个订单", "查询金额最高的前20个订单"),
+        ("查询已支付的订单", "查询未支付的订单"),
+        ("查询状态为'paid'的订单", "查询状态为'refunded'的订单"),
+        ("查询前十个用户", "查询前二十个用户"),
+    ])
+    def test_semantic_hit_requires_same_literals(self, cached, question):
+        """测试向量完全相同但数字、引号内的值或否定词不同的问题不命中"""
+        def same_embed(texts):
+            return [[1.0, 0.0] for _ in texts]
+        
+        cache = ResponseCache(max_size=10, ttl_seconds=60, similarity_threshold=0.97, embed_fn=same_embed)
+        cache.put("f1", "v1", cached, RESPONSE)
+        
+        assert cache.get("f1", "v1", question) is None
+        assert cache.get("f1", "v1", cached + "吧") == RESPONSE
+    
+    def test_question_literals(self):
+        """测试字面量提取（数字、引号内的值、否定词）"""
+        assert question_literals(normalize_question("前10个“北京”的未支付订单，金额大于99.5")) == (
+            "10", "北京", "未", "99.5"
+        )
+    
+    def test_embedding_failure_falls_back_to_exact(self):
+        """测试向量模型不可用时仅做精确匹配"""
+        def broken_embed(texts):
+            raise RuntimeError("model unavailable")
+        
+        cache = ResponseCache(max_size=10, ttl_seconds=60, similarity_threshold=0.9, embed_fn=broken_embed)
+        cache.put("f1", "v1", "统计订单数量", RESPONSE)
+        
+        assert cache.get("f1", "v1", "统计订单数量") == RESPONSE
+        assert cache.get("f1", "v1", "订单数量统计") is None
+    
+    def test_ttl_and_lru_eviction(self):
+        """测试过期淘汰和容量淘汰"""
+        cache = ResponseCache(max_size=2, ttl_seconds=0.01, similarity_threshold=0)
+        cache.put("f1", "v1", "q1", RESPONSE)
+        time.sleep(0.02)
+        assert cache.get("f1", "v1", "q1") is None
+        
+        cache = ResponseCache(max_size=2, ttl_seconds=60, similarity_threshold=0)
+        for q in ["q1", "q2", "q3"]:
+            cache.put("f1", "v1", q, RESPONSE)
+        assert cache.get("f1", "v1", "q1") is None
+        assert cache.get("f1", "v1", "q3") == RESPONSE
+    
+    def test_invalidate_file(self):
+        """测试按文件失效"""
+        cache = ResponseCache(max_size=10, ttl_seconds=60, similarity_threshold=0)
+        cache.put("f1", "v1", "q1", RESPONSE)
+        cache.put("f2", "v1", "q1", RESPONSE)
+        
+        assert cache.invalidate_file("f1") == 1
+        assert cache.get("f1", "v1", "q1") is None
+        assert cache.get("f2", "v1", "q1") == RESPONSE
+    
+    def test_returned_response_is_a_copy(self):
+        """测试返回副本，调用方修改不影响缓存"""
+        cache = ResponseCache(max_size=10, ttl_seconds=60, similarity_threshold=0)
+        cache.put("f1", "v1", "q1", RESPONSE)
+        
+        cache.get("f1", "v1", "q1")["references"].append({"table": "x"})
+        assert cache.get("f1", "v1", "q1")["references"] == []
+
+
+class TestAgentServiceResponseCache:
+    """测试 Agent 服务前置缓存"""
+    
+    def test_cache_hit_skips_agent(self, monkeypatch):
+        """测试缓存命中时不执行 ReAct 循环"""
+        service = AgentService()
+        service.response_cache = ResponseCache(max_size=10, ttl_seconds=60, similarity_threshold=0)
+        service.response_cache.put("f1", "v1", "统计订单数量", RESPONSE)
+        
+        def fail(*args, **kwargs):
+            raise AssertionError("Agent should not run on cache hit")
+        
+        monkeypatch.setattr(service, "_get_or_create_agent", fail)
+        
+        result = asyncio.run(service.process_message(
+            "统计订单数量", file_id="f1", schema_version="v1"
+        ))
+        assert result == RESPONSE
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,91 @@
+"""
+表结构关系图测试
+验证外键关系图的构建，以及按文件缓存和失效
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+
+from domain.ddl.schema_graph import JoinEdge, SchemaGraph, SchemaGraphRegistry
+from infrastructure.parser.ddl_parser import ddl_parser
+
+DDL = """
+CREATE TABLE users (id int PRIMARY KEY, name varchar(64));
+CREATE TABLE shops (id int PRIMARY KEY, owner_id int REFERENCES users);
+CREATE TABLE orders (
+  id int PRIMARY KEY, user_id int, shop_id int,
+  CONSTRAINT fk_user FOREIGN KEY (user_id) REFERENCES users (id),
+  CONSTRAINT fk_shop FOREIGN KEY (shop_id) REFERENCES shops (id)
+);
+CREATE TABLE order_items (
+  order_id int, line_no int, sku varchar(32),
+  FOREIGN KEY (order_id) REFERENCES orders (id),
+  FOREIGN KEY (sku) REFERENCES products (sku)
+);
+CREATE TABLE logs (id int, message text);
+"""
+
+
+@pytest.fixture
+def graph():
+    """由示例 DDL 构建的关系图"""
+    return SchemaGraph.from_tables([table.to_dict() for table in ddl_parser.parse(DDL)])
+
+
+class TestSchemaGraph:
+    """测试外键关系图"""
+    
+    def test_edges_from_foreign_keys(self, graph):
+        """测试外键转换为边，引用列为空时使用主键，指向不存在的表的外键被忽略"""
+        assert graph.table_names == ["users", "shops", "orders", "order_items", "logs"]
+        assert {edge.condition() for edge in graph.edges} == {
+            "shops.owner_id = users.id",
+            "orders.user_id = users.id",
+            "orders.shop_id = shops.id",
+            "order_items.order_id = orders.id",
+        }
+    
+    def test_composite_foreign_key_single_edge(self):
+        """测试复合外键合并为一条边"""
+        graph = SchemaGraph.from_tables([table.to_dict() for table in ddl_parser.parse(
+            "CREATE TABLE a (x int, y int, PRIMARY KEY (x, y));"
+            "CREATE TABLE b (ax int, ay int, CONSTRAINT fk FOREIGN KEY (ax, ay) REFERENCES a (x, y));"
+        )])
+        
+        assert graph.edges == [JoinEdge("b", ("ax", "ay"), "a", ("x", "y"))]
+        assert graph.edges[0].condition() == "b.ax = a.x AND b.ay = a.y"
+
+
+class TestSchemaGraphRegistry:
+    """测试按文件缓存的关系图"""
+    
+    def test_cached_until_invalidated(self):
+        """测试关系图按文件缓存，失效后重新加载，未就绪的文件不缓存"""
+        tables = [table.to_dict() for table in ddl_parser.parse(DDL)]
+        records = {
+            "ready": {"status": "ready", "tables": tables},
+            "parsing": {"status": "parsing"},
+        }
+        loads = []
+        
+        def loader(file_id):
+            loads.append(file_id)
+            return records.get(file_id)
+        
+        registry = SchemaGraphRegistry(loader, max_size=1)
+        graph = registry.get("ready")
+        
+        assert registry.get("ready") is graph
+        assert registry.get("parsing") is None
+        assert registry.get("missing") is None
+        registry.invalidate("ready")
+        assert registry.get("ready") is not graph
+        assert loads == ["ready", "parsing", "missing", "ready"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
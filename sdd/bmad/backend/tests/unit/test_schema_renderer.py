@@ -0,0 +1,129 @@
+"""
+表结构紧凑渲染测试
+验证单行表结构格式、token 估算、按相关性在预算内取舍表和字段，以及检索结果的紧凑输出
+"""
+import sys
+import json
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+
+import domain.agent.vector_search_tool as tool_module
+from domain.agent.vector_search_tool import VectorSearchTool
+from domain.ddl.schema_renderer import count_tokens, render_schema, render_table
+
+ORDERS = {
+    "name": "orders",
+    "columns": [
+        {"name": "id", "data_type": "BIGINT"},
+        {"name": "user_id", "data_type": "BIGINT"},
+        {"name": "total", "data_type": "DECIMAL(10,2)", "comment": "订单金额"},
+        {"name": "created_at", "data_type": "DATETIME"},
+    ],
+    "primary_keys": ["id"],
+    "foreign_keys": [{"name": "fk", "column": "user_id", "ref_table": "users", "ref_column": "id"}],
+    "comment": "订单"
+}
+USERS = {"name": "users", "columns": [{"name": "id", "data_type": "BIGINT"}], "primary_keys": ["id"]}
+
+
+class TestRenderTable:
+    """测试单表渲染"""
+    
+    def test_compact_line(self):
+        """测试字段类型、主键、外键、注释和表注释在一行内"""
+        assert render_table(ORDERS) == (
+            "orders(id BIGINT PK, user_id BIGINT FK→users.id, total DECIMAL(10,2) '订单金额', "
+            "created_at DATETIME) -- 订单"
+        )
+    
+    def test_max_columns_keeps_keys(self):
+        """测试缩减字段时优先保留主键和外键字段，并注明省略的字段数"""
+        assert render_table(ORDERS, max_columns=3) == (
+            "orders(id BIGINT PK, user_id BIGINT FK→users.id, total DECIMAL(10,2) '订单金额', ...+1) -- 订单"
+        )
+        assert render_table(ORDERS, max_columns=1) == "orders(id BIGINT PK, ...+3) -- 订单"
+
+
+class TestRenderSchema:
+    """测试预算内渲染多表"""
+    
+    def test_count_tokens(self):
+        """测试中文按字计数，其余字符按 4 个一个 token"""
+        assert count_tokens("订单金额") == 4
+        assert count_tokens("orders") == 2
+        assert count_tokens("") == 0
+    
+    def test_unlimited(self):
+        """测试不限制预算时按原顺序全部列出"""
+        schema = render_schema([ORDERS, USERS])
+        
+        assert schema.text.splitlines() == [render_table(ORDERS), render_table(USERS)]
+        assert schema.tables == ["orders", "users"]
+        assert schema.tokens == count_tokens(schema.text)
+    
+    def test_budget_by_relevance(self):
+        """测试相关性高的表优先；放不下的表缩减字段，之后的表省略"""
+        budget = count_tokens(render_table(USERS)) + count_tokens(render_table(ORDERS, max_columns=2)) + 2
+        
+        schema = render_schema([ORDERS, USERS, dict(USERS, name="logs")], budget, {"users": 0.9, "orders": 0.5})
+        
+        assert schema.tables == ["users"]
+        assert schema.truncated == ["orders"]
+        assert schema.omitted == ["logs"]
+        assert schema.text.splitlines() == [
+            render_table(USERS), render_table(ORDERS, max_columns=2), "-- 另有 1 张表超出长度限制未列出"
+        ]
+
+
+class CompactVectorService:
+    """返回带紧凑表结构元数据的命中结果"""
+    
+    def query_schema(self, query_text, n_results=5, file_id=None):
+        return {
+            "documents": [["表名: orders | 字段数量: 4", "表: orders | 字段: total | 类型: DECIMAL(10,2)", "表名: users"]],
+            "metadatas": [[
+                {"type": "table", "table_name": "orders", "column_count": 4, "schema": render_table(ORDERS)},
+                {"type": "column", "table_name": "orders", "column_name": "total",
+                 "data_type": "DECIMAL(10,2)", "comment": "订单金额"},
+                {"type": "table", "table_name": "users", "column_count": 1},
+            ]],
+            "distances": [[0.1, 0.2, 0.6]]
+        }
+
+
+class TestCompactSearchResults:
+    """测试检索工具的紧凑输出"""
+    
+    @pytest.fixture(autouse=True)
+    def vector_service(self, monkeypatch):
+        """使用返回固定命中的假向量服务"""
+        monkeypatch.setattr(tool_module, "get_vector_service", lambda: CompactVectorService())
+    
+    def test_compact_items(self):
+        """测试表命中返回紧凑表结构（旧数据退回检索文档），字段命中返回类型和注释，输出不缩进"""
+        observation = VectorSearchTool(expand_depth=0, token_budget=0)._run("订单金额")
+        results = json.loads(observation)
+        
+        assert "\n" not in observation
+        assert results == [
+            {"type": "表", "name": "orders", "schema": render_table(ORDERS), "relevance": 0.9},
+            {"type": "字段", "table": "orders", "name": "total", "data_type": "DECIMAL(10,2)",
+             "relevance": 0.8, "comment": "订单金额"},
+            {"type": "表", "name": "users", "schema": "表名: users", "relevance": 0.4},
+        ]
+    
+    def test_token_budget(self):
+        """测试超出预算的低相关性结果被去掉，第一条结果始终保留"""
+        limited = json.loads(VectorSearchTool(expand_depth=0, token_budget=80)._run("订单金额"))
+        tiny = json.loads(VectorSearchTool(expand_depth=0, token_budget=1)._run("订单金额"))
+        
+        assert [item["name"] for item in limited] == ["orders", "total"]
+        assert [item["name"] for item in tiny] == ["orders"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
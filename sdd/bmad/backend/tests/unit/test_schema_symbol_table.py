@@ -0,0 +1,93 @@
+"""
+Schema 符号表测试
+验证 表 -> 字段 -> 类型 的查找、字段反向索引，以及按文件缓存（解析完成时放入、失效后从仓储重建）
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+
+from domain.sql.sql_validator import get_sql_validator
+from domain.sql.symbol_table import SchemaSymbolTable, SymbolTableRegistry
+
+TABLES = [
+    {"name": "Users", "columns": [{"name": "ID", "data_type": "BIGINT"}, {"name": "name", "data_type": "VARCHAR(64)"}]},
+    {"name": "orders", "columns": [{"name": "id", "data_type": "BIGINT"}, {"name": "user_id", "data_type": "BIGINT"}]},
+]
+
+
+class TestSchemaSymbolTable:
+    """测试符号表查找"""
+    
+    def test_lookup_case_insensitive(self):
+        """测试表名、字段名不区分大小写，返回字段类型"""
+        symbols = SchemaSymbolTable.from_tables(TABLES)
+        
+        assert len(symbols) == 2 and "USERS" in symbols and "payments" not in symbols
+        assert symbols.has_column("users", "id") and not symbols.has_column("users", "user_id")
+        assert symbols.column_type("orders", "USER_ID") == "BIGINT"
+        assert symbols.column_type("users", "email") is None
+    
+    def test_tables_with_column(self):
+        """测试字段反向索引"""
+        symbols = SchemaSymbolTable.from_tables(TABLES)
+        
+        assert symbols.tables_with_column("id") == ["users", "orders"]
+        assert symbols.tables_with_column("user_id") == ["orders"]
+        assert symbols.tables_with_column("email") == []
+    
+    def test_from_metadata(self):
+        """测试从验证器的 schema 元数据构建（字段名列表，类型未知）"""
+        symbols = SchemaSymbolTable.from_metadata({"users": {"columns": ["id", "name"]}})
+        
+        assert symbols.has_column("users", "name")
+        assert symbols.column_type("users", "name") is None
+    
+    def test_validator_accepts_symbol_table(self):
+        """测试验证器直接使用符号表"""
+        validator = get_sql_validator(SchemaSymbolTable.from_tables(TABLES))
+        
+        assert validator.validate_references("SELECT u.name FROM users u;")["valid"] is True
+        assert validator.validate_references("SELECT u.email FROM users u;")["errors"] == ["字段不存在：users.email"]
+
+
+class TestSymbolTableRegistry:
+    """测试按文件缓存的符号表"""
+    
+    @pytest.fixture
+    def loads(self):
+        """记录仓储读取次数"""
+        return []
+    
+    @pytest.fixture
+    def registry(self, loads):
+        """只包含一个就绪文件的符号表缓存"""
+        def loader(file_id):
+            loads.append(file_id)
+            return {"status": "ready", "tables": TABLES} if file_id == "file-a" else None
+        return SymbolTableRegistry(loader, max_size=1)
+    
+    def test_put_at_ingestion_skips_repository(self, registry, loads):
+        """测试解析完成时放入的符号表直接使用，不读取仓储"""
+        symbols = SchemaSymbolTable.from_tables(TABLES[:1])
+        registry.put("file-a", symbols)
+        
+        assert registry.get("file-a") is symbols
+        assert loads == []
+    
+    def test_rebuilt_after_invalidate(self, registry, loads):
+        """测试失效后从仓储重建，不存在的文件返回 None"""
+        registry.put("file-a", SchemaSymbolTable.from_tables(TABLES[:1]))
+        registry.invalidate("file-a")
+        
+        assert "orders" in registry.get("file-a")
+        assert registry.get("file-a") is registry.get("file-a")
+        assert registry.get("missing") is None
+        assert loads == ["file-a", "missing"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
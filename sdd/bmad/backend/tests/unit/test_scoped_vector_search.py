@@ -0,0 +1,210 @@
+"""
+按文件限定向量检索测试
+验证 file_id 从 Agent 服务传递到检索工具，按元数据过滤检索结果，以及沿外键扩展的关联子图
+"""
+import sys
+import json
+import asyncio
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import domain.agent.vector_search_tool as tool_module
+from domain.agent.vector_search_tool import VectorSearchTool, scoped_file_id
+from application.agent_service import AgentService
+from domain.ddl.schema_graph import SchemaGraphRegistry
+from domain.ddl.schema_renderer import count_tokens
+from infrastructure.parser.ddl_parser import TableColumn, TableInfo, ddl_parser
+from infrastructure.vector.vector_service import VectorService
+
+
+class CharEmbedding(EmbeddingFunction):
+    """按字符计数的离线 embedding（测试环境无法下载模型）"""
+    
+    def __init__(self):
+        pass
+    
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors = []
+        for text in input:
+            vector = [0.0] * 64
+            for ch in text:
+                vector[ord(ch) % 64] += 1.0
+            vectors.append(vector)
+        return vectors
+    
+    @staticmethod
+    def name() -> str:
+        return "char-embedding"
+
+
+class RecordingVectorService:
+    """记录检索参数的假向量服务"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def query_schema(self, query_text, n_results=5, file_id=None):
+        self.calls.append(file_id)
+        return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+
+@pytest.fixture
+def vector_service():
+    """使用离线 embedding 的向量服务"""
+    service = VectorService()
+    service.collection = service.client.get_or_create_collection(
+        name=f"ddl_schema_{uuid.uuid4().hex[:8]}",
+        embedding_function=CharEmbedding()
+    )
+    return service
+
+
+def make_table(name: str) -> TableInfo:
+    """创建测试表"""
+    return TableInfo(name=name, columns=[TableColumn("id", "BIGINT"), TableColumn("name", "VARCHAR(64)")])
+
+
+class TestQuerySchemaFilter:
+    """测试向量检索按文件过滤"""
+    
+    def test_results_limited_to_file(self, vector_service):
+        """测试只返回指定文件的表结构"""
+        vector_service.vectorize_tables([make_table("users")], "file-a")
+        vector_service.vectorize_tables([make_table("users_backup")], "file-b")
+        
+        results = vector_service.query_schema("用户表 users", n_results=3, file_id="file-a")
+        
+        assert results["metadatas"][0]
+        assert {m["file_id"] for m in results["metadatas"][0]} == {"file-a"}
+    
+    def test_without_file_id_searches_all(self, vector_service):
+        """测试不指定文件时检索全部文件"""
+        vector_service.vectorize_tables([make_table("users")], "file-a")
+        vector_service.vectorize_tables([make_table("users_backup")], "file-b")
+        
+        results = vector_service.query_schema("users", n_results=6)
+        
+        assert {m["file_id"] for m in results["metadatas"][0]} == {"file-a", "file-b"}
+
+
+class TestFileIdPropagation:
+    """测试 file_id 传递"""
+    
+    def test_tool_reads_scoped_file_id(self, monkeypatch):
+        """测试工具在线程中执行时仍能读取当前文件 ID"""
+        recorder = RecordingVectorService()
+        monkeypatch.setattr(tool_module, "get_vector_service", lambda: recorder)
+        tool = VectorSearchTool()
+        
+        async def main():
+            with scoped_file_id("file-a"):
+                await tool._arun("用户表")
+            await tool._arun("用户表")
+        
+        asyncio.run(main())
+        assert recorder.calls == ["file-a", None]
+    
+    def test_process_message_scopes_search(self, monkeypatch):
+        """测试 Agent 调用检索工具时使用请求的 file_id"""
+        recorder = RecordingVectorService()
+        monkeypatch.setattr(tool_module, "get_vector_service", lambda: recorder)
+        
+        service = AgentService()
+        llm = FakeListChatModel(responses=[
+            "Thought: 需要表结构\nAction: vector_search\nAction Input: 用户表",
+            "Thought: 完成\nFinal Answer: SELECT * FROM users;",
+        ])
+        monkeypatch.setattr(service.llm_service, "get_chat_model", lambda api_key=None: llm)
+        
+        result = asyncio.run(service.process_message("查询所有用户", file_id="file-a"))
+        
+        assert result["sql"] == "SELECT * FROM users;"
+        assert recorder.calls == ["file-a"]
+
+
+class HitVectorService:
+    """返回固定命中（orders 表及其字段）的假向量服务"""
+    
+    def query_schema(self, query_text, n_results=5, file_id=None):
+        return {
+            "documents": [["表名: orders", "表: orders | 字段: user_id"]],
+            "metadatas": [[
+                {"type": "table", "table_name": "orders", "column_count": 3},
+                {"type": "column", "table_name": "orders", "column_name": "user_id", "data_type": "INT"},
+            ]],
+            "distances": [[0.1, 0.2]]
+        }
+
+
+class TestSchemaGraphExpansion:
+    """测试检索结果沿外键扩展"""
+    
+    DDL = (
+        "CREATE TABLE users (id INT PRIMARY KEY, org_id INT REFERENCES orgs(id));"
+        "CREATE TABLE orgs (id INT PRIMARY KEY, name VARCHAR(64));"
+        "CREATE TABLE orders (id INT PRIMARY KEY, user_id INT REFERENCES users(id), total DECIMAL(10,2));"
+        "CREATE TABLE logs (id INT);"
+    )
+    
+    @pytest.fixture
+    def registry(self, monkeypatch):
+        """使用示例 DDL 的关系图缓存"""
+        tables = [table.to_dict() for table in ddl_parser.parse(self.DDL)]
+        registry = SchemaGraphRegistry(lambda file_id: {"status": "ready", "tables": tables})
+        monkeypatch.setattr(tool_module, "get_vector_service", lambda: HitVectorService())
+        monkeypatch.setattr(tool_module, "get_schema_graph_registry", lambda: registry)
+        return registry
+    
+    def test_hits_expanded_to_join_tables(self, registry):
+        """测试一次检索返回命中表、外键关联表和连接条件"""
+        tool = VectorSearchTool(expand_depth=1)
+        
+        with scoped_file_id("file-a"):
+            results = json.loads(tool._run("每个用户的订单金额"))
+        
+        assert [item["type"] for item in results] == ["表", "字段", "关联子图"]
+        assert results[2]["tables"] == [
+            {"name": "orders", "columns": ["id INT", "user_id INT", "total DECIMAL(10,2)"]},
+            {"name": "users", "columns": ["id INT", "org_id INT"]},
+        ]
+        assert results[2]["joins"] == ["orders.user_id = users.id"]
+    
+    def test_depth_and_table_limit(self, registry):
+        """测试扩展层数和表数上限"""
+        with scoped_file_id("file-a"):
+            deep = json.loads(VectorSearchTool(expand_depth=2)._run("订单"))[-1]
+            limited = json.loads(VectorSearchTool(expand_depth=2, max_subgraph_tables=1)._run("订单"))
+        
+        assert [table["name"] for table in deep["tables"]] == ["orders", "users", "orgs"]
+        assert deep["joins"] == ["users.org_id = orgs.id", "orders.user_id = users.id"]
+        assert [item["type"] for item in limited] == ["表", "字段"]
+    
+    def test_subgraph_trimmed_to_token_budget(self, registry):
+        """测试关联子图超出剩余 token 预算时去掉最后扩展到的表"""
+        with scoped_file_id("file-a"):
+            full = json.loads(VectorSearchTool(expand_depth=2, token_budget=0)._run("订单"))
+            hits_tokens = count_tokens(json.dumps(full[:-1], ensure_ascii=False, separators=(",", ":")))
+            trimmed = json.loads(VectorSearchTool(expand_depth=2, token_budget=hits_tokens + 55)._run("订单"))[-1]
+        
+        assert [table["name"] for table in trimmed["tables"]] == ["orders", "users"]
+        assert trimmed["joins"] == ["orders.user_id = users.id"]
+    
+    def test_disabled_or_unscoped(self, registry):
+        """测试关闭扩展或未限定文件时只返回检索结果"""
+        with scoped_file_id("file-a"):
+            disabled = json.loads(VectorSearchTool(expand_depth=0)._run("订单"))
+        unscoped = json.loads(VectorSearchTool(expand_depth=1)._run("订单"))
+        
+        assert [item["type"] for item in disabled] == ["表", "字段"]
+        assert [item["type"] for item in unscoped] == ["表", "字段"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -130,6 +130,65 @@ class TestSQLReferenceValidation:
         assert len(result["warnings"]) > 0
 
 
+class TestColumnReferenceValidation:
+    """字段和别名引用验证测试"""
+    
+    SCHEMA = {
+        "users": {"columns": ["id", "name", "status"]},
+        "orders": {"columns": ["id", "user_id", "total", "created_at"]}
+    }
+    
+    def errors(self, sql):
+        """验证引用并返回错误列表"""
+        return get_sql_validator(self.SCHEMA).validate_references(sql)["errors"]
+    
+    def test_valid_aliases_and_columns(self):
+        """测试表别名、AS 别名、输出列别名和函数参数中的 FROM"""
+        sql = """
+        SELECT u.name, status, o.total AS amount, COUNT(*) cnt
+        FROM users u
+        LEFT JOIN orders AS o ON o.user_id = u.id
+        WHERE EXTRACT(YEAR FROM o.created_at) = 2024
+        GROUP BY u.name, status, o.total
+        ORDER BY amount DESC, cnt;
+        """
+        
+        assert self.errors(sql) == []
+    
+    def test_hallucinated_columns(self):
+        """测试不存在的字段（带别名和不带表名）以及未知别名"""
+        sql = "SELECT u.email, discount, x.id FROM users u JOIN orders o ON o.uid = u.id;"
+        
+        assert self.errors(sql) == [
+            "字段不存在：users.email", "未知的表或别名：x（x.id）", "字段不存在：orders.uid", "字段不存在：discount"
+        ]
+    
+    def test_column_from_other_table_in_scope(self):
+        """测试不带表名的字段只要在语句引用的某张表中即有效"""
+        assert self.errors("SELECT name, total FROM users JOIN orders ON orders.user_id = users.id;") == []
+        assert self.errors("SELECT total FROM users;") == ["字段不存在：total"]
+    
+    def test_subquery_and_cte(self):
+        """测试子查询中的表同样验证，CTE 和子查询别名的字段不在 schema 中、不做验证"""
+        assert self.errors(
+            "SELECT name FROM users WHERE id IN (SELECT user_id FROM orders WHERE total > 10);"
+        ) == []
+        assert self.errors(
+            "WITH big AS (SELECT user_id, SUM(total) s FROM orders GROUP BY user_id) "
+            "SELECT u.name, big.s FROM users u JOIN big ON big.user_id = u.id;"
+        ) == []
+        assert self.errors("SELECT t.n FROM (SELECT COUNT(*) n FROM payments) t;") == ["表不存在：payments"]
+    
+    def test_lateral_and_only_are_not_tables(self):
+        """测试表名位置上的 LATERAL、ONLY 修饰词不被当作表名，其后的子查询和表照常处理"""
+        assert self.errors(
+            "SELECT u.name, t.total FROM users u "
+            "LEFT JOIN LATERAL (SELECT o.total FROM orders o WHERE o.user_id = u.id LIMIT 1) t ON true;"
+        ) == []
+        assert self.errors("SELECT name FROM ONLY users;") == []
+        assert self.errors("SELECT u.name FROM users u, LATERAL (SELECT 1 FROM payments) p;") == ["表不存在：payments"]
+
+
 class TestCompleteValidation:
     """完整验证测试"""
     
@@ -206,18 +265,8 @@ class TestTableNameExtraction:
         assert "users" in tables
         assert "orders" in tables
     
-    @pytest.mark.xfail(
-        reason="已知限制：逗号分隔的多表提取尚未完全实现。"
-               "当前仅能提取第一个表。推荐用户使用 JOIN 语法。"
-               "TODO: 完善 _extract_table_names 方法以支持逗号分隔的表"
-    )
     def test_extract_multiple_tables_comma_separated(self):
-        """
-        测试逗号分隔的多表提取（旧式 SQL 语法）
-        
-        已知限制：当前实现无法完整提取所有逗号分隔的表
-        推荐使用 JOIN 语法
-        """
+        """测试逗号分隔的多表提取（旧式 SQL 语法）"""
         validator = get_sql_validator()
         
         sql = "SELECT * FROM users, orders;"
@@ -226,9 +275,8 @@ class TestTableNameExtraction:
         
         tables = validator._extract_table_names(parsed)
         
-        # 完整测试：应该提取所有表（目前会失败，因此标记为 xfail）
         assert "users" in tables, "应该提取到 users 表"
-        assert "orders" in tables, "应该提取到 orders 表（当前实现缺失）"
+        assert "orders" in tables, "应该提取到 orders 表"
         assert len(tables) == 2, f"应该提取到 2 个表，实际: {len(tables)}"
 
 
@@ -0,0 +1,178 @@
+"""
+流式 DDL 解析测试
+验证表结构语句（CREATE TABLE / ALTER TABLE / CREATE INDEX）流式切分、分块/并行解析结果与整体解析一致，以及上传文件逐块校验和压缩存储
+"""
+import sys
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import interface.api.file_controller as file_module
+from infrastructure.executor.ingestion_executor import IngestionExecutor
+from infrastructure.parser.ddl_parser import ddl_parser
+from infrastructure.parser.ddl_splitter import iter_schema_statements
+from infrastructure.repository.sqlite_file_repository import CompressedContent, SQLiteFileRepository
+
+DUMP = """-- MySQL dump
+/*!40101 SET NAMES utf8 */;
+DROP TABLE IF EXISTS `users`;
+CREATE TABLE `users` (
+  `id` bigint NOT NULL AUTO_INCREMENT COMMENT '用户;ID',
+  `name` varchar(64) DEFAULT 'a''b;c',
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB COMMENT='用户表';
+INSERT INTO `users` VALUES (1,'x;y -- z'),(2,'it\\'s; /* no */ CREATE TABLE fake (a int)');
+/* block; comment */
+CREATE TABLE orders (id INT PRIMARY KEY, user_id INT NOT NULL) -- trailing; comment
+;
+CREATE VIEW v AS SELECT 1;
+ALTER TABLE `orders` ADD CONSTRAINT `fk_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`);
+ALTER VIEW v AS SELECT 2;
+CREATE UNIQUE INDEX uk_name ON users (name);
+create table lower_case (a int)
+"""
+
+
+def chunked(text: str, size: int):
+    """按固定大小切块"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestSchemaStatementSplitter:
+    """测试表结构语句流式切分"""
+    
+    def test_only_schema_statements(self):
+        """测试只保留 CREATE TABLE / ALTER TABLE / CREATE INDEX，忽略字符串和注释中的分号与关键字"""
+        statements = list(iter_schema_statements([DUMP]))
+        
+        assert len(statements) == 5
+        assert statements[0].lstrip().startswith("CREATE TABLE `users`")
+        assert statements[0].endswith("COMMENT='用户表';")
+        assert "-- trailing; comment" in statements[1]
+        assert statements[2].strip().startswith("ALTER TABLE `orders` ADD CONSTRAINT")
+        assert statements[3].strip() == "CREATE UNIQUE INDEX uk_name ON users (name);"
+        assert statements[4].strip() == "create table lower_case (a int)"
+    
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+    def test_chunk_boundaries(self, size):
+        """测试任意分块（记号跨块）与整体切分结果一致"""
+        assert list(iter_schema_statements(chunked(DUMP, size))) == \
+            list(iter_schema_statements([DUMP]))
+
+
+class TestParseStream:
+    """测试流式解析"""
+    
+    def test_same_tables_as_whole_content(self):
+        """测试分块解析与整体解析结果一致"""
+        expected = [table.to_dict() for table in ddl_parser.parse(DUMP)]
+        
+        assert [t["name"] for t in expected] == ["users", "orders", "lower_case"]
+        assert [table.to_dict() for table in ddl_parser.parse_stream(chunked(DUMP, 5))] == expected
+    
+    def test_compressed_content_is_picklable_stream(self):
+        """测试压缩原文可 pickle（交给解析进程）并按块流式解压"""
+        import zlib
+        content = CompressedContent(zlib.compress(DUMP.encode("utf-8")), chunk_size=16)
+        restored = pickle.loads(pickle.dumps(content))
+        
+        chunks = list(restored)
+        assert len(chunks) > 1
+        assert "".join(chunks) == DUMP
+        assert [t.name for t in ddl_parser.parse_stream(restored)] == ["users", "orders", "lower_case"]
+    
+    
+    @pytest.mark.parametrize("batch_size, max_pending_batches", [(1, 1), (2, 8), (200, 8)])
+    def test_parallel_parse_same_as_sequential(self, batch_size, max_pending_batches):
+        """测试分批并行解析与顺序解析结果及顺序一致"""
+        expected = [table.to_dict() for table in ddl_parser.parse_stream(chunked(DUMP, 5))]
+        
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            tables = ddl_parser.parse_parallel(
+                chunked(DUMP, 5), executor, batch_size=batch_size, max_pending_batches=max_pending_batches
+            )
+        
+        assert [table.to_dict() for table in tables] == expected
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """使用临时仓储的上传接口，后台任务只记录 file_id"""
+    repository = SQLiteFileRepository(str(tmp_path / "files.db"))
+    scheduled = []
+    
+    async def record(file_id):
+        scheduled.append(file_id)
+    
+    monkeypatch.setattr(file_module, "file_repository", repository)
+    monkeypatch.setattr(file_module, "process_ddl_background", record)
+    monkeypatch.setattr(file_module.ddl_service, "reserve_slot", lambda: None)
+    monkeypatch.setattr(file_module, "UPLOAD_CHUNK_SIZE", 8)
+    
+    app = FastAPI()
+    app.include_router(file_module.router, prefix="/api/files")
+    client = TestClient(app)
+    client.repository = repository
+    client.scheduled = scheduled
+    return client
+
+
+class TestStreamingUpload:
+    """测试上传文件逐块校验和存储"""
+    
+    def test_upload_stored_compressed(self, client):
+        """测试上传内容逐块压缩存储，后台任务只传 file_id"""
+        data = DUMP.encode("utf-8")
+        response = client.post("/api/files/upload", files={"file": ("dump.sql", data, "text/plain")})
+        
+        assert response.status_code == 201
+        body = response.json()
+        assert body["file_size"] == len(data)
+        assert client.scheduled == [body["file_id"]]
+        assert "".join(client.repository.iter_content(body["file_id"])) == DUMP
+    
+    def test_keyword_across_chunks(self, client):
+        """测试 CREATE TABLE 跨块时仍能识别"""
+        data = b"-- header\n" + b"CREATE TABLE t (a int);"
+        response = client.post("/api/files/upload", files={"file": ("t.sql", data, "text/plain")})
+        assert response.status_code == 201
+    
+    def test_invalid_encoding_and_missing_ddl_rejected(self, client):
+        """测试非 UTF-8 内容和不含 CREATE TABLE 的文件被拒绝且不保存"""
+        bad_encoding = client.post(
+            "/api/files/upload", files={"file": ("a.sql", b"CREATE TABLE t (a int); \xff\xfe", "text/plain")}
+        )
+        no_ddl = client.post(
+            "/api/files/upload", files={"file": ("b.sql", b"SELECT 1;", "text/plain")}
+        )
+        
+        assert bad_encoding.status_code == 400
+        assert "编码" in bad_encoding.json()["detail"]
+        assert no_ddl.status_code == 400
+        assert client.repository.list_files() == []
+    
+    def test_failed_save_releases_slot(self, client, monkeypatch):
+        """测试保存到仓储失败时归还预占的处理队列位置"""
+        executor = IngestionExecutor(max_concurrency=1, queue_size=1, parse_workers=0, embed_workers=1)
+        monkeypatch.setattr(file_module.ddl_service, "reserve_slot", executor.reserve)
+        monkeypatch.setattr(file_module.ddl_service, "release_slot", executor.release)
+        
+        def fail(*args, **kwargs):
+            raise OSError("database is locked")
+        
+        monkeypatch.setattr(client.repository, "create_from_chunks", fail)
+        with pytest.raises(OSError):
+            client.post("/api/files/upload", files={"file": ("t.sql", b"CREATE TABLE t (a int);", "text/plain")})
+        
+        assert executor.get_stats()["pending"] == 0
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
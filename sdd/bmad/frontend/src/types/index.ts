@@ -15,10 +15,19 @@ export interface FileItem {
   table_count?: number
   column_count?: number
   embedding_count?: number
+  embedding_progress?: EmbeddingProgress
   error_message?: string
   tables?: TableInfo[]
 }
 
+/**
+ * 向量化进度（解析中）
+ */
+export interface EmbeddingProgress {
+  embedded: number
+  total: number
+}
+
 /**
  * 表信息
  */